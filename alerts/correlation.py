@@ -0,0 +1,282 @@
+"""
+Root-cause correlation of simultaneous failure alerts
+
+When an upstream router or link drops, every device behind it fails at
+once. So failing devices are classified before their alerts are inserted.
+The classification uses a precomputed index of the keys each device
+shares with others:
+    - its upstream traceroute hops, deepest first
+    - its subnet
+    - its device groups
+    - its location
+    - its ISP
+
+A key is a candidate root cause when two things hold. At least
+ALERT_CORRELATION_MIN_DEVICES of its devices failed within
+ALERT_CORRELATION_WINDOW_SECONDS. And those devices make up at least
+ALERT_CORRELATION_MIN_RATIO of its members. Each failing device joins the
+candidate that explains the most failures. A broader candidate only wins
+over a more specific one when it explains at least MIN_DEVICES more.
+
+The alerts of a key become children of one parent alert. Alerts raised
+individually earlier in the window are adopted by it, and later ones
+join it while it stays active. Only parents are published and notified.
+"""
+import ipaddress
+import logging
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# AlertType values of failures that may share an upstream cause
+CORRELATED_TYPES = ('device_down', 'port_down', 'timeout')
+
+KEY_LABELS = {
+    'upstream': 'upstream hop',
+    'subnet': 'subnet',
+    'group': 'device group',
+    'location': 'location',
+    'isp': 'ISP',
+}
+
+
+class CorrelationIndex:
+    """Correlation keys of every device, most specific first, with the member count of each key"""
+
+    def __init__(self, device_keys: Dict[int, Tuple[str, ...]]):
+        self.device_keys = device_keys
+        self.sizes: Dict[str, int] = {}
+        for keys in device_keys.values():
+            for key in keys:
+                self.sizes[key] = self.sizes.get(key, 0) + 1
+
+    @classmethod
+    def from_rows(cls, devices: Iterable[Tuple], groups: Iterable[Tuple] = (),
+                  hops: Iterable[Tuple] = (), subnet_prefix: int = 24) -> 'CorrelationIndex':
+        """
+        Build the index from database rows.
+
+        Args:
+            devices: (id, ip_address, location, isp) rows
+            groups: (device id, group name) rows
+            hops: (device id, address, hop) rows of the devices' current routes
+            subnet_prefix: Prefix length of the subnet key
+        """
+        group_names, upstream = {}, {}
+        for device_id, name in groups:
+            group_names.setdefault(device_id, []).append(name)
+        for device_id, address, hop in hops:
+            upstream.setdefault(device_id, []).append((hop, address))
+
+        device_keys = {}
+        for device_id, ip_address, location, isp in devices:
+            keys = [f'upstream:{address}' for _hop, address in sorted(upstream.get(device_id, ()), reverse=True)
+                    if address != ip_address]
+            keys.append(f'subnet:{ipaddress.ip_network(f"{ip_address}/{subnet_prefix}", strict=False)}')
+            keys.extend(f'group:{name}' for name in sorted(group_names.get(device_id, ())))
+            if location:
+                keys.append(f'location:{location}')
+            if isp:
+                keys.append(f'isp:{isp}')
+            device_keys[device_id] = tuple(keys)
+        return cls(device_keys)
+
+    def classify(self, failed: Iterable[int], min_devices: int = 5, min_ratio: float = 0.5,
+                 open_keys: Iterable[str] = ()) -> Dict[int, str]:
+        """
+        Assign failing devices to the root cause that explains them.
+
+        Args:
+            failed: Devices that failed within the window
+            min_devices: Least number of failed devices for a key to qualify
+            min_ratio: Least share of a key's devices that must have failed
+            open_keys: Keys that already have an active parent alert; they
+                qualify with any number of failures
+
+        Returns:
+            Dictionary mapping correlated device ids to their key; devices
+            left on their own are absent
+        """
+        failed = set(failed)
+        counts = {}
+        for device_id in failed:
+            for key in self.device_keys.get(device_id, ()):
+                counts[key] = counts.get(key, 0) + 1
+
+        open_keys = set(open_keys)
+        qualified = {key for key, count in counts.items()
+                     if key in open_keys or (count >= min_devices and count >= min_ratio * self.sizes[key])}
+        if not qualified:
+            return {}
+
+        assigned = {}
+        for device_id in failed:
+            best = None
+            for key in self.device_keys.get(device_id, ()):
+                # Keys come most specific first; a broader one wins only when the failures
+                # it adds are a group of their own, not a stray failure elsewhere behind it
+                if key in qualified and (best is None or counts[key] - counts[best] >= min_devices):
+                    best = key
+            if best is not None:
+                assigned[device_id] = best
+
+        # A candidate whose devices all went to bigger ones is no longer a group
+        members = {}
+        for key in assigned.values():
+            members[key] = members.get(key, 0) + 1
+        return {device_id: key for device_id, key in assigned.items()
+                if key in open_keys or members[key] >= min_devices}
+
+
+def describe_key(key: str) -> str:
+    """Return a readable form of a correlation key, such as 'upstream hop 10.0.0.1'."""
+    kind, _, value = key.partition(':')
+    return f"{KEY_LABELS.get(kind, kind)} {value}"
+
+
+def correlation_options(config: Dict) -> Dict:
+    """Map ALERT_CORRELATION_* configuration keys to classify() options."""
+    return {
+        'min_devices': config.get('ALERT_CORRELATION_MIN_DEVICES', 5),
+        'min_ratio': config.get('ALERT_CORRELATION_MIN_RATIO', 0.5),
+    }
+
+
+def load_index(subnet_prefix: int = 24) -> CorrelationIndex:
+    """Build the correlation index from the active devices, their groups and their routes."""
+    from devices.models import Device, DeviceGroup
+    from monitoring.models import DevicePathHop
+
+    return CorrelationIndex.from_rows(
+        Device.objects.filter(is_active=True).values_list('id', 'ip_address', 'location', 'isp'),
+        DeviceGroup.devices.through.objects.values_list('device_id', 'devicegroup__name'),
+        DevicePathHop.objects.values_list('device_id', 'node__address', 'hop'),
+        subnet_prefix=subnet_prefix,
+    )
+
+
+_index = None
+_index_loaded_at = None
+_index_lock = threading.Lock()
+
+
+def get_correlation_index() -> CorrelationIndex:
+    """Return the process-wide correlation index, rebuilt every ALERT_CORRELATION_INDEX_SECONDS."""
+    from django.conf import settings
+
+    global _index, _index_loaded_at
+    config = getattr(settings, 'NETWORK_MONITOR', {})
+    with _index_lock:
+        if _index is None or time.monotonic() - _index_loaded_at >= config.get('ALERT_CORRELATION_INDEX_SECONDS', 300):
+            _index = load_index(config.get('ALERT_CORRELATION_SUBNET_PREFIX', 24))
+            _index_loaded_at = time.monotonic()
+        return _index
+
+
+def correlate_alerts(alerts: List) -> List:
+    """
+    Attach failure alerts that share a root cause to a parent alert.
+
+    New parents are saved and the children get their parent set, ready
+    for the caller's bulk insert. Matching alerts already saved earlier
+    in the window are re-parented in place.
+
+    Returns:
+        The new parent alerts
+    """
+    from django.conf import settings
+    from django.db import IntegrityError, transaction
+    from django.db.models import F
+    from django.utils import timezone
+    from monitoring.notify import SEVERITY_ORDER
+    from .models import Alert, AlertType
+
+    config = getattr(settings, 'NETWORK_MONITOR', {})
+    failures = [alert for alert in alerts if alert.alert_type in CORRELATED_TYPES]
+    if not config.get('ALERT_CORRELATION_ENABLED', True) or not failures:
+        return []
+
+    now = timezone.now()
+    window = config.get('ALERT_CORRELATION_WINDOW_SECONDS', 120)
+    since = now - timedelta(seconds=window)
+
+    # Every failure of the window counts, including ones already attached to a
+    # narrower cause, so a storm that arrives batch by batch ends up under one parent
+    recent = list(Alert.objects.filter(
+        alert_type__in=CORRELATED_TYPES, is_active=True, created_at__gte=since
+    ).values_list('id', 'device_id', 'parent_id'))
+    open_parents = dict(Alert.objects.filter(
+        alert_type=AlertType.CORRELATED, is_active=True, updated_at__gte=since
+    ).values_list('correlation_key', 'id'))
+
+    failed = {alert.device_id for alert in failures} | {device_id for _id, device_id, _parent in recent}
+    assigned = get_correlation_index().classify(failed, open_keys=open_parents, **correlation_options(config))
+    if not assigned:
+        return []
+
+    groups = {}
+    for alert in failures:
+        key = assigned.get(alert.device_id)
+        if key:
+            groups.setdefault(key, ([], []))[0].append(alert)
+    for alert_id, device_id, parent_id in recent:
+        key = assigned.get(device_id)
+        if key in groups and (parent_id is None or parent_id != open_parents.get(key)):
+            groups[key][1].append((alert_id, parent_id))
+
+    new_parents = {}
+    for key, (children, adopted) in groups.items():
+        if key in open_parents:
+            continue
+        worst = max((child.severity for child in children), key=lambda severity: SEVERITY_ORDER.get(severity, 0))
+        count = len(children) + len(adopted)
+        parent = Alert(
+            device=children[0].device,
+            alert_type=AlertType.CORRELATED,
+            severity=worst,
+            title=f"Correlated outage: {count} failures share {describe_key(key)}"[:200],
+            message=(f"{count} failure alerts raised within {window}s share {describe_key(key)}, "
+                     f"the likely root cause. Further failures sharing it are attached to this alert."),
+            correlation_key=key,
+            child_count=count,
+        )
+        # The unique active correlation_key makes a worker correlating the same storm
+        # at the same time wait for the other's parent, then join it
+        try:
+            with transaction.atomic():
+                parent.save()
+            new_parents[key] = parent
+        except IntegrityError:
+            open_parents[key] = Alert.objects.get(
+                alert_type=AlertType.CORRELATED, is_active=True, correlation_key=key
+            ).id
+            groups[key] = (children, [entry for entry in adopted if entry[1] != open_parents[key]])
+
+    # Children moved off a narrower parent are taken off its count; a parent left
+    # without children is superseded by the one that took them
+    superseded = {}
+    for key, (children, adopted) in groups.items():
+        parent_id = new_parents[key].id if key in new_parents else open_parents[key]
+        for child in children:
+            child.parent_id = parent_id
+        if adopted:
+            Alert.objects.filter(id__in=[alert_id for alert_id, _parent in adopted]).update(parent_id=parent_id)
+            for _alert_id, previous in adopted:
+                if previous is not None:
+                    superseded.setdefault(previous, [parent_id, 0])[1] += 1
+                    superseded[previous][0] = parent_id
+        if key not in new_parents:
+            Alert.objects.filter(id=parent_id).update(
+                child_count=F('child_count') + len(children) + len(adopted), updated_at=now
+            )
+
+    for previous, (parent_id, moved) in superseded.items():
+        Alert.objects.filter(id=previous).update(child_count=F('child_count') - moved, updated_at=now)
+        Alert.objects.filter(id=previous, child_count=0).update(is_active=False, resolved_at=now, parent_id=parent_id)
+
+    logger.info(f"Correlated {sum(len(c) + len(a) for c, a in groups.values())} alerts "
+                f"under {len(groups)} root causes ({len(new_parents)} new)")
+    return list(new_parents.values())
@@ -0,0 +1,88 @@
+"""
+Deduplicated, bulk alert creation
+
+Alerts are filtered through the (device, alert type) cooldown cache.
+Failures sharing a root cause are grouped under a parent alert, and the
+rest are written with a single bulk insert. So an outage that flips
+thousands of devices costs one cache round trip, a few queries and one
+INSERT, not one query and one row per device.
+"""
+import logging
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import transaction
+
+from monitoring.cooldown import PENDING_CLAIM_SECONDS, get_cooldown_cache
+from monitoring.events import publish_on_commit, alert_event
+from .correlation import correlate_alerts
+from .models import Alert
+
+logger = logging.getLogger(__name__)
+
+
+def alert_cooldown():
+    """Return the process-wide alert cooldown cache."""
+    config = getattr(settings, 'NETWORK_MONITOR', {})
+    return get_cooldown_cache(
+        'alert_cooldown',
+        url=config.get('ALERT_COOLDOWN_URL'),
+        ttl=config.get('ALERT_COOLDOWN_MINUTES', 15) * 60,
+        maxsize=config.get('ALERT_COOLDOWN_CACHE_SIZE', 100000)
+    )
+
+
+def create_alerts(alerts: List[Alert], keys: Optional[List] = None) -> List[Alert]:
+    """
+    Insert the alerts whose cooldown key is not cooling down.
+
+    Failures sharing a root cause are attached to a correlated parent
+    alert first, and only parents and uncorrelated alerts are published.
+    The alerts should be built with their device object, which the
+    published alert events read. Only the first alert of a key in
+    `alerts` is kept.
+
+    Keys are first claimed for PENDING_CLAIM_SECONDS only, and get their
+    full cooldown once the alerts commit. Keys of an insert that fails are
+    released at once. Keys of an enclosing transaction that rolls back
+    lapse after the pending claim, so those alerts are raised again soon
+    rather than suppressed for the whole cooldown.
+
+    Args:
+        alerts: Unsaved alerts
+        keys: Cooldown key of each alert; defaults to (device id, alert type)
+
+    Returns:
+        The created alerts; new correlated parents are reachable
+        through their `parent_id`
+    """
+    if not alerts:
+        return []
+
+    if keys is None:
+        keys = [(alert.device_id, alert.alert_type) for alert in alerts]
+    cooldown = alert_cooldown()
+    claimed = cooldown.claim_many(keys, ttl=min(PENDING_CLAIM_SECONDS, cooldown.ttl))
+    pending = set(claimed)
+    fresh = []
+    for alert, key in zip(alerts, keys):
+        if key in pending:
+            pending.discard(key)
+            fresh.append(alert)
+
+    if len(fresh) < len(alerts):
+        logger.info(f"Skipped {len(alerts) - len(fresh)} alerts in cooldown")
+    if not fresh:
+        return []
+
+    try:
+        with transaction.atomic():
+            parents = correlate_alerts(fresh)
+            created = Alert.objects.bulk_create(fresh)
+    except Exception:
+        cooldown.release(claimed)
+        raise
+
+    transaction.on_commit(lambda: cooldown.extend(claimed), robust=True)
+    publish_on_commit([alert_event(alert) for alert in parents + created if alert.parent_id is None])
+    return created
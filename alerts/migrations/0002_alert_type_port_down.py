@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("alerts", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="alert",
+            name="alert_type",
+            field=models.CharField(
+                choices=[
+                    ("device_down", "Device Down"),
+                    ("device_up", "Device Up"),
+                    ("high_latency", "High Latency"),
+                    ("speed_degradation", "Speed Degradation"),
+                    ("timeout", "Timeout"),
+                    ("port_down", "Port Down"),
+                ],
+                max_length=20,
+            ),
+        ),
+    ]
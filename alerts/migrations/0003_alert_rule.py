@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("alerts", "0002_alert_type_port_down"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="alert",
+            name="rule",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Alert rule that raised the alert",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="alerts",
+                to="alerts.alertrule",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="alert",
+            name="alert_type",
+            field=models.CharField(
+                choices=[
+                    ("device_down", "Device Down"),
+                    ("device_up", "Device Up"),
+                    ("high_latency", "High Latency"),
+                    ("speed_degradation", "Speed Degradation"),
+                    ("timeout", "Timeout"),
+                    ("port_down", "Port Down"),
+                    ("packet_loss", "Packet Loss"),
+                ],
+                max_length=20,
+            ),
+        ),
+    ]
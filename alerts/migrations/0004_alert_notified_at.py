@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("alerts", "0003_alert_rule"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="alert",
+            name="notified_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="When Slack and webhook channels were notified",
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("alerts", "0004_alert_notified_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="alert",
+            name="child_count",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Number of alerts attached to this one"
+            ),
+        ),
+        migrations.AddField(
+            model_name="alert",
+            name="correlation_key",
+            field=models.CharField(
+                blank=True,
+                help_text="Shared root cause, such as upstream:10.0.0.1",
+                max_length=255,
+            ),
+        ),
+        migrations.AddField(
+            model_name="alert",
+            name="parent",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Correlated outage alert this alert is part of",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="children",
+                to="alerts.alert",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="alert",
+            name="alert_type",
+            field=models.CharField(
+                choices=[
+                    ("device_down", "Device Down"),
+                    ("device_up", "Device Up"),
+                    ("high_latency", "High Latency"),
+                    ("speed_degradation", "Speed Degradation"),
+                    ("timeout", "Timeout"),
+                    ("port_down", "Port Down"),
+                    ("packet_loss", "Packet Loss"),
+                    ("correlated", "Correlated Outage"),
+                ],
+                max_length=20,
+            ),
+        ),
+    ]
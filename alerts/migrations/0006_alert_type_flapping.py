@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("alerts", "0005_alert_correlation"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="alert",
+            name="alert_type",
+            field=models.CharField(
+                choices=[
+                    ("device_down", "Device Down"),
+                    ("device_up", "Device Up"),
+                    ("high_latency", "High Latency"),
+                    ("speed_degradation", "Speed Degradation"),
+                    ("timeout", "Timeout"),
+                    ("port_down", "Port Down"),
+                    ("packet_loss", "Packet Loss"),
+                    ("correlated", "Correlated Outage"),
+                    ("flapping", "Device Flapping"),
+                ],
+                max_length=20,
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("alerts", "0006_alert_type_flapping"),
+        ("devices", "0005_device_status_flapping"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="alert",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("alert_type", "correlated"), ("is_active", True)),
+                fields=("correlation_key",),
+                name="unique_active_correlation_key",
+            ),
+        ),
+    ]
@@ -13,6 +13,10 @@ class AlertType(models.TextChoices):
     HIGH_LATENCY = 'high_latency', 'High Latency'
     SPEED_DEGRADATION = 'speed_degradation', 'Speed Degradation'
     TIMEOUT = 'timeout', 'Timeout'
+    PORT_DOWN = 'port_down', 'Port Down'
+    PACKET_LOSS = 'packet_loss', 'Packet Loss'
+    CORRELATED = 'correlated', 'Correlated Outage'
+    FLAPPING = 'flapping', 'Device Flapping'
 
 
 class AlertSeverity(models.TextChoices):
@@ -27,6 +31,26 @@ class Alert(models.Model):
     """Alert model for storing alert notifications"""
     
     device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='alerts')
+    rule = models.ForeignKey(
+        'AlertRule',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='alerts',
+        help_text="Alert rule that raised the alert"
+    )
+    
+    # Root-cause correlation: failures sharing a cause hang off one parent alert
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='children',
+        help_text="Correlated outage alert this alert is part of"
+    )
+    correlation_key = models.CharField(max_length=255, blank=True, help_text="Shared root cause, such as upstream:10.0.0.1")
+    child_count = models.PositiveIntegerField(default=0, help_text="Number of alerts attached to this one")
     
     # Alert details
     alert_type = models.CharField(max_length=20, choices=AlertType.choices)
@@ -44,6 +68,7 @@ class Alert(models.Model):
     # Notification tracking
     email_sent = models.BooleanField(default=False)
     email_sent_at = models.DateTimeField(null=True, blank=True)
+    notified_at = models.DateTimeField(null=True, blank=True, help_text="When Slack and webhook channels were notified")
     retry_count = models.PositiveIntegerField(default=0)
     
     # Metadata
@@ -59,6 +84,14 @@ class Alert(models.Model):
             models.Index(fields=['is_active', '-created_at']),
             models.Index(fields=['severity', '-created_at']),
         ]
+        constraints = [
+            # One open parent per root cause, even when workers correlate the same storm at once
+            models.UniqueConstraint(
+                fields=['correlation_key'],
+                condition=models.Q(alert_type=AlertType.CORRELATED, is_active=True),
+                name='unique_active_correlation_key',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.get_alert_type_display()} - {self.device.name}"
@@ -86,17 +119,21 @@ class Alert(models.Model):
         return icon_map.get(self.severity, 'bi-bell')
     
     def acknowledge(self, acknowledged_by=None):
-        """Acknowledge the alert"""
+        """Acknowledge the alert and its correlated children"""
         self.is_acknowledged = True
         self.acknowledged_by = acknowledged_by or 'System'
         self.acknowledged_at = timezone.now()
         self.save()
+        self.children.filter(is_acknowledged=False).update(
+            is_acknowledged=True, acknowledged_by=self.acknowledged_by, acknowledged_at=self.acknowledged_at
+        )
     
     def resolve(self):
-        """Resolve the alert"""
+        """Resolve the alert and its correlated children"""
         self.is_active = False
         self.resolved_at = timezone.now()
         self.save()
+        self.children.filter(is_active=True).update(is_active=False, resolved_at=self.resolved_at)
 
 
 class AlertRule(models.Model):
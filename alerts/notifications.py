@@ -0,0 +1,226 @@
+"""
+Delivery of pending alerts to the notification channels
+
+Enabled NotificationChannels are read once per run. Email goes out as one
+digest per recipient. It is sent over a mail connection that the worker
+process keeps open between runs, and reopened when the server has dropped
+it. Slack and webhook channels get their alerts in a few requests, sent
+concurrently over the pooled webhook sender.
+
+Channel configuration:
+    email: {"recipients": [...], "min_severity": "high"}
+    slack: {"webhook_url": "https://hooks.slack.com/...", "min_severity": ...}
+    webhook: {"url": "https://...", "headers": {...}, "min_severity": ...}
+
+ALERT_EMAIL_RECIPIENTS always receives every alert by email.
+"""
+import logging
+import os
+import threading
+from typing import Dict, Iterable, List, Set, Tuple
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+from monitoring.notify import (
+    SEVERITY_ORDER, digest_body, digest_subject, get_webhook_sender, recipient_digests, sort_alerts
+)
+from .models import NotificationChannel
+
+logger = logging.getLogger(__name__)
+
+# Alert lines in a Slack message; the rest are summarized
+SLACK_MAX_LINES = 50
+
+
+def notify_options(config: Dict) -> Dict:
+    """Map ALERT_WEBHOOK_* configuration keys to WebhookSender options."""
+    return {
+        'workers': config.get('ALERT_WEBHOOK_WORKERS', 16),
+        'timeout': config.get('ALERT_WEBHOOK_TIMEOUT', 10.0),
+        'retries': config.get('ALERT_WEBHOOK_RETRIES', 3),
+    }
+
+
+def load_channels() -> Tuple[List[Tuple[List[str], str]], List[Dict]]:
+    """
+    Read the enabled notification channels.
+
+    Returns:
+        (email routes, hooks): the (recipients, min_severity) pairs of the
+        email channels, and one dict per Slack or webhook channel with
+        name, type, url, headers and min_severity
+    """
+    config = getattr(settings, 'NETWORK_MONITOR', {})
+    routes = []
+    if config.get('ALERT_EMAIL_RECIPIENTS'):
+        routes.append((list(config['ALERT_EMAIL_RECIPIENTS']), 'low'))
+
+    hooks = []
+    for channel in NotificationChannel.objects.filter(is_enabled=True):
+        options = channel.configuration or {}
+        min_severity = options.get('min_severity', 'low')
+        if channel.channel_type == 'email':
+            recipients = options.get('recipients', [])
+            if isinstance(recipients, str):
+                recipients = recipients.split(',')
+            recipients = [recipient.strip() for recipient in recipients if recipient.strip()]
+            if recipients:
+                routes.append((recipients, min_severity))
+        elif channel.channel_type in ('slack', 'webhook'):
+            url = options.get('webhook_url') or options.get('url')
+            if not url:
+                logger.warning(f"Notification channel {channel.name} has no URL")
+                continue
+            hooks.append({
+                'name': channel.name,
+                'type': channel.channel_type,
+                'url': url,
+                'headers': options.get('headers') or None,
+                'min_severity': min_severity,
+            })
+        else:
+            logger.warning(f"Notification channel {channel.name}: "
+                           f"{channel.get_channel_type_display()} delivery is not supported")
+    return routes, hooks
+
+
+def alert_item(alert) -> Dict:
+    """Flatten an alert and its device into the dictionary digests are built from."""
+    return {
+        'id': alert.id,
+        'device_id': alert.device_id,
+        'device_name': alert.device.name,
+        'ip_address': alert.device.ip_address,
+        'alert_type': alert.alert_type,
+        'severity': alert.severity,
+        'title': alert.title,
+        'message': alert.message,
+        'created_at': alert.created_at,
+    }
+
+
+def slack_payload(items: List[Dict]) -> Dict:
+    """Build one Slack message summarizing the alerts."""
+    lines = [f"*{digest_subject(items)}*"]
+    for item in items[:SLACK_MAX_LINES]:
+        lines.append(f"• [{item['severity'].upper()}] {item['device_name']} ({item['ip_address']}): {item['title']}")
+    if len(items) > SLACK_MAX_LINES:
+        lines.append(f"… and {len(items) - SLACK_MAX_LINES} more")
+    return {'text': '\n'.join(lines)}
+
+
+def webhook_payload(items: List[Dict]) -> Dict:
+    """Build a webhook body carrying the alerts."""
+    return {
+        'count': len(items),
+        'alerts': [dict(item, created_at=item['created_at'].isoformat()) for item in items],
+    }
+
+
+_mail_connection = None
+_mail_pid = None
+_mail_lock = threading.Lock()
+
+
+def get_mail_connection():
+    """Return the process-wide open mail connection, reopened after a fork."""
+    global _mail_connection, _mail_pid
+    with _mail_lock:
+        if _mail_connection is None or _mail_pid != os.getpid():
+            connection = get_connection()
+            connection.open()
+            _mail_connection = connection
+            _mail_pid = os.getpid()
+        return _mail_connection
+
+
+def close_mail_connection():
+    """Close the process-wide mail connection; the next send reopens it."""
+    global _mail_connection
+    with _mail_lock:
+        if _mail_connection is not None:
+            try:
+                _mail_connection.close()
+            except Exception:
+                pass
+            _mail_connection = None
+
+
+def send_email_digests(digests: Dict[str, List[Dict]]) -> Set[str]:
+    """
+    Send each recipient its digest over the persistent mail connection.
+
+    A send that fails is retried once on a fresh connection, since servers
+    drop connections that sat idle between runs.
+
+    Returns:
+        The recipients whose digest could not be sent
+    """
+    failed = set()
+    for recipient, items in digests.items():
+        message = EmailMessage(digest_subject(items), digest_body(items), to=[recipient])
+        for attempt in range(2):
+            try:
+                get_mail_connection().send_messages([message])
+                break
+            except Exception as e:
+                close_mail_connection()
+                if attempt:
+                    logger.error(f"Failed to send alert digest to {recipient}: {e}")
+                    failed.add(recipient)
+    return failed
+
+
+def send_hooks(hooks: List[Dict], items: List[Dict], batch_size: int = 500) -> Tuple[int, Set[int]]:
+    """
+    Send the alerts to the Slack and webhook channels concurrently.
+
+    Returns:
+        (number of successful requests, ids of alerts in a failed request)
+    """
+    calls, call_items = [], []
+    for hook in hooks:
+        floor = SEVERITY_ORDER.get(hook['min_severity'], 0)
+        selected = [item for item in items if SEVERITY_ORDER.get(item['severity'], 0) >= floor]
+        if not selected:
+            continue
+        if hook['type'] == 'slack':
+            calls.append((hook['url'], slack_payload(selected), hook['headers']))
+            call_items.append(selected)
+        else:
+            for start in range(0, len(selected), batch_size):
+                chunk = selected[start:start + batch_size]
+                calls.append((hook['url'], webhook_payload(chunk), hook['headers']))
+                call_items.append(chunk)
+
+    config = getattr(settings, 'NETWORK_MONITOR', {})
+    results = get_webhook_sender(**notify_options(config)).post_many(calls)
+
+    failed = {item['id'] for result, chunk in zip(results, call_items) if not result['ok'] for item in chunk}
+    return sum(1 for result in results if result['ok']), failed
+
+
+def dispatch_alerts(email_alerts: Iterable, hook_alerts: Iterable, routes: List, hooks: List[Dict]) -> Dict:
+    """
+    Deliver alerts to the email routes and the Slack/webhook channels.
+
+    Returns:
+        Dictionary with messages and requests sent, and email_failed and
+        hooks_failed, the ids of alerts whose delivery failed
+    """
+    email_items = sort_alerts(alert_item(alert) for alert in email_alerts)
+    hook_items = sort_alerts(alert_item(alert) for alert in hook_alerts)
+
+    digests = recipient_digests(email_items, routes) if email_items else {}
+    failed_recipients = send_email_digests(digests)
+    email_failed = {item['id'] for recipient in failed_recipients for item in digests[recipient]}
+
+    requests_sent, hooks_failed = send_hooks(hooks, hook_items) if hook_items else (0, set())
+
+    return {
+        'messages': len(digests) - len(failed_recipients),
+        'requests': requests_sent,
+        'email_failed': email_failed,
+        'hooks_failed': hooks_failed,
+    }
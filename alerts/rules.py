@@ -0,0 +1,439 @@
+"""
+Streaming evaluation of alert rules
+
+Enabled AlertRules are compiled once per reload. Each rule's device_filter
+becomes the set of device ids it covers, and those sets are inverted into
+a device -> rules index. Each device keeps a fixed-size ring buffer of its
+recent latency and packet loss with running sums. So a new result updates
+the window, then checks each rule that covers the device in O(1). A rule
+fires once its condition has held for threshold_duration. That is tracked
+with the time the breach started, not by reading past result rows, and the
+alert is resolved when the condition clears.
+
+The windows and breach timers live in memory, so one process has to see
+every result of a device, in order. Workers that write results do not
+evaluate them. They queue them on ALERT_RULE_QUEUE, which is consumed by
+a single worker process:
+
+    celery -A network_monitor worker -Q alert_rules --concurrency=1
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PING_CONDITIONS = ('ping_failure', 'high_latency', 'packet_loss')
+SPEED_CONDITIONS = ('speed_degradation',)
+
+# AlertType value raised by each condition
+CONDITION_ALERT_TYPES = {
+    'ping_failure': 'device_down',
+    'high_latency': 'high_latency',
+    'packet_loss': 'packet_loss',
+    'speed_degradation': 'speed_degradation',
+}
+
+# device_filter keys that match a Device field directly
+DEVICE_FILTER_FIELDS = ('device_type', 'location', 'country', 'city', 'isp', 'organization')
+
+FIRE = 'fire'
+RESOLVE = 'resolve'
+
+RuleEvent = namedtuple('RuleEvent', ['kind', 'rule', 'device_id', 'value', 'since', 'timestamp'])
+
+
+def device_filter_lookups(device_filter: Optional[Dict]) -> Dict:
+    """
+    Translate an AlertRule device_filter into Device queryset lookups.
+
+    Supported keys are the Device fields in DEVICE_FILTER_FIELDS, `ids`
+    and `groups` (DeviceGroup names). Each one takes a value or a list of
+    values. An empty filter matches every device.
+
+    Raises:
+        ValueError: If the filter is not a dict or has an unknown key
+    """
+    if not device_filter:
+        return {}
+    if not isinstance(device_filter, dict):
+        raise ValueError("Device filter must be an object")
+
+    lookups = {}
+    for key, value in device_filter.items():
+        values = list(value) if isinstance(value, (list, tuple)) else [value]
+        if key == 'ids':
+            try:
+                lookups['id__in'] = [int(v) for v in values]
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid device ids: {value!r}")
+        elif key == 'groups':
+            lookups['groups__name__in'] = [str(v) for v in values]
+        elif key in DEVICE_FILTER_FIELDS:
+            lookups[f'{key}__in'] = [str(v) for v in values]
+        else:
+            raise ValueError(f"Unknown device filter key: {key}")
+    return lookups
+
+
+class DeviceWindow:
+    """Ring buffer of a device's last `size` ping results with running sums"""
+
+    __slots__ = ('size', 'latencies', 'losses', 'index', 'count', 'latency_sum',
+                 'latency_count', 'loss_sum', 'failures', 'download_speed')
+
+    def __init__(self, size: int = 10):
+        self.size = max(1, size)
+        self.latencies = [None] * self.size
+        self.losses = [0.0] * self.size
+        self.index = 0
+        self.count = 0
+        self.latency_sum = 0.0
+        self.latency_count = 0
+        self.loss_sum = 0.0
+        self.failures = 0
+        self.download_speed = None
+
+    def add(self, reachable: bool, latency: Optional[float], loss: Optional[float]):
+        """Push a ping result, evicting the oldest one when the buffer is full."""
+        i = self.index
+        if self.count == self.size:
+            evicted = self.latencies[i]
+            if evicted is not None:
+                self.latency_sum -= evicted
+                self.latency_count -= 1
+            self.loss_sum -= self.losses[i]
+        else:
+            self.count += 1
+
+        latency = latency if reachable else None
+        loss = loss or 0.0
+        self.latencies[i] = latency
+        self.losses[i] = loss
+        if latency is not None:
+            self.latency_sum += latency
+            self.latency_count += 1
+        self.loss_sum += loss
+        self.index = (i + 1) % self.size
+        self.failures = 0 if reachable else self.failures + 1
+
+    @property
+    def mean_latency(self) -> Optional[float]:
+        """Mean latency of the reachable results in the window"""
+        if not self.latency_count:
+            return None
+        return self.latency_sum / self.latency_count
+
+    @property
+    def mean_loss(self) -> Optional[float]:
+        """Mean packet loss of the results in the window"""
+        if not self.count:
+            return None
+        return self.loss_sum / self.count
+
+
+class CompiledRule:
+    """An AlertRule reduced to what evaluating it needs"""
+
+    __slots__ = ('id', 'name', 'condition', 'threshold', 'duration', 'severity',
+                 'template', 'device_ids')
+
+    def __init__(self, id, name, condition, threshold, duration, severity, template='',
+                 device_ids=frozenset()):
+        self.id = id
+        self.name = name
+        self.condition = condition
+        self.threshold = threshold
+        self.duration = duration
+        self.severity = severity
+        self.template = template
+        self.device_ids = frozenset(device_ids)
+
+    def measure(self, window: DeviceWindow) -> Optional[float]:
+        """Return the window value the condition compares, None when there is none."""
+        if self.condition == 'ping_failure':
+            return window.failures
+        if self.condition == 'high_latency':
+            return window.mean_latency
+        if self.condition == 'packet_loss':
+            return window.mean_loss
+        return window.download_speed
+
+    def breached(self, value: Optional[float]) -> bool:
+        """
+        Check the condition against a measured value.
+
+        ping_failure counts consecutive failed pings (at least one),
+        speed_degradation breaches below the threshold and the others above it.
+        """
+        if value is None:
+            return False
+        if self.condition == 'ping_failure':
+            return value >= max(1, self.threshold)
+        if self.condition == 'speed_degradation':
+            return value < self.threshold
+        return value > self.threshold
+
+
+class RuleEngine:
+    """In-memory evaluator of compiled rules over per-device windows"""
+
+    def __init__(self, window_size: int = 10):
+        self.window_size = window_size
+        self.windows: Dict[int, DeviceWindow] = {}
+        self.ping_rules: Dict[int, List[CompiledRule]] = {}
+        self.speed_rules: Dict[int, List[CompiledRule]] = {}
+        # (rule id, device id) -> [breach start, fired]
+        self.breaches: Dict[tuple, list] = {}
+        self.loaded_at = None
+        self.lock = threading.Lock()
+
+    def load(self, rules: Iterable[CompiledRule]):
+        """
+        Rebuild the device -> rules index.
+
+        Windows and running breaches of devices and rules that are still
+        indexed are kept, so a reload does not restart their timers.
+        """
+        ping_rules, speed_rules = {}, {}
+        for rule in rules:
+            index = speed_rules if rule.condition in SPEED_CONDITIONS else ping_rules
+            for device_id in rule.device_ids:
+                index.setdefault(device_id, []).append(rule)
+
+        with self.lock:
+            self.ping_rules = ping_rules
+            self.speed_rules = speed_rules
+            indexed = {(rule.id, device_id)
+                       for index in (ping_rules, speed_rules)
+                       for device_id, device_rules in index.items() for rule in device_rules}
+            self.breaches = {key: state for key, state in self.breaches.items() if key in indexed}
+            self.windows = {device_id: window for device_id, window in self.windows.items()
+                            if device_id in ping_rules or device_id in speed_rules}
+            self.loaded_at = time.monotonic()
+
+    def _window(self, device_id: int) -> DeviceWindow:
+        window = self.windows.get(device_id)
+        if window is None:
+            window = self.windows[device_id] = DeviceWindow(self.window_size)
+        return window
+
+    def observe(self, device_id: int, timestamp, reachable: bool, latency: Optional[float] = None,
+                loss: Optional[float] = None) -> List[RuleEvent]:
+        """Fold a ping result into the device's window and evaluate its ping rules."""
+        with self.lock:
+            rules = self.ping_rules.get(device_id)
+            if not rules and device_id not in self.speed_rules:
+                return []
+            window = self._window(device_id)
+            window.add(reachable, latency, loss)
+            return self._evaluate(rules or (), device_id, window, timestamp)
+
+    def observe_speed(self, device_id: int, timestamp, download_speed: Optional[float]) -> List[RuleEvent]:
+        """Record a successful speed test's download speed and evaluate the device's speed rules."""
+        with self.lock:
+            rules = self.speed_rules.get(device_id)
+            if not rules:
+                return []
+            window = self._window(device_id)
+            window.download_speed = download_speed
+            return self._evaluate(rules, device_id, window, timestamp)
+
+    def _evaluate(self, rules, device_id, window, timestamp) -> List[RuleEvent]:
+        events = []
+        for rule in rules:
+            key = (rule.id, device_id)
+            value = rule.measure(window)
+            state = self.breaches.get(key)
+            if rule.breached(value):
+                if state is None:
+                    state = self.breaches[key] = [timestamp, False]
+                if not state[1] and (timestamp - state[0]).total_seconds() >= rule.duration:
+                    state[1] = True
+                    events.append(RuleEvent(FIRE, rule, device_id, value, state[0], timestamp))
+            elif state is not None:
+                del self.breaches[key]
+                if state[1]:
+                    events.append(RuleEvent(RESOLVE, rule, device_id, value, state[0], timestamp))
+        return events
+
+    def rearm(self, events: Iterable[RuleEvent]):
+        """
+        Undo the breach state changes of events that could not be applied.
+
+        A fired breach fires again on the device's next result, and a
+        resolved one resolves again on the next result that clears it.
+        """
+        with self.lock:
+            for event in events:
+                key = (event.rule.id, event.device_id)
+                if event.kind == FIRE:
+                    state = self.breaches.get(key)
+                    if state is not None:
+                        state[1] = False
+                elif key not in self.breaches:
+                    self.breaches[key] = [event.since, True]
+
+
+class _TemplateValues(dict):
+    """Leaves unknown {variables} of a message template as they are"""
+
+    def __missing__(self, key):
+        return '{' + key + '}'
+
+
+def render_message(rule: CompiledRule, device, event: RuleEvent) -> str:
+    """
+    Render a rule's alert message.
+
+    Templates may use {device}, {ip_address}, {rule}, {condition},
+    {value}, {threshold} and {duration}.
+    """
+    value = round(event.value, 2) if isinstance(event.value, float) else event.value
+    values = _TemplateValues(
+        device=device.name,
+        ip_address=device.ip_address,
+        rule=rule.name,
+        condition=rule.condition.replace('_', ' '),
+        value=value,
+        threshold=rule.threshold,
+        duration=rule.duration,
+    )
+    default = (f"{rule.name}: {values['condition']} on {device.name} ({device.ip_address}), "
+               f"value {value} against threshold {rule.threshold} for {rule.duration}s.")
+    if not rule.template:
+        return default
+    try:
+        return rule.template.format_map(values)
+    except (ValueError, IndexError, AttributeError) as e:
+        logger.warning(f"Invalid message template for alert rule {rule.name}: {e}")
+        return default
+
+
+def compile_rules() -> List[CompiledRule]:
+    """Compile the enabled AlertRules, resolving each device_filter to device ids."""
+    from devices.models import Device
+    from .models import AlertRule
+
+    compiled = []
+    for rule in AlertRule.objects.filter(is_enabled=True):
+        try:
+            lookups = device_filter_lookups(rule.device_filter)
+        except ValueError as e:
+            logger.error(f"Skipping alert rule {rule.name}: {e}")
+            continue
+        device_ids = Device.objects.filter(is_active=True, alert_enabled=True, **lookups) \
+            .values_list('id', flat=True).distinct()
+        compiled.append(CompiledRule(
+            id=rule.id,
+            name=rule.name,
+            condition=rule.condition_type,
+            threshold=rule.threshold_value,
+            duration=rule.threshold_duration,
+            severity=rule.alert_severity,
+            template=rule.alert_message_template,
+            device_ids=device_ids,
+        ))
+    return compiled
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_rule_engine() -> RuleEngine:
+    """Return the process-wide rule engine, recompiling the rules every ALERT_RULE_RELOAD_SECONDS."""
+    from django.conf import settings
+
+    global _engine
+    config = getattr(settings, 'NETWORK_MONITOR', {})
+    with _engine_lock:
+        if _engine is None:
+            _engine = RuleEngine(window_size=config.get('ALERT_RULE_WINDOW_SIZE', 10))
+        reload_seconds = config.get('ALERT_RULE_RELOAD_SECONDS', 60)
+        if _engine.loaded_at is None or time.monotonic() - _engine.loaded_at >= reload_seconds:
+            _engine.load(compile_rules())
+        return _engine
+
+
+def apply_rule_events(events: List[RuleEvent]) -> Dict:
+    """Create the alerts of fired rules and resolve the ones whose condition cleared, in one transaction."""
+    from django.db import transaction
+    from django.db.models import Q
+    from django.utils import timezone
+    from devices.models import Device
+    from .dedup import create_alerts
+    from .models import Alert
+
+    fired = [event for event in events if event.kind == FIRE]
+    resolved = [event for event in events if event.kind == RESOLVE]
+
+    alerts = []
+    cleared = 0
+    with transaction.atomic():
+        if fired:
+            devices = Device.objects.in_bulk({event.device_id for event in fired})
+            for event in fired:
+                device = devices.get(event.device_id)
+                if device is None:
+                    continue
+                alerts.append(Alert(
+                    device=device,
+                    rule_id=event.rule.id,
+                    alert_type=CONDITION_ALERT_TYPES[event.rule.condition],
+                    severity=event.rule.severity,
+                    title=f"{event.rule.name}: {device.name}"[:200],
+                    message=render_message(event.rule, device, event),
+                ))
+            alerts = create_alerts(alerts)
+            logger.info(f"Alert rules fired {len(alerts)} alerts")
+
+        if resolved:
+            query = Q()
+            for event in resolved:
+                query |= Q(rule_id=event.rule.id, device_id=event.device_id)
+            cleared = Alert.objects.filter(query, is_active=True).update(
+                is_active=False, resolved_at=timezone.now()
+            )
+
+    return {'fired': len(alerts), 'resolved': cleared}
+
+
+def _apply_or_rearm(engine: RuleEngine, events: List[RuleEvent]) -> Dict:
+    try:
+        return apply_rule_events(events)
+    except Exception:
+        engine.rearm(events)
+        raise
+
+
+def ping_rule_inputs(rows) -> List[list]:
+    """Serialize saved PingResult rows for the evaluate_alert_rules task."""
+    return [[row.device_id, row.timestamp.isoformat(), row.is_reachable, row.response_time, row.packet_loss]
+            for row in rows]
+
+
+def evaluate_ping_results(results: Iterable) -> Dict:
+    """
+    Feed committed ping results to the rule engine and apply what it fires.
+
+    Call it once the results are committed, never inside their write
+    transaction. Otherwise an alert failure would roll back the rows, and
+    the engine would count them again when they are retried.
+
+    Args:
+        results: (device id, timestamp, reachable, latency, packet loss) rows
+    """
+    engine = get_rule_engine()
+    events = []
+    for device_id, timestamp, reachable, latency, loss in results:
+        events.extend(engine.observe(device_id, timestamp, reachable, latency, loss))
+    return _apply_or_rearm(engine, events)
+
+
+def evaluate_speed_result(device_id: int, timestamp, download_speed: Optional[float]) -> Dict:
+    """Feed a successful speed test to the rule engine and apply what it fires."""
+    engine = get_rule_engine()
+    return _apply_or_rearm(engine, engine.observe_speed(device_id, timestamp, download_speed))
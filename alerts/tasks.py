@@ -0,0 +1,108 @@
+"""
+Celery tasks for alert notifications
+"""
+import logging
+from datetime import datetime, timedelta
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Alert
+from .notifications import load_channels, dispatch_alerts
+from .rules import evaluate_ping_results, evaluate_speed_result
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def send_pending_alerts():
+    """Send the alerts raised since the last run to the notification channels as digests"""
+    try:
+        config = getattr(settings, 'NETWORK_MONITOR', {})
+        routes, hooks = load_channels()
+        if not routes and not hooks:
+            return {'message': 'No notification channels configured'}
+
+        # Both kinds of delivery are tracked separately, so a failed one is retried on its own.
+        # Correlated children are covered by their parent's notification
+        pending = Q()
+        if routes:
+            pending |= Q(email_sent=False)
+        if hooks:
+            pending |= Q(notified_at__isnull=True)
+
+        # The batch stays locked while it is sent, so an overlapping run skips these
+        # alerts instead of sending them again; it picks any others that are pending
+        now = timezone.now()
+        with transaction.atomic():
+            alerts = list(
+                Alert.objects.select_for_update(skip_locked=True, of=('self',))
+                .filter(
+                    pending,
+                    is_active=True,
+                    parent__isnull=True,
+                    created_at__gte=now - timedelta(minutes=config.get('ALERT_NOTIFY_MAX_AGE_MINUTES', 60)),
+                    retry_count__lt=config.get('ALERT_NOTIFY_MAX_RETRIES', 3)
+                )
+                .select_related('device')
+                .order_by('created_at')[:config.get('ALERT_NOTIFY_BATCH_SIZE', 5000)]
+            )
+
+            if not alerts:
+                return {'message': 'No pending alerts to send'}
+
+            email_alerts = [alert for alert in alerts if routes and not alert.email_sent]
+            hook_alerts = [alert for alert in alerts if hooks and alert.notified_at is None]
+            result = dispatch_alerts(email_alerts, hook_alerts, routes, hooks)
+
+            # Alerts no route selected (below every min_severity) count as handled
+            emailed = [alert.id for alert in email_alerts if alert.id not in result['email_failed']]
+            notified = [alert.id for alert in hook_alerts if alert.id not in result['hooks_failed']]
+            failed = result['email_failed'] | result['hooks_failed']
+
+            Alert.objects.filter(id__in=emailed).update(email_sent=True, email_sent_at=now)
+            Alert.objects.filter(id__in=notified).update(notified_at=now)
+            Alert.objects.filter(id__in=failed).update(retry_count=F('retry_count') + 1)
+
+        logger.info(f"Sent {len(alerts)} alerts in {result['messages']} emails and "
+                    f"{result['requests']} webhook requests, {len(failed)} failed")
+
+        return {
+            'alerts': len(alerts),
+            'emails': result['messages'],
+            'webhook_requests': result['requests'],
+            'failed': len(failed)
+        }
+
+    except Exception as e:
+        logger.error(f"Error sending pending alerts: {e}")
+        return {'error': str(e)}
+
+
+@shared_task
+def evaluate_alert_rules(results):
+    """Evaluate the alert rules over committed ping results
+
+    Routed to ALERT_RULE_QUEUE, whose single worker process holds every
+    device's rule window.
+    """
+    try:
+        return evaluate_ping_results(
+            (device_id, datetime.fromisoformat(timestamp), reachable, latency, loss)
+            for device_id, timestamp, reachable, latency, loss in results
+        )
+    except Exception as e:
+        logger.error(f"Error evaluating alert rules for {len(results)} ping results: {e}")
+        return {'error': str(e)}
+
+
+@shared_task
+def evaluate_speed_rules(device_id, timestamp, download_speed):
+    """Evaluate the speed alert rules over a committed speed test; routed like evaluate_alert_rules"""
+    try:
+        return evaluate_speed_result(device_id, datetime.fromisoformat(timestamp), download_speed)
+    except Exception as e:
+        logger.error(f"Error evaluating speed alert rules for device {device_id}: {e}")
+        return {'error': str(e)}
@@ -14,6 +14,14 @@ def list_alerts(request):
     """List all alerts with filtering"""
     alerts = Alert.objects.select_related('device').order_by('-created_at')
     
+    # Correlated children are listed under their parent alert
+    parent_filter = request.GET.get('parent')
+    if parent_filter and parent_filter.isdigit():
+        alerts = alerts.filter(parent_id=parent_filter)
+    else:
+        parent_filter = None
+        alerts = alerts.filter(parent__isnull=True)
+    
     # Apply filters
     status_filter = request.GET.get('status')
     if status_filter == 'active':
@@ -34,6 +42,7 @@ def list_alerts(request):
         'page_obj': page_obj,
         'status_filter': status_filter,
         'severity_filter': severity_filter,
+        'parent_filter': parent_filter,
     }
     return render(request, 'alerts/list.html', context)
 
@@ -8,6 +8,7 @@ from flask import current_app, render_template_string
 from flask_mail import Message
 from app import mail
 from app.models import Alert, Device, SystemSettings
+from monitoring.notify import digest_body, digest_subject, sort_alerts
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +17,7 @@ class EmailAlertManager:
     
     def __init__(self):
         self.enabled = self._is_email_enabled()
+        self._recipients = None
     
     def _is_email_enabled(self) -> bool:
         """Check if email notifications are enabled."""
@@ -69,6 +71,51 @@ class EmailAlertManager:
             logger.error(f"Failed to send alert email: {str(e)}")
             return False
     
+    def send_alert_digest(self, alerts: List[Alert]) -> bool:
+        """
+        Send alerts as one digest per recipient over a single SMTP session.
+        
+        Args:
+            alerts: Alert objects to send
+            
+        Returns:
+            True if every digest was sent, False otherwise
+        """
+        if not self.enabled:
+            logger.info("Email notifications are disabled")
+            return False
+        
+        recipients = self._get_alert_recipients()
+        if not recipients:
+            logger.warning("No email recipients configured")
+            return False
+        
+        items = sort_alerts(self._digest_item(alert) for alert in alerts)
+        subject = digest_subject(items)
+        body = digest_body(items)
+        
+        try:
+            with mail.connect() as connection:
+                for recipient in recipients:
+                    connection.send(Message(subject=subject, recipients=[recipient], body=body))
+            logger.info(f"Alert digest of {len(items)} alerts sent to {len(recipients)} recipients")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to send alert digest: {str(e)}")
+            return False
+    
+    def _digest_item(self, alert: Alert) -> dict:
+        """Flatten an alert and its device for the digest."""
+        return {
+            'id': alert.id,
+            'device_name': alert.device.name,
+            'ip_address': alert.device.ip_address,
+            'severity': alert.severity,
+            'title': alert.title,
+            'created_at': alert.created_at,
+        }
+    
     def send_test_email(self, recipient: str) -> bool:
         """
         Send a test email to verify configuration.
@@ -142,7 +189,13 @@ Timestamp: {}
             return False
     
     def _get_alert_recipients(self) -> List[str]:
-        """Get list of email recipients for alerts."""
+        """Get list of email recipients for alerts, looked up once per manager."""
+        if self._recipients is None:
+            self._recipients = self._load_alert_recipients()
+        return self._recipients
+    
+    def _load_alert_recipients(self) -> List[str]:
+        """Read the email recipients from the app config or database settings."""
         try:
             # Get from app config first
             recipients = current_app.config.get('ALERT_EMAIL_RECIPIENTS', [])
@@ -1,7 +1,7 @@
 """
 Main application routes
 """
-from flask import render_template, request, jsonify, flash, redirect, url_for
+from flask import render_template, request, jsonify, flash, redirect, url_for, current_app
 from datetime import datetime, timedelta
 from sqlalchemy import func
 
@@ -9,6 +9,7 @@ from app.main import bp
 from app import db
 from app.models import Device, PingResult, SpeedTestResult, Alert, DeviceStatus, SystemSettings
 from app.monitoring.monitor import NetworkMonitor
+from monitoring.write_buffer import published_metrics
 
 @bp.route('/')
 @bp.route('/dashboard')
@@ -195,7 +196,8 @@ def health_check():
             'status': 'healthy',
             'timestamp': datetime.utcnow().isoformat(),
             'database': 'connected',
-            'devices': device_count
+            'devices': device_count,
+            'write_buffers': published_metrics(current_app.config.get('REDIS_URL'))
         })
         
     except Exception as e:
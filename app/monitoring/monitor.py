@@ -3,15 +3,19 @@ Main monitoring engine that coordinates ping and speed tests
 """
 import time
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import List, Dict, Optional
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
 
+from flask import current_app, has_app_context
+
 from app import db
 from app.models import Device, PingResult, SpeedTestResult, DeviceStatus, Alert, AlertType
 from app.monitoring.ping import PingMonitor
 from app.monitoring.speed_test import SpeedTestMonitor
+from monitoring.write_buffer import get_buffer, buffer_options, configure_metrics
+from monitoring.cooldown import PENDING_CLAIM_SECONDS, get_cooldown_cache
 
 logger = logging.getLogger(__name__)
 
@@ -19,18 +23,36 @@ class NetworkMonitor:
     """Main network monitoring engine."""
     
     def __init__(self, max_workers: int = 10):
-        self.ping_monitor = PingMonitor()
+        config = current_app.config if has_app_context() else {}
+        self.app = current_app._get_current_object() if has_app_context() else None
+        self.ping_monitor = PingMonitor(
+            use_icmp_engine=config.get('USE_ICMP_ENGINE', True),
+            icmp_max_rate=config.get('ICMP_MAX_RATE', 2000)
+        )
+        self.ping_buffer = self._make_ping_buffer(config) if self.app else None
         self.speed_monitor = SpeedTestMonitor()
+        # Flask device ids are unrelated to Django's, so the two apps must
+        # not share cooldown keys when they share a Redis
+        self.alert_cooldown = get_cooldown_cache(
+            'flask_alert_cooldown',
+            url=config.get('REDIS_URL'),
+            ttl=config.get('ALERT_COOLDOWN_MINUTES', 15) * 60
+        )
         self.max_workers = max_workers
         self.lock = threading.Lock()
         self._running = False
     
-    def monitor_device(self, device: Device) -> Dict:
+    def monitor_device(self, device: Device, commit: bool = True,
+                       ping_result: Optional[Dict] = None) -> Dict:
         """
         Monitor a single device (ping and optionally speed test).
         
         Args:
             device: Device object to monitor
+            commit: Commit a status change immediately; worker threads leave
+                it to the caller, whose session and app context own `device`
+            ping_result: Result of a batch ping that already covered the
+                device; the device is pinged on its own when None
             
         Returns:
             Dictionary with monitoring results
@@ -50,7 +72,7 @@ class NetworkMonitor:
         try:
             # Perform ping test if enabled
             if device.ping_enabled:
-                ping_result = self._ping_device(device)
+                ping_result = self._ping_device(device, ping_result)
                 results['ping_result'] = ping_result
                 
                 # Update device status based on ping result
@@ -65,7 +87,8 @@ class NetworkMonitor:
                     if ping_result['is_reachable']:
                         device.last_seen = datetime.utcnow()
                     
-                    db.session.commit()
+                    if commit:
+                        db.session.commit()
             
             # Perform speed test if enabled and device is reachable
             if (device.speed_test_enabled and 
@@ -107,12 +130,14 @@ class NetworkMonitor:
         logger.info(f"Starting monitoring for {len(devices)} devices")
         
         results = []
+        changed = []
+        ping_results = self._ping_devices([device for device in devices if device.ping_enabled])
         
-        # Monitor devices concurrently
+        # Apply the ping results and run speed tests concurrently
         with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
             # Submit monitoring tasks
             future_to_device = {
-                executor.submit(self.monitor_device, device): device 
+                executor.submit(self.monitor_device, device, False, ping_results.get(device.ip_address)): device 
                 for device in devices
             }
             
@@ -123,9 +148,8 @@ class NetworkMonitor:
                     result = future.result(timeout=60)  # 60 second timeout per device
                     results.append(result)
                     
-                    # Generate alerts if status changed
                     if result.get('status_changed'):
-                        self._generate_status_alert(device, result)
+                        changed.append((device, result))
                         
                 except Exception as e:
                     logger.error(f"Error monitoring device {device.name}: {str(e)}")
@@ -135,40 +159,112 @@ class NetworkMonitor:
                         'error': str(e),
                         'timestamp': datetime.utcnow()
                     })
+
+        # Save status changes made by the worker threads. Alerts commit too,
+        # which expires every device, so they wait until the workers are done
+        db.session.commit()
         
+        alerts = [self._generate_status_alert(device, result) for device, result in changed]
+        alerts = [alert for alert in alerts if alert is not None]
+        if alerts:
+            # The provisional claims become full cooldowns only once the
+            # alerts are saved; alerts that fail to save are raised again
+            keys = [(alert.device_id, alert.alert_type) for alert in alerts]
+            try:
+                db.session.add_all(alerts)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                self.alert_cooldown.release(keys)
+                raise
+            self.alert_cooldown.extend(keys)
+
         logger.info(f"Completed monitoring for {len(devices)} devices")
         return results
     
-    def _ping_device(self, device: Device) -> Dict:
+    def _ping_devices(self, devices: List[Device]) -> Dict[str, Dict]:
+        """
+        Ping every device in one batch over the shared ICMP socket.
+        
+        Without the ICMP engine each host would be pinged in turn, so the
+        devices are left to the worker threads to ping on their own.
+        
+        Args:
+            devices: Devices to ping
+            
+        Returns:
+            Dictionary mapping each IP address to its ping results
+        """
+        if not devices or not self.ping_monitor.use_icmp_engine:
+            return {}
+        
+        try:
+            return self.ping_monitor.ping_hosts(
+                {device.ip_address for device in devices},
+                count=4,
+                timeouts={device.ip_address: device.ping_timeout for device in devices}
+            )
+        except Exception as e:
+            logger.error(f"Error pinging {len(devices)} devices in one batch: {str(e)}")
+            return {}
+    
+    def _ping_device(self, device: Device, ping_result: Optional[Dict] = None) -> Dict:
         """
         Ping a device and store results.
         
         Args:
             device: Device to ping
+            ping_result: Result of a batch ping of the device, stored
+                instead of pinging it again
             
         Returns:
             Dictionary with ping results
         """
-        ping_result = self.ping_monitor.ping_host(
-            device.ip_address,
-            timeout=device.ping_timeout,
-            count=4
-        )
-        
-        # Store ping result in database
-        db_result = PingResult(
-            device_id=device.id,
-            is_reachable=ping_result['is_reachable'],
-            response_time=ping_result['response_time'],
-            packet_loss=ping_result['packet_loss'],
-            error_message=ping_result.get('error_message')
-        )
+        if ping_result is None:
+            ping_result = self.ping_monitor.ping_host(
+                device.ip_address,
+                timeout=device.ping_timeout,
+                count=4
+            )
+        
+        row = {
+            'device_id': device.id,
+            'is_reachable': ping_result['is_reachable'],
+            'response_time': ping_result['response_time'],
+            'packet_loss': ping_result['packet_loss'],
+            'error_message': ping_result.get('error_message'),
+            'timestamp': datetime.utcnow()
+        }
         
-        db.session.add(db_result)
-        db.session.commit()
+        # Queue ping result for the next bulk write
+        if self.ping_buffer is not None:
+            self.ping_buffer.add(row)
+        else:
+            db.session.add(PingResult(**row))
+            db.session.commit()
         
         return ping_result
     
+    def _make_ping_buffer(self, config):
+        """
+        Get the process-wide write-behind buffer for ping results.
+        
+        Args:
+            config: Flask app configuration
+            
+        Returns:
+            WriteBehindBuffer that bulk inserts ping result rows
+        """
+        app = self.app
+        
+        def write(rows):
+            with app.app_context():
+                db.session.bulk_insert_mappings(PingResult, rows)
+                db.session.commit()
+        
+        configure_metrics(config.get('REDIS_URL'), config.get('WRITE_BUFFER_METRICS_INTERVAL', 10.0))
+        return get_buffer('flask.PingResult', lambda: write, **buffer_options(config))
+    
     def _speed_test_device(self, device: Device) -> Dict:
         """
         Run speed test for a device and store results.
@@ -255,9 +351,15 @@ class NetworkMonitor:
         Args:
             device: Device that changed status
             result: Monitoring result
+            
+        Returns:
+            Unsaved Alert, or None when no alert is needed or its
+            (device, alert type) is cooling down. The key is claimed for
+            PENDING_CLAIM_SECONDS only; the caller extends the claim once
+            the alert is saved, or releases it.
         """
         if not device.alert_enabled:
-            return
+            return None
         
         previous_status = result['previous_status']
         current_status = result['current_status']
@@ -279,34 +381,23 @@ class NetworkMonitor:
             title = f"Device {device.name} has performance issues"
             message = f"Device {device.name} ({device.ip_address}) is experiencing high latency or packet loss."
         else:
-            return  # No alert needed
+            return None  # No alert needed
         
         # Check for recent similar alerts (cooldown)
-        cooldown_time = datetime.utcnow() - timedelta(minutes=15)  # 15 minute cooldown
-        recent_alert = Alert.query.filter(
-            Alert.device_id == device.id,
-            Alert.alert_type == alert_type,
-            Alert.created_at > cooldown_time,
-            Alert.is_active == True
-        ).first()
-        
-        if recent_alert:
+        pending_ttl = min(PENDING_CLAIM_SECONDS, self.alert_cooldown.ttl)
+        if not self.alert_cooldown.claim_many([(device.id, alert_type)], ttl=pending_ttl):
             logger.info(f"Skipping alert for {device.name} - recent alert exists")
-            return
+            return None
+        
+        logger.info(f"Generated alert: {title}")
         
-        # Create new alert
-        alert = Alert(
+        return Alert(
             device_id=device.id,
             alert_type=alert_type,
             severity=severity,
             title=title,
             message=message
         )
-        
-        db.session.add(alert)
-        db.session.commit()
-        
-        logger.info(f"Generated alert: {title}")
     
     def get_device_status_summary(self) -> Dict:
         """
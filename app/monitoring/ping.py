@@ -6,22 +6,81 @@ import socket
 import subprocess
 import platform
 import re
-from typing import Dict, Optional, Tuple
+from typing import Dict, Iterable, Optional, Tuple
 from ping3 import ping, verbose_ping
 import logging
 
+from monitoring.icmp import ping_hosts as icmp_ping_hosts, IcmpUnavailable
+
 logger = logging.getLogger(__name__)
 
 class PingMonitor:
     """Handles ping operations for network monitoring."""
     
-    def __init__(self):
+    def __init__(self, use_icmp_engine: bool = True, icmp_max_rate: int = 2000):
         self.system = platform.system().lower()
+        self.use_icmp_engine = use_icmp_engine
+        self.icmp_max_rate = icmp_max_rate
+    
+    def ping_hosts(self, hosts: Iterable[str], timeout: int = 5, count: int = 4,
+                   timeouts: Optional[Dict[str, float]] = None) -> Dict[str, Dict]:
+        """
+        Ping many hosts concurrently from a single ICMP socket.
+        
+        Falls back to pinging each host with `ping_host` when the asyncio
+        ICMP engine is disabled or ICMP sockets are not permitted.
+        
+        Args:
+            hosts: IP addresses or hostnames to ping
+            timeout: Timeout in seconds
+            count: Number of ping packets to send per host
+            timeouts: Optional per-host timeout overrides
+            
+        Returns:
+            Dictionary mapping each host to its ping results
+        """
+        hosts = list(hosts)
+        timeouts = timeouts or {}
+        
+        if self.use_icmp_engine:
+            try:
+                return icmp_ping_hosts(
+                    hosts,
+                    timeout=timeout,
+                    count=count,
+                    timeouts=timeouts,
+                    max_rate=self.icmp_max_rate
+                )
+            except IcmpUnavailable as e:
+                logger.warning(f"ICMP engine unavailable, falling back: {str(e)}")
+                self.use_icmp_engine = False
+        
+        return {
+            host: self._fallback_ping(host, timeouts.get(host, timeout), count)
+            for host in hosts
+        }
     
     def ping_host(self, host: str, timeout: int = 5, count: int = 4) -> Dict:
         """
         Ping a host and return detailed results.
         
+        Args:
+            host: IP address or hostname to ping
+            timeout: Timeout in seconds
+            count: Number of ping packets to send
+            
+        Returns:
+            Dictionary with ping results
+        """
+        if self.use_icmp_engine:
+            return self.ping_hosts([host], timeout=timeout, count=count)[host]
+        
+        return self._fallback_ping(host, timeout, count)
+    
+    def _fallback_ping(self, host: str, timeout: int, count: int) -> Dict:
+        """
+        Ping a host with ping3, then the system ping command.
+        
         Args:
             host: IP address or hostname to ping
             timeout: Timeout in seconds
@@ -1,7 +1,7 @@
 """
 Reports routes
 """
-from flask import render_template, request, send_file
+from flask import render_template, request, send_file, Response, stream_with_context
 from datetime import datetime, timedelta
 
 from app.reports import bp
@@ -29,6 +29,17 @@ def export():
         end_date = datetime.utcnow()
     
     excel_manager = ExcelManager()
+    
+    if request.args.get('format') == 'csv':
+        # Ping results only, streamed straight from the database cursor
+        compress = request.args.get('compress') == 'gzip'
+        filename = f"ping_results_{start_date.strftime('%Y%m%d')}.csv" + ('.gz' if compress else '')
+        return Response(
+            stream_with_context(excel_manager.stream_ping_results_csv(start_date, end_date, compress=compress)),
+            mimetype='application/gzip' if compress else 'text/csv',
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+    
     file_path = excel_manager.export_monitoring_results(start_date, end_date)
     
     return send_file(file_path, as_attachment=True)
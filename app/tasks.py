@@ -2,6 +2,7 @@
 Celery background tasks for network monitoring
 """
 import logging
+import time
 from datetime import datetime, timedelta
 from celery import Celery
 from celery.schedules import crontab
@@ -10,6 +11,9 @@ from app import create_app, db, make_celery
 from app.models import Device, PingResult, SpeedTestResult, Alert, SystemSettings
 from app.monitoring.monitor import NetworkMonitor
 from app.alerts.email import EmailAlertManager
+from app.utils.reporting import device_report_frame, frame_records
+from monitoring.scheduler import IntervalScheduler, WindowMark
+from monitoring.retention import delete_in_batches, retention_options
 
 # Create Flask app and Celery instance
 app = create_app()
@@ -17,6 +21,12 @@ celery = make_celery(app)
 
 logger = logging.getLogger(__name__)
 
+# Per-process ping scheduler, refreshed from the devices table
+scheduler = IntervalScheduler(tick=app.config['SCHEDULER_TICK_SECONDS'])
+scheduler_synced_at = 0.0
+# End of the last scheduler window this process handled
+window_mark = WindowMark()
+
 @celery.task(bind=True)
 def monitor_all_devices(self):
     """
@@ -46,6 +56,48 @@ def monitor_all_devices(self):
             logger.error(f"Error in monitor_all_devices task: {str(e)}")
             self.retry(countdown=60, max_retries=3)
 
+@celery.task(bind=True)
+def monitor_due_devices(self):
+    """
+    Monitor only the devices whose ping interval is due this tick.
+    """
+    global scheduler_synced_at
+    
+    with app.app_context():
+        try:
+            now = time.time()
+            if now - scheduler_synced_at >= app.config['SCHEDULER_RESYNC_SECONDS']:
+                devices = db.session.query(Device.id, Device.ping_interval).filter(
+                    Device.is_active == True,
+                    Device.ping_enabled == True
+                ).all()
+                scheduler.sync({
+                    device_id: ping_interval or app.config['DEFAULT_PING_INTERVAL']
+                    for device_id, ping_interval in devices
+                }, now)
+                scheduler_synced_at = now
+            
+            # A tick that runs late also covers the windows skipped since the last one handled
+            _window_start, window_end = scheduler.window(now)
+            due_ids = scheduler.due(now, since=window_mark.advance(window_end))
+            if not due_ids:
+                return {'total_devices': 0, 'timestamp': datetime.utcnow().isoformat()}
+            
+            monitor = NetworkMonitor()
+            results = monitor.monitor_devices(due_ids)
+            
+            return {
+                'total_devices': len(results),
+                'successful': len([r for r in results if 'error' not in r]),
+                'failed': len([r for r in results if 'error' in r]),
+                'status_changes': len([r for r in results if r.get('status_changed')]),
+                'timestamp': datetime.utcnow().isoformat()
+            }
+            
+        except Exception as e:
+            logger.error(f"Error in monitor_due_devices task: {str(e)}")
+            return {'error': str(e)}
+
 @celery.task(bind=True)
 def monitor_device_by_id(self, device_id):
     """
@@ -119,25 +171,20 @@ def send_alert_emails(self):
             if not alerts:
                 return {'message': 'No pending alerts to send'}
             
+            # One digest per recipient over a single SMTP session
             email_manager = EmailAlertManager()
-            sent_count = 0
-            failed_count = 0
+            success = email_manager.send_alert_digest(alerts)
+            sent_at = datetime.utcnow()
             
             for alert in alerts:
-                try:
-                    success = email_manager.send_alert_email(alert)
-                    if success:
-                        alert.email_sent = True
-                        alert.email_sent_at = datetime.utcnow()
-                        sent_count += 1
-                    else:
-                        alert.retry_count += 1
-                        failed_count += 1
-                        
-                except Exception as e:
-                    logger.error(f"Error sending alert email for alert {alert.id}: {str(e)}")
+                if success:
+                    alert.email_sent = True
+                    alert.email_sent_at = sent_at
+                else:
                     alert.retry_count += 1
-                    failed_count += 1
+            
+            sent_count = len(alerts) if success else 0
+            failed_count = len(alerts) - sent_count
             
             db.session.commit()
             
@@ -152,6 +199,29 @@ def send_alert_emails(self):
             logger.error(f"Error in send_alert_emails task: {str(e)}")
             self.retry(countdown=300, max_retries=3)  # 5 minute retry
 
+def purge_in_batches(model, order_by, *criteria):
+    """
+    Delete rows of `model` matching `criteria` in bounded, separately committed batches.
+    
+    Args:
+        model: Model class to purge
+        order_by: Indexed column that drives batch selection
+        criteria: SQLAlchemy filter expressions selecting expired rows
+        
+    Returns:
+        Dictionary with deleted, batches, seconds and rows_per_sec
+    """
+    def next_batch(size):
+        rows = db.session.query(model.id).filter(*criteria).order_by(order_by).limit(size)
+        return [row_id for (row_id,) in rows]
+    
+    def delete_batch(ids):
+        deleted = model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+    
+    return delete_in_batches(next_batch, delete_batch, **retention_options(app.config))
+
 @celery.task
 def cleanup_old_data():
     """
@@ -166,26 +236,23 @@ def cleanup_old_data():
             retention_days = int(ping_retention_days.value) if ping_retention_days else 30
             
             cutoff_date = datetime.utcnow() - timedelta(days=retention_days)
-            
-            # Delete old ping results
-            old_pings = PingResult.query.filter(
-                PingResult.timestamp < cutoff_date
-            ).delete()
-            
-            # Delete old speed test results (keep for longer - 90 days)
             speed_cutoff = datetime.utcnow() - timedelta(days=90)
-            old_speeds = SpeedTestResult.query.filter(
-                SpeedTestResult.timestamp < speed_cutoff
-            ).delete()
-            
-            # Delete resolved alerts older than 30 days
             alert_cutoff = datetime.utcnow() - timedelta(days=30)
-            old_alerts = Alert.query.filter(
+            
+            # Delete old ping results, speed test results (kept for longer -
+            # 90 days) and resolved alerts older than 30 days in batches
+            old_pings = purge_in_batches(
+                PingResult, PingResult.timestamp, PingResult.timestamp < cutoff_date
+            )['deleted']
+            old_speeds = purge_in_batches(
+                SpeedTestResult, SpeedTestResult.timestamp, SpeedTestResult.timestamp < speed_cutoff
+            )['deleted']
+            old_alerts = purge_in_batches(
+                Alert, Alert.created_at,
+                Alert.created_at < alert_cutoff,
                 Alert.resolved_at < alert_cutoff,
                 Alert.is_active == False
-            ).delete()
-            
-            db.session.commit()
+            )['deleted']
             
             logger.info(f"Cleaned up {old_pings} ping results, {old_speeds} speed tests, {old_alerts} alerts")
             
@@ -223,45 +290,27 @@ def generate_daily_report():
                 'total_speed_tests': 0
             }
             
-            for device in devices:
-                # Get ping results for the day
-                ping_results = PingResult.query.filter(
-                    PingResult.device_id == device.id,
-                    PingResult.timestamp >= start_of_day,
-                    PingResult.timestamp <= end_of_day
-                ).all()
-                
-                # Get speed test results for the day
-                speed_results = SpeedTestResult.query.filter(
-                    SpeedTestResult.device_id == device.id,
-                    SpeedTestResult.timestamp >= start_of_day,
-                    SpeedTestResult.timestamp <= end_of_day
-                ).all()
-                
-                # Calculate statistics
-                total_pings = len(ping_results)
-                successful_pings = len([p for p in ping_results if p.is_reachable])
-                uptime_percentage = (successful_pings / total_pings * 100) if total_pings > 0 else 0
-                
-                avg_response_time = None
-                if successful_pings > 0:
-                    response_times = [p.response_time for p in ping_results if p.response_time]
-                    if response_times:
-                        avg_response_time = sum(response_times) / len(response_times)
-                
+            # One streamed fetch and group-by for all devices
+            stats = frame_records(device_report_frame(devices, start_of_day, end_of_day))
+            
+            for device, row in zip(devices, stats):
                 device_stats = {
                     'device_name': device.name,
                     'ip_address': device.ip_address,
-                    'total_pings': total_pings,
-                    'successful_pings': successful_pings,
-                    'uptime_percentage': round(uptime_percentage, 2),
-                    'avg_response_time': round(avg_response_time, 2) if avg_response_time else None,
-                    'speed_tests': len(speed_results)
+                    'total_pings': row['total_pings'],
+                    'successful_pings': row['successful_pings'],
+                    'uptime_percentage': row['uptime_percentage'],
+                    'avg_response_time': row['avg_response_time'],
+                    'p50_response_time': row['p50'],
+                    'p95_response_time': row['p95'],
+                    'p99_response_time': row['p99'],
+                    'avg_packet_loss': row['avg_packet_loss'],
+                    'speed_tests': row['speed_tests']
                 }
                 
                 report_data['device_stats'].append(device_stats)
-                report_data['total_pings'] += total_pings
-                report_data['total_speed_tests'] += len(speed_results)
+                report_data['total_pings'] += row['total_pings']
+                report_data['total_speed_tests'] += row['speed_tests']
             
             # Get alerts for the day
             alerts = Alert.query.filter(
@@ -280,10 +329,10 @@ def generate_daily_report():
 
 # Celery Beat Schedule
 celery.conf.beat_schedule = {
-    # Monitor all devices every 5 minutes
-    'monitor-all-devices': {
-        'task': 'app.tasks.monitor_all_devices',
-        'schedule': 300.0,  # 5 minutes
+    # Dispatch devices whose own ping_interval is due
+    'monitor-due-devices': {
+        'task': 'app.tasks.monitor_due_devices',
+        'schedule': float(app.config['SCHEDULER_TICK_SECONDS']),
     },
     
     # Send alert emails every 2 minutes
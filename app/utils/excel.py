@@ -11,12 +11,27 @@ from openpyxl.styles import Font, PatternFill, Alignment
 from openpyxl.utils.dataframe import dataframe_to_rows
 import ipaddress
 import tempfile
+from sqlalchemy import select
 
 from app import db
 from app.models import Device, PingResult, SpeedTestResult, Alert, DeviceStatus
+from app.utils.reporting import device_report_frame, frame_records
+from monitoring.export import csv_stream, write_xlsx
 
 logger = logging.getLogger(__name__)
 
+PING_EXPORT_HEADER = ['device_name', 'ip_address', 'timestamp', 'is_reachable', 'response_time_ms',
+                      'packet_loss_percent', 'error_message']
+SPEED_EXPORT_HEADER = ['device_name', 'ip_address', 'timestamp', 'download_speed_mbps', 'upload_speed_mbps',
+                       'ping_latency_ms', 'server_name', 'server_location', 'test_duration_sec',
+                       'is_successful', 'error_message']
+ALERT_EXPORT_HEADER = ['device_name', 'ip_address', 'alert_type', 'severity', 'title', 'message', 'is_active',
+                       'is_acknowledged', 'acknowledged_by', 'created_at', 'acknowledged_at', 'resolved_at']
+SUMMARY_EXPORT_HEADER = ['device_name', 'ip_address', 'device_type', 'location', 'total_pings',
+                         'successful_pings', 'uptime_percentage', 'avg_response_time_ms', 'p50_response_time_ms',
+                         'p95_response_time_ms', 'p99_response_time_ms', 'avg_packet_loss_percent',
+                         'speed_tests_count', 'alerts_count', 'current_status']
+
 class ExcelManager:
     """Handles Excel import/export operations."""
     
@@ -217,6 +232,9 @@ class ExcelManager:
         """
         Export monitoring results to Excel file.
         
+        Result rows are streamed from server-side cursors into a write-only
+        workbook, so memory use does not grow with the date range.
+        
         Args:
             start_date: Start date for data export
             end_date: End date for data export
@@ -236,163 +254,88 @@ class ExcelManager:
             device_query = device_query.filter(Device.id.in_(device_ids))
         devices = device_query.all()
         
-        # Create Excel file with multiple sheets
-        with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-            # Export ping results
-            self._export_ping_results(writer, devices, start_date, end_date)
-            
-            # Export speed test results
-            self._export_speed_results(writer, devices, start_date, end_date)
-            
-            # Export alerts
-            self._export_alerts(writer, devices, start_date, end_date)
-            
-            # Export summary
-            self._export_summary(writer, devices, start_date, end_date)
+        rows = write_xlsx(file_path, [
+            ('Ping Results', PING_EXPORT_HEADER, self._ping_rows(start_date, end_date, device_ids)),
+            ('Speed Test Results', SPEED_EXPORT_HEADER, self._speed_rows(start_date, end_date, device_ids)),
+            ('Alerts', ALERT_EXPORT_HEADER, self._alert_rows(start_date, end_date, device_ids)),
+            ('Summary', SUMMARY_EXPORT_HEADER, self._summary_rows(devices, start_date, end_date)),
+        ])
         
-        logger.info(f"Exported monitoring results to {file_path}")
+        logger.info(f"Exported {rows} monitoring result rows to {file_path}")
         return file_path
     
-    def _export_ping_results(self, writer, devices: List[Device], start_date: datetime, end_date: datetime):
-        """Export ping results to Excel sheet."""
-        data = []
-        
-        for device in devices:
-            ping_results = PingResult.query.filter(
-                PingResult.device_id == device.id,
-                PingResult.timestamp >= start_date,
-                PingResult.timestamp <= end_date
-            ).all()
-            
-            for result in ping_results:
-                data.append({
-                    'device_name': device.name,
-                    'ip_address': device.ip_address,
-                    'timestamp': result.timestamp.isoformat(),
-                    'is_reachable': result.is_reachable,
-                    'response_time_ms': result.response_time,
-                    'packet_loss_percent': result.packet_loss,
-                    'error_message': result.error_message
-                })
+    def stream_ping_results_csv(self, start_date: datetime, end_date: datetime,
+                                device_ids: Optional[List[int]] = None, compress: bool = False):
+        """
+        Stream ping results as CSV (optionally gzipped) for a streaming response.
         
-        if data:
-            df = pd.DataFrame(data)
-            df.to_excel(writer, sheet_name='Ping Results', index=False)
+        Returns:
+            Iterator of bytes chunks
+        """
+        return csv_stream(PING_EXPORT_HEADER, self._ping_rows(start_date, end_date, device_ids), compress=compress)
     
-    def _export_speed_results(self, writer, devices: List[Device], start_date: datetime, end_date: datetime):
-        """Export speed test results to Excel sheet."""
-        data = []
-        
-        for device in devices:
-            speed_results = SpeedTestResult.query.filter(
-                SpeedTestResult.device_id == device.id,
-                SpeedTestResult.timestamp >= start_date,
-                SpeedTestResult.timestamp <= end_date
-            ).all()
-            
-            for result in speed_results:
-                data.append({
-                    'device_name': device.name,
-                    'ip_address': device.ip_address,
-                    'timestamp': result.timestamp.isoformat(),
-                    'download_speed_mbps': result.download_speed,
-                    'upload_speed_mbps': result.upload_speed,
-                    'ping_latency_ms': result.ping_latency,
-                    'server_name': result.server_name,
-                    'server_location': result.server_location,
-                    'test_duration_sec': result.test_duration,
-                    'is_successful': result.is_successful,
-                    'error_message': result.error_message
-                })
-        
-        if data:
-            df = pd.DataFrame(data)
-            df.to_excel(writer, sheet_name='Speed Test Results', index=False)
+    def _stream_rows(self, query, chunk_size: int = 5000):
+        """Yield the rows of a query from a server-side cursor."""
+        result = db.session.connection().execution_options(stream_results=True).execute(query)
+        for rows in result.partitions(chunk_size):
+            yield from rows
     
-    def _export_alerts(self, writer, devices: List[Device], start_date: datetime, end_date: datetime):
-        """Export alerts to Excel sheet."""
-        device_ids = [d.id for d in devices]
-        
-        alerts = Alert.query.filter(
-            Alert.device_id.in_(device_ids),
+    def _ping_rows(self, start_date: datetime, end_date: datetime, device_ids: Optional[List[int]] = None):
+        """Ping result rows in PING_EXPORT_HEADER order."""
+        query = select(
+            Device.name, Device.ip_address, PingResult.timestamp, PingResult.is_reachable,
+            PingResult.response_time, PingResult.packet_loss, PingResult.error_message
+        ).join(Device, Device.id == PingResult.device_id).where(
+            PingResult.timestamp >= start_date,
+            PingResult.timestamp <= end_date
+        ).order_by(PingResult.timestamp)
+        if device_ids:
+            query = query.where(PingResult.device_id.in_(device_ids))
+        return self._stream_rows(query)
+    
+    def _speed_rows(self, start_date: datetime, end_date: datetime, device_ids: Optional[List[int]] = None):
+        """Speed test result rows in SPEED_EXPORT_HEADER order."""
+        query = select(
+            Device.name, Device.ip_address, SpeedTestResult.timestamp, SpeedTestResult.download_speed,
+            SpeedTestResult.upload_speed, SpeedTestResult.ping_latency, SpeedTestResult.server_name,
+            SpeedTestResult.server_location, SpeedTestResult.test_duration, SpeedTestResult.is_successful,
+            SpeedTestResult.error_message
+        ).join(Device, Device.id == SpeedTestResult.device_id).where(
+            SpeedTestResult.timestamp >= start_date,
+            SpeedTestResult.timestamp <= end_date
+        ).order_by(SpeedTestResult.timestamp)
+        if device_ids:
+            query = query.where(SpeedTestResult.device_id.in_(device_ids))
+        return self._stream_rows(query)
+    
+    def _alert_rows(self, start_date: datetime, end_date: datetime, device_ids: Optional[List[int]] = None):
+        """Alert rows in ALERT_EXPORT_HEADER order."""
+        query = select(
+            Device.name, Device.ip_address, Alert.alert_type, Alert.severity, Alert.title, Alert.message,
+            Alert.is_active, Alert.is_acknowledged, Alert.acknowledged_by, Alert.created_at,
+            Alert.acknowledged_at, Alert.resolved_at
+        ).join(Device, Device.id == Alert.device_id).where(
             Alert.created_at >= start_date,
             Alert.created_at <= end_date
-        ).all()
-        
-        data = []
-        for alert in alerts:
-            data.append({
-                'device_name': alert.device.name,
-                'ip_address': alert.device.ip_address,
-                'alert_type': alert.alert_type.value,
-                'severity': alert.severity,
-                'title': alert.title,
-                'message': alert.message,
-                'is_active': alert.is_active,
-                'is_acknowledged': alert.is_acknowledged,
-                'acknowledged_by': alert.acknowledged_by,
-                'created_at': alert.created_at.isoformat(),
-                'acknowledged_at': alert.acknowledged_at.isoformat() if alert.acknowledged_at else None,
-                'resolved_at': alert.resolved_at.isoformat() if alert.resolved_at else None
-            })
-        
-        if data:
-            df = pd.DataFrame(data)
-            df.to_excel(writer, sheet_name='Alerts', index=False)
+        ).order_by(Alert.created_at)
+        if device_ids:
+            query = query.where(Alert.device_id.in_(device_ids))
+        return self._stream_rows(query)
     
-    def _export_summary(self, writer, devices: List[Device], start_date: datetime, end_date: datetime):
-        """Export summary statistics to Excel sheet."""
-        data = []
-        
-        for device in devices:
-            # Get ping statistics
-            ping_results = PingResult.query.filter(
-                PingResult.device_id == device.id,
-                PingResult.timestamp >= start_date,
-                PingResult.timestamp <= end_date
-            ).all()
-            
-            total_pings = len(ping_results)
-            successful_pings = len([p for p in ping_results if p.is_reachable])
-            uptime_percentage = (successful_pings / total_pings * 100) if total_pings > 0 else 0
-            
-            avg_response_time = None
-            if successful_pings > 0:
-                response_times = [p.response_time for p in ping_results if p.response_time]
-                if response_times:
-                    avg_response_time = sum(response_times) / len(response_times)
-            
-            # Get speed test count
-            speed_tests = SpeedTestResult.query.filter(
-                SpeedTestResult.device_id == device.id,
-                SpeedTestResult.timestamp >= start_date,
-                SpeedTestResult.timestamp <= end_date
-            ).count()
-            
-            # Get alert count
-            alerts = Alert.query.filter(
-                Alert.device_id == device.id,
-                Alert.created_at >= start_date,
-                Alert.created_at <= end_date
-            ).count()
-            
-            data.append({
-                'device_name': device.name,
-                'ip_address': device.ip_address,
-                'device_type': device.device_type,
-                'location': device.location,
-                'total_pings': total_pings,
-                'successful_pings': successful_pings,
-                'uptime_percentage': round(uptime_percentage, 2),
-                'avg_response_time_ms': round(avg_response_time, 2) if avg_response_time else None,
-                'speed_tests_count': speed_tests,
-                'alerts_count': alerts,
-                'current_status': device.status.value if device.status else 'unknown'
-            })
-        
-        if data:
-            df = pd.DataFrame(data)
-            df.to_excel(writer, sheet_name='Summary', index=False)
+    def _summary_rows(self, devices: List[Device], start_date: datetime, end_date: datetime):
+        """Per-device summary rows in SUMMARY_EXPORT_HEADER order."""
+        if not devices:
+            return
+        
+        stats = frame_records(device_report_frame(devices, start_date, end_date))
+        for device, row in zip(devices, stats):
+            yield (
+                device.name, device.ip_address, device.device_type, device.location,
+                row['total_pings'], row['successful_pings'], row['uptime_percentage'],
+                row['avg_response_time'], row['p50'], row['p95'], row['p99'], row['avg_packet_loss'],
+                row['speed_tests'], row['alerts'],
+                device.status.value if device.status else 'unknown'
+            )
     
     def _format_devices_worksheet(self, worksheet, row_count: int):
         """Apply formatting to devices worksheet."""
@@ -0,0 +1,3 @@
+"""
+Probe throughput benchmarks against a simulated network of stand-in hosts
+"""
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Probe throughput benchmark
+
+Starts stand-in TCP, HTTP and DNS services for a simulated network of
+loopback hosts (see benchmarks/simnet.py) and runs full monitoring cycles
+of each probe path against it:
+
+    django-devices  monitoring.tasks.monitor_all_devices
+    django-ports    monitoring.service_tasks.monitor_all_ports
+    flask-devices   app.monitoring.monitor.NetworkMonitor.monitor_devices
+
+Every (target, scale) pair runs in a fresh worker process with its own
+throwaway SQLite database, so peak RSS and database writes belong to that
+run alone. A cycle is timed until the write-behind buffers have been
+drained. Reported per run: devices/sec, p50/p99 cycle time, database write
+statements and rows per second, and peak RSS.
+
+Requires Linux (for the 127.0.0.0/8 loopback aliases) and permission to
+open ICMP sockets; binding the DNS stand-in to port 53 needs root.
+
+Usage:
+    python -m benchmarks.run
+    python -m benchmarks.run --targets django-devices --scales 1000 10000 --cycles 5
+    python -m benchmarks.run --loss 0.02 --blackhole 0.05 --json results.json
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from benchmarks.simnet import SimulatedNetwork, StandInServices, impair
+
+TARGETS = ('django-devices', 'django-ports', 'flask-devices')
+DEFAULT_SCALES = (1000, 10000, 50000)
+
+# Share of port monitors per service type; DNS falls back to plain TCP
+# when the DNS stand-in is not available
+PORT_MIX = ('tcp',) * 7 + ('http',) * 2 + ('dns',)
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def percentile(values, pct):
+    """Return the nearest-rank percentile of `values`."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def raise_file_limit():
+    """Raise the soft open-file limit to the hard limit for many concurrent sockets."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+class WriteCounter:
+    """Count database write statements and affected rows across threads"""
+
+    def __init__(self):
+        self.statements = 0
+        self.rows = 0
+        self._lock = threading.Lock()
+
+    def record(self, sql, rowcount):
+        if sql.lstrip()[:6].upper() not in WRITE_STATEMENTS:
+            return
+        with self._lock:
+            self.statements += 1
+            self.rows += max(rowcount or 0, 0)
+
+    def reset(self):
+        with self._lock:
+            self.statements = 0
+            self.rows = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Django execute wrapper."""
+        result = execute(sql, params, many, context)
+        self.record(sql, context['cursor'].rowcount)
+        return result
+
+
+def setup_django(workdir, counter):
+    """Point Django at a fresh SQLite database and count its writes."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'network_monitor.settings')
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+
+    settings.DATABASES['default']['NAME'] = os.path.join(workdir, 'benchmark.sqlite3')
+    connections['default'].close()
+    call_command('migrate', verbosity=0)
+
+    # Tasks queued by the monitoring cycle run inline in this process
+    from network_monitor.celery import app as celery_app
+    celery_app.conf.task_always_eager = True
+
+    # Write-behind buffers flush from their own threads and connections
+    def install(connection, **kwargs):
+        if counter not in connection.execute_wrappers:
+            connection.execute_wrappers.append(counter)
+
+    connection_created.connect(install, weak=False)
+    install(connections['default'])
+
+
+def create_django_devices(network, timeout):
+    from devices.models import Device
+
+    devices = [
+        Device(name=f'bench-{i:06d}', ip_address=host, ping_timeout=timeout)
+        for i, host in enumerate(network.hosts)
+    ]
+    return Device.objects.bulk_create(devices, batch_size=1000)
+
+
+def django_devices(network, ports, timeout):
+    """
+    Create one device per host.
+
+    Returns:
+        (run_cycle, unreachable) callables; run_cycle returns its error count
+    """
+    from devices.models import Device, DeviceStatus
+    from monitoring.tasks import monitor_all_devices
+
+    create_django_devices(network, timeout)
+
+    def run_cycle():
+        monitor_all_devices()
+        return 0
+
+    def unreachable():
+        return Device.objects.filter(status=DeviceStatus.OFFLINE).count()
+
+    return run_cycle, unreachable
+
+
+def django_ports(network, ports, timeout):
+    """
+    Create one device and one port monitor per host, mixing TCP, HTTP and DNS.
+
+    Returns:
+        (run_cycle, unreachable) callables; run_cycle returns its error count
+    """
+    from monitoring.port_models import PortMonitor, ServiceType
+    from monitoring.service_tasks import monitor_all_ports
+
+    services = {
+        'tcp': (ServiceType.CUSTOM, ports['tcp']),
+        'http': (ServiceType.HTTP, ports['http']),
+        'dns': (ServiceType.DNS, ports['dns']) if 'dns' in ports else (ServiceType.CUSTOM, ports['tcp']),
+    }
+    monitors = []
+    for i, device in enumerate(create_django_devices(network, timeout)):
+        service_type, port = services[PORT_MIX[i % len(PORT_MIX)]]
+        monitors.append(PortMonitor(device=device, port=port, service_type=service_type, timeout=timeout))
+    PortMonitor.objects.bulk_create(monitors, batch_size=1000)
+
+    def run_cycle():
+        return len(monitor_all_ports()['errors'])
+
+    def unreachable():
+        return PortMonitor.objects.filter(is_reachable=False).count()
+
+    return run_cycle, unreachable
+
+
+def flask_devices(network, ports, timeout, workdir, counter):
+    """
+    Create one device per host in a fresh Flask database.
+
+    Returns:
+        (run_cycle, unreachable) callables; run_cycle returns its error count
+    """
+    from flask import Flask
+    from sqlalchemy import event
+
+    from config import DevelopmentConfig
+    from app import db
+
+    # Only the database is needed; the web blueprints are not registered
+    app = Flask('app')
+    app.config.from_object(DevelopmentConfig)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(workdir, 'benchmark.db')
+    db.init_app(app)
+
+    from app.models import Device, DeviceStatus
+    from app.monitoring.monitor import NetworkMonitor
+
+    with app.app_context():
+        db.create_all()
+        db.session.bulk_insert_mappings(Device, [
+            {'name': f'bench-{i:06d}', 'ip_address': host, 'ping_timeout': timeout}
+            for i, host in enumerate(network.hosts)
+        ])
+        db.session.commit()
+
+        @event.listens_for(db.engine, 'after_cursor_execute')
+        def count_write(conn, cursor, statement, parameters, context, executemany):
+            counter.record(statement, cursor.rowcount)
+
+    def run_cycle():
+        with app.app_context():
+            results = NetworkMonitor().monitor_devices()
+        return sum(1 for result in results if 'error' in result)
+
+    def unreachable():
+        with app.app_context():
+            return Device.query.filter_by(status=DeviceStatus.OFFLINE).count()
+
+    return run_cycle, unreachable
+
+
+def run_worker(args):
+    """Run the cycles of one (target, scale) pair and print the result as JSON."""
+    raise_file_limit()
+    # Per-batch INFO lines would otherwise dominate the log at these scales
+    logging.disable(logging.INFO)
+
+    network = SimulatedNetwork(args.scale, latency=args.latency, jitter=args.jitter,
+                               loss=args.loss, blackhole=args.blackhole, seed=args.seed)
+    ports = json.loads(args.ports)
+    counter = WriteCounter()
+
+    from monitoring.write_buffer import flush_all
+
+    with tempfile.TemporaryDirectory(prefix='probe-benchmark-') as workdir:
+        if args.worker == 'flask-devices':
+            run_cycle, unreachable = flask_devices(network, ports, args.timeout, workdir, counter)
+        else:
+            setup_django(workdir, counter)
+            setup = django_devices if args.worker == 'django-devices' else django_ports
+            run_cycle, unreachable = setup(network, ports, args.timeout)
+
+        counter.reset()
+        cycle_times = []
+        errors = 0
+        with impair(network):
+            for _ in range(args.cycles):
+                started = time.perf_counter()
+                errors += run_cycle()
+                flush_all()
+                cycle_times.append(time.perf_counter() - started)
+
+        elapsed = sum(cycle_times)
+        result = {
+            'target': args.worker,
+            'scale': args.scale,
+            'cycles': args.cycles,
+            'devices_per_sec': round(args.scale * args.cycles / elapsed, 1),
+            'cycle_p50': round(percentile(cycle_times, 50), 3),
+            'cycle_p99': round(percentile(cycle_times, 99), 3),
+            'db_writes_per_sec': round(counter.statements / elapsed, 1),
+            'db_rows_per_sec': round(counter.rows / elapsed, 1),
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            'unreachable': unreachable(),
+            'errors': errors,
+        }
+
+    print(json.dumps(result))
+
+
+def run_benchmarks(args):
+    """Serve the simulated network and run every (target, scale) pair in a worker."""
+    raise_file_limit()
+    logging.basicConfig(level=logging.WARNING)
+
+    network = SimulatedNetwork(max(args.scales), latency=args.latency, jitter=args.jitter,
+                               loss=args.loss, blackhole=args.blackhole, seed=args.seed)
+    blackholed = sum(1 for profile in network.profiles.values() if profile.blackholed)
+    print(f"Simulated network: {len(network)} hosts, {blackholed} black-holed, "
+          f"{args.latency}±{args.jitter} ms, {args.loss:.1%} loss")
+
+    results = []
+    with StandInServices(network) as services:
+        for target in args.targets:
+            for scale in args.scales:
+                command = [
+                    sys.executable, '-m', 'benchmarks.run',
+                    '--worker', target,
+                    '--scale', str(scale),
+                    '--ports', json.dumps(services.ports),
+                    '--cycles', str(args.cycles),
+                    '--timeout', str(args.timeout),
+                    '--latency', str(args.latency),
+                    '--jitter', str(args.jitter),
+                    '--loss', str(args.loss),
+                    '--blackhole', str(args.blackhole),
+                    '--seed', str(args.seed),
+                ]
+                print(f"Running {target} x {scale} ...", flush=True)
+                completed = subprocess.run(command, cwd=BASE_DIR, capture_output=True, text=True)
+                if completed.returncode != 0:
+                    print(completed.stderr.strip()[-2000:], file=sys.stderr)
+                    results.append({'target': target, 'scale': scale, 'failed': True})
+                    continue
+                results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0 if all(not result.get('failed') for result in results) else 1
+
+
+def print_results(results):
+    header = (f"{'target':<16}{'scale':>8}{'dev/s':>10}{'p50 s':>9}{'p99 s':>9}"
+              f"{'writes/s':>10}{'rows/s':>10}{'rss MB':>9}{'down':>7}{'errors':>8}")
+    print()
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        if r.get('failed'):
+            print(f"{r['target']:<16}{r['scale']:>8}  failed")
+            continue
+        print(f"{r['target']:<16}{r['scale']:>8}{r['devices_per_sec']:>10}{r['cycle_p50']:>9}"
+              f"{r['cycle_p99']:>9}{r['db_writes_per_sec']:>10}{r['db_rows_per_sec']:>10}"
+              f"{r['peak_rss_mb']:>9}{r['unreachable']:>7}{r['errors']:>8}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the probe paths against a simulated network.')
+    parser.add_argument('--targets', nargs='+', choices=TARGETS, default=list(TARGETS))
+    parser.add_argument('--scales', nargs='+', type=int, default=list(DEFAULT_SCALES),
+                        help='Number of simulated targets per run')
+    parser.add_argument('--cycles', type=int, default=3, help='Monitoring cycles per run')
+    parser.add_argument('--timeout', type=int, default=2, help='Probe timeout in seconds')
+    parser.add_argument('--latency', type=float, default=5.0, help='Mean added latency in ms')
+    parser.add_argument('--jitter', type=float, default=2.0, help='Latency jitter in ms')
+    parser.add_argument('--loss', type=float, default=0.01, help='Per-packet loss probability')
+    parser.add_argument('--blackhole', type=float, default=0.02, help='Fraction of hosts that never answer')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='Also write the results to this file')
+    parser.add_argument('--worker', choices=TARGETS, help=argparse.SUPPRESS)
+    parser.add_argument('--scale', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--ports', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.worker:
+        run_worker(args)
+        return 0
+    return run_benchmarks(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,340 @@
+"""
+Simulated network of stand-in hosts for probe benchmarks
+
+Every simulated host is a loopback alias from 127.16.0.1 upwards. Linux
+routes all of 127.0.0.0/8 to the loopback interface, so the kernel answers
+ICMP echo and TCP connections for any of these addresses without any
+interface configuration. One wildcard listener per service serves TCP,
+HTTP and DNS for every host and tells hosts apart by the local address a
+connection or datagram arrived on.
+
+Each host gets a deterministic profile (added latency, packet loss,
+black-holed or not) derived from the network seed. HTTP and DNS stand-ins
+apply the profile when answering; ICMP echo and TCP handshakes are answered
+by the kernel, so `impair()` applies the profile on the probing side around
+the real packets instead.
+"""
+import asyncio
+import ipaddress
+import logging
+import random
+import socket
+import struct
+import threading
+from contextlib import ExitStack, contextmanager
+from typing import Dict, Optional
+from unittest import mock
+
+from monitoring.icmp import AsyncIcmpPinger
+
+logger = logging.getLogger(__name__)
+
+FIRST_HOST = ipaddress.IPv4Address('127.16.0.1')
+MAX_HOSTS = int(ipaddress.IPv4Address('127.255.255.254')) - int(FIRST_HOST) + 1
+
+# Linux value of IP_PKTINFO, which the socket module does not export
+IP_PKTINFO = getattr(socket, 'IP_PKTINFO', 8)
+
+# Linux retransmits an unanswered SYN after one second
+SYN_RETRY_DELAY = 1.0
+
+# Address returned by the DNS stand-in for every A query (RFC 5737)
+DNS_ANSWER = '192.0.2.1'
+
+HTTP_RESPONSE = (
+    b'HTTP/1.1 200 OK\r\n'
+    b'Content-Type: text/plain\r\n'
+    b'Content-Length: 2\r\n'
+    b'\r\n'
+    b'OK'
+)
+
+
+class HostProfile:
+    """Network conditions of one simulated host"""
+
+    __slots__ = ('latency', 'loss', 'blackholed')
+
+    def __init__(self, latency: float = 0.0, loss: float = 0.0, blackholed: bool = False):
+        self.latency = latency
+        self.loss = loss
+        self.blackholed = blackholed
+
+    @property
+    def delay(self) -> float:
+        """Added round-trip latency in seconds."""
+        return self.latency / 1000
+
+    def drops(self, rng=random) -> bool:
+        """Return True if a packet to this host is lost."""
+        return self.blackholed or (self.loss > 0 and rng.random() < self.loss)
+
+
+class SimulatedNetwork:
+    """
+    Deterministic set of simulated hosts and their network conditions.
+
+    The same arguments always produce the same hosts and profiles, so the
+    process serving the stand-ins and the process probing them agree
+    without sharing state.
+
+    Args:
+        size: Number of hosts
+        latency: Mean added round-trip latency in milliseconds
+        jitter: Maximum deviation from `latency` in milliseconds
+        loss: Probability that any single packet is lost
+        blackhole: Fraction of hosts that never answer
+        seed: Seed for the per-host profiles
+    """
+
+    def __init__(self, size: int, latency: float = 5.0, jitter: float = 2.0,
+                 loss: float = 0.0, blackhole: float = 0.0, seed: int = 1):
+        if not 0 < size <= MAX_HOSTS:
+            raise ValueError(f"Network size must be between 1 and {MAX_HOSTS}")
+
+        rng = random.Random(seed)
+        self.hosts = [str(FIRST_HOST + i) for i in range(size)]
+        self.profiles = {
+            host: HostProfile(
+                latency=max(0.0, latency + rng.uniform(-jitter, jitter)),
+                loss=loss,
+                blackholed=rng.random() < blackhole
+            )
+            for host in self.hosts
+        }
+
+    def __len__(self):
+        return len(self.hosts)
+
+    def profile(self, host: str) -> Optional[HostProfile]:
+        """Return the profile of `host`, or None if it is not simulated."""
+        return self.profiles.get(host)
+
+
+@contextmanager
+def impair(network: SimulatedNetwork):
+    """
+    Apply host profiles to ICMP echo and TCP connects made by this process.
+
+    Real packets are still sent to the loopback aliases; lost and
+    black-holed probes wait out their timeout as they would on a network,
+    and TCP connects whose SYN is lost pay the kernel's retransmit delay.
+    Addresses outside the simulated network are not affected.
+    """
+    probe = AsyncIcmpPinger._probe
+    open_connection = asyncio.open_connection
+
+    async def impaired_probe(pinger, address, timeout):
+        profile = network.profile(address)
+        if profile is None:
+            return await probe(pinger, address, timeout)
+        if profile.drops():
+            await pinger._throttle()
+            await asyncio.sleep(timeout)
+            return None
+
+        rtt = await probe(pinger, address, timeout)
+        if rtt is None:
+            return None
+        rtt += profile.latency
+        if rtt > timeout * 1000:
+            await asyncio.sleep(timeout)
+            return None
+        await asyncio.sleep(profile.delay)
+        return rtt
+
+    async def impaired_open_connection(host=None, port=None, **kwargs):
+        profile = network.profile(host)
+        if profile is not None:
+            if profile.blackholed:
+                # SYNs vanish; the caller's own timeout ends the attempt
+                await asyncio.Event().wait()
+            await asyncio.sleep(profile.delay + (SYN_RETRY_DELAY if profile.drops() else 0))
+        return await open_connection(host, port, **kwargs)
+
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch.object(AsyncIcmpPinger, '_probe', impaired_probe))
+        stack.enter_context(mock.patch('asyncio.open_connection', impaired_open_connection))
+        yield network
+
+
+def dns_reply(query: bytes) -> Optional[bytes]:
+    """
+    Build the response to a DNS query.
+
+    A questions are answered with DNS_ANSWER, anything else with an empty
+    answer section. Returns None for packets that are not a single-question
+    query.
+    """
+    if len(query) < 12:
+        return None
+    ident, flags, qdcount = struct.unpack('!HHH', query[:6])
+    if flags & 0x8000 or qdcount != 1:
+        return None
+
+    end = 12
+    while end < len(query) and query[end]:
+        end += query[end] + 1
+    end += 5  # Root label, QTYPE and QCLASS
+    if end > len(query):
+        return None
+    question = query[12:end]
+
+    answer = b''
+    if struct.unpack('!H', question[-4:-2])[0] == 1:
+        # Name is a pointer to the question at offset 12
+        answer = b'\xc0\x0c' + struct.pack('!HHIH', 1, 1, 60, 4) + socket.inet_aton(DNS_ANSWER)
+
+    # QR and RA set; opcode and RD copied from the query
+    flags = 0x8080 | (flags & 0x7900)
+    return struct.pack('!HHHHHH', ident, flags, 1, 1 if answer else 0, 0, 0) + question + answer
+
+
+def _pktinfo_destination(ancdata) -> Optional[str]:
+    """Return the destination address from IP_PKTINFO ancillary data."""
+    for level, kind, data in ancdata:
+        if level == socket.IPPROTO_IP and kind == IP_PKTINFO and len(data) >= 12:
+            return socket.inet_ntoa(data[8:12])
+    return None
+
+
+class StandInServices:
+    """
+    TCP, HTTP and DNS responders for every host of a simulated network.
+
+    The responders run on an event loop in a background thread. TCP and
+    HTTP listen on ephemeral ports; DNS has to use port 53 because the DNS
+    service check always queries the default port, and is left out (with a
+    warning) when that port cannot be bound.
+    """
+
+    def __init__(self, network: SimulatedNetwork, dns_port: int = 53):
+        self.network = network
+        self.dns_port = dns_port
+        self.ports = {}
+        self.loop = None
+        self._thread = None
+        self._servers = []
+        self._dns_sock = None
+        self._rng = random.Random()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def start(self) -> Dict[str, int]:
+        """
+        Start the responders.
+
+        Returns:
+            Dictionary mapping 'tcp', 'http' and (if available) 'dns' to ports
+        """
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name='stand-in-services', daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+        return self.ports
+
+    def stop(self):
+        """Close every listener and stop the event loop thread."""
+        if self.loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+        self.loop = None
+
+    async def _start(self):
+        for name, handler in (('tcp', self._handle_tcp), ('http', self._handle_http)):
+            server = await asyncio.start_server(handler, '0.0.0.0', 0, backlog=4096)
+            self._servers.append(server)
+            self.ports[name] = server.sockets[0].getsockname()[1]
+
+        try:
+            self._open_dns_socket()
+            server = await asyncio.start_server(self._handle_tcp, '0.0.0.0', self.dns_port, backlog=4096)
+        except OSError as e:
+            logger.warning(f"DNS stand-in disabled, cannot bind port {self.dns_port}: {e}")
+            self._close_dns_socket()
+        else:
+            self._servers.append(server)
+            self.ports['dns'] = self.dns_port
+
+    async def _stop(self):
+        self._close_dns_socket()
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+
+    async def _handle_tcp(self, reader, writer):
+        writer.close()
+
+    async def _handle_http(self, reader, writer):
+        host = writer.get_extra_info('sockname')[0]
+        profile = self.network.profile(host) or HostProfile()
+        try:
+            if profile.blackholed:
+                await reader.read()
+                return
+            while True:
+                await reader.readuntil(b'\r\n\r\n')
+                await asyncio.sleep(profile.delay)
+                writer.write(HTTP_RESPONSE)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _open_dns_socket(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.setsockopt(socket.IPPROTO_IP, IP_PKTINFO, 1)
+            sock.setblocking(False)
+            sock.bind(('0.0.0.0', self.dns_port))
+        except OSError:
+            sock.close()
+            raise
+        self._dns_sock = sock
+        self.loop.add_reader(sock.fileno(), self._on_dns_readable)
+
+    def _close_dns_socket(self):
+        if self._dns_sock is not None:
+            self.loop.remove_reader(self._dns_sock.fileno())
+            self._dns_sock.close()
+            self._dns_sock = None
+
+    def _on_dns_readable(self):
+        while self._dns_sock is not None:
+            try:
+                query, ancdata, _flags, client = self._dns_sock.recvmsg(512, socket.CMSG_SPACE(12))
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                logger.debug(f"DNS stand-in receive error: {e}")
+                return
+
+            host = _pktinfo_destination(ancdata)
+            reply = dns_reply(query)
+            if host is None or reply is None:
+                continue
+            profile = self.network.profile(host) or HostProfile()
+            if profile.drops(self._rng):
+                continue
+            self.loop.call_later(profile.delay, self._send_dns, reply, host, client)
+
+    def _send_dns(self, reply, host, client):
+        """Send a reply from the address the query was sent to."""
+        if self._dns_sock is None:
+            return
+        pktinfo = struct.pack('=i4s4s', 0, socket.inet_aton(host), bytes(4))
+        try:
+            self._dns_sock.sendmsg([reply], [(socket.IPPROTO_IP, IP_PKTINFO, pktinfo)], 0, client)
+        except OSError as e:
+            logger.debug(f"DNS stand-in send error: {e}")
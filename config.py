@@ -39,6 +39,15 @@ class Config:
     DEFAULT_PING_INTERVAL = int(os.environ.get('DEFAULT_PING_INTERVAL') or 60)
     MAX_CONCURRENT_PINGS = int(os.environ.get('MAX_CONCURRENT_PINGS') or 50)
     SPEED_TEST_INTERVAL = int(os.environ.get('SPEED_TEST_INTERVAL') or 3600)
+    USE_ICMP_ENGINE = os.environ.get('USE_ICMP_ENGINE', 'True').lower() == 'true'
+    ICMP_MAX_RATE = int(os.environ.get('ICMP_MAX_RATE') or 2000)
+    SCHEDULER_TICK_SECONDS = int(os.environ.get('SCHEDULER_TICK_SECONDS') or 10)
+    SCHEDULER_RESYNC_SECONDS = int(os.environ.get('SCHEDULER_RESYNC_SECONDS') or 60)
+    WRITE_BUFFER_MAX_BATCH = int(os.environ.get('WRITE_BUFFER_MAX_BATCH') or 500)
+    WRITE_BUFFER_FLUSH_INTERVAL = float(os.environ.get('WRITE_BUFFER_FLUSH_INTERVAL') or 2.0)
+    WRITE_BUFFER_MAX_PENDING = int(os.environ.get('WRITE_BUFFER_MAX_PENDING') or 10000)
+    RETENTION_BATCH_SIZE = int(os.environ.get('RETENTION_BATCH_SIZE') or 5000)
+    RETENTION_BATCH_PAUSE = float(os.environ.get('RETENTION_BATCH_PAUSE') or 0.05)
     
     # Alert Configuration
     ALERT_EMAIL_RECIPIENTS = os.environ.get('ALERT_EMAIL_RECIPIENTS', '').split(',')
@@ -0,0 +1,248 @@
+"""
+Bulk device import pipeline
+
+An uploaded file is parsed into a DataFrame and validated column-wise
+(prepare_import), then written in batches (run_import): each batch looks up
+its existing IPs with one query, creates new devices and their port
+monitors with bulk_create and, if requested, updates existing devices with
+bulk_update. The pipeline runs inline for synchronous imports or in the
+import_devices task, which reports progress through the Celery result
+backend.
+"""
+import logging
+import re
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Dotted-quad IPv4 without leading zeros, the form validate_ipv4_address accepts
+IPV4_PATTERN = r'(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)(?:\.(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)){3}'
+
+# First match wins, in this order
+DEVICE_TYPE_KEYWORDS = [
+    ('database', ['db', 'database', 'sql', 'mysql', 'postgres', 'oracle']),
+    ('web_server', ['web', 'www', 'http', 'apache', 'nginx']),
+    ('ftp_server', ['ftp', 'sftp', 'file']),
+    ('dns_server', ['dns', 'bind', 'named']),
+    ('router', ['router', 'gateway', 'gw']),
+    ('switch', ['switch', 'sw']),
+    ('firewall', ['firewall', 'fw', 'pfsense']),
+]
+
+# Imported devices per service discovery task
+DISCOVERY_CHUNK_SIZE = 500
+
+UPDATE_FIELDS = ['name', 'location', 'device_type', 'isp', 'ping_enabled', 'alert_enabled']
+
+
+def import_options(post) -> Dict:
+    """Read the device import form fields into an options dict."""
+    def checked(name):
+        return post.get(name) == 'on'
+
+    def column(name):
+        value = post.get(name)
+        return int(value) if value and value.isdigit() else None
+
+    monitoring_ports = []
+    if checked('enable_http'):
+        monitoring_ports.extend([80, 443, 8080, 8443])
+    if checked('enable_ftp'):
+        monitoring_ports.extend([21, 22])
+    if checked('enable_database'):
+        monitoring_ports.extend([3306, 5432, 1433, 1521, 27017])
+    if checked('enable_custom_ports'):
+        monitoring_ports.extend(int(p.strip()) for p in post.get('custom_ports', '').split(',') if p.strip().isdigit())
+
+    return {
+        'has_header': checked('has_header'),
+        'update_existing': checked('update_existing'),
+        'ip_column': int(post.get('ip_column', 0)),
+        'name_column': column('name_column'),
+        'location_column': column('location_column'),
+        'isp_column': column('isp_column'),
+        'default_device_type': post.get('default_device_type', 'server'),
+        'auto_detect_type': checked('auto_detect_type'),
+        'enable_ping': checked('enable_ping'),
+        'enable_alerts': checked('enable_alerts'),
+        'enable_snmp': checked('enable_snmp'),
+        'monitoring_ports': sorted(set(monitoring_ports)),
+        'batch_size': int(post.get('batch_size', 100)),
+        'processing_mode': post.get('processing_mode', 'async'),
+    }
+
+
+def read_import_file(uploaded_file, has_header: bool) -> pd.DataFrame:
+    """Read an uploaded Excel, CSV or whitespace/comma separated text file."""
+    extension = uploaded_file.name.lower().split('.')[-1]
+    header = 0 if has_header else None
+
+    if extension in ['xlsx', 'xls']:
+        return pd.read_excel(uploaded_file, header=header, dtype=str)
+    if extension == 'csv':
+        return pd.read_csv(uploaded_file, header=header, dtype=str)
+
+    lines = uploaded_file.read().decode('utf-8').strip().split('\n')
+    if has_header:
+        lines = lines[1:]
+    return pd.DataFrame([line.split(',') if ',' in line else line.split() for line in lines])
+
+
+def _text_column(df: pd.DataFrame, position: Optional[int], max_length: int) -> pd.Series:
+    if position is None or position >= df.shape[1]:
+        return pd.Series('', index=df.index)
+    return df.iloc[:, position].fillna('').astype(str).str.strip().str[:max_length]
+
+
+def detect_device_types(names: pd.Series, default: str) -> pd.Series:
+    """Guess device types from name keywords, column-wise."""
+    lowered = names.str.lower()
+    conditions = [
+        lowered.str.contains('|'.join(map(re.escape, keywords)), regex=True) for _type, keywords in DEVICE_TYPE_KEYWORDS
+    ]
+    choices = [device_type for device_type, _keywords in DEVICE_TYPE_KEYWORDS]
+    return pd.Series(np.select(conditions, choices, default=default), index=names.index)
+
+
+def prepare_import(df: pd.DataFrame, options: Dict):
+    """
+    Validate and normalise import rows column-wise.
+
+    Rows with an invalid IP address, or repeating an IP already seen
+    earlier in the file, are reported and dropped.
+
+    Returns:
+        (records, errors): a list of device field dicts with the source
+        row number, and a list of error messages
+    """
+    if options['ip_column'] >= df.shape[1]:
+        return [], [f"IP column {options['ip_column']} is not in the file"]
+
+    rows = pd.DataFrame(index=df.index)
+    rows['row'] = df.index + (2 if options['has_header'] else 1)
+    rows['ip_address'] = df.iloc[:, options['ip_column']].fillna('').astype(str).str.strip()
+
+    names = _text_column(df, options['name_column'], 100)
+    rows['name'] = names.where(names != '', rows['ip_address'].str[:100])
+    rows['location'] = _text_column(df, options['location_column'], 100)
+    rows['isp'] = _text_column(df, options['isp_column'], 200)
+    if options['auto_detect_type']:
+        rows['device_type'] = detect_device_types(rows['name'], options['default_device_type'])
+    else:
+        rows['device_type'] = options['default_device_type']
+
+    errors = []
+    valid = rows['ip_address'].str.fullmatch(IPV4_PATTERN)
+    for row, ip_address in rows.loc[~valid, ['row', 'ip_address']].itertuples(index=False):
+        errors.append(f"Row {row}: Invalid IP address '{ip_address}'")
+    rows = rows[valid]
+
+    duplicate = rows['ip_address'].duplicated()
+    for row, ip_address in rows.loc[duplicate, ['row', 'ip_address']].itertuples(index=False):
+        errors.append(f"Row {row}: Duplicate IP address '{ip_address}'")
+    rows = rows[~duplicate]
+
+    return rows.to_dict('records'), errors
+
+
+def _port_monitors(device_ids: List[int], options: Dict):
+    from monitoring.port_models import PortMonitor, get_service_type_for_port
+
+    monitors = []
+    for device_id in device_ids:
+        for port in options['monitoring_ports']:
+            monitors.append(PortMonitor(
+                device_id=device_id, port=port, service_type=get_service_type_for_port(port),
+                is_enabled=True, check_interval=300, timeout=10, alert_on_failure=True, alert_threshold=3,
+            ))
+        if options.get('enable_snmp') and 161 not in options['monitoring_ports']:
+            monitors.append(PortMonitor(
+                device_id=device_id, port=161, service_type='snmp', service_name='SNMP',
+                is_enabled=True, check_interval=600, timeout=15,
+            ))
+    return monitors
+
+
+def run_import(records: List[Dict], options: Dict,
+               progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    Write prepared device records in batches of options['batch_size'].
+
+    Args:
+        records: Records from prepare_import
+        options: Options from import_options
+        progress: Called with the running totals after each batch
+
+    Returns:
+        Dictionary with total, processed, created, updated and errors
+    """
+    from django.db import transaction
+
+    from monitoring.port_models import PortMonitor
+    from .models import Device
+
+    batch_size = max(1, options['batch_size'])
+    totals = {'total': len(records), 'processed': 0, 'created': 0, 'updated': 0, 'errors': []}
+    new_device_ids = []
+
+    for start in range(0, len(records), batch_size):
+        batch = records[start:start + batch_size]
+        try:
+            with transaction.atomic():
+                existing = dict(Device.objects.filter(
+                    ip_address__in=[record['ip_address'] for record in batch]
+                ).values_list('ip_address', 'id'))
+
+                fields = [{
+                    'name': record['name'],
+                    'ip_address': record['ip_address'],
+                    'device_type': record['device_type'],
+                    'location': record['location'],
+                    'isp': record['isp'],
+                    'ping_enabled': options['enable_ping'],
+                    'alert_enabled': options['enable_alerts'],
+                } for record in batch]
+
+                created = Device.objects.bulk_create([
+                    Device(is_active=True, **values) for values in fields if values['ip_address'] not in existing
+                ])
+                created_ids = [device.pk for device in created]
+                PortMonitor.objects.bulk_create(_port_monitors(created_ids, options), ignore_conflicts=True)
+
+                updated = 0
+                if options['update_existing'] and existing:
+                    updated = Device.objects.bulk_update([
+                        Device(pk=existing[values['ip_address']], **values)
+                        for values in fields if values['ip_address'] in existing
+                    ], UPDATE_FIELDS)
+        except Exception as e:
+            logger.error(f"Device import batch at row {batch[0]['row']} failed: {e}")
+            totals['errors'].append(f"Rows {batch[0]['row']}-{batch[-1]['row']}: {e}")
+        else:
+            totals['created'] += len(created_ids)
+            totals['updated'] += updated
+            new_device_ids.extend(created_ids)
+
+        totals['processed'] += len(batch)
+        if progress:
+            progress(totals)
+
+    _discover_services(new_device_ids)
+    return totals
+
+
+def _discover_services(device_ids: List[int]):
+    """Queue service discovery for newly imported devices."""
+    if not device_ids:
+        return
+    # Imported here to keep the monitoring tasks out of import time, but
+    # outside the try so a broken import fails loudly instead of being logged
+    from monitoring.service_tasks import discover_services
+    try:
+        for start in range(0, len(device_ids), DISCOVERY_CHUNK_SIZE):
+            discover_services.delay(device_ids[start:start + DISCOVERY_CHUNK_SIZE])
+    except Exception as e:
+        logger.warning(f"Could not queue service discovery for {len(device_ids)} imported devices: {e}")
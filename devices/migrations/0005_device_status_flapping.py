@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("devices", "0004_device_latitude_device_longitude"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="device",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("online", "Online"),
+                    ("offline", "Offline"),
+                    ("warning", "Warning"),
+                    ("unknown", "Unknown"),
+                    ("flapping", "Flapping"),
+                ],
+                default="unknown",
+                help_text="Current device status",
+                max_length=10,
+            ),
+        ),
+    ]
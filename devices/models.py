@@ -13,6 +13,7 @@ class DeviceStatus(models.TextChoices):
     OFFLINE = 'offline', 'Offline'
     WARNING = 'warning', 'Warning'
     UNKNOWN = 'unknown', 'Unknown'
+    FLAPPING = 'flapping', 'Flapping'
 
 
 class DeviceType(models.TextChoices):
@@ -153,6 +154,7 @@ class Device(models.Model):
             DeviceStatus.OFFLINE: 'danger',
             DeviceStatus.WARNING: 'warning',
             DeviceStatus.UNKNOWN: 'secondary',
+            DeviceStatus.FLAPPING: 'info',
         }
         return color_map.get(self.status, 'secondary')
     
@@ -164,6 +166,7 @@ class Device(models.Model):
             DeviceStatus.OFFLINE: 'bi-x-circle-fill',
             DeviceStatus.WARNING: 'bi-exclamation-triangle-fill',
             DeviceStatus.UNKNOWN: 'bi-question-circle-fill',
+            DeviceStatus.FLAPPING: 'bi-arrow-left-right',
         }
         return icon_map.get(self.status, 'bi-question-circle-fill')
     
@@ -175,43 +178,23 @@ class Device(models.Model):
         """Get recent speed test results for this device"""
         return self.speed_results.order_by('-timestamp')[:limit]
     
-    def get_uptime_percentage(self, days=1):
-        """Calculate uptime percentage for the last N days"""
+    def get_ping_summary(self, days=1):
+        """Summarise ping rollups for the last N days"""
         from django.utils import timezone
         from datetime import timedelta
+        from monitoring.rollups import ping_summary
         
         end_time = timezone.now()
         start_time = end_time - timedelta(days=days)
-        
-        ping_results = self.ping_results.filter(
-            timestamp__gte=start_time,
-            timestamp__lte=end_time
-        )
-        
-        total_pings = ping_results.count()
-        if total_pings == 0:
-            return None
-        
-        successful_pings = ping_results.filter(is_reachable=True).count()
-        return round((successful_pings / total_pings) * 100, 2)
+        return ping_summary(start_time, end_time, device_id=self.pk)
+    
+    def get_uptime_percentage(self, days=1):
+        """Calculate uptime percentage for the last N days"""
+        return self.get_ping_summary(days)['uptime_percentage']
     
     def get_average_response_time(self, days=1):
         """Calculate average response time for the last N days"""
-        from django.utils import timezone
-        from datetime import timedelta
-        from django.db.models import Avg
-        
-        end_time = timezone.now()
-        start_time = end_time - timedelta(days=days)
-        
-        avg_response = self.ping_results.filter(
-            timestamp__gte=start_time,
-            timestamp__lte=end_time,
-            is_reachable=True,
-            response_time__isnull=False
-        ).aggregate(avg_time=Avg('response_time'))
-        
-        return round(avg_response['avg_time'], 2) if avg_response['avg_time'] else None
+        return self.get_ping_summary(days)['avg_latency']
 
 
 class DeviceGroup(models.Model):
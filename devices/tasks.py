@@ -0,0 +1,32 @@
+"""
+Celery tasks for device management
+"""
+import logging
+from celery import shared_task
+
+from .importer import run_import
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True)
+def import_devices(self, records, options):
+    """Import prepared device records, reporting progress as task state"""
+    def progress(totals):
+        if self.request.id and not self.request.is_eager:
+            self.update_state(state='PROGRESS', meta={
+                'total': totals['total'],
+                'processed': totals['processed'],
+                'created': totals['created'],
+                'updated': totals['updated'],
+                'error_count': len(totals['errors']),
+            })
+
+    try:
+        totals = run_import(records, options, progress)
+        logger.info(f"Imported {totals['created']} new and updated {totals['updated']} devices "
+                    f"from {totals['total']} rows")
+        return totals
+    except Exception as e:
+        logger.error(f"Error importing devices: {e}")
+        return {'error': str(e)}
@@ -12,7 +12,10 @@ urlpatterns = [
     path('<int:pk>/', views.device_detail, name='detail'),
     path('<int:pk>/edit/', views.device_edit, name='edit'),
     path('<int:pk>/delete/', views.device_delete, name='delete'),
+    path('<int:pk>/export/', views.device_data_export, name='data_export'),
     path('import/', views.device_import, name='import'),
+    path('import/<str:task_id>/', views.import_status, name='import_status'),
+    path('import/<str:task_id>/progress/', views.import_progress, name='import_progress'),
     path('export/', views.device_export, name='export'),
     path('map/', views.device_map, name='map'),
 
@@ -4,39 +4,42 @@ Views for device management
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse, FileResponse
 from django.db import models
+import tempfile
 
+from monitoring.export import csv_stream, write_xlsx, export_filename
 from .models import Device, DeviceGroup
 from .forms import DeviceForm, DeviceGroupForm
-
-
-def device_list(request):
-    """List all devices with advanced filtering - optimized for 1000+ devices"""
-    from django.core.cache import cache
-    from django.db.models import Prefetch
-
-    # Start with optimized queryset
-    devices = Device.objects.select_related().only(
-        'id', 'name', 'ip_address', 'hostname', 'device_type', 'location',
-        'city', 'country', 'isp', 'organization', 'status', 'last_seen',
-        'current_latency', 'current_upload_speed', 'current_download_speed',
-        'is_active', 'ping_enabled'
-    )
-
+from .importer import import_options, read_import_file, prepare_import, run_import
+from .tasks import import_devices
+
+DEVICE_EXPORT_FIELDS = [
+    'name', 'ip_address', 'hostname', 'device_type', 'location', 'city', 'country', 'isp',
+    'organization', 'status', 'last_seen', 'current_latency', 'current_download_speed',
+    'current_upload_speed', 'ping_enabled', 'is_active',
+]
+PING_EXPORT_FIELDS = [
+    'timestamp', 'is_reachable', 'response_time', 'packet_loss', 'packets_sent',
+    'packets_received', 'min_time', 'max_time', 'avg_time', 'error_message',
+]
+
+
+def filter_devices(devices, params):
+    """Apply the device list filter and sort parameters to a device queryset"""
     # Apply filters with database indexes
-    ip_filter = request.GET.get('ip_filter')
+    ip_filter = params.get('ip_filter')
     if ip_filter:
         devices = devices.filter(ip_address__icontains=ip_filter)
 
-    host_filter = request.GET.get('host_filter')
+    host_filter = params.get('host_filter')
     if host_filter:
         devices = devices.filter(
             models.Q(name__icontains=host_filter) |
             models.Q(hostname__icontains=host_filter)
         )
 
-    location_filter = request.GET.get('location_filter')
+    location_filter = params.get('location_filter')
     if location_filter:
         devices = devices.filter(
             models.Q(location__icontains=location_filter) |
@@ -44,30 +47,30 @@ def device_list(request):
             models.Q(country__icontains=location_filter)
         )
 
-    isp_filter = request.GET.get('isp_filter')
+    isp_filter = params.get('isp_filter')
     if isp_filter:
         devices = devices.filter(
             models.Q(isp__icontains=isp_filter) |
             models.Q(organization__icontains=isp_filter)
         )
 
-    status_filter = request.GET.get('status_filter')
+    status_filter = params.get('status_filter')
     if status_filter:
         devices = devices.filter(status=status_filter)
 
-    type_filter = request.GET.get('type_filter')
+    type_filter = params.get('type_filter')
     if type_filter:
         devices = devices.filter(device_type=type_filter)
 
-    monitoring_filter = request.GET.get('monitoring_filter')
+    monitoring_filter = params.get('monitoring_filter')
     if monitoring_filter == 'enabled':
         devices = devices.filter(is_active=True)
     elif monitoring_filter == 'disabled':
         devices = devices.filter(is_active=False)
 
     # Sorting with database indexes
-    sort_by = request.GET.get('sort_by', 'name')
-    order = request.GET.get('order', 'asc')
+    sort_by = params.get('sort_by', 'name')
+    order = params.get('order', 'asc')
 
     valid_sort_fields = ['name', 'ip_address', 'status', 'last_seen', 'current_latency']
     if sort_by in valid_sort_fields:
@@ -77,6 +80,24 @@ def device_list(request):
     else:
         devices = devices.order_by('name')
 
+    return devices
+
+
+def device_list(request):
+    """List all devices with advanced filtering - optimized for 1000+ devices"""
+    from django.core.cache import cache
+    from django.db.models import Prefetch
+
+    # Start with optimized queryset
+    devices = Device.objects.select_related().only(
+        'id', 'name', 'ip_address', 'hostname', 'device_type', 'location',
+        'city', 'country', 'isp', 'organization', 'status', 'last_seen',
+        'current_latency', 'current_upload_speed', 'current_download_speed',
+        'is_active', 'ping_enabled'
+    )
+
+    devices = filter_devices(devices, request.GET)
+
     # Pagination optimized for large datasets
     page_size = int(request.GET.get('page_size', 50))  # Increased default page size
     page_size = min(page_size, 200)  # Cap at 200 for performance
@@ -107,12 +128,13 @@ def device_detail(request, pk):
     # Get recent speed test results
     recent_speeds = device.speed_results.order_by('-timestamp')[:10]
     
+    summary = device.get_ping_summary(1)
     context = {
         'device': device,
         'recent_pings': recent_pings,
         'recent_speeds': recent_speeds,
-        'uptime_24h': device.get_uptime_percentage(1),
-        'avg_response_time': device.get_average_response_time(1),
+        'uptime_24h': summary['uptime_percentage'],
+        'avg_response_time': summary['avg_latency'],
     }
     return render(request, 'devices/detail.html', context)
 
@@ -179,9 +201,10 @@ def device_edit(request, pk):
         except Exception as e:
             messages.error(request, f'Error updating device: {str(e)}')
 
-    # Get device statistics
-    uptime_24h = device.get_uptime_percentage(1)
-    avg_response_time = device.get_average_response_time(1)
+    # Get device statistics from one rollup summary
+    summary = device.get_ping_summary(1)
+    uptime_24h = summary['uptime_percentage']
+    avg_response_time = summary['avg_latency']
 
     context = {
         'device': device,
@@ -215,182 +238,35 @@ def device_import(request):
                 messages.error(request, 'Please select a file to upload.')
                 return render(request, 'devices/import.html')
 
-            # Get import settings
-            has_header = request.POST.get('has_header') == 'on'
-            update_existing = request.POST.get('update_existing') == 'on'
-            ip_column = int(request.POST.get('ip_column', 0))
-            name_column = request.POST.get('name_column')
-            location_column = request.POST.get('location_column')
-            isp_column = request.POST.get('isp_column')
-            default_device_type = request.POST.get('default_device_type', 'server')
-            auto_detect_type = request.POST.get('auto_detect_type') == 'on'
-
-            # Monitoring settings
-            enable_ping = request.POST.get('enable_ping') == 'on'
-            enable_alerts = request.POST.get('enable_alerts') == 'on'
-            enable_http = request.POST.get('enable_http') == 'on'
-            enable_ftp = request.POST.get('enable_ftp') == 'on'
-            enable_database = request.POST.get('enable_database') == 'on'
-            enable_custom_ports = request.POST.get('enable_custom_ports') == 'on'
-            custom_ports = request.POST.get('custom_ports', '')
-            enable_snmp = request.POST.get('enable_snmp') == 'on'
-            enable_speed_test = request.POST.get('enable_speed_test') == 'on'
-            enable_ssl_check = request.POST.get('enable_ssl_check') == 'on'
-            enable_dns_check = request.POST.get('enable_dns_check') == 'on'
-
-            batch_size = int(request.POST.get('batch_size', 100))
-            processing_mode = request.POST.get('processing_mode', 'async')
-
-            # Process the file
-            import pandas as pd
-            import io
-
-            # Read file based on type
-            file_extension = uploaded_file.name.lower().split('.')[-1]
-
-            if file_extension in ['xlsx', 'xls']:
-                df = pd.read_excel(uploaded_file, header=0 if has_header else None)
-            elif file_extension == 'csv':
-                df = pd.read_csv(uploaded_file, header=0 if has_header else None)
-            else:
-                # Handle text files
-                content = uploaded_file.read().decode('utf-8')
-                lines = content.strip().split('\n')
-                if has_header:
-                    lines = lines[1:]  # Skip header
-
-                # Create DataFrame from text lines
-                data = []
-                for line in lines:
-                    parts = line.split(',') if ',' in line else line.split()
-                    if len(parts) > ip_column:
-                        data.append(parts)
-
-                df = pd.DataFrame(data)
-
-            # Validate and process data
-            devices_created = 0
-            devices_updated = 0
-            errors = []
-
-            # Process in batches for better performance
-            total_rows = len(df)
-
-            for batch_start in range(0, total_rows, batch_size):
-                batch_end = min(batch_start + batch_size, total_rows)
-                batch_df = df.iloc[batch_start:batch_end]
-
-                for index, row in batch_df.iterrows():
-                    try:
-                        # Extract IP address
-                        ip_address = str(row.iloc[ip_column]).strip()
-
-                        # Validate IP address
-                        import ipaddress
-                        try:
-                            ipaddress.ip_address(ip_address)
-                        except ValueError:
-                            errors.append(f"Row {index + 1}: Invalid IP address '{ip_address}'")
-                            continue
-
-                        # Extract other fields
-                        device_name = ip_address  # Default name
-                        if name_column and name_column.isdigit():
-                            name_col = int(name_column)
-                            if len(row) > name_col:
-                                device_name = str(row.iloc[name_col]).strip()
-
-                        location = ""
-                        if location_column and location_column.isdigit():
-                            loc_col = int(location_column)
-                            if len(row) > loc_col:
-                                location = str(row.iloc[loc_col]).strip()
-
-                        isp = ""
-                        if isp_column and isp_column.isdigit():
-                            isp_col = int(isp_column)
-                            if len(row) > isp_col:
-                                isp = str(row.iloc[isp_col]).strip()
-
-                        # Auto-detect device type from hostname/IP patterns
-                        detected_device_type = default_device_type
-                        if auto_detect_type and device_name:
-                            name_lower = device_name.lower()
-                            if any(x in name_lower for x in ['db', 'database', 'sql', 'mysql', 'postgres', 'oracle']):
-                                detected_device_type = 'database'
-                            elif any(x in name_lower for x in ['web', 'www', 'http', 'apache', 'nginx']):
-                                detected_device_type = 'web_server'
-                            elif any(x in name_lower for x in ['ftp', 'sftp', 'file']):
-                                detected_device_type = 'ftp_server'
-                            elif any(x in name_lower for x in ['dns', 'bind', 'named']):
-                                detected_device_type = 'dns_server'
-                            elif any(x in name_lower for x in ['router', 'gateway', 'gw']):
-                                detected_device_type = 'router'
-                            elif any(x in name_lower for x in ['switch', 'sw']):
-                                detected_device_type = 'switch'
-                            elif any(x in name_lower for x in ['firewall', 'fw', 'pfsense']):
-                                detected_device_type = 'firewall'
-
-                        # Determine monitoring ports based on device type and settings
-                        monitoring_ports = []
-                        if enable_http:
-                            monitoring_ports.extend([80, 443, 8080, 8443])
-                        if enable_ftp:
-                            monitoring_ports.extend([21, 22])
-                        if enable_database:
-                            monitoring_ports.extend([3306, 5432, 1433, 1521, 27017])
-                        if enable_custom_ports and custom_ports:
-                            try:
-                                custom_port_list = [int(p.strip()) for p in custom_ports.split(',') if p.strip().isdigit()]
-                                monitoring_ports.extend(custom_port_list)
-                            except:
-                                pass
-
-                        # Check if device exists
-                        device, created = Device.objects.get_or_create(
-                            ip_address=ip_address,
-                            defaults={
-                                'name': device_name,
-                                'device_type': detected_device_type,
-                                'location': location,
-                                'isp': isp,
-                                'ping_enabled': enable_ping,
-                                'alert_enabled': enable_alerts,
-                                'is_active': True,
-                            }
-                        )
-
-                        if created:
-                            devices_created += 1
-
-                            # Set up port monitoring for new devices
-                            setup_device_monitoring(device, monitoring_ports, {
-                                'enable_snmp': enable_snmp,
-                                'enable_speed_test': enable_speed_test,
-                                'enable_ssl_check': enable_ssl_check,
-                                'enable_dns_check': enable_dns_check,
-                            })
-
-                        elif update_existing:
-                            device.name = device_name
-                            device.location = location
-                            device.device_type = detected_device_type
-                            device.isp = isp
-                            device.ping_enabled = enable_ping
-                            device.alert_enabled = enable_alerts
-                            device.save()
-                            devices_updated += 1
-
-                    except Exception as e:
-                        errors.append(f"Row {index + 1}: {str(e)}")
+            options = import_options(request.POST)
 
-            # Show results
-            if devices_created > 0:
-                messages.success(request, f'Successfully imported {devices_created} new devices.')
-            if devices_updated > 0:
-                messages.success(request, f'Successfully updated {devices_updated} existing devices.')
+            # Validate every row up front; only valid rows are written
+            df = read_import_file(uploaded_file, options['has_header'])
+            records, errors = prepare_import(df, options)
             if errors:
-                error_msg = f'{len(errors)} errors occurred during import. First few: ' + '; '.join(errors[:5])
+                messages.warning(
+                    request,
+                    f'{len(errors)} rows were skipped. First few: ' + '; '.join(errors[:5])
+                )
+
+            if options['processing_mode'] == 'async' and records:
+                try:
+                    result = import_devices.delay(records, options)
+                    messages.info(request, f'Importing {len(records)} devices in the background.')
+                    return redirect('devices:import_status', task_id=result.id)
+                except Exception as e:
+                    messages.warning(request, f'Background import unavailable ({e}); importing now.')
+
+            totals = run_import(records, options)
+
+            # Show results
+            if totals['created'] > 0:
+                messages.success(request, f"Successfully imported {totals['created']} new devices.")
+            if totals['updated'] > 0:
+                messages.success(request, f"Successfully updated {totals['updated']} existing devices.")
+            if totals['errors']:
+                error_msg = f"{len(totals['errors'])} batches failed during import. First few: " + \
+                    '; '.join(totals['errors'][:5])
                 messages.warning(request, error_msg)
 
             return redirect('devices:list')
@@ -402,49 +278,29 @@ def device_import(request):
     return render(request, 'devices/import.html', context)
 
 
-def setup_device_monitoring(device, monitoring_ports, monitoring_options):
-    """Set up comprehensive monitoring for a device"""
-    from monitoring.port_models import PortMonitor, get_service_type_for_port
-
-    # Set up port monitoring
-    for port in monitoring_ports:
-        service_type = get_service_type_for_port(port)
-
-        PortMonitor.objects.get_or_create(
-            device=device,
-            port=port,
-            defaults={
-                'service_type': service_type,
-                'is_enabled': True,
-                'check_interval': 300,  # 5 minutes
-                'timeout': 10,
-                'alert_on_failure': True,
-                'alert_threshold': 3,
-            }
-        )
+def import_status(request, task_id):
+    """Progress page of a background device import"""
+    context = {'task_id': task_id}
+    return render(request, 'devices/import_status.html', context)
 
-    # Schedule service discovery for comprehensive monitoring
-    if monitoring_options.get('enable_snmp'):
-        # Set up SNMP monitoring if enabled
-        PortMonitor.objects.get_or_create(
-            device=device,
-            port=161,
-            defaults={
-                'service_type': 'snmp',
-                'service_name': 'SNMP',
-                'is_enabled': True,
-                'check_interval': 600,  # 10 minutes
-                'timeout': 15,
-            }
-        )
 
-    # Auto-discover additional services
-    try:
-        from monitoring.service_tasks import auto_discover_services
-        auto_discover_services.delay(device.id)
-    except ImportError:
-        # Fallback if Celery is not available
-        pass
+def import_progress(request, task_id):
+    """Progress of a background device import as JSON"""
+    from celery.result import AsyncResult
+
+    result = AsyncResult(task_id)
+    data = {'state': result.state}
+    if result.state == 'PROGRESS':
+        data.update(result.info or {})
+    elif result.successful():
+        totals = result.result or {}
+        if 'error' in totals:
+            data.update(state='FAILURE', error=totals['error'])
+        else:
+            data.update(totals, error_count=len(totals['errors']), errors=totals['errors'][:20])
+    elif result.failed():
+        data['error'] = str(result.result)
+    return JsonResponse(data)
 
 
 def device_map(request):
@@ -519,10 +375,35 @@ def device_map_api(request):
 
 
 def device_export(request):
-    """Export devices to Excel"""
-    # TODO: Implement Excel export
-    messages.info(request, 'Excel export feature coming soon!')
-    return redirect('devices:list')
+    """Export the filtered device list to Excel, or CSV with ?format=csv"""
+    devices = filter_devices(Device.objects.all(), request.GET)
+    rows = devices.values_list(*DEVICE_EXPORT_FIELDS).iterator(chunk_size=2000)
+
+    if request.GET.get('format') == 'csv':
+        response = StreamingHttpResponse(csv_stream(DEVICE_EXPORT_FIELDS, rows), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{export_filename("devices", "csv")}"'
+        return response
+
+    # Write-only workbook spooled to a temporary file, streamed back by FileResponse
+    workbook = tempfile.TemporaryFile()
+    write_xlsx(workbook, [('Devices', DEVICE_EXPORT_FIELDS, rows)])
+    workbook.seek(0)
+    return FileResponse(workbook, as_attachment=True, filename=export_filename('devices', 'xlsx'))
+
+
+def device_data_export(request, pk):
+    """Stream a device's ping history as CSV (gzipped with ?compress=gzip)"""
+    device = get_object_or_404(Device, pk=pk)
+    compress = request.GET.get('compress') == 'gzip'
+    rows = device.ping_results.order_by('timestamp').values_list(*PING_EXPORT_FIELDS).iterator(chunk_size=5000)
+
+    response = StreamingHttpResponse(
+        csv_stream(PING_EXPORT_FIELDS, rows, compress=compress),
+        content_type='application/gzip' if compress else 'text/csv'
+    )
+    filename = export_filename(f'device_{device.pk}_pings', 'csv.gz' if compress else 'csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 
 
 def group_list(request):
@@ -14,6 +14,7 @@ urlpatterns = [
 
     # Custom API endpoints
     path('dashboard/', views.api_dashboard_data, name='api_dashboard'),
+    path('events/', views.event_stream, name='api_event_stream'),
     path('device/<int:device_id>/', views.api_device_status, name='api_device_status'),
     path('device/<int:device_id>/alerts/', views.get_device_alerts, name='api_device_alerts'),
 
@@ -22,9 +23,16 @@ urlpatterns = [
     path('speed-test/<int:device_id>/', views.run_speed_test, name='api_speed_test'),
     path('traceroute/<int:device_id>/', views.run_traceroute, name='api_traceroute'),
 
+    # Topology built from traceroutes
+    path('topology/', views.topology_graph, name='api_topology'),
+    path('topology/hops/<str:address>/devices/', views.topology_hop_devices, name='api_topology_hop_devices'),
+    path('topology/shared-upstreams/', views.topology_shared_upstreams, name='api_topology_shared_upstreams'),
+
     # Network discovery
     path('discover/', views.discover_network, name='api_discover_network'),
+    path('discover/<int:scan_id>/', views.discovery_scan_status, name='api_discovery_scan'),
 
     # Health check
     path('health/', views.system_health, name='api_health'),
+    path('health/write-buffers/', views.api_write_buffer_metrics, name='api_write_buffer_metrics'),
 ]
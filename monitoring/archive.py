@@ -0,0 +1,352 @@
+"""
+Columnar cold archive of expired monitoring results
+
+With ARCHIVE_ENABLED, ping and port check results past their history window
+are not simply deleted: each whole UTC day is first written to compressed
+Parquet files, one per day and owner (device or port monitor):
+
+    ARCHIVE_ROOT/ping/day=2026-01-31/device=12.parquet
+    ARCHIVE_ROOT/port/day=2026-01-31/port_monitor=7.parquet
+
+and only then removed from the database, a dropped partition at a time
+when the ping table is partitioned. Reads memory-map the files of the
+requested days and owners only, so long-range reports never touch the OLTP
+database. Requires pyarrow.
+"""
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import groupby
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DAY_FORMAT = '%Y-%m-%d'
+
+
+class ArchiveUnavailable(Exception):
+    """Raised when pyarrow is not installed"""
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ArchiveUnavailable('The cold archive needs pyarrow (pip install pyarrow)') from e
+    return pyarrow
+
+
+class ArchiveKind:
+    """Which model an archive holds and the columns it keeps."""
+
+    def __init__(self, name: str, model_path: str, owner: str, columns: Dict[str, str]):
+        self.name = name
+        self.model_path = model_path
+        self.owner = owner
+        self.columns = columns
+
+    @property
+    def model(self):
+        from django.apps import apps
+        return apps.get_model(self.model_path)
+
+    def schema(self):
+        pa = _pyarrow()
+        types = {
+            'int': pa.int64(),
+            'float': pa.float64(),
+            'bool': pa.bool_(),
+            'string': pa.string(),
+            'timestamp': pa.timestamp('us', tz='UTC'),
+        }
+        return pa.schema([(name, types[kind]) for name, kind in self.columns.items()])
+
+
+KINDS = {
+    'ping': ArchiveKind('ping', 'monitoring.PingResult', 'device_id', {
+        'id': 'int',
+        'device_id': 'int',
+        'timestamp': 'timestamp',
+        'is_reachable': 'bool',
+        'response_time': 'float',
+        'packet_loss': 'float',
+        'packets_sent': 'int',
+        'packets_received': 'int',
+        'min_time': 'float',
+        'max_time': 'float',
+        'avg_time': 'float',
+        'error_message': 'string',
+    }),
+    'port': ArchiveKind('port', 'monitoring.PortCheckResult', 'port_monitor_id', {
+        'id': 'int',
+        'port_monitor_id': 'int',
+        'timestamp': 'timestamp',
+        'is_reachable': 'bool',
+        'response_time': 'float',
+        'error_message': 'string',
+        'http_status_code': 'int',
+        'http_response_size': 'int',
+        'ssl_cert_expiry': 'timestamp',
+    }),
+}
+
+
+def _config():
+    from django.conf import settings
+    return getattr(settings, 'NETWORK_MONITOR', {})
+
+
+def archive_root() -> Path:
+    return Path(_config().get('ARCHIVE_ROOT', 'archive'))
+
+
+def _day(value):
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, value.day, tzinfo=dt_timezone.utc)
+
+
+def day_path(kind: ArchiveKind, day, root: Optional[Path] = None) -> Path:
+    return (root or archive_root()) / kind.name / f"day={day.strftime(DAY_FORMAT)}"
+
+
+def owner_path(kind: ArchiveKind, day, owner_id, root: Optional[Path] = None) -> Path:
+    return day_path(kind, day, root) / f"{kind.owner[:-3]}={owner_id}.parquet"
+
+
+def write_owner_day(kind: ArchiveKind, day, owner_id, rows: List[tuple], root: Optional[Path] = None,
+                    compression: Optional[str] = None) -> int:
+    """
+    Write one owner's rows of one day, merging with an existing file.
+
+    Rows already in the file (same id) are skipped, so a day whose delete
+    was interrupted can be archived again safely. The file is replaced
+    atomically.
+
+    Returns:
+        Number of rows added to the archive
+    """
+    pa = _pyarrow()
+    schema = kind.schema()
+    table = pa.Table.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(zip(*rows), schema)],
+        schema=schema
+    )
+
+    path = owner_path(kind, day, owner_id, root)
+    if path.exists():
+        existing = pa.parquet.read_table(path, memory_map=True)
+        table = table.filter(pa.compute.invert(pa.compute.is_in(table['id'], value_set=existing['id'])))
+        added = table.num_rows
+        table = pa.concat_tables([existing, table]).sort_by([('timestamp', 'ascending')])
+    else:
+        added = table.num_rows
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_suffix('.parquet.tmp')
+    compression = compression or _config().get('ARCHIVE_COMPRESSION', 'zstd')
+    pa.parquet.write_table(table, temporary, compression=compression)
+    os.replace(temporary, path)
+    return added
+
+
+def archive_day(kind: ArchiveKind, day, root: Optional[Path] = None) -> int:
+    """
+    Copy every result of one UTC day into the archive.
+
+    Rows are streamed from the database ordered by owner, so only one
+    owner-day is held in memory at a time.
+
+    Returns:
+        Number of rows added to the archive
+    """
+    rows = kind.model.objects.filter(
+        timestamp__gte=day, timestamp__lt=day + timedelta(days=1)
+    ).order_by(kind.owner, 'timestamp').values_list(*kind.columns).iterator(chunk_size=5000)
+
+    owner_index = list(kind.columns).index(kind.owner)
+    archived = 0
+    for owner_id, owner_rows in groupby(rows, key=lambda row: row[owner_index]):
+        archived += write_owner_day(kind, day, owner_id, list(owner_rows), root)
+    return archived
+
+
+def archive_and_purge(kind_name: str):
+    """
+    Build a retention purge that archives whole days before deleting them.
+
+    The returned callable takes the retention cutoff. Days ending at or
+    before the cutoff are archived and deleted oldest first; the rest of
+    the cutoff's day waits for the next run, so nothing is deleted
+    unarchived.
+    """
+    def purge(cutoff) -> Dict:
+        from .partitions import partitioning_enabled, is_partitioned, drop_expired_partitions
+        from .retention import RetentionPolicy, purge_expired, retention_options
+        from .rollups import ExpiredRollupBackfill
+
+        kind = KINDS[kind_name]
+        model = kind.model
+        options = retention_options(_config())
+        backfill = None
+        if _config().get('RETENTION_ROLLUP_BEFORE_DELETE', True):
+            backfill = ExpiredRollupBackfill.for_pings() if kind_name == 'ping' else ExpiredRollupBackfill.for_ports()
+        partitioned = kind_name == 'ping' and partitioning_enabled() and is_partitioned()
+        started = time.monotonic()
+        stats = {'deleted': 0, 'batches': 0, 'archived': 0, 'archived_days': 0}
+
+        last_day = _day(cutoff)
+        oldest = model.objects.filter(timestamp__lt=last_day).order_by('timestamp').values_list(
+            'timestamp', flat=True
+        ).first()
+        day = _day(oldest) if oldest else last_day
+
+        while day < last_day:
+            end = day + timedelta(days=1)
+            stats['archived'] += archive_day(kind, day)
+            stats['archived_days'] += 1
+
+            if partitioned:
+                stats['deleted'] += drop_expired_partitions(end)['deleted']
+            # Whatever no dropped partition covered goes row by row
+            deleted = purge_expired(
+                RetentionPolicy(kind_name, model, end, filters={'timestamp__gte': day}, rollup=backfill),
+                **options
+            )
+            stats['deleted'] += deleted['deleted']
+            stats['batches'] += deleted['batches']
+            day = end
+
+        seconds = time.monotonic() - started
+        stats['seconds'] = round(seconds, 3)
+        stats['rows_per_sec'] = round(stats['deleted'] / seconds, 1) if seconds > 0 else 0.0
+        if stats['archived']:
+            logger.info(f"Archived {stats['archived']} {kind_name} results from {stats['archived_days']} days "
+                        f"to {archive_root()}")
+        return stats
+
+    return purge
+
+
+def prune_archive(now=None, root: Optional[Path] = None) -> int:
+    """
+    Remove archived days older than ARCHIVE_RETENTION_DAYS.
+
+    Returns:
+        Number of day directories removed
+    """
+    from django.utils import timezone
+
+    cutoff = (now or timezone.now()) - timedelta(days=_config().get('ARCHIVE_RETENTION_DAYS', 730))
+    removed = 0
+    for kind in KINDS.values():
+        for path, day in _archived_days(kind, root):
+            if day + timedelta(days=1) <= cutoff:
+                shutil.rmtree(path)
+                removed += 1
+    return removed
+
+
+def _archived_days(kind: ArchiveKind, root: Optional[Path] = None):
+    base = (root or archive_root()) / kind.name
+    if not base.is_dir():
+        return
+    for path in sorted(base.iterdir()):
+        try:
+            day = datetime.strptime(path.name[len('day='):], DAY_FORMAT).replace(tzinfo=dt_timezone.utc)
+        except ValueError:
+            continue
+        yield path, day
+
+
+def read_archive(kind_name: str, start, end, owner_ids: Optional[Iterable[int]] = None,
+                 columns: Optional[List[str]] = None, root: Optional[Path] = None):
+    """
+    Read archived results with start <= timestamp < end.
+
+    Only the files of the days in range (and of `owner_ids`, if given) are
+    opened, each memory-mapped.
+
+    Args:
+        kind_name: 'ping' or 'port'
+        start: Start of the range (aware datetime)
+        end: End of the range (aware datetime)
+        owner_ids: Device or port monitor ids to read, or None for all
+        columns: Columns to read, or None for all
+        root: Archive directory, defaults to ARCHIVE_ROOT
+
+    Returns:
+        pyarrow.Table sorted by owner and timestamp
+    """
+    pa = _pyarrow()
+    kind = KINDS[kind_name]
+    if columns is not None:
+        columns = list(dict.fromkeys([kind.owner, 'timestamp', *columns]))
+
+    tables = []
+    day = _day(start)
+    while day < end:
+        directory = day_path(kind, day, root)
+        if owner_ids is None:
+            paths = sorted(directory.glob('*.parquet')) if directory.is_dir() else []
+        else:
+            paths = [path for path in (owner_path(kind, day, owner_id, root) for owner_id in owner_ids)
+                     if path.exists()]
+        for path in paths:
+            tables.append(pa.parquet.read_table(path, columns=columns, memory_map=True))
+        day += timedelta(days=1)
+
+    if not tables:
+        schema = kind.schema()
+        return schema.empty_table() if columns is None else pa.schema(
+            [schema.field(name) for name in columns]
+        ).empty_table()
+
+    table = pa.concat_tables(tables)
+    start_scalar = pa.scalar(start, type=table.schema.field('timestamp').type)
+    end_scalar = pa.scalar(end, type=table.schema.field('timestamp').type)
+    in_range = pa.compute.and_(
+        pa.compute.greater_equal(table['timestamp'], start_scalar),
+        pa.compute.less(table['timestamp'], end_scalar),
+    )
+    return table.filter(in_range).sort_by([(kind.owner, 'ascending'), ('timestamp', 'ascending')])
+
+
+def archived_series(kind_name: str, owner_id: int, start, end, bucket_seconds: int = 3600,
+                    root: Optional[Path] = None) -> List[Dict]:
+    """
+    Aggregate one owner's archived results into fixed-size time buckets.
+
+    Returns:
+        List of dicts with bucket, samples, uptime_percentage, avg_latency
+        and max_latency, ordered by bucket
+    """
+    pa = _pyarrow()
+    table = read_archive(kind_name, start, end, [owner_id], ['is_reachable', 'response_time'], root)
+    if not table.num_rows:
+        return []
+
+    buckets = pa.compute.floor_temporal(table['timestamp'], multiple=bucket_seconds, unit='second')
+    grouped = pa.table({
+        'bucket': buckets,
+        'up': pa.compute.cast(table['is_reachable'], pa.int64()),
+        'response_time': table['response_time'],
+    }).group_by('bucket').aggregate([
+        ('up', 'count'), ('up', 'sum'), ('response_time', 'mean'), ('response_time', 'max'),
+    ]).sort_by('bucket')
+
+    series = []
+    for row in grouped.to_pylist():
+        samples = row['up_count']
+        series.append({
+            'bucket': row['bucket'],
+            'samples': samples,
+            'uptime_percentage': round(row['up_sum'] / samples * 100, 2) if samples else None,
+            'avg_latency': round(row['response_time_mean'], 2) if row['response_time_mean'] is not None else None,
+            'max_latency': round(row['response_time_max'], 2) if row['response_time_max'] is not None else None,
+        })
+    return series
@@ -0,0 +1,202 @@
+"""
+Cooldown cache that deduplicates alerts by (device, alert type)
+
+The first alert for a key claims the key for `ttl` seconds, and any alert
+for the same key within that time is dropped. So deciding whether an alert
+is a duplicate no longer needs a query against recent Alert rows. Claims
+are kept in a bounded in-process LRU. With Redis, each claim is also a
+SET NX EX key, so every worker process agrees on it. The local LRU
+remembers keys already known to be cooling down, so repeats during an
+outage skip the Redis round trip too.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Seconds a cooldown key stays claimed until its alert commits
+PENDING_CLAIM_SECONDS = 60
+
+
+class CooldownCache:
+    """Bounded LRU of keys in cooldown, each expiring `ttl` seconds after its claim"""
+
+    def __init__(self, ttl: float = 900.0, maxsize: int = 100000, clock=time.monotonic):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.clock = clock
+        self._expiry = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._expiry)
+
+    def _cooling(self, key, now) -> bool:
+        expires = self._expiry.get(key)
+        if expires is None:
+            return False
+        if expires <= now:
+            del self._expiry[key]
+            return False
+        self._expiry.move_to_end(key)
+        return True
+
+    def _remember(self, key, expires):
+        self._expiry[key] = expires
+        self._expiry.move_to_end(key)
+        while len(self._expiry) > self.maxsize:
+            self._expiry.popitem(last=False)
+
+    def cooling(self, keys: Iterable[Hashable]) -> Set:
+        """Return the keys that are still cooling down."""
+        with self._lock:
+            now = self.clock()
+            return {key for key in keys if self._cooling(key, now)}
+
+    def remember(self, key: Hashable, ttl: Optional[float] = None):
+        """Put a key in cooldown for `ttl` seconds (the cache's ttl by default)."""
+        with self._lock:
+            self._remember(key, self.clock() + (self.ttl if ttl is None else ttl))
+
+    def claim_many(self, keys: Iterable[Hashable], ttl: Optional[float] = None) -> List:
+        """
+        Claim every key that is not cooling down.
+
+        Args:
+            keys: Keys to claim
+            ttl: Seconds the claims last, the cache's ttl by default; see extend()
+
+        Returns:
+            The claimed keys in order. A key repeated in `keys` is claimed once.
+        """
+        claimed = []
+        with self._lock:
+            now = self.clock()
+            for key in keys:
+                if self._cooling(key, now):
+                    continue
+                self._remember(key, now + (self.ttl if ttl is None else ttl))
+                claimed.append(key)
+        return claimed
+
+    def extend(self, keys: Iterable[Hashable], ttl: Optional[float] = None):
+        """Restart the cooldown of claimed keys, e.g. to make a short provisional claim final."""
+        with self._lock:
+            expires = self.clock() + (self.ttl if ttl is None else ttl)
+            for key in keys:
+                self._remember(key, expires)
+
+    def release(self, keys: Iterable[Hashable]):
+        """End the cooldown of keys whose alerts were never written."""
+        with self._lock:
+            for key in keys:
+                self._expiry.pop(key, None)
+
+    def claim(self, key: Hashable) -> bool:
+        """Claim a single key; False when it is cooling down."""
+        return bool(self.claim_many([key]))
+
+
+class RedisCooldownCache:
+    """Cooldown claims shared by every worker through Redis SET NX EX keys"""
+
+    def __init__(self, url: str, ttl: float = 900.0, maxsize: int = 100000,
+                 prefix: str = 'network_monitor:cooldown'):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_connect_timeout=2)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.local = CooldownCache(ttl=ttl, maxsize=maxsize)
+
+    def _name(self, key) -> str:
+        parts = key if isinstance(key, tuple) else (key,)
+        return ':'.join([self.prefix] + [str(part) for part in parts])
+
+    def claim_many(self, keys: Iterable[Hashable], ttl: Optional[float] = None) -> List:
+        """Claim every key no worker has claimed within the ttl; see CooldownCache.claim_many."""
+        ttl = self.ttl if ttl is None else ttl
+        keys = list(dict.fromkeys(keys))
+        cooling = self.local.cooling(keys)
+        candidates = [key for key in keys if key not in cooling]
+        if not candidates:
+            return []
+
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for key in candidates:
+                pipe.set(self._name(key), 1, nx=True, ex=max(1, int(ttl)))
+            outcomes = pipe.execute()
+
+            claimed = [key for key, ok in zip(candidates, outcomes) if ok]
+            taken = [key for key, ok in zip(candidates, outcomes) if not ok]
+
+            # Keys claimed by another worker cool down locally for what is left of their ttl
+            if taken:
+                pipe = self.client.pipeline(transaction=False)
+                for key in taken:
+                    pipe.pttl(self._name(key))
+                for key, remaining in zip(taken, pipe.execute()):
+                    if remaining and remaining > 0:
+                        self.local.remember(key, remaining / 1000.0)
+        except Exception as e:
+            logger.warning(f"Cooldown Redis unavailable ({e}), deduplicating in-process only")
+            return self.local.claim_many(candidates, ttl=ttl)
+
+        for key in claimed:
+            self.local.remember(key, ttl)
+        return claimed
+
+    def extend(self, keys: Iterable[Hashable], ttl: Optional[float] = None):
+        """Restart the cooldown of claimed keys; see CooldownCache.extend."""
+        ttl = self.ttl if ttl is None else ttl
+        keys = list(keys)
+        self.local.extend(keys, ttl)
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for key in keys:
+                pipe.set(self._name(key), 1, ex=max(1, int(ttl)))
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Cooldown Redis unavailable ({e}), extending in-process only")
+
+    def release(self, keys: Iterable[Hashable]):
+        """End the cooldown of keys in every worker; see CooldownCache.release."""
+        keys = list(keys)
+        self.local.release(keys)
+        if not keys:
+            return
+        try:
+            self.client.delete(*[self._name(key) for key in keys])
+        except Exception as e:
+            logger.warning(f"Cooldown Redis unavailable ({e}), releasing in-process only")
+
+    def claim(self, key: Hashable) -> bool:
+        """Claim a single key; False when it is cooling down."""
+        return bool(self.claim_many([key]))
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cooldown_cache(name: str, url: Optional[str] = None, ttl: float = 900.0,
+                       maxsize: int = 100000):
+    """Return the process-wide cooldown cache called `name`, Redis-backed when `url` is reachable."""
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            if url:
+                try:
+                    cache = RedisCooldownCache(url, ttl=ttl, maxsize=maxsize, prefix=f'network_monitor:{name}')
+                    cache.client.ping()
+                except Exception as e:
+                    logger.warning(f"Cooldown Redis unavailable ({e}), using in-process cache")
+                    cache = None
+            if cache is None:
+                cache = CooldownCache(ttl=ttl, maxsize=maxsize)
+            _caches[name] = cache
+        return cache
@@ -0,0 +1,181 @@
+"""
+Maintenance of the per-device latest-state snapshot
+
+DeviceState rows are upserted as probe results are written so that the
+live monitor and status APIs can render every device from one query.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from devices.models import Device
+from .models import DeviceState, PingResult, SpeedTestResult
+from .rollups import ping_summaries_by_device
+from .events import latency_bucket, publish_on_commit
+
+logger = logging.getLogger(__name__)
+
+PING_FIELDS = ['last_ping_at', 'last_ping_reachable', 'last_response_time', 'last_packet_loss', 'updated_at']
+SPEED_FIELDS = ['last_speed_at', 'last_speed_successful', 'last_download_speed', 'last_upload_speed', 'updated_at']
+STATS_FIELDS = ['uptime_24h', 'avg_response_time_24h', 'stats_updated_at']
+
+
+def _stats_interval():
+    config = getattr(settings, 'NETWORK_MONITOR', {})
+    return timedelta(seconds=config.get('DEVICE_STATE_STATS_INTERVAL', 300))
+
+
+def _upsert(states, fields):
+    """Insert or update DeviceState rows, touching only `fields`."""
+    if states:
+        DeviceState.objects.bulk_create(
+            states,
+            update_conflicts=True,
+            unique_fields=['device'],
+            update_fields=fields
+        )
+
+
+def _apply_stats(state, summary, now):
+    state.uptime_24h = summary.get('uptime_percentage')
+    state.avg_response_time_24h = summary.get('avg_latency')
+    state.stats_updated_at = now
+
+
+def record_ping_states(results, now=None):
+    """
+    Update the latest ping of each device from saved PingResult rows.
+
+    The rolling 24h uptime and latency are recomputed from the rollups for
+    devices whose statistics are older than DEVICE_STATE_STATS_INTERVAL,
+    with one grouped query for the whole batch. Devices whose latency
+    bucket changed are published to the dashboard event stream.
+    """
+    now = now or timezone.now()
+    latest = {}
+    for result in results:
+        timestamp = result.timestamp or now
+        current = latest.get(result.device_id)
+        if current is None or timestamp >= (current.timestamp or now):
+            latest[result.device_id] = result
+    if not latest:
+        return 0
+
+    fresh_since = now - _stats_interval()
+    previous = {
+        device_id: (stats_updated_at, latency_bucket(reachable, response_time) if reachable is not None else None)
+        for device_id, stats_updated_at, reachable, response_time in DeviceState.objects.filter(
+            device_id__in=latest.keys()
+        ).values_list('device_id', 'stats_updated_at', 'last_ping_reachable', 'last_response_time')
+    }
+    fresh = {
+        device_id for device_id, (stats_updated_at, _bucket) in previous.items()
+        if stats_updated_at and stats_updated_at >= fresh_since
+    }
+    stale = [device_id for device_id in latest if device_id not in fresh]
+    summaries = ping_summaries_by_device(now - timedelta(hours=24), now, device_ids=stale) if stale else {}
+
+    ping_only, with_stats, events = [], [], []
+    for device_id, result in latest.items():
+        state = DeviceState(
+            device_id=device_id,
+            last_ping_at=result.timestamp or now,
+            last_ping_reachable=result.is_reachable,
+            last_response_time=result.response_time,
+            last_packet_loss=result.packet_loss,
+            updated_at=now
+        )
+        if device_id in fresh:
+            ping_only.append(state)
+        else:
+            _apply_stats(state, summaries.get(device_id, {}), now)
+            with_stats.append(state)
+
+        bucket = latency_bucket(result.is_reachable, result.response_time)
+        previous_bucket = previous[device_id][1] if device_id in previous else None
+        if bucket != previous_bucket:
+            events.append(('latency', {
+                'device_id': device_id,
+                'bucket': bucket,
+                'previous': previous_bucket,
+                'response_time': result.response_time,
+                'uptime_24h': state.uptime_24h if device_id not in fresh else None,
+                'timestamp': state.last_ping_at.isoformat(),
+            }))
+
+    _upsert(ping_only, PING_FIELDS)
+    _upsert(with_stats, PING_FIELDS + STATS_FIELDS)
+    publish_on_commit(events)
+    return len(latest)
+
+
+def record_speed_state(result, now=None):
+    """Update the latest speed test of a device from a saved SpeedTestResult."""
+    now = now or timezone.now()
+    _upsert([DeviceState(
+        device_id=result.device_id,
+        last_speed_at=result.timestamp or now,
+        last_speed_successful=result.is_successful,
+        last_download_speed=result.download_speed,
+        last_upload_speed=result.upload_speed,
+        updated_at=now
+    )], SPEED_FIELDS)
+
+
+def refresh_device_states(device_ids=None, chunk_size=1000):
+    """
+    Rebuild DeviceState rows from the latest raw results and the rollups.
+
+    Used to backfill devices that have results but no state yet, and to
+    bring the 24h statistics of devices that are no longer probed up to date.
+    """
+    now = timezone.now()
+    devices = Device.objects.all() if device_ids is None else Device.objects.filter(id__in=device_ids)
+    ids = list(devices.values_list('id', flat=True))
+
+    latest_ping = PingResult.objects.filter(device=OuterRef('pk')).order_by('-timestamp')
+    latest_speed = SpeedTestResult.objects.filter(device=OuterRef('pk')).order_by('-timestamp')
+
+    refreshed = 0
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        summaries = ping_summaries_by_device(now - timedelta(hours=24), now, device_ids=chunk)
+        rows = Device.objects.filter(id__in=chunk).annotate(
+            ping_at=Subquery(latest_ping.values('timestamp')[:1]),
+            ping_reachable=Subquery(latest_ping.values('is_reachable')[:1]),
+            ping_response_time=Subquery(latest_ping.values('response_time')[:1]),
+            ping_packet_loss=Subquery(latest_ping.values('packet_loss')[:1]),
+            speed_at=Subquery(latest_speed.values('timestamp')[:1]),
+            speed_successful=Subquery(latest_speed.values('is_successful')[:1]),
+            speed_download=Subquery(latest_speed.values('download_speed')[:1]),
+            speed_upload=Subquery(latest_speed.values('upload_speed')[:1]),
+        ).values(
+            'id', 'ping_at', 'ping_reachable', 'ping_response_time', 'ping_packet_loss',
+            'speed_at', 'speed_successful', 'speed_download', 'speed_upload'
+        )
+
+        states = []
+        for row in rows:
+            state = DeviceState(
+                device_id=row['id'],
+                last_ping_at=row['ping_at'],
+                last_ping_reachable=row['ping_reachable'],
+                last_response_time=row['ping_response_time'],
+                last_packet_loss=row['ping_packet_loss'],
+                last_speed_at=row['speed_at'],
+                last_speed_successful=row['speed_successful'],
+                last_download_speed=row['speed_download'],
+                last_upload_speed=row['speed_upload'],
+                updated_at=now
+            )
+            _apply_stats(state, summaries.get(row['id'], {}), now)
+            states.append(state)
+
+        _upsert(states, PING_FIELDS + SPEED_FIELDS + STATS_FIELDS)
+        refreshed += len(states)
+
+    logger.info(f"Refreshed state of {refreshed} devices")
+    return refreshed
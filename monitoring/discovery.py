@@ -0,0 +1,445 @@
+"""
+Asyncio network and service discovery engines
+
+Every address of a range up to a /16 is probed with a single ICMP echo
+over the shared socket of the ICMP engine; addresses that do not answer
+are tried with TCP connects on a few common ports, where both an accepted
+connection and a refusal prove the host is up. All probes share one rate
+limit. The sweep runs on an event loop in a background thread and hands
+hits to the caller in small batches as they arrive, so a Celery task can
+write them to the database while the sweep is still running.
+
+Service discovery works the same way one level down: the candidate ports
+of many hosts are connected to concurrently and each host's open ports
+are handed over as soon as that host is done.
+"""
+import asyncio
+import errno
+import ipaddress
+import logging
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .icmp import AsyncIcmpPinger, IcmpUnavailable
+from .tcp import AsyncTcpChecker
+
+logger = logging.getLogger(__name__)
+
+# SSH, Telnet, HTTP, HTTPS, SMB, RDP: one of them is open or actively refused on most hosts
+DISCOVERY_PORTS = (22, 23, 80, 443, 445, 3389)
+
+# A /16
+MAX_DISCOVERY_HOSTS = 65536
+
+# Errors meaning this process ran out of file descriptors, not that a host is down
+DESCRIPTOR_ERRNOS = (errno.EMFILE, errno.ENFILE)
+
+# Descriptors kept free for the database, the broker and log files during a sweep
+DESCRIPTOR_RESERVE = 128
+
+
+def descriptor_budget(reserve: int = DESCRIPTOR_RESERVE) -> Optional[int]:
+    """Return how many sockets this process may open beside `reserve`, or None without a limit."""
+    try:
+        import resource
+    except ImportError:
+        # Windows has no RLIMIT_NOFILE
+        return None
+    soft, _hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return None
+    return max(1, soft - reserve)
+
+
+def discovery_hosts(subnet: str, max_hosts: int = MAX_DISCOVERY_HOSTS) -> Tuple[int, Iterator[str]]:
+    """
+    Parse a subnet into the addresses to probe.
+
+    Args:
+        subnet: IPv4 network in CIDR notation
+        max_hosts: Largest number of addresses accepted
+
+    Returns:
+        (count, addresses): the number of addresses and a lazy iterator over them
+
+    Raises:
+        ValueError: If the subnet is not IPv4 or is larger than max_hosts
+    """
+    network = ipaddress.ip_network(subnet, strict=False)
+    if network.version != 4:
+        raise ValueError(f"Only IPv4 subnets can be swept, got {subnet}")
+    # Network and broadcast addresses are skipped except on /31 and /32
+    count = network.num_addresses if network.prefixlen >= 31 else network.num_addresses - 2
+    if count > max_hosts:
+        raise ValueError(f"{subnet} has {count} addresses, more than the limit of {max_hosts}")
+    return count, (str(ip) for ip in network.hosts())
+
+
+class RateLimiter:
+    """Pace events on the running event loop to at most `rate` per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        if self._next < now:
+            self._next = now
+        delay = self._next - now
+        self._next += self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class NetworkSweeper:
+    """
+    Find the live hosts among many addresses.
+
+    A fixed pool of workers pulls addresses from the input, so memory and
+    open sockets stay bounded however large the range is. ICMP probes and
+    TCP connects both wait on one RateLimiter. A dead address holds its
+    worker for a full timeout, so max_in_flight should be at least
+    max_rate * timeout for the rate limit to be reached.
+
+    Each worker may hold one socket per fallback port, so the connects in
+    flight are also capped by the process's open files limit. Running out
+    of descriptors anyway fails the sweep instead of reporting the hosts
+    it could not probe as down.
+    """
+
+    def __init__(self, timeout: float = 1.0, ports: Sequence[int] = DISCOVERY_PORTS,
+                 max_rate: int = 2000, max_in_flight: int = 2048, use_icmp: bool = True):
+        self.timeout = timeout
+        self.ports = tuple(ports)
+        self.max_rate = max_rate
+        self.max_in_flight = max_in_flight
+        self.use_icmp = use_icmp
+        self.scanned = 0
+        self.cancelled = False
+        self._limiter = None
+        self._pinger = None
+        self._sockets = None
+
+    async def _icmp_probe(self, address: str) -> Optional[Dict]:
+        await self._limiter.wait()
+        result = await self._pinger.ping(address, timeout=self.timeout, count=1)
+        if not result['is_reachable']:
+            return None
+        return {'method': 'icmp', 'port': None, 'response_time': result['response_time']}
+
+    async def _tcp_probe(self, address: str, port: int) -> Optional[Dict]:
+        async with self._sockets:
+            await self._limiter.wait()
+            started = time.perf_counter()
+            try:
+                _reader, writer = await asyncio.wait_for(asyncio.open_connection(address, port), self.timeout)
+            except ConnectionRefusedError:
+                # A RST comes from the host itself, so it is up even with the port closed
+                pass
+            except (asyncio.TimeoutError, OSError) as e:
+                if getattr(e, 'errno', None) in DESCRIPTOR_ERRNOS:
+                    raise
+                return None
+            else:
+                writer.close()
+                try:
+                    await writer.wait_closed()
+                except OSError:
+                    pass
+        return {
+            'method': 'tcp',
+            'port': port,
+            'response_time': round((time.perf_counter() - started) * 1000, 3),
+        }
+
+    async def _tcp_fallback(self, address: str) -> Optional[Dict]:
+        """Connect to all ports at once and stop at the first that answers."""
+        probes = [asyncio.ensure_future(self._tcp_probe(address, port)) for port in self.ports]
+        try:
+            for probe in asyncio.as_completed(probes):
+                hit = await probe
+                if hit:
+                    return hit
+            return None
+        finally:
+            for probe in probes:
+                probe.cancel()
+
+    async def probe(self, address: str) -> Optional[Dict]:
+        """
+        Probe one address.
+
+        Returns:
+            Hit dictionary with ip, reachable, hostname, method, port and
+            response_time, or None if the address did not answer
+        """
+        hit = None
+        if self._pinger is not None:
+            hit = await self._icmp_probe(address)
+        if hit is None and self.ports:
+            hit = await self._tcp_fallback(address)
+        if hit is None:
+            return None
+        return {'ip': address, 'reachable': True, 'hostname': None, **hit}
+
+    async def sweep(self, addresses: Iterable[str], on_hit):
+        """
+        Probe every address, calling `on_hit(hit)` for each host that answers.
+
+        Args:
+            addresses: IPv4 addresses, consumed lazily
+            on_hit: Called on the event loop with each hit dictionary
+        """
+        self._limiter = RateLimiter(self.max_rate)
+        addresses = iter(addresses)
+
+        max_sockets = self.max_in_flight * max(1, len(self.ports))
+        budget = descriptor_budget()
+        if budget is not None and budget < max_sockets:
+            logger.info(f"Discovery limited to {budget} connects in flight by the open files limit")
+            max_sockets = budget
+        self._sockets = asyncio.Semaphore(max_sockets)
+
+        if self.use_icmp:
+            # The sweep's own limiter paces the pinger, which must not add a second throttle
+            pinger = AsyncIcmpPinger(timeout=self.timeout, count=1, max_rate=10 ** 9,
+                                     max_in_flight=self.max_in_flight)
+            try:
+                pinger.open()
+                self._pinger = pinger
+            except IcmpUnavailable as e:
+                logger.warning(f"ICMP unavailable for discovery, using TCP connects only: {e}")
+
+        async def worker():
+            for address in addresses:
+                if self.cancelled:
+                    return
+                try:
+                    hit = await self.probe(address)
+                except OSError as e:
+                    if e.errno in DESCRIPTOR_ERRNOS:
+                        logger.error(f"Discovery ran out of file descriptors at {address}: {e}")
+                        raise OSError(e.errno, f"Out of file descriptors; lower DISCOVERY_MAX_IN_FLIGHT "
+                                               f"or raise the open files limit ({e.strerror})")
+                    logger.debug(f"Discovery probe of {address} failed: {e}")
+                    hit = None
+                except Exception as e:
+                    logger.debug(f"Discovery probe of {address} failed: {e}")
+                    hit = None
+                self.scanned += 1
+                if hit:
+                    on_hit(hit)
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.max_in_flight)))
+        finally:
+            if self._pinger is not None:
+                self._pinger.close()
+                self._pinger = None
+
+
+_DONE = object()
+
+
+def _stream_batches(scanner, run, batch_size: int, flush_interval: float,
+                    thread_name: str) -> Iterator[List[Dict]]:
+    """
+    Run `run(emit)` on an event loop in a background thread, yielding what it emits in batches.
+
+    A batch is yielded when it holds batch_size items or flush_interval
+    seconds have passed, whichever comes first, so callers can report
+    progress even while nothing is emitted. Closing the generator sets
+    `scanner.cancelled` and waits for the loop to finish.
+    """
+    items = queue.Queue()
+    errors = []
+
+    def target():
+        try:
+            asyncio.run(run(items.put))
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            items.put(_DONE)
+
+    thread = threading.Thread(target=target, name=thread_name, daemon=True)
+    thread.start()
+
+    batch = []
+    deadline = time.monotonic() + flush_interval
+    done = False
+    try:
+        while not done:
+            try:
+                item = items.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            if item is _DONE:
+                done = True
+            elif item is not None:
+                batch.append(item)
+
+            if done or len(batch) >= batch_size or time.monotonic() >= deadline:
+                if errors:
+                    raise errors[0]
+                yield batch
+                batch = []
+                deadline = time.monotonic() + flush_interval
+    finally:
+        scanner.cancelled = True
+        thread.join()
+
+
+def sweep(addresses: Iterable[str], batch_size: int = 100, flush_interval: float = 1.0,
+          **options) -> Iterator[Tuple[List[Dict], int]]:
+    """
+    Sweep addresses on a background event loop, yielding hits as they arrive.
+
+    Args:
+        addresses: IPv4 addresses to probe
+        batch_size: Most hits per yielded batch
+        flush_interval: Longest wait in seconds between batches
+        **options: NetworkSweeper arguments
+
+    Returns:
+        Iterator of (hits, scanned) tuples, where scanned is the number of
+        addresses probed so far
+    """
+    sweeper = NetworkSweeper(**options)
+    batches = _stream_batches(
+        sweeper, lambda emit: sweeper.sweep(addresses, emit), batch_size, flush_interval, 'network-discovery'
+    )
+    for hits in batches:
+        yield hits, sweeper.scanned
+
+
+def parse_ports(spec: str, max_ports: int = 1024) -> List[int]:
+    """
+    Parse a port list such as "22,80,8000-8100".
+
+    Raises:
+        ValueError: If a port is out of range or the list has more than max_ports ports
+    """
+    ports = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, _sep, last = part.partition('-')
+        try:
+            first = int(first)
+            last = int(last) if last else first
+        except ValueError:
+            raise ValueError(f"Invalid port range '{part}'")
+        if not 1 <= first <= last <= 65535:
+            raise ValueError(f"Invalid port range '{part}'")
+        ports.update(range(first, last + 1))
+        if len(ports) > max_ports:
+            raise ValueError(f"More than {max_ports} ports requested")
+    return sorted(ports)
+
+
+class ServiceScanner:
+    """
+    Find the open TCP ports of many hosts.
+
+    Up to max_hosts hosts are scanned at once, each with all of its ports
+    in parallel through one AsyncTcpChecker, so a firewalled host costs one
+    timeout rather than one per port. A host's result is emitted as soon
+    as all of its ports are done.
+    """
+
+    def __init__(self, timeout: float = 3.0, max_concurrency: int = 1000,
+                 per_host_limit: int = 64, max_hosts: int = 256):
+        self.checker = AsyncTcpChecker(timeout=timeout, max_concurrency=max_concurrency,
+                                       per_host_limit=per_host_limit)
+        self.max_hosts = max_hosts
+        self.scanned = 0
+        self.cancelled = False
+
+    async def scan_host(self, host: str, ports: Sequence[int]) -> List[int]:
+        """Return the ports of `host` that accept a connection."""
+        results = await self.checker.check_many((host, port) for port in ports)
+        return sorted(port for (_host, port), result in results.items() if result['is_reachable'])
+
+    async def scan(self, targets: Iterable[Tuple], on_result):
+        """
+        Scan every target, calling `on_result(result)` as each host finishes.
+
+        Args:
+            targets: (key, host, ports) tuples, consumed lazily; key is
+                passed through to identify the host, such as a device id
+            on_result: Called on the event loop with a dictionary holding
+                key, host and open_ports
+        """
+        targets = iter(targets)
+
+        async def worker():
+            for key, host, ports in targets:
+                if self.cancelled:
+                    return
+                try:
+                    open_ports = await self.scan_host(host, ports)
+                except Exception as e:
+                    logger.debug(f"Service scan of {host} failed: {e}")
+                    open_ports = []
+                self.scanned += 1
+                on_result({'key': key, 'host': host, 'open_ports': open_ports})
+
+        await asyncio.gather(*(worker() for _ in range(self.max_hosts)))
+
+
+def scan_services(targets: Iterable[Tuple], batch_size: int = 100, flush_interval: float = 1.0,
+                  **options) -> Iterator[Tuple[List[Dict], int]]:
+    """
+    Scan the ports of many hosts on a background event loop, yielding results as hosts finish.
+
+    Args:
+        targets: (key, host, ports) tuples
+        batch_size: Most host results per yielded batch
+        flush_interval: Longest wait in seconds between batches
+        **options: ServiceScanner arguments
+
+    Returns:
+        Iterator of (results, scanned) tuples, where scanned is the number
+        of hosts finished so far
+    """
+    scanner = ServiceScanner(**options)
+    batches = _stream_batches(
+        scanner, lambda emit: scanner.scan(targets, emit), batch_size, flush_interval, 'service-discovery'
+    )
+    for results in batches:
+        yield results, scanner.scanned
+
+
+def reverse_lookup(address: str) -> str:
+    """Return the PTR name of an address, or an empty string."""
+    try:
+        return socket.gethostbyaddr(address)[0]
+    except (OSError, UnicodeError):
+        return ''
+
+
+def resolve_hostnames(addresses: Iterable[str], max_workers: int = 64) -> Dict[str, str]:
+    """
+    Reverse-resolve many addresses concurrently.
+
+    The system resolver is blocking, so lookups run on a thread pool.
+
+    Returns:
+        Dictionary mapping each address that has a PTR record to its name
+    """
+    addresses = list(dict.fromkeys(addresses))
+    if not addresses:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(addresses))) as executor:
+        names = executor.map(reverse_lookup, addresses)
+        return {address: name for address, name in zip(addresses, names) if name}
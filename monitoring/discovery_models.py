@@ -0,0 +1,81 @@
+"""
+Network discovery models
+"""
+from django.db import models
+
+
+class DiscoveryStatus(models.TextChoices):
+    """Discovery scan status choices"""
+    PENDING = 'pending', 'Pending'
+    RUNNING = 'running', 'Running'
+    COMPLETED = 'completed', 'Completed'
+    FAILED = 'failed', 'Failed'
+
+
+class DiscoveryMethod(models.TextChoices):
+    """How a discovered host answered"""
+    ICMP = 'icmp', 'ICMP Echo'
+    TCP = 'tcp', 'TCP Connect'
+
+
+class DiscoveryScan(models.Model):
+    """Model for one sweep of a subnet"""
+
+    subnet = models.CharField(max_length=50, help_text="Swept network in CIDR notation")
+    status = models.CharField(max_length=20, choices=DiscoveryStatus.choices, default=DiscoveryStatus.PENDING)
+    task_id = models.CharField(max_length=255, blank=True, help_text="Celery task running the sweep")
+
+    # Progress
+    hosts_total = models.PositiveIntegerField(default=0, help_text="Number of addresses to probe")
+    hosts_scanned = models.PositiveIntegerField(default=0, help_text="Number of addresses probed so far")
+    hosts_found = models.PositiveIntegerField(default=0, help_text="Number of hosts that answered")
+
+    # Error information
+    error_message = models.TextField(blank=True, help_text="Error message if the sweep failed")
+
+    # Metadata
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Discovery Scan'
+        verbose_name_plural = 'Discovery Scans'
+
+    def __str__(self):
+        return f"Discovery of {self.subnet} - {self.get_status_display()}"
+
+    @property
+    def progress_percentage(self):
+        """Return the share of addresses probed so far"""
+        if self.hosts_total == 0:
+            return 0.0
+        return round((self.hosts_scanned / self.hosts_total) * 100, 2)
+
+
+class DiscoveredHost(models.Model):
+    """Model for a host that answered a discovery sweep"""
+
+    scan = models.ForeignKey(DiscoveryScan, on_delete=models.CASCADE, related_name='hosts')
+    ip_address = models.GenericIPAddressField(protocol='IPv4')
+    hostname = models.CharField(max_length=255, blank=True, help_text="Reverse DNS name")
+
+    # How the host answered
+    method = models.CharField(max_length=10, choices=DiscoveryMethod.choices)
+    port = models.PositiveIntegerField(null=True, blank=True, help_text="TCP port that answered")
+    response_time = models.FloatField(null=True, blank=True, help_text="Response time in milliseconds")
+
+    # Metadata
+    discovered_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['scan', 'ip_address']
+        verbose_name = 'Discovered Host'
+        verbose_name_plural = 'Discovered Hosts'
+        constraints = [
+            models.UniqueConstraint(fields=['scan', 'ip_address'], name='unique_discovered_host'),
+        ]
+
+    def __str__(self):
+        return f"{self.ip_address} ({self.get_method_display()})"
@@ -0,0 +1,211 @@
+"""
+Dashboard event bus for pushing monitoring deltas to connected browsers
+
+Monitoring tasks publish small delta events (status transitions, latency
+bucket changes, new alerts) once per change. Events are appended to a
+capped Redis stream, which every Server-Sent Events connection tails from
+its own last-seen id, so viewers never trigger database queries. When
+Redis is not configured an in-process ring buffer is used instead, which
+is enough for a single-process development server.
+
+When Redis is configured but unreachable, events published by the
+workers cannot reach any browser. That is logged as an error and Redis
+is tried again every EVENT_STREAM_RETRY_SECONDS rather than settling on
+the in-process buffer for the life of the process.
+
+Every open stream holds its server worker for up to
+EVENT_STREAM_MAX_SECONDS, so the stream needs gevent workers or an ASGI
+server; a few open dashboards would take every synchronous worker.
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency buckets shown on the live monitor
+LATENCY_BUCKETS = ((50, 'good'), (200, 'fair'), (1000, 'slow'))
+
+
+def latency_bucket(is_reachable, response_time):
+    """Return the display bucket for a ping result."""
+    if not is_reachable:
+        return 'down'
+    if response_time is None:
+        return 'unknown'
+    for upper, name in LATENCY_BUCKETS:
+        if response_time < upper:
+            return name
+    return 'critical'
+
+
+def _parse_id(event_id):
+    """Turn a stream id ('1700000000000-0' or '42') into a comparable tuple."""
+    return tuple(int(part) for part in str(event_id).split('-'))
+
+
+class LocalEventBus:
+    """In-process ring buffer of events, shared by all threads of one process"""
+
+    def __init__(self, maxlen=10000):
+        self._events = deque(maxlen=maxlen)
+        self._counter = 0
+        self._condition = threading.Condition()
+
+    def publish_many(self, events):
+        with self._condition:
+            for event_type, data in events:
+                self._counter += 1
+                self._events.append((str(self._counter), event_type, data))
+            self._condition.notify_all()
+
+    def last_id(self):
+        return str(self._counter)
+
+    def read(self, last_id, timeout=15.0, count=500):
+        """Return (events after `last_id`, whether events were lost)."""
+        last = int(last_id) if str(last_id).isdigit() else self._counter
+        with self._condition:
+            if self._counter <= last:
+                self._condition.wait(timeout)
+            lost = bool(self._events) and int(self._events[0][0]) > last + 1
+            events = [event for event in self._events if int(event[0]) > last][:count]
+        return events, lost
+
+
+class RedisEventBus:
+    """Capped Redis stream of events, shared by every web and worker process"""
+
+    def __init__(self, url, stream='network_monitor:events', maxlen=10000):
+        import redis
+
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.stream = stream
+        self.maxlen = maxlen
+
+    def publish_many(self, events):
+        pipe = self.client.pipeline(transaction=False)
+        for event_type, data in events:
+            pipe.xadd(
+                self.stream,
+                {'type': event_type, 'data': json.dumps(data, default=str)},
+                maxlen=self.maxlen,
+                approximate=True
+            )
+        pipe.execute()
+
+    def last_id(self):
+        latest = self.client.xrevrange(self.stream, count=1)
+        return latest[0][0] if latest else '0-0'
+
+    def read(self, last_id, timeout=15.0, count=500):
+        """Return (events after `last_id`, whether events were lost)."""
+        response = self.client.xread({self.stream: last_id}, count=count, block=int(timeout * 1000))
+        entries = response[0][1] if response else []
+
+        # The stream is trimmed from the head; if the reader's position fell
+        # off the head, it may have missed events and has to resync
+        lost = False
+        if entries and last_id != '0-0':
+            oldest = self.client.xrange(self.stream, count=1)
+            lost = bool(oldest) and _parse_id(oldest[0][0]) > _parse_id(last_id)
+
+        events = [(event_id, fields['type'], json.loads(fields['data'])) for event_id, fields in entries]
+        return events, lost
+
+
+_bus = None
+_local_bus = None
+_retry_at = 0.0
+_bus_lock = threading.Lock()
+
+
+def get_event_bus():
+    """
+    Return the process-wide event bus, Redis-backed when EVENT_STREAM_URL is set.
+
+    While a configured Redis is unreachable the in-process bus stands in,
+    and Redis is tried again once EVENT_STREAM_RETRY_SECONDS have passed.
+    """
+    global _bus, _local_bus, _retry_at
+    if _bus is not None:
+        return _bus
+    with _bus_lock:
+        if _bus is not None:
+            return _bus
+        config = getattr(settings, 'NETWORK_MONITOR', {})
+        url = config.get('EVENT_STREAM_URL')
+        maxlen = config.get('EVENT_STREAM_MAXLEN', 10000)
+        if not url:
+            _bus = LocalEventBus(maxlen=maxlen)
+            return _bus
+
+        if time.monotonic() >= _retry_at:
+            try:
+                bus = RedisEventBus(url, maxlen=maxlen)
+                bus.client.ping()
+                _bus = bus
+                if _local_bus is not None:
+                    logger.info("Event stream Redis reachable again")
+                return _bus
+            except Exception as e:
+                retry_seconds = config.get('EVENT_STREAM_RETRY_SECONDS', 30)
+                _retry_at = time.monotonic() + retry_seconds
+                logger.error(f"Event stream Redis unavailable ({e}); dashboard events from other "
+                             f"processes are lost until it is back, retrying in {retry_seconds}s")
+        if _local_bus is None:
+            _local_bus = LocalEventBus(maxlen=maxlen)
+        return _local_bus
+
+
+def publish_events(events):
+    """Publish (type, data) events; failures are logged, never raised."""
+    events = list(events)
+    if not events:
+        return
+    try:
+        get_event_bus().publish_many(events)
+    except Exception as e:
+        logger.warning(f"Could not publish {len(events)} dashboard events: {e}")
+
+
+def publish_on_commit(events):
+    """Publish events once the current transaction commits."""
+    events = list(events)
+    if events:
+        transaction.on_commit(lambda: publish_events(events))
+
+
+def status_event(device, previous_status, timestamp):
+    """Build a device status transition event."""
+    return ('status', {
+        'device_id': device.id,
+        'name': device.name,
+        'previous': previous_status,
+        'status': device.status,
+        'timestamp': timestamp.isoformat(),
+    })
+
+
+def alert_event(alert):
+    """Build a new alert event."""
+    return ('alert', {
+        'id': alert.id,
+        'device_id': alert.device_id,
+        'device_name': alert.device.name,
+        'ip_address': alert.device.ip_address,
+        'alert_type': alert.alert_type,
+        'severity': alert.severity,
+        'title': alert.title,
+        'created_at': alert.created_at.isoformat(),
+    })
+
+
+def format_sse(event_id, event_type, data):
+    """Format one event as a Server-Sent Events message."""
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
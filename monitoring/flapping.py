@@ -0,0 +1,187 @@
+"""
+Flap detection with hysteresis for device status
+
+A device on a lossy link can alternate between online and offline on
+every check. Each alternation would be a status write, an alert and a
+notification. So every device keeps a bounded history of its last
+`history` checks, stored as one bit per check for whether its state
+changed. The history lives in an in-process LRU, or in Redis so that
+every worker sees the same one.
+
+The flap percentage weighs the changes the way Nagios does. The oldest
+check weighs 0.8 and the newest 1.2, so recent changes count more. A
+device starts flapping when the percentage reaches `high`. It stops once
+the percentage drops below `low`, and the gap between the two keeps it
+from toggling in and out of the flapping state itself.
+"""
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# percent: weighted share of recent checks that changed state
+# flapping: whether the device is flapping after this check
+# was_flapping: whether it was flapping before it
+FlapResult = namedtuple('FlapResult', 'percent flapping was_flapping')
+
+
+def flap_percent(changes: str, window: int) -> float:
+    """
+    Return the weighted percentage of state changes.
+
+    Args:
+        changes: One '1' or '0' per check, oldest first, for whether the
+            state changed; checks before the first count as unchanged
+        window: Number of checks the percentage covers
+    """
+    changes = changes[-window:]
+    offset = window - len(changes)
+    total = 0.0
+    for position, changed in enumerate(changes, start=offset):
+        if changed == '1':
+            total += 0.8 + 0.4 * position / (window - 1) if window > 1 else 1.0
+    return 100.0 * total / window
+
+
+class FlapDetector:
+    """Bounded LRU of per-device state histories, with flapping hysteresis"""
+
+    def __init__(self, history: int = 21, low: float = 25.0, high: float = 50.0, maxsize: int = 100000):
+        if not 0 <= low <= high:
+            raise ValueError(f"Flap thresholds must satisfy 0 <= low <= high, got {low} and {high}")
+        # The first check of a history has nothing to change from
+        self.window = max(1, history - 1)
+        self.low = low
+        self.high = high
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def step(self, entry: Optional[Tuple[str, str, bool]], state: str) -> Tuple[Tuple[str, str, bool], FlapResult]:
+        """
+        Fold one check into a history entry.
+
+        Args:
+            entry: (change bits, last state, flapping), or None for a new device
+            state: State seen by this check
+
+        Returns:
+            The updated entry and the check's FlapResult
+        """
+        if entry is None:
+            return ('', state, False), FlapResult(0.0, False, False)
+
+        changes, last_state, was_flapping = entry
+        changes = (changes + ('1' if state != last_state else '0'))[-self.window:]
+        percent = flap_percent(changes, self.window)
+        flapping = percent >= self.low if was_flapping else percent >= self.high
+        return (changes, state, flapping), FlapResult(percent, flapping, was_flapping)
+
+    def record_many(self, observations: Iterable[Tuple[Hashable, str]]) -> Dict[Hashable, FlapResult]:
+        """
+        Record the state each device was seen in.
+
+        Args:
+            observations: (device key, state) pairs
+
+        Returns:
+            Dictionary mapping each device key to its FlapResult
+        """
+        results = {}
+        with self._lock:
+            for key, state in observations:
+                entry, results[key] = self.step(self._entries.get(key), state)
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return results
+
+    def record(self, key: Hashable, state: str) -> FlapResult:
+        """Record a single check; see record_many."""
+        return self.record_many([(key, state)])[key]
+
+
+class RedisFlapDetector(FlapDetector):
+    """
+    State histories shared by every worker through Redis.
+
+    One batch of checks costs one MGET and one pipelined SET. Each history
+    is a short string that expires after `ttl` seconds without checks. Two
+    workers checking the same device at the same moment may lose one of
+    the two checks, which only nudges its percentage.
+    """
+
+    def __init__(self, url: str, history: int = 21, low: float = 25.0, high: float = 50.0,
+                 maxsize: int = 100000, ttl: float = 86400.0, prefix: str = 'network_monitor:flap'):
+        import redis
+
+        super().__init__(history=history, low=low, high=high, maxsize=maxsize)
+        self.client = redis.Redis.from_url(url, socket_connect_timeout=2)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _name(self, key) -> str:
+        return f"{self.prefix}:{key}"
+
+    @staticmethod
+    def _decode(value) -> Optional[Tuple[str, str, bool]]:
+        if not value:
+            return None
+        value = value.decode() if isinstance(value, bytes) else value
+        head, _, state = value.partition(':')
+        return head[1:], state, head[:1] == '1'
+
+    @staticmethod
+    def _encode(entry: Tuple[str, str, bool]) -> str:
+        changes, state, flapping = entry
+        return f"{int(flapping)}{changes}:{state}"
+
+    def record_many(self, observations: Iterable[Tuple[Hashable, str]]) -> Dict[Hashable, FlapResult]:
+        """Record the state each device was seen in; see FlapDetector.record_many."""
+        observations = list(observations)
+        if not observations:
+            return {}
+
+        try:
+            # A device checked twice in one batch is read and written once
+            keys = list(dict.fromkeys(key for key, _state in observations))
+            entries = dict(zip(keys, map(self._decode, self.client.mget([self._name(key) for key in keys]))))
+            results = {}
+            for key, state in observations:
+                entries[key], results[key] = self.step(entries[key], state)
+            pipe = self.client.pipeline(transaction=False)
+            for key in keys:
+                pipe.set(self._name(key), self._encode(entries[key]), ex=max(1, int(self.ttl)))
+            pipe.execute()
+            return results
+        except Exception as e:
+            logger.warning(f"Flap detection Redis unavailable ({e}), tracking in-process only")
+            return super().record_many(observations)
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def get_flap_detector(url: Optional[str] = None, **options) -> FlapDetector:
+    """Return the process-wide flap detector, Redis-backed when `url` is reachable."""
+    global _detector
+    with _detector_lock:
+        if _detector is None:
+            if url:
+                try:
+                    _detector = RedisFlapDetector(url, **options)
+                    _detector.client.ping()
+                except Exception as e:
+                    logger.warning(f"Flap detection Redis unavailable ({e}), using in-process histories")
+                    _detector = None
+            if _detector is None:
+                options.pop('ttl', None)
+                _detector = FlapDetector(**options)
+        return _detector
@@ -0,0 +1,170 @@
+"""
+Pooled keep-alive HTTP(S) checker that reads TLS certificates from the request handshake
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPSConnection
+from urllib3.connectionpool import HTTPSConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# Certificate checks are about expiry, not trust; self-signed device
+# certificates are the norm on monitored equipment
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+
+def _read_der(data: bytes, offset: int):
+    """Read one DER TLV at `offset`; returns (tag, value_start, value_end)."""
+    tag = data[offset]
+    length = data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        size = length & 0x7F
+        length = int.from_bytes(data[offset:offset + size], 'big')
+        offset += size
+    return tag, offset, offset + length
+
+
+def _parse_der_time(tag: int, value: bytes) -> datetime:
+    """Parse an ASN.1 UTCTime (0x17) or GeneralizedTime (0x18)."""
+    text = value.decode('ascii').rstrip('Z')
+    if tag == 0x17:
+        year = int(text[:2])
+        text = f"{1900 + year if year >= 50 else 2000 + year}{text[2:]}"
+    return datetime.strptime(text[:14], '%Y%m%d%H%M%S').replace(tzinfo=timezone.utc)
+
+
+def certificate_not_after(der: bytes) -> Optional[datetime]:
+    """
+    Return the notAfter date of a DER encoded X.509 certificate.
+
+    Walks Certificate -> tbsCertificate -> validity without needing a
+    crypto library, since only the expiry date is of interest.
+    """
+    try:
+        _tag, start, _end = _read_der(der, 0)              # Certificate
+        _tag, offset, _end = _read_der(der, start)         # tbsCertificate
+        if der[offset] == 0xA0:                            # [0] version
+            offset = _read_der(der, offset)[2]
+        for _field in ('serialNumber', 'signature', 'issuer'):
+            offset = _read_der(der, offset)[2]
+        _tag, offset, _end = _read_der(der, offset)        # validity
+        offset = _read_der(der, offset)[2]                 # notBefore
+        tag, value_start, value_end = _read_der(der, offset)
+        return _parse_der_time(tag, der[value_start:value_end])
+    except (IndexError, ValueError) as e:
+        logger.debug(f"Could not parse certificate validity: {e}")
+        return None
+
+
+class CertCapturingHTTPSConnection(HTTPSConnection):
+    """HTTPS connection that keeps the DER peer certificate of its handshake"""
+
+    peer_certificate = None
+
+    def connect(self):
+        super().connect()
+        try:
+            self.peer_certificate = self.sock.getpeercert(binary_form=True)
+        except (AttributeError, ValueError, OSError):
+            self.peer_certificate = None
+
+
+class CertCapturingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = CertCapturingHTTPSConnection
+
+
+class CertCapturingAdapter(HTTPAdapter):
+    """Transport adapter whose HTTPS connections record their peer certificate"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            **self.poolmanager.pool_classes_by_scheme,
+            'https': CertCapturingHTTPSConnectionPool,
+        }
+
+
+def _peer_certificate(response) -> Optional[bytes]:
+    """Return the DER peer certificate of the connection that served `response`."""
+    connection = getattr(response.raw, 'connection', None)
+    return getattr(connection, 'peer_certificate', None)
+
+
+class PooledHttpChecker:
+    """
+    Check HTTP(S) services over a shared keep-alive connection pool.
+
+    Connections to each host are reused across checks, bounded by
+    `pool_maxsize` per host (callers block rather than opening more), and
+    the TLS certificate is read from the connection that served the
+    request, so an HTTPS check costs at most one handshake.
+    """
+
+    def __init__(self, pool_maxsize: int = 4, pool_connections: int = 1000):
+        self.session = requests.Session()
+        adapter = CertCapturingAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=True,
+            max_retries=0
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def check(self, url: str, timeout: float = 10) -> Dict:
+        """
+        Fetch `url` and report status, size and certificate expiry.
+
+        Returns:
+            Dictionary with http_status_code, http_response_size,
+            http_response_time and, for HTTPS, ssl_cert_expiry and
+            ssl_cert_days_remaining; or http_error on failure
+        """
+        started = time.perf_counter()
+        try:
+            with self.session.get(url, timeout=timeout, stream=True, verify=False) as response:
+                der = _peer_certificate(response) if url.startswith('https') else None
+                body = response.content
+        except requests.RequestException as e:
+            return {'http_error': str(e)}
+
+        service_data = {
+            'http_status_code': response.status_code,
+            'http_response_size': len(body),
+            'http_response_time': round((time.perf_counter() - started) * 1000, 3)
+        }
+
+        if der:
+            expiry = certificate_not_after(der)
+            if expiry:
+                service_data['ssl_cert_expiry'] = expiry
+                service_data['ssl_cert_days_remaining'] = (expiry - datetime.now(timezone.utc)).days
+
+        return service_data
+
+    def close(self):
+        self.session.close()
+
+
+_checker = None
+_checker_pid = None
+_checker_lock = threading.Lock()
+
+
+def get_http_checker(**options) -> PooledHttpChecker:
+    """Return the process-wide pooled checker, recreated after a fork."""
+    global _checker, _checker_pid
+    with _checker_lock:
+        if _checker is None or _checker_pid != os.getpid():
+            _checker = PooledHttpChecker(**options)
+            _checker_pid = os.getpid()
+        return _checker
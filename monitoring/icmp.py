@@ -0,0 +1,316 @@
+"""
+Asyncio ICMP echo engine for probing many hosts from a single socket
+"""
+import asyncio
+import ipaddress
+import logging
+import os
+import socket
+import struct
+import time
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+
+# 56 bytes of payload, same as the default `ping` packet size
+PAYLOAD = bytes(range(56))
+
+
+class IcmpUnavailable(Exception):
+    """Raised when neither a datagram nor a raw ICMP socket can be opened"""
+
+
+def checksum(data: bytes) -> int:
+    """Compute the RFC 1071 internet checksum of `data`."""
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def build_echo_request(ident: int, seq: int, payload: bytes = PAYLOAD) -> bytes:
+    """Build an ICMP echo request packet with a valid checksum."""
+    header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    csum = checksum(header + payload)
+    return struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, csum, ident, seq) + payload
+
+
+def parse_echo_reply(data: bytes) -> Optional[tuple]:
+    """
+    Parse an ICMP echo reply.
+
+    Raw sockets (and datagram sockets on some platforms) deliver the IPv4
+    header in front of the ICMP message; it is stripped when present.
+
+    Returns:
+        (ident, seq) tuple, or None if `data` is not an echo reply
+    """
+    if data and data[0] >> 4 == 4:
+        header_len = (data[0] & 0x0F) * 4
+        data = data[header_len:]
+    if len(data) < 8:
+        return None
+    icmp_type, _code, _csum, ident, seq = struct.unpack('!BBHHH', data[:8])
+    if icmp_type != ICMP_ECHO_REPLY:
+        return None
+    return ident, seq
+
+
+def empty_result(host: str, count: int) -> Dict:
+    """Return a ping result dict in the shape used by the PingMonitor classes."""
+    return {
+        'host': host,
+        'is_reachable': False,
+        'response_time': None,
+        'packet_loss': 100.0,
+        'packets_sent': count,
+        'packets_received': 0,
+        'min_time': None,
+        'max_time': None,
+        'avg_time': None,
+        'error_message': None,
+        'timestamp': time.time()
+    }
+
+
+class AsyncIcmpPinger:
+    """
+    Send ICMP echo requests to many hosts over one socket.
+
+    A datagram ICMP socket is used where the kernel allows unprivileged
+    pings (Linux `net.ipv4.ping_group_range`, macOS); otherwise a raw
+    socket is opened, which requires root or CAP_NET_RAW. Replies are
+    matched to requests by sequence number and source address, and by
+    identifier on raw sockets where the kernel does not rewrite it.
+    """
+
+    def __init__(self, timeout: float = 5.0, count: int = 4, interval: float = 0.25,
+                 max_rate: int = 2000, max_in_flight: int = 2048):
+        self.timeout = timeout
+        self.count = count
+        self.interval = interval
+        self.max_rate = max_rate
+        self.max_in_flight = max_in_flight
+        self.ident = os.getpid() & 0xFFFF
+        self.sock = None
+        self.is_raw = False
+        self._loop = None
+        self._seq = 0
+        self._pending = {}
+        self._next_send = 0.0
+        self._semaphore = None
+
+    async def __aenter__(self):
+        self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    def open(self):
+        """Open the ICMP socket and register it with the running event loop."""
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+            self.is_raw = False
+        except (PermissionError, OSError):
+            try:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+                self.is_raw = True
+            except (PermissionError, OSError) as e:
+                raise IcmpUnavailable(f"Cannot open ICMP socket: {e}")
+
+        sock.setblocking(False)
+        self.sock = sock
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(sock.fileno(), self._on_readable)
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+    def close(self):
+        """Unregister and close the socket, failing any outstanding probes."""
+        if self.sock is None:
+            return
+        self._loop.remove_reader(self.sock.fileno())
+        self.sock.close()
+        self.sock = None
+        for _addr, future, _sent_at in self._pending.values():
+            if not future.done():
+                future.cancel()
+        self._pending.clear()
+
+    def _on_readable(self):
+        """Drain the socket and resolve the futures of matching probes."""
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                logger.debug(f"ICMP receive error: {e}")
+                return
+
+            received_at = self._loop.time()
+            parsed = parse_echo_reply(data)
+            if parsed is None:
+                continue
+
+            ident, seq = parsed
+            if self.is_raw and ident != self.ident:
+                continue  # Reply to another process on the host
+
+            pending = self._pending.get(seq)
+            if pending is None or pending[0] != addr[0]:
+                continue
+
+            _addr, future, sent_at = pending
+            if not future.done():
+                future.set_result((received_at - sent_at) * 1000)
+
+    def _next_seq(self) -> int:
+        """Allocate a sequence number that is not in flight."""
+        for _ in range(0x10000):
+            self._seq = (self._seq + 1) & 0xFFFF
+            if self._seq not in self._pending:
+                return self._seq
+        raise RuntimeError("No free ICMP sequence numbers")
+
+    async def _throttle(self):
+        """Pace sends to at most `max_rate` packets per second."""
+        now = self._loop.time()
+        if self._next_send < now:
+            self._next_send = now
+        delay = self._next_send - now
+        self._next_send += 1.0 / self.max_rate
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _probe(self, address: str, timeout: float) -> Optional[float]:
+        """Send one echo request and wait for its reply; returns RTT in ms."""
+        await self._throttle()
+
+        seq = self._next_seq()
+        future = self._loop.create_future()
+        packet = build_echo_request(self.ident, seq)
+        self._pending[seq] = (address, future, self._loop.time())
+
+        try:
+            while True:
+                try:
+                    self.sock.sendto(packet, (address, 0))
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(0.001)
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._pending.pop(seq, None)
+
+    async def _resolve(self, host: str) -> str:
+        """Return the IPv4 address for `host`, resolving names if needed."""
+        try:
+            return str(ipaddress.IPv4Address(host))
+        except ValueError:
+            infos = await self._loop.getaddrinfo(host, None, family=socket.AF_INET)
+            return infos[0][4][0]
+
+    async def ping(self, host: str, timeout: Optional[float] = None,
+                   count: Optional[int] = None) -> Dict:
+        """
+        Ping a single host.
+
+        Args:
+            host: IPv4 address or hostname
+            timeout: Per-probe timeout in seconds (defaults to the pinger's)
+            count: Number of echo requests to send (defaults to the pinger's)
+
+        Returns:
+            Dictionary with ping results
+        """
+        timeout = timeout or self.timeout
+        count = count or self.count
+        result = empty_result(host, count)
+
+        async with self._semaphore:
+            try:
+                address = await self._resolve(host)
+            except (OSError, IndexError) as e:
+                result['error_message'] = f"Cannot resolve {host}: {e}"
+                return result
+
+            probes = []
+            try:
+                for i in range(count):
+                    if i:
+                        await asyncio.sleep(self.interval)
+                    probes.append(asyncio.ensure_future(self._probe(address, timeout)))
+                rtts = [rtt for rtt in await asyncio.gather(*probes) if rtt is not None]
+            except OSError as e:
+                for probe in probes:
+                    probe.cancel()
+                result['error_message'] = str(e)
+                return result
+
+        if rtts:
+            result.update({
+                'is_reachable': True,
+                'packets_received': len(rtts),
+                'packet_loss': round((count - len(rtts)) / count * 100, 2),
+                'min_time': round(min(rtts), 3),
+                'max_time': round(max(rtts), 3),
+                'avg_time': round(sum(rtts) / len(rtts), 3),
+            })
+            result['response_time'] = result['avg_time']
+        else:
+            result['error_message'] = "Request timed out"
+
+        return result
+
+    async def ping_many(self, hosts: Iterable[str],
+                        timeouts: Optional[Dict[str, float]] = None) -> Dict[str, Dict]:
+        """
+        Ping many hosts concurrently.
+
+        Args:
+            hosts: IPv4 addresses or hostnames
+            timeouts: Optional per-host timeout overrides in seconds
+
+        Returns:
+            Dictionary mapping each host to its ping result
+        """
+        timeouts = timeouts or {}
+        hosts = list(dict.fromkeys(hosts))
+        results = await asyncio.gather(
+            *(self.ping(host, timeout=timeouts.get(host)) for host in hosts)
+        )
+        return dict(zip(hosts, results))
+
+
+def ping_hosts(hosts: Iterable[str], timeout: float = 5, count: int = 4,
+               timeouts: Optional[Dict[str, float]] = None, **kwargs) -> Dict[str, Dict]:
+    """
+    Synchronously ping many hosts with the asyncio engine.
+
+    Raises:
+        IcmpUnavailable: If no ICMP socket can be opened on this host
+    """
+    async def run():
+        async with AsyncIcmpPinger(timeout=timeout, count=count, **kwargs) as pinger:
+            return await pinger.ping_many(hosts, timeouts=timeouts)
+
+    return asyncio.run(run())
+
+
+def icmp_available() -> bool:
+    """Check whether this process may open an ICMP socket."""
+    for sock_type in (socket.SOCK_DGRAM, socket.SOCK_RAW):
+        try:
+            socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP).close()
+            return True
+        except OSError:
+            continue
+    return False
@@ -0,0 +1,225 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("devices", "0004_device_latitude_device_longitude"),
+        ("monitoring", "0003_portmonitor_portcheckresult_servicemonitor_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PingRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "resolution",
+                    models.CharField(
+                        choices=[("1m", "1 Minute"), ("1h", "1 Hour"), ("1d", "1 Day")],
+                        max_length=2,
+                    ),
+                ),
+                (
+                    "bucket",
+                    models.DateTimeField(help_text="Start of the rollup bucket (UTC)"),
+                ),
+                (
+                    "count",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Number of checks in the bucket"
+                    ),
+                ),
+                (
+                    "success_count",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Number of successful checks"
+                    ),
+                ),
+                (
+                    "latency_count",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Number of latency samples"
+                    ),
+                ),
+                (
+                    "latency_sum",
+                    models.FloatField(
+                        default=0.0, help_text="Sum of latency samples in milliseconds"
+                    ),
+                ),
+                (
+                    "latency_min",
+                    models.FloatField(
+                        blank=True,
+                        help_text="Minimum latency in milliseconds",
+                        null=True,
+                    ),
+                ),
+                (
+                    "latency_max",
+                    models.FloatField(
+                        blank=True,
+                        help_text="Maximum latency in milliseconds",
+                        null=True,
+                    ),
+                ),
+                (
+                    "latency_p95",
+                    models.FloatField(
+                        blank=True,
+                        help_text="95th percentile latency in milliseconds",
+                        null=True,
+                    ),
+                ),
+                (
+                    "latency_histogram",
+                    models.JSONField(
+                        blank=True,
+                        default=dict,
+                        help_text="Log-scale latency histogram used to merge percentiles",
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "loss_sum",
+                    models.FloatField(
+                        default=0.0, help_text="Sum of packet loss percentages"
+                    ),
+                ),
+                (
+                    "device",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ping_rollups",
+                        to="devices.device",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Ping Rollup",
+                "verbose_name_plural": "Ping Rollups",
+                "ordering": ["-bucket"],
+                "indexes": [
+                    models.Index(
+                        fields=["resolution", "bucket"],
+                        name="monitoring__resolut_88c75e_idx",
+                    )
+                ],
+                "unique_together": {("device", "resolution", "bucket")},
+            },
+        ),
+        migrations.CreateModel(
+            name="PortCheckRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "resolution",
+                    models.CharField(
+                        choices=[("1m", "1 Minute"), ("1h", "1 Hour"), ("1d", "1 Day")],
+                        max_length=2,
+                    ),
+                ),
+                (
+                    "bucket",
+                    models.DateTimeField(help_text="Start of the rollup bucket (UTC)"),
+                ),
+                (
+                    "count",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Number of checks in the bucket"
+                    ),
+                ),
+                (
+                    "success_count",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Number of successful checks"
+                    ),
+                ),
+                (
+                    "latency_count",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Number of latency samples"
+                    ),
+                ),
+                (
+                    "latency_sum",
+                    models.FloatField(
+                        default=0.0, help_text="Sum of latency samples in milliseconds"
+                    ),
+                ),
+                (
+                    "latency_min",
+                    models.FloatField(
+                        blank=True,
+                        help_text="Minimum latency in milliseconds",
+                        null=True,
+                    ),
+                ),
+                (
+                    "latency_max",
+                    models.FloatField(
+                        blank=True,
+                        help_text="Maximum latency in milliseconds",
+                        null=True,
+                    ),
+                ),
+                (
+                    "latency_p95",
+                    models.FloatField(
+                        blank=True,
+                        help_text="95th percentile latency in milliseconds",
+                        null=True,
+                    ),
+                ),
+                (
+                    "latency_histogram",
+                    models.JSONField(
+                        blank=True,
+                        default=dict,
+                        help_text="Log-scale latency histogram used to merge percentiles",
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "port_monitor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="rollups",
+                        to="monitoring.portmonitor",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Port Check Rollup",
+                "verbose_name_plural": "Port Check Rollups",
+                "ordering": ["-bucket"],
+                "indexes": [
+                    models.Index(
+                        fields=["resolution", "bucket"],
+                        name="monitoring__resolut_2d2c29_idx",
+                    )
+                ],
+                "unique_together": {("port_monitor", "resolution", "bucket")},
+            },
+        ),
+    ]
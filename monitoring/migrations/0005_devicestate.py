@@ -0,0 +1,109 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("devices", "0004_device_latitude_device_longitude"),
+        ("monitoring", "0004_pingrollup_portcheckrollup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DeviceState",
+            fields=[
+                (
+                    "device",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="state",
+                        serialize=False,
+                        to="devices.device",
+                    ),
+                ),
+                (
+                    "last_ping_at",
+                    models.DateTimeField(
+                        blank=True, help_text="Time of the latest ping", null=True
+                    ),
+                ),
+                (
+                    "last_ping_reachable",
+                    models.BooleanField(
+                        blank=True, help_text="Latest ping reachability", null=True
+                    ),
+                ),
+                (
+                    "last_response_time",
+                    models.FloatField(
+                        blank=True,
+                        help_text="Latest response time in milliseconds",
+                        null=True,
+                    ),
+                ),
+                (
+                    "last_packet_loss",
+                    models.FloatField(
+                        blank=True, help_text="Latest packet loss percentage", null=True
+                    ),
+                ),
+                (
+                    "last_speed_at",
+                    models.DateTimeField(
+                        blank=True, help_text="Time of the latest speed test", null=True
+                    ),
+                ),
+                (
+                    "last_speed_successful",
+                    models.BooleanField(
+                        blank=True, help_text="Latest speed test outcome", null=True
+                    ),
+                ),
+                (
+                    "last_download_speed",
+                    models.FloatField(
+                        blank=True, help_text="Latest download speed in Mbps", null=True
+                    ),
+                ),
+                (
+                    "last_upload_speed",
+                    models.FloatField(
+                        blank=True, help_text="Latest upload speed in Mbps", null=True
+                    ),
+                ),
+                (
+                    "uptime_24h",
+                    models.FloatField(
+                        blank=True,
+                        help_text="Uptime percentage over the last 24 hours",
+                        null=True,
+                    ),
+                ),
+                (
+                    "avg_response_time_24h",
+                    models.FloatField(
+                        blank=True,
+                        help_text="Average response time over the last 24 hours",
+                        null=True,
+                    ),
+                ),
+                (
+                    "stats_updated_at",
+                    models.DateTimeField(
+                        blank=True,
+                        help_text="When the 24h statistics were computed",
+                        null=True,
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Device State",
+                "verbose_name_plural": "Device States",
+            },
+        ),
+    ]
@@ -0,0 +1,146 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitoring", "0005_devicestate"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DiscoveryScan",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "subnet",
+                    models.CharField(
+                        help_text="Swept network in CIDR notation", max_length=50
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("running", "Running"),
+                            ("completed", "Completed"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "task_id",
+                    models.CharField(
+                        blank=True,
+                        help_text="Celery task running the sweep",
+                        max_length=255,
+                    ),
+                ),
+                (
+                    "hosts_total",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Number of addresses to probe"
+                    ),
+                ),
+                (
+                    "hosts_scanned",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Number of addresses probed so far"
+                    ),
+                ),
+                (
+                    "hosts_found",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Number of hosts that answered"
+                    ),
+                ),
+                (
+                    "error_message",
+                    models.TextField(
+                        blank=True, help_text="Error message if the sweep failed"
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "verbose_name": "Discovery Scan",
+                "verbose_name_plural": "Discovery Scans",
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.CreateModel(
+            name="DiscoveredHost",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("ip_address", models.GenericIPAddressField(protocol="IPv4")),
+                (
+                    "hostname",
+                    models.CharField(
+                        blank=True, help_text="Reverse DNS name", max_length=255
+                    ),
+                ),
+                (
+                    "method",
+                    models.CharField(
+                        choices=[("icmp", "ICMP Echo"), ("tcp", "TCP Connect")],
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "port",
+                    models.PositiveIntegerField(
+                        blank=True, help_text="TCP port that answered", null=True
+                    ),
+                ),
+                (
+                    "response_time",
+                    models.FloatField(
+                        blank=True, help_text="Response time in milliseconds", null=True
+                    ),
+                ),
+                ("discovered_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "scan",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="hosts",
+                        to="monitoring.discoveryscan",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Discovered Host",
+                "verbose_name_plural": "Discovered Hosts",
+                "ordering": ["scan", "ip_address"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("scan", "ip_address"), name="unique_discovered_host"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,219 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("devices", "0004_device_latitude_device_longitude"),
+        ("monitoring", "0006_discoveryscan_discoveredhost"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DevicePath",
+            fields=[
+                (
+                    "device",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="path",
+                        serialize=False,
+                        to="devices.device",
+                    ),
+                ),
+                (
+                    "path_hash",
+                    models.CharField(
+                        db_index=True,
+                        help_text="SHA-1 of the hop addresses",
+                        max_length=40,
+                    ),
+                ),
+                (
+                    "hops",
+                    models.JSONField(
+                        default=list,
+                        help_text="Hop addresses in order, None for silent hops",
+                    ),
+                ),
+                (
+                    "change_count",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Number of route changes seen"
+                    ),
+                ),
+                (
+                    "changed_at",
+                    models.DateTimeField(help_text="When the route last changed"),
+                ),
+                (
+                    "checked_at",
+                    models.DateTimeField(help_text="When the route was last traced"),
+                ),
+            ],
+            options={
+                "verbose_name": "Device Path",
+                "verbose_name_plural": "Device Paths",
+            },
+        ),
+        migrations.CreateModel(
+            name="TopologyNode",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("address", models.GenericIPAddressField(protocol="IPv4", unique=True)),
+                ("first_seen", models.DateTimeField(auto_now_add=True)),
+                ("last_seen", models.DateTimeField(db_index=True)),
+            ],
+            options={
+                "verbose_name": "Topology Node",
+                "verbose_name_plural": "Topology Nodes",
+            },
+        ),
+        migrations.AddField(
+            model_name="tracerouteresult",
+            name="path_changed",
+            field=models.BooleanField(
+                default=False,
+                help_text="Whether the route differs from the previous trace",
+            ),
+        ),
+        migrations.AddField(
+            model_name="tracerouteresult",
+            name="path_hash",
+            field=models.CharField(
+                blank=True, help_text="SHA-1 of the hop addresses", max_length=40
+            ),
+        ),
+        migrations.CreateModel(
+            name="TopologyEdge",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "count",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Number of traces that crossed the link"
+                    ),
+                ),
+                (
+                    "latency_sum",
+                    models.FloatField(
+                        default=0.0, help_text="Sum of link latencies in milliseconds"
+                    ),
+                ),
+                (
+                    "latency_min",
+                    models.FloatField(
+                        blank=True,
+                        help_text="Minimum link latency in milliseconds",
+                        null=True,
+                    ),
+                ),
+                (
+                    "latency_max",
+                    models.FloatField(
+                        blank=True,
+                        help_text="Maximum link latency in milliseconds",
+                        null=True,
+                    ),
+                ),
+                ("first_seen", models.DateTimeField(auto_now_add=True)),
+                ("last_seen", models.DateTimeField(db_index=True)),
+                (
+                    "source",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="outgoing_edges",
+                        to="monitoring.topologynode",
+                    ),
+                ),
+                (
+                    "target",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="incoming_edges",
+                        to="monitoring.topologynode",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Topology Edge",
+                "verbose_name_plural": "Topology Edges",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("source", "target"), name="unique_topology_edge"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="DevicePathHop",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "hop",
+                    models.PositiveSmallIntegerField(
+                        help_text="TTL at which the node answered"
+                    ),
+                ),
+                (
+                    "device",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="path_hops",
+                        to="devices.device",
+                    ),
+                ),
+                (
+                    "node",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="device_hops",
+                        to="monitoring.topologynode",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Device Path Hop",
+                "verbose_name_plural": "Device Path Hops",
+                "ordering": ["device", "hop"],
+                "indexes": [
+                    models.Index(
+                        fields=["node", "device"], name="monitoring__node_id_88b209_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("device", "hop"), name="unique_device_path_hop"
+                    )
+                ],
+            },
+        ),
+    ]
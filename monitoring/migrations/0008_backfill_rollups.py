@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def backfill_rollups(apps, schema_editor):
+    """Roll up the raw results written before the rollups existed."""
+    from monitoring.rollups import rebuild_rollups
+
+    rebuild_rollups(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    # rebuild_rollups commits one day at a time
+    atomic = False
+
+    dependencies = [
+        ("monitoring", "0007_topology"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
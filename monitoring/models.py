@@ -258,24 +258,18 @@ class SystemMetrics(models.Model):
         self.save()
     
     def update_ping_stats(self):
-        """Update ping statistics for today"""
-        today = timezone.now().date()
-        tomorrow = today + timedelta(days=1)
+        """Update ping statistics for today from the daily ping rollups"""
+        from .rollups import ping_summary
         
-        ping_results = PingResult.objects.filter(
-            timestamp__gte=today,
-            timestamp__lt=tomorrow
-        )
+        today = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        summary = ping_summary(today, today + timedelta(days=1))
         
-        self.total_pings_today = ping_results.count()
-        self.successful_pings_today = ping_results.filter(is_reachable=True).count()
+        self.total_pings_today = summary['total_checks']
+        self.successful_pings_today = summary['successful_checks']
         
-        # Calculate average response time
-        successful_pings = ping_results.filter(is_reachable=True, response_time__isnull=False)
-        if successful_pings.exists():
-            from django.db.models import Avg
-            avg_time = successful_pings.aggregate(avg=Avg('response_time'))['avg']
-            self.avg_response_time = round(avg_time, 2) if avg_time else None
+        # Average response time of successful pings
+        if summary['avg_latency'] is not None:
+            self.avg_response_time = summary['avg_latency']
         
         self.save()
     
@@ -310,6 +304,63 @@ class SystemMetrics(models.Model):
         self.save()
 
 
+class DeviceState(models.Model):
+    """Denormalised latest monitoring state of a device, updated on each probe"""
+
+    device = models.OneToOneField(Device, on_delete=models.CASCADE, primary_key=True, related_name='state')
+
+    # Latest ping
+    last_ping_at = models.DateTimeField(null=True, blank=True, help_text="Time of the latest ping")
+    last_ping_reachable = models.BooleanField(null=True, blank=True, help_text="Latest ping reachability")
+    last_response_time = models.FloatField(null=True, blank=True, help_text="Latest response time in milliseconds")
+    last_packet_loss = models.FloatField(null=True, blank=True, help_text="Latest packet loss percentage")
+
+    # Latest speed test
+    last_speed_at = models.DateTimeField(null=True, blank=True, help_text="Time of the latest speed test")
+    last_speed_successful = models.BooleanField(null=True, blank=True, help_text="Latest speed test outcome")
+    last_download_speed = models.FloatField(null=True, blank=True, help_text="Latest download speed in Mbps")
+    last_upload_speed = models.FloatField(null=True, blank=True, help_text="Latest upload speed in Mbps")
+
+    # Rolling 24h statistics
+    uptime_24h = models.FloatField(null=True, blank=True, help_text="Uptime percentage over the last 24 hours")
+    avg_response_time_24h = models.FloatField(null=True, blank=True, help_text="Average response time over the last 24 hours")
+    stats_updated_at = models.DateTimeField(null=True, blank=True, help_text="When the 24h statistics were computed")
+
+    # Metadata
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Device State'
+        verbose_name_plural = 'Device States'
+
+    def __str__(self):
+        return f"State of {self.device.name}"
+
+    @property
+    def latest_ping(self):
+        """Return the latest ping in the shape of a PingResult, or None"""
+        if self.last_ping_at is None:
+            return None
+        return {
+            'is_reachable': self.last_ping_reachable,
+            'response_time': self.last_response_time,
+            'packet_loss': self.last_packet_loss,
+            'timestamp': self.last_ping_at,
+        }
+
+    @property
+    def latest_speed(self):
+        """Return the latest speed test in the shape of a SpeedTestResult, or None"""
+        if self.last_speed_at is None:
+            return None
+        return {
+            'is_successful': self.last_speed_successful,
+            'download_speed': self.last_download_speed,
+            'upload_speed': self.last_upload_speed,
+            'timestamp': self.last_speed_at,
+        }
+
+
 class TracerouteResult(models.Model):
     """Model for storing traceroute results"""
 
@@ -320,6 +371,8 @@ class TracerouteResult(models.Model):
     total_hops = models.PositiveIntegerField(default=0, help_text="Total number of hops")
     destination_reached = models.BooleanField(default=False, help_text="Whether destination was reached")
     total_time = models.FloatField(null=True, blank=True, help_text="Total time to reach destination")
+    path_hash = models.CharField(max_length=40, blank=True, help_text="SHA-1 of the hop addresses")
+    path_changed = models.BooleanField(default=False, help_text="Whether the route differs from the previous trace")
 
     # Error information
     error_message = models.TextField(blank=True, help_text="Error message if traceroute failed")
@@ -389,3 +442,12 @@ from .port_models import (
     ServiceMonitor, ServiceCheckResult,
     COMMON_PORTS, get_service_type_for_port
 )
+
+# Import rollup models
+from .rollup_models import RollupResolution, PingRollup, PortCheckRollup
+
+# Import discovery models
+from .discovery_models import DiscoveryStatus, DiscoveryMethod, DiscoveryScan, DiscoveredHost
+
+# Import topology models
+from .topology_models import TopologyNode, TopologyEdge, DevicePath, DevicePathHop
@@ -0,0 +1,174 @@
+"""
+Alert digests and pooled webhook delivery
+
+Pending alerts are sent as digests. Each recipient gets one message
+listing every alert it should see, so an outage that raises thousands of
+alerts becomes one email per recipient plus one request per chat or
+webhook channel. Webhooks share a keep-alive connection pool and are sent
+concurrently. Failed requests are retried with exponential backoff.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+SEVERITY_ORDER = {'low': 0, 'medium': 1, 'high': 2, 'critical': 3}
+
+SEVERITY_PREFIX = {
+    'low': '[INFO]',
+    'medium': '[WARNING]',
+    'high': '[ALERT]',
+    'critical': '[CRITICAL]',
+}
+
+# Statuses worth retrying; anything else is a permanent failure
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+def sort_alerts(alerts: Iterable[Dict]) -> List[Dict]:
+    """Order alerts by severity, most severe first, then by creation time."""
+    return sorted(alerts, key=lambda alert: (-SEVERITY_ORDER.get(alert['severity'], 0), str(alert['created_at'])))
+
+
+def recipient_digests(alerts: Sequence[Dict], routes: Iterable[Tuple[Iterable[str], str]]) -> Dict[str, List[Dict]]:
+    """
+    Group alerts into one digest per recipient.
+
+    Args:
+        alerts: Alert dictionaries with id, severity and created_at
+        routes: (recipients, min_severity) pairs; a recipient on several
+            routes gets the union of their alerts, each alert once
+
+    Returns:
+        Dictionary mapping each recipient to its alerts, most severe first
+    """
+    digests = {}
+    for recipients, min_severity in routes:
+        floor = SEVERITY_ORDER.get(min_severity or 'low', 0)
+        selected = [alert for alert in alerts if SEVERITY_ORDER.get(alert['severity'], 0) >= floor]
+        for recipient in recipients:
+            digest = digests.setdefault(recipient, {})
+            for alert in selected:
+                digest[alert['id']] = alert
+    return {recipient: sort_alerts(digest.values()) for recipient, digest in digests.items() if digest}
+
+
+def digest_subject(alerts: Sequence[Dict]) -> str:
+    """Return the subject of a digest: the alert's own title when there is only one."""
+    top = max(alerts, key=lambda alert: SEVERITY_ORDER.get(alert['severity'], 0))
+    prefix = SEVERITY_PREFIX.get(top['severity'], '[ALERT]')
+    if len(alerts) == 1:
+        return f"{prefix} {top['title']}"
+    devices = len({alert['device_name'] for alert in alerts})
+    return f"{prefix} {len(alerts)} network alerts on {devices} devices"
+
+
+def digest_body(alerts: Sequence[Dict], max_lines: int = 200) -> str:
+    """Return the plain text body of a digest, listing at most `max_lines` alerts."""
+    lines = [f"Network Monitor - {len(alerts)} alerts", ""]
+    counts = {}
+    for alert in alerts:
+        counts[alert['severity']] = counts.get(alert['severity'], 0) + 1
+    lines.append(', '.join(f"{counts[severity]} {severity}" for severity in sorted(
+        counts, key=lambda severity: -SEVERITY_ORDER.get(severity, 0))))
+    lines.append("")
+
+    for alert in alerts[:max_lines]:
+        lines.append(f"[{alert['severity'].upper()}] {alert['created_at']:%Y-%m-%d %H:%M:%S} "
+                     f"{alert['device_name']} ({alert['ip_address']}): {alert['title']}")
+    if len(alerts) > max_lines:
+        lines.append(f"... and {len(alerts) - max_lines} more")
+
+    lines += ["", "---", "This is an automated message from Network Monitor."]
+    return '\n'.join(lines)
+
+
+class WebhookSender:
+    """
+    POST JSON payloads over a shared keep-alive connection pool.
+
+    Payloads are sent concurrently by up to `workers` threads. A request
+    that fails to connect, times out or gets a retryable status is retried
+    up to `retries` times. It waits `backoff` seconds and doubles the wait
+    each time. A Retry-After header can extend the wait, up to `max_backoff`.
+    """
+
+    def __init__(self, workers: int = 16, timeout: float = 10.0, retries: int = 3,
+                 backoff: float = 1.0, max_backoff: float = 30.0, sleep=time.sleep):
+        self.workers = workers
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sleep = sleep
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=100, pool_maxsize=workers, pool_block=True, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _delay(self, attempt: int, response: Optional[requests.Response]) -> float:
+        delay = self.backoff * (2 ** attempt)
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        return min(delay, self.max_backoff)
+
+    def post(self, url: str, payload: Dict, headers: Optional[Dict] = None) -> Dict:
+        """
+        POST one payload, retrying transient failures.
+
+        Returns:
+            Dictionary with url, ok, attempts and status_code or error
+        """
+        attempt = 0
+        while True:
+            response = None
+            error = None
+            try:
+                response = self.session.post(url, json=payload, headers=headers, timeout=self.timeout)
+                if response.status_code < 400:
+                    return {'url': url, 'ok': True, 'attempts': attempt + 1, 'status_code': response.status_code}
+                error = f"HTTP {response.status_code}"
+                retryable = response.status_code in RETRY_STATUSES
+            except requests.RequestException as e:
+                error = str(e)
+                retryable = True
+
+            if not retryable or attempt >= self.retries:
+                logger.warning(f"Webhook {url} failed after {attempt + 1} attempts: {error}")
+                return {'url': url, 'ok': False, 'attempts': attempt + 1, 'error': error,
+                        'status_code': response.status_code if response is not None else None}
+            self.sleep(self._delay(attempt, response))
+            attempt += 1
+
+    def post_many(self, calls: Sequence[Tuple[str, Dict, Optional[Dict]]]) -> List[Dict]:
+        """POST (url, payload, headers) calls concurrently; results come back in order."""
+        if not calls:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(calls))) as executor:
+            return list(executor.map(lambda call: self.post(*call), calls))
+
+    def close(self):
+        self.session.close()
+
+
+_sender = None
+_sender_pid = None
+_sender_lock = threading.Lock()
+
+
+def get_webhook_sender(**options) -> WebhookSender:
+    """Return the process-wide webhook sender, recreated after a fork."""
+    global _sender, _sender_pid
+    with _sender_lock:
+        if _sender is None or _sender_pid != os.getpid():
+            _sender = WebhookSender(**options)
+            _sender_pid = os.getpid()
+        return _sender
@@ -0,0 +1,278 @@
+"""
+Daily range partitioning of PingResult on PostgreSQL
+
+With PING_PARTITIONING enabled, the ping results table becomes a
+declaratively partitioned table with one partition per UTC day. PostgreSQL
+routes every insert to the partition of its timestamp and skips partitions
+outside the range of a query, so ORM callers keep using PingResult as
+before. Retention drops whole partitions instead of deleting rows.
+
+The existing table is converted in place: it is renamed and attached as one
+partition holding all history up to the conversion boundary, so no rows are
+copied. The expensive validation (a unique index on (id, timestamp) and a
+range CHECK constraint) is built before the table is locked, and the lock is
+held only for the catalog changes. Rows are still protected by Django's
+cascading deletes; partitions carry no foreign key constraint.
+
+Other database backends keep the plain table and batched retention.
+"""
+import logging
+import re
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import PingResult
+
+logger = logging.getLogger(__name__)
+
+PARTITION_SUFFIX = '_p%Y%m%d'
+LEGACY_SUFFIX = '_legacy'
+DEFAULT_SUFFIX = '_default'
+
+_UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+
+def _config():
+    return getattr(settings, 'NETWORK_MONITOR', {})
+
+
+def partitioning_enabled():
+    """Return True if PING_PARTITIONING is set and the database supports it."""
+    return bool(_config().get('PING_PARTITIONING')) and connection.vendor == 'postgresql'
+
+
+def _table():
+    return PingResult._meta.db_table
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+def _day(value):
+    """Floor a datetime to the start of its UTC day."""
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, value.day, tzinfo=dt_timezone.utc)
+
+
+def _literal(value):
+    return f"'{value.isoformat()}'"
+
+
+def is_partitioned():
+    """Return True if the ping results table is already partitioned."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [_table()]
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions():
+    """
+    Return the partitions of the ping results table.
+
+    Returns:
+        List of (name, upper bound) tuples ordered by bound; the default
+        partition has an upper bound of None
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+            "FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s AND pg_table_is_visible(p.oid)",
+            [_table()]
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bound in rows:
+        match = _UPPER_BOUND.search(bound or '')
+        partitions.append((name, parse_datetime(match.group(1)) if match else None))
+    return sorted(partitions, key=lambda item: item[1] or datetime.max.replace(tzinfo=dt_timezone.utc))
+
+
+def _index_statements(table):
+    """CREATE INDEX statements for the parent table mirroring the model's indexes."""
+    meta = PingResult._meta
+    definitions = []
+    for index in meta.indexes:
+        definitions.append([
+            f"{_quote(meta.get_field(name.lstrip('-')).column)}{' DESC' if name.startswith('-') else ''}"
+            for name in index.fields
+        ])
+    for field in meta.local_fields:
+        if (field.db_index or field.is_relation) and not field.primary_key:
+            definitions.append([_quote(field.column)])
+
+    statements = []
+    for number, columns in enumerate(definitions):
+        name = f"{table[:40]}_part_{number}_idx"
+        statements.append(f"CREATE INDEX IF NOT EXISTS {_quote(name)} ON {_quote(table)} ({', '.join(columns)})")
+    return statements
+
+
+def convert_to_partitioned(now=None):
+    """
+    Convert the ping results table into a daily partitioned table.
+
+    History up to the boundary (the start of the day after tomorrow) stays
+    in the renamed original table, attached as a single partition.
+
+    Returns:
+        The boundary from which daily partitions start
+    """
+    table = _table()
+    legacy = f"{table}{LEGACY_SUFFIX}"
+    boundary = _day(now or timezone.now()) + timedelta(days=2)
+    check_name = f"{table[:40]}_before_partitioning"
+    unique_name = f"{table[:40]}_id_timestamp_uniq"
+
+    # Build everything that scans the table while writes continue
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {_quote(unique_name)} "
+            f"ON {_quote(table)} (id, \"timestamp\")"
+        )
+        cursor.execute(
+            f"ALTER TABLE {_quote(table)} ADD CONSTRAINT {_quote(check_name)} "
+            f"CHECK (\"timestamp\" < {_literal(boundary)}) NOT VALID"
+        )
+        cursor.execute(f"ALTER TABLE {_quote(table)} VALIDATE CONSTRAINT {_quote(check_name)}")
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {_quote(table)} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f"ALTER TABLE {_quote(table)} RENAME TO {_quote(legacy)}")
+
+        # Partitions must not own the id sequence; the parent gets its own
+        # identity continuing after the highest existing id
+        cursor.execute(f"ALTER TABLE {_quote(legacy)} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+        cursor.execute(f"ALTER TABLE {_quote(legacy)} ALTER COLUMN id DROP DEFAULT")
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {_quote(legacy)}")
+        next_id = cursor.fetchone()[0]
+
+        cursor.execute(
+            f"CREATE TABLE {_quote(table)} (LIKE {_quote(legacy)} INCLUDING DEFAULTS) "
+            f"PARTITION BY RANGE (\"timestamp\")"
+        )
+        cursor.execute(
+            f"ALTER TABLE {_quote(table)} ALTER COLUMN id "
+            f"ADD GENERATED BY DEFAULT AS IDENTITY (START WITH {int(next_id)})"
+        )
+        cursor.execute(f"ALTER TABLE {_quote(table)} ADD PRIMARY KEY (id, \"timestamp\")")
+        for statement in _index_statements(table):
+            cursor.execute(statement)
+
+        # The CHECK constraint proves the range, so attaching does not scan
+        cursor.execute(
+            f"ALTER TABLE {_quote(table)} ATTACH PARTITION {_quote(legacy)} "
+            f"FOR VALUES FROM (MINVALUE) TO ({_literal(boundary)})"
+        )
+        cursor.execute(
+            f"CREATE TABLE {_quote(table + DEFAULT_SUFFIX)} PARTITION OF {_quote(table)} DEFAULT"
+        )
+
+    logger.info(f"Converted {table} to daily partitions from {boundary.date()}")
+    return boundary
+
+
+def create_partition(day):
+    """
+    Create the partition for the UTC day starting at `day`.
+
+    Rows for that day that already landed in the default partition are
+    moved into the new partition before it is attached.
+    """
+    table = _table()
+    start, end = day, day + timedelta(days=1)
+    name = f"{table}{start.strftime(PARTITION_SUFFIX)}"
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE {_quote(name)} (LIKE {_quote(table)} INCLUDING DEFAULTS)")
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {_quote(table + DEFAULT_SUFFIX)} "
+            f"WHERE \"timestamp\" >= %s AND \"timestamp\" < %s RETURNING *) "
+            f"INSERT INTO {_quote(name)} SELECT * FROM moved",
+            [start, end]
+        )
+        cursor.execute(
+            f"ALTER TABLE {_quote(table)} ATTACH PARTITION {_quote(name)} "
+            f"FOR VALUES FROM ({_literal(start)}) TO ({_literal(end)})"
+        )
+    return name
+
+
+def ensure_partitions(now=None):
+    """
+    Convert the table if needed and create the partitions of the coming days.
+
+    Returns:
+        Dictionary describing what was done
+    """
+    if not _config().get('PING_PARTITIONING'):
+        return {'enabled': False}
+    if connection.vendor != 'postgresql':
+        logger.warning(f"PING_PARTITIONING needs PostgreSQL, not {connection.vendor}; keeping a plain table")
+        return {'enabled': False, 'reason': f'unsupported database {connection.vendor}'}
+
+    now = now or timezone.now()
+    converted = False
+    if not is_partitioned():
+        convert_to_partitioned(now)
+        converted = True
+
+    covered_until = max(upper for _name, upper in list_partitions() if upper is not None)
+    created = []
+    # Start at the end of the covered range if maintenance missed some days
+    day = min(covered_until, _day(now))
+    last_day = _day(now) + timedelta(days=_config().get('PING_PARTITION_PRECREATE_DAYS', 3))
+    while day <= last_day:
+        if day >= covered_until:
+            created.append(create_partition(day))
+        day += timedelta(days=1)
+
+    return {'enabled': True, 'converted': converted, 'created': created}
+
+
+def drop_expired_partitions(cutoff):
+    """
+    Drop every partition whose whole range lies before `cutoff`.
+
+    Returns:
+        Dictionary in the shape of delete_in_batches statistics, with the
+        deleted count estimated from table statistics
+    """
+    started = time.monotonic()
+    dropped = []
+    deleted = 0
+    table = _table()
+
+    for name, upper in list_partitions():
+        if upper is None or upper > cutoff:
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE relname = %s", [name])
+            deleted += cursor.fetchone()[0]
+            cursor.execute(f"ALTER TABLE {_quote(table)} DETACH PARTITION {_quote(name)}")
+            cursor.execute(f"DROP TABLE {_quote(name)}")
+        dropped.append(name)
+
+    seconds = time.monotonic() - started
+    if dropped:
+        logger.info(f"Dropped {len(dropped)} expired ping result partitions (~{deleted} rows)")
+    return {
+        'deleted': deleted,
+        'batches': 0,
+        'partitions_dropped': dropped,
+        'seconds': round(seconds, 3),
+        'rows_per_sec': round(deleted / seconds, 1) if seconds > 0 else 0.0,
+    }
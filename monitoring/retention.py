@@ -0,0 +1,193 @@
+"""
+Chunked retention for monitoring result tables
+
+Expired rows are selected through the table's timestamp index a bounded
+batch at a time and deleted by primary key, each batch in its own short
+transaction with a pause in between. Writers (and SQLite readers) are never
+locked out for longer than one batch, however much history has piled up.
+"""
+import logging
+import time
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def retention_options(config: Dict) -> Dict:
+    """Map RETENTION_* configuration keys to delete_in_batches options."""
+    return {
+        'batch_size': config.get('RETENTION_BATCH_SIZE', 5000),
+        'pause': config.get('RETENTION_BATCH_PAUSE', 0.05),
+    }
+
+
+def delete_in_batches(next_batch: Callable[[int], List], delete_batch: Callable[[List], int],
+                      batch_size: int = 5000, pause: float = 0.05) -> Dict:
+    """
+    Delete rows one bounded batch at a time.
+
+    Args:
+        next_batch: Returns up to `n` primary keys of expired rows
+        delete_batch: Deletes the rows with the given primary keys and
+            returns how many were deleted; expected to commit
+        batch_size: Rows per batch
+        pause: Seconds to sleep between batches so other writers get in
+
+    Returns:
+        Dictionary with deleted, batches, seconds and rows_per_sec
+    """
+    started = time.monotonic()
+    deleted = 0
+    batches = 0
+
+    while True:
+        ids = next_batch(batch_size)
+        if not ids:
+            break
+        deleted += delete_batch(ids)
+        batches += 1
+        if len(ids) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+
+    seconds = time.monotonic() - started
+    return {
+        'deleted': deleted,
+        'batches': batches,
+        'seconds': round(seconds, 3),
+        'rows_per_sec': round(deleted / seconds, 1) if seconds > 0 else 0.0,
+    }
+
+
+class RetentionPolicy:
+    """
+    Rows of `model` older than `cutoff` are deleted.
+
+    `timestamp_field` must be indexed; it drives batch selection. `filters`
+    narrow the expired rows further, and `rollup`, if given, is called with
+    each batch of rows inside the deleting transaction. Tables that can
+    expire data without deleting rows pass `purge`, called with the cutoff
+    instead of the batched delete.
+    """
+
+    def __init__(self, name: str, model, cutoff, timestamp_field: str = 'timestamp',
+                 filters: Optional[Dict] = None, rollup: Optional[Callable[[List], None]] = None,
+                 purge: Optional[Callable] = None):
+        self.name = name
+        self.model = model
+        self.cutoff = cutoff
+        self.timestamp_field = timestamp_field
+        self.filters = filters or {}
+        self.rollup = rollup
+        self.purge = purge
+
+    def expired(self):
+        return self.model.objects.filter(
+            **{f'{self.timestamp_field}__lt': self.cutoff}, **self.filters
+        ).order_by(self.timestamp_field)
+
+
+def retention_policies(now=None) -> List[RetentionPolicy]:
+    """Build the retention policy of every Django result table from NETWORK_MONITOR settings."""
+    from django.conf import settings
+    from django.utils import timezone
+
+    from alerts.models import Alert
+    from .models import PingResult, SpeedTestResult, TracerouteResult
+    from .port_models import PortCheckResult, ServiceCheckResult
+    from .rollups import ExpiredRollupBackfill
+    from .partitions import partitioning_enabled, is_partitioned, drop_expired_partitions
+    from .archive import archive_and_purge
+
+    now = now or timezone.now()
+    config = getattr(settings, 'NETWORK_MONITOR', {})
+    rollup = config.get('RETENTION_ROLLUP_BEFORE_DELETE', True)
+
+    def cutoff(key, default):
+        return now - timedelta(days=config.get(key, default))
+
+    alert_cutoff = cutoff('ALERT_HISTORY_DAYS', 30)
+    archive = config.get('ARCHIVE_ENABLED', False)
+    if archive:
+        ping_policy = RetentionPolicy(
+            'ping_results', PingResult, cutoff('MAX_PING_HISTORY_DAYS', 30), purge=archive_and_purge('ping')
+        )
+    elif partitioning_enabled() and is_partitioned():
+        # Whole days are dropped; rows written by the tasks are already rolled up
+        ping_policy = RetentionPolicy(
+            'ping_results', PingResult, cutoff('MAX_PING_HISTORY_DAYS', 30),
+            purge=drop_expired_partitions
+        )
+    else:
+        ping_policy = RetentionPolicy(
+            'ping_results', PingResult, cutoff('MAX_PING_HISTORY_DAYS', 30),
+            rollup=ExpiredRollupBackfill.for_pings() if rollup else None
+        )
+
+    return [
+        ping_policy,
+        RetentionPolicy('speed_results', SpeedTestResult, cutoff('SPEED_TEST_HISTORY_DAYS', 90)),
+        # Resolved alerts; resolved_at is not indexed, but an alert resolved
+        # before the cutoff was also created before it
+        RetentionPolicy(
+            'alerts', Alert, alert_cutoff, timestamp_field='created_at',
+            filters={'is_active': False, 'resolved_at__lt': alert_cutoff}
+        ),
+        RetentionPolicy(
+            'port_check_results', PortCheckResult, cutoff('PORT_CHECK_HISTORY_DAYS', 30),
+            rollup=ExpiredRollupBackfill.for_ports() if rollup else None,
+            purge=archive_and_purge('port') if archive else None
+        ),
+        RetentionPolicy('service_check_results', ServiceCheckResult, cutoff('SERVICE_CHECK_HISTORY_DAYS', 30)),
+        RetentionPolicy('traceroute_results', TracerouteResult, cutoff('TRACEROUTE_HISTORY_DAYS', 30)),
+    ]
+
+
+def purge_expired(policy: RetentionPolicy, **options) -> Dict:
+    """Delete the expired rows of one policy in batches; see delete_in_batches."""
+    from django.db import transaction
+
+    if policy.purge is not None:
+        stats = policy.purge(policy.cutoff)
+        stats['cutoff'] = policy.cutoff.isoformat()
+        return stats
+
+    expired = policy.expired()
+    model = policy.model
+
+    def next_batch(size):
+        return list(expired.values_list('pk', flat=True)[:size])
+
+    def delete_batch(ids):
+        with transaction.atomic():
+            if policy.rollup is not None:
+                policy.rollup(list(model.objects.filter(pk__in=ids)))
+            _total, per_model = model.objects.filter(pk__in=ids).delete()
+        return per_model.get(model._meta.label, 0)
+
+    stats = delete_in_batches(next_batch, delete_batch, **options)
+    stats['cutoff'] = policy.cutoff.isoformat()
+    return stats
+
+
+def run_retention(names=None, now=None) -> Dict[str, Dict]:
+    """
+    Apply the retention policies (optionally only those in `names`).
+
+    Returns:
+        Dictionary mapping each policy name to its purge statistics
+    """
+    from django.conf import settings
+
+    options = retention_options(getattr(settings, 'NETWORK_MONITOR', {}))
+    results = {}
+    for policy in retention_policies(now):
+        if names is not None and policy.name not in names:
+            continue
+        results[policy.name] = stats = purge_expired(policy, **options)
+        if stats['deleted']:
+            logger.info(f"Retention removed {stats['deleted']} {policy.name} in {stats['batches']} batches "
+                        f"({stats['rows_per_sec']} rows/sec)")
+    return results
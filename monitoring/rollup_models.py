@@ -0,0 +1,100 @@
+"""
+Rollup models for pre-aggregated ping and port check statistics
+"""
+from django.db import models
+from devices.models import Device
+from .port_models import PortMonitor
+
+
+class RollupResolution(models.TextChoices):
+    """Rollup bucket size choices"""
+    MINUTE = '1m', '1 Minute'
+    HOUR = '1h', '1 Hour'
+    DAY = '1d', '1 Day'
+
+
+class RollupBase(models.Model):
+    """Counters and latency statistics for one time bucket"""
+
+    resolution = models.CharField(max_length=2, choices=RollupResolution.choices)
+    bucket = models.DateTimeField(help_text="Start of the rollup bucket (UTC)")
+
+    # Check counts
+    count = models.PositiveIntegerField(default=0, help_text="Number of checks in the bucket")
+    success_count = models.PositiveIntegerField(default=0, help_text="Number of successful checks")
+
+    # Latency statistics over successful checks with a response time
+    latency_count = models.PositiveIntegerField(default=0, help_text="Number of latency samples")
+    latency_sum = models.FloatField(default=0.0, help_text="Sum of latency samples in milliseconds")
+    latency_min = models.FloatField(null=True, blank=True, help_text="Minimum latency in milliseconds")
+    latency_max = models.FloatField(null=True, blank=True, help_text="Maximum latency in milliseconds")
+    latency_p95 = models.FloatField(null=True, blank=True, help_text="95th percentile latency in milliseconds")
+    latency_histogram = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Log-scale latency histogram used to merge percentiles"
+    )
+
+    # Metadata
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def uptime_percentage(self):
+        """Return the share of successful checks in the bucket"""
+        if self.count == 0:
+            return None
+        return round((self.success_count / self.count) * 100, 2)
+
+    @property
+    def avg_latency(self):
+        """Return the mean latency of the bucket"""
+        if self.latency_count == 0:
+            return None
+        return round(self.latency_sum / self.latency_count, 2)
+
+
+class PingRollup(RollupBase):
+    """Model for storing per-device ping statistics at 1m/1h/1d resolution"""
+
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='ping_rollups')
+    loss_sum = models.FloatField(default=0.0, help_text="Sum of packet loss percentages")
+
+    class Meta:
+        unique_together = ['device', 'resolution', 'bucket']
+        ordering = ['-bucket']
+        verbose_name = 'Ping Rollup'
+        verbose_name_plural = 'Ping Rollups'
+        indexes = [
+            models.Index(fields=['resolution', 'bucket']),
+        ]
+
+    def __str__(self):
+        return f"{self.device.name} - {self.resolution} at {self.bucket}"
+
+    @property
+    def avg_packet_loss(self):
+        """Return the mean packet loss of the bucket"""
+        if self.count == 0:
+            return None
+        return round(self.loss_sum / self.count, 2)
+
+
+class PortCheckRollup(RollupBase):
+    """Model for storing per-port check statistics at 1m/1h/1d resolution"""
+
+    port_monitor = models.ForeignKey(PortMonitor, on_delete=models.CASCADE, related_name='rollups')
+
+    class Meta:
+        unique_together = ['port_monitor', 'resolution', 'bucket']
+        ordering = ['-bucket']
+        verbose_name = 'Port Check Rollup'
+        verbose_name_plural = 'Port Check Rollups'
+        indexes = [
+            models.Index(fields=['resolution', 'bucket']),
+        ]
+
+    def __str__(self):
+        return f"{self.port_monitor} - {self.resolution} at {self.bucket}"
@@ -0,0 +1,524 @@
+"""
+Incremental 1m/1h/1d rollups of ping and port check results
+
+Results are folded into per-device (or per-port) buckets as they are
+written, and uptime/latency queries read the coarsest buckets that cover
+the requested window instead of scanning raw result rows.
+"""
+import logging
+import math
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min, Max, Q, Sum
+from django.utils import timezone
+
+from .models import PingResult, PortCheckResult
+from .rollup_models import PingRollup, PortCheckRollup, RollupResolution
+
+logger = logging.getLogger(__name__)
+
+RESOLUTION_STEPS = {
+    RollupResolution.MINUTE: timedelta(minutes=1),
+    RollupResolution.HOUR: timedelta(hours=1),
+    RollupResolution.DAY: timedelta(days=1),
+}
+
+# Latency histogram bins grow by 10% from 0.1 ms, so merged percentiles are
+# accurate to within one bin (~10%) without keeping individual samples
+HISTOGRAM_BASE_MS = 0.1
+HISTOGRAM_GROWTH = 1.1
+
+ROLLUP_FIELDS = [
+    'count', 'success_count', 'latency_count', 'latency_sum', 'latency_min',
+    'latency_max', 'latency_p95', 'latency_histogram', 'updated_at',
+]
+
+# Results reach the rollups a little after their timestamp (write-behind
+# buffers, queued fold tasks), so a rebuild leaves the current day, and the
+# previous one until this long past midnight, to the live writers
+REBUILD_SETTLE = timedelta(hours=1)
+
+
+def floor_bucket(value, resolution):
+    """Return the start of the `resolution` bucket containing `value` (UTC)."""
+    value = value.astimezone(dt_timezone.utc)
+    if resolution == RollupResolution.MINUTE:
+        return value.replace(second=0, microsecond=0)
+    if resolution == RollupResolution.HOUR:
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def ceil_bucket(value, resolution):
+    """Return the first `resolution` bucket boundary at or after `value`."""
+    floor = floor_bucket(value, resolution)
+    return floor if floor == value else floor + RESOLUTION_STEPS[resolution]
+
+
+def covering_ranges(start, end, minutes_since=None):
+    """
+    Split [start, end) into the coarsest rollup buckets that cover it.
+
+    Whole days are read from 1d buckets, the hours around them from 1h
+    buckets and the remaining edge minutes from 1m buckets, so a 30-day
+    window touches at most ~30 + 2*23 + 2*59 rows per device. The window
+    is aligned to whole minutes; the bucket holding `end` is included.
+
+    Args:
+        start: Window start (aware datetime)
+        end: Window end (aware datetime)
+        minutes_since: Oldest time 1m buckets are kept for; an edge that
+            needs older minutes is widened to its whole hour instead
+
+    Returns:
+        List of (resolution, bucket_start, bucket_end) tuples
+    """
+    minute, hour, day = RollupResolution.MINUTE, RollupResolution.HOUR, RollupResolution.DAY
+
+    m0, m1 = ceil_bucket(start, minute), ceil_bucket(end, minute)
+    if m0 >= m1:
+        return []
+    if minutes_since is not None:
+        # Pruned minutes would silently drop out of the window; the hours holding them remain
+        if m0 < minutes_since:
+            m0 = floor_bucket(m0, hour)
+        if floor_bucket(m1, hour) < minutes_since:
+            m1 = ceil_bucket(m1, hour)
+
+    h0, h1 = ceil_bucket(m0, hour), floor_bucket(m1, hour)
+    if h0 >= h1:
+        return [(minute, m0, m1)]
+
+    d0, d1 = ceil_bucket(h0, day), floor_bucket(h1, day)
+    if d0 < d1:
+        ranges = [(day, d0, d1), (hour, h0, d0), (hour, d1, h1)]
+    else:
+        ranges = [(hour, h0, h1)]
+    ranges += [(minute, m0, h0), (minute, h1, m1)]
+
+    return [r for r in ranges if r[1] < r[2]]
+
+
+def histogram_bin(latency):
+    """Return the histogram bin index for a latency in milliseconds."""
+    if latency <= HISTOGRAM_BASE_MS:
+        return 0
+    return int(math.log(latency / HISTOGRAM_BASE_MS, HISTOGRAM_GROWTH))
+
+
+def histogram_percentile(histogram, percentile, lower=None, upper=None):
+    """
+    Estimate a percentile from a latency histogram.
+
+    Args:
+        histogram: Mapping of bin index (int or str) to sample count
+        percentile: Percentile to estimate, 0-100
+        lower: Known minimum latency, used to clamp the estimate
+        upper: Known maximum latency, used to clamp the estimate
+
+    Returns:
+        Estimated latency in milliseconds, or None for an empty histogram
+    """
+    counts = sorted((int(index), count) for index, count in histogram.items() if count)
+    total = sum(count for _index, count in counts)
+    if total == 0:
+        return None
+
+    target = total * percentile / 100.0
+    seen = 0
+    for index, count in counts:
+        seen += count
+        if seen >= target:
+            break
+
+    estimate = HISTOGRAM_BASE_MS * HISTOGRAM_GROWTH ** (index + 1)
+    if upper is not None:
+        estimate = min(estimate, upper)
+    if lower is not None:
+        estimate = max(estimate, lower)
+    return round(estimate, 3)
+
+
+def merge_histograms(target, source):
+    """Add the counts of `source` into `target` in place."""
+    for index, count in source.items():
+        key = str(index)
+        target[key] = target.get(key, 0) + count
+    return target
+
+
+def _empty_partial():
+    return {
+        'count': 0,
+        'success_count': 0,
+        'latency_count': 0,
+        'latency_sum': 0.0,
+        'latency_min': None,
+        'latency_max': None,
+        'latency_histogram': {},
+        'loss_sum': 0.0,
+    }
+
+
+def _add_sample(partial, is_reachable, latency, loss):
+    partial['count'] += 1
+    partial['loss_sum'] += loss or 0.0
+    if not is_reachable:
+        return
+
+    partial['success_count'] += 1
+    if latency is None:
+        return
+
+    partial['latency_count'] += 1
+    partial['latency_sum'] += latency
+    partial['latency_min'] = latency if partial['latency_min'] is None else min(partial['latency_min'], latency)
+    partial['latency_max'] = latency if partial['latency_max'] is None else max(partial['latency_max'], latency)
+    key = str(histogram_bin(latency))
+    partial['latency_histogram'][key] = partial['latency_histogram'].get(key, 0) + 1
+
+
+def _merge_partial(rollup, partial, now):
+    rollup.count += partial['count']
+    rollup.success_count += partial['success_count']
+    rollup.latency_count += partial['latency_count']
+    rollup.latency_sum += partial['latency_sum']
+
+    for field, pick in (('latency_min', min), ('latency_max', max)):
+        values = [v for v in (getattr(rollup, field), partial[field]) if v is not None]
+        setattr(rollup, field, pick(values) if values else None)
+
+    rollup.latency_histogram = merge_histograms(
+        dict(rollup.latency_histogram or {}), partial['latency_histogram']
+    )
+    rollup.latency_p95 = histogram_percentile(
+        rollup.latency_histogram, 95, rollup.latency_min, rollup.latency_max
+    )
+    if hasattr(rollup, 'loss_sum'):
+        rollup.loss_sum += partial['loss_sum']
+    rollup.updated_at = now
+
+
+def _record(rollup_model, owner_field, samples, fields, resolutions=RESOLUTION_STEPS):
+    """Fold (owner_id, timestamp, is_reachable, latency, loss) samples into rollups."""
+    partials = {}
+    for owner_id, timestamp, is_reachable, latency, loss in samples:
+        for resolution in resolutions:
+            key = (owner_id, resolution, floor_bucket(timestamp, resolution))
+            partial = partials.get(key)
+            if partial is None:
+                partial = partials[key] = _empty_partial()
+            _add_sample(partial, is_reachable, latency, loss)
+
+    if not partials:
+        return 0
+
+    owner_attr = f'{owner_field}_id'
+    keys = sorted(partials)
+    now = timezone.now()
+
+    with transaction.atomic():
+        # Make sure every bucket exists, then lock and merge into them
+        rollup_model.objects.bulk_create(
+            [rollup_model(**{owner_attr: owner_id, 'resolution': resolution, 'bucket': bucket})
+             for owner_id, resolution, bucket in keys],
+            ignore_conflicts=True
+        )
+        existing = rollup_model.objects.select_for_update().filter(
+            **{f'{owner_attr}__in': {key[0] for key in keys}},
+            resolution__in={key[1] for key in keys},
+            bucket__in={key[2] for key in keys},
+        ).order_by('pk')
+        rollups = {
+            (getattr(rollup, owner_attr), rollup.resolution, rollup.bucket): rollup
+            for rollup in existing
+        }
+
+        # Write the merged rows back with one upsert instead of bulk_update,
+        # whose CASE WHEN per field and row dominates large batches
+        updated = []
+        for key in keys:
+            rollup = rollups[key]
+            _merge_partial(rollup, partials[key], now)
+            updated.append(rollup_model(
+                **{owner_attr: key[0], 'resolution': key[1], 'bucket': key[2]},
+                **{field: getattr(rollup, field) for field in fields}
+            ))
+        rollup_model.objects.bulk_create(
+            updated,
+            update_conflicts=True,
+            unique_fields=[owner_field, 'resolution', 'bucket'],
+            update_fields=fields
+        )
+
+    return len(updated)
+
+
+def record_ping_results(results):
+    """Fold saved PingResult rows into the device ping rollups."""
+    now = timezone.now()
+    return _record(
+        PingRollup, 'device',
+        ((r.device_id, r.timestamp or now, r.is_reachable, r.response_time, r.packet_loss)
+         for r in results),
+        ROLLUP_FIELDS + ['loss_sum']
+    )
+
+
+def record_port_results(results):
+    """Fold saved PortCheckResult rows into the port check rollups."""
+    now = timezone.now()
+    return _record(
+        PortCheckRollup, 'port_monitor',
+        ((r.port_monitor_id, r.timestamp or now, r.is_reachable, r.response_time, None)
+         for r in results),
+        ROLLUP_FIELDS
+    )
+
+
+class ExpiredRollupBackfill:
+    """
+    Fold expiring raw results into rollups before retention deletes them.
+
+    Results written by the monitoring tasks are already in the rollups, so
+    only owner-days without a daily rollup (rows imported or written by
+    scripts that bypass the tasks) are recorded. The decision is made once
+    per owner-day and remembered, as one day's rows span several batches.
+    """
+
+    def __init__(self, rollup_model, owner_field, record):
+        self.rollup_model = rollup_model
+        self.owner_attr = f'{owner_field}_id'
+        self.record = record
+        self._missing = {}
+
+    @classmethod
+    def for_pings(cls):
+        return cls(PingRollup, 'device', record_ping_results)
+
+    @classmethod
+    def for_ports(cls):
+        return cls(PortCheckRollup, 'port_monitor', record_port_results)
+
+    def _key(self, result):
+        return getattr(result, self.owner_attr), floor_bucket(result.timestamp, RollupResolution.DAY)
+
+    def __call__(self, results):
+        unknown = {self._key(result) for result in results} - self._missing.keys()
+        if unknown:
+            existing = set(self.rollup_model.objects.filter(
+                resolution=RollupResolution.DAY,
+                **{f'{self.owner_attr}__in': {key[0] for key in unknown}},
+                bucket__in={key[1] for key in unknown},
+            ).values_list(self.owner_attr, 'bucket'))
+            for key in unknown:
+                self._missing[key] = key not in existing
+
+        missing = [result for result in results if self._missing[self._key(result)]]
+        if missing:
+            self.record(missing)
+        return len(missing)
+
+
+def _summary(row, percentile_histogram=None):
+    """Build a summary dict from aggregated rollup sums."""
+    total = row.get('total') or 0
+    success = row.get('success') or 0
+    latency_count = row.get('latency_count') or 0
+    summary = {
+        'total_checks': total,
+        'successful_checks': success,
+        'uptime_percentage': round((success / total) * 100, 2) if total else None,
+        'avg_latency': round(row['latency_sum'] / latency_count, 2) if latency_count else None,
+        'min_latency': row.get('latency_min'),
+        'max_latency': row.get('latency_max'),
+    }
+    if 'loss_sum' in row:
+        summary['avg_packet_loss'] = round(row['loss_sum'] / total, 2) if total else None
+    if percentile_histogram is not None:
+        summary['p95_latency'] = histogram_percentile(
+            percentile_histogram, 95, row.get('latency_min'), row.get('latency_max')
+        )
+    return summary
+
+
+def _summarize(queryset, start, end, group_by=None, with_loss=False, percentiles=False):
+    """Aggregate the rollups of `queryset` covering [start, end)."""
+    config = getattr(settings, 'NETWORK_MONITOR', {})
+    minutes_since = timezone.now() - timedelta(hours=config.get('ROLLUP_MINUTE_RETENTION_HOURS', 48))
+    ranges = covering_ranges(start, end, minutes_since)
+    if not ranges:
+        return {} if group_by else _summary({'loss_sum': 0.0} if with_loss else {})
+
+    window = Q()
+    for resolution, range_start, range_end in ranges:
+        window |= Q(resolution=resolution, bucket__gte=range_start, bucket__lt=range_end)
+    queryset = queryset.filter(window).order_by()
+
+    aggregates = {
+        'total': Sum('count'),
+        'success': Sum('success_count'),
+        'latency_count': Sum('latency_count'),
+        'latency_sum': Sum('latency_sum'),
+        'latency_min': Min('latency_min'),
+        'latency_max': Max('latency_max'),
+    }
+    if with_loss:
+        aggregates['loss_sum'] = Sum('loss_sum')
+
+    if group_by is None:
+        row = queryset.aggregate(**aggregates)
+        histogram = None
+        if percentiles:
+            histogram = {}
+            for partial in queryset.values_list('latency_histogram', flat=True):
+                merge_histograms(histogram, partial or {})
+        return _summary(row, histogram)
+
+    histograms = {}
+    if percentiles:
+        for owner_id, partial in queryset.values_list(group_by, 'latency_histogram'):
+            merge_histograms(histograms.setdefault(owner_id, {}), partial or {})
+
+    return {
+        row[group_by]: _summary(row, histograms.get(row[group_by], {}) if percentiles else None)
+        for row in queryset.values(group_by).annotate(**aggregates)
+    }
+
+
+def ping_summary(start, end, device_id=None, percentiles=False):
+    """
+    Summarise ping rollups between `start` and `end`.
+
+    Args:
+        start: Window start (aware datetime)
+        end: Window end (aware datetime)
+        device_id: Limit to one device; all devices when None
+        percentiles: Also merge histograms to estimate p95 latency
+
+    Returns:
+        Dictionary with check counts, uptime, latency and packet loss
+    """
+    queryset = PingRollup.objects.all()
+    if device_id is not None:
+        queryset = queryset.filter(device_id=device_id)
+    return _summarize(queryset, start, end, with_loss=True, percentiles=percentiles)
+
+
+def ping_summaries_by_device(start, end, device_ids=None, percentiles=False):
+    """Summarise ping rollups per device with one grouped query."""
+    queryset = PingRollup.objects.all()
+    if device_ids is not None:
+        queryset = queryset.filter(device_id__in=device_ids)
+    return _summarize(queryset, start, end, group_by='device_id', with_loss=True,
+                      percentiles=percentiles)
+
+
+def port_summary(start, end, port_monitor_id=None, percentiles=False):
+    """Summarise port check rollups between `start` and `end`."""
+    queryset = PortCheckRollup.objects.all()
+    if port_monitor_id is not None:
+        queryset = queryset.filter(port_monitor_id=port_monitor_id)
+    return _summarize(queryset, start, end, percentiles=percentiles)
+
+
+def _retention_cutoffs(now):
+    """Return the bucket start below which each resolution is pruned."""
+    config = getattr(settings, 'NETWORK_MONITOR', {})
+    return {
+        RollupResolution.MINUTE: now - timedelta(hours=config.get('ROLLUP_MINUTE_RETENTION_HOURS', 48)),
+        RollupResolution.HOUR: now - timedelta(days=config.get('ROLLUP_HOUR_RETENTION_DAYS', 90)),
+        RollupResolution.DAY: now - timedelta(days=config.get('ROLLUP_DAY_RETENTION_DAYS', 730)),
+    }
+
+
+def prune_rollups(now=None):
+    """Delete rollups older than the retention configured per resolution."""
+    now = now or timezone.now()
+    deleted = 0
+    for rollup_model in (PingRollup, PortCheckRollup):
+        for resolution, cutoff in _retention_cutoffs(now).items():
+            count, _ = rollup_model.objects.filter(resolution=resolution, bucket__lt=cutoff).delete()
+            deleted += count
+    return deleted
+
+
+def _rebuild_day(rollup_model, result_model, owner_field, columns, fields, day, resolutions, chunk_size):
+    """Replace the rollups of one day with ones recomputed from its raw results."""
+    day_end = day + RESOLUTION_STEPS[RollupResolution.DAY]
+    processed = 0
+    with transaction.atomic():
+        rollup_model.objects.filter(bucket__gte=day, bucket__lt=day_end).delete()
+        rows = result_model.objects.filter(
+            timestamp__gte=day, timestamp__lt=day_end
+        ).order_by().values_list(*columns)
+
+        batch = []
+        for row in rows.iterator(chunk_size=chunk_size):
+            # Port checks have no packet loss
+            batch.append(row if len(row) == 5 else row + (None,))
+            if len(batch) >= chunk_size:
+                _record(rollup_model, owner_field, batch, fields, resolutions)
+                processed += len(batch)
+                batch = []
+        if batch:
+            _record(rollup_model, owner_field, batch, fields, resolutions)
+            processed += len(batch)
+    return processed
+
+
+def rebuild_rollups(start=None, end=None, chunk_size=5000, apps=None):
+    """
+    Recompute the rollups of closed days from raw results.
+
+    Every day from the one containing `start` (the oldest raw result when
+    None) up to the one containing `end` is replaced in its own transaction.
+    Days still open to the live writers (see REBUILD_SETTLE) are never
+    touched, nor are days retention may already have deleted raw results
+    from, so their rollups are not recomputed from partial data.
+
+    Used to backfill rollups for results written before rollups existed or
+    by scripts that bypass the monitoring tasks. The data migration passes
+    its `apps` registry to run this on historical models.
+    """
+    now = timezone.now()
+    config = getattr(settings, 'NETWORK_MONITOR', {})
+    closed = floor_bucket(now - REBUILD_SETTLE, RollupResolution.DAY)
+    end = closed if end is None else min(ceil_bucket(end, RollupResolution.DAY), closed)
+    cutoffs = _retention_cutoffs(now)
+    totals = {}
+
+    for rollup_model, result_model, owner_field, columns, fields, history_key in (
+        (PingRollup, PingResult, 'device',
+         ('device_id', 'timestamp', 'is_reachable', 'response_time', 'packet_loss'),
+         ROLLUP_FIELDS + ['loss_sum'], 'MAX_PING_HISTORY_DAYS'),
+        (PortCheckRollup, PortCheckResult, 'port_monitor',
+         ('port_monitor_id', 'timestamp', 'is_reachable', 'response_time'),
+         ROLLUP_FIELDS, 'PORT_CHECK_HISTORY_DAYS'),
+    ):
+        if apps is not None:
+            rollup_model = apps.get_model(rollup_model._meta.app_label, rollup_model.__name__)
+            result_model = apps.get_model(result_model._meta.app_label, result_model.__name__)
+
+        first = start
+        if first is None:
+            first = result_model.objects.aggregate(first=Min('timestamp'))['first']
+        processed = 0
+        if first is not None:
+            complete = ceil_bucket(now - timedelta(days=config.get(history_key, 30)), RollupResolution.DAY)
+            day = max(floor_bucket(first, RollupResolution.DAY), complete)
+            while day < end:
+                day_end = day + RESOLUTION_STEPS[RollupResolution.DAY]
+                # Skip resolutions whose buckets of this day are already pruned
+                resolutions = [resolution for resolution, cutoff in cutoffs.items() if cutoff < day_end]
+                if resolutions:
+                    processed += _rebuild_day(rollup_model, result_model, owner_field, columns,
+                                              fields, day, resolutions, chunk_size)
+                day = day_end
+
+        totals[result_model._meta.model_name] = processed
+        logger.info(f"Rebuilt {rollup_model.__name__} from {processed} results before {end}")
+
+    return totals
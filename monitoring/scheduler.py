@@ -0,0 +1,196 @@
+"""
+Min-heap interval scheduler for per-device and per-port check intervals
+"""
+import heapq
+import logging
+import math
+import threading
+import zlib
+from typing import Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class IntervalScheduler:
+    """
+    Track the next due time of many periodic checks in a min-heap.
+
+    Every key is given a stable phase offset derived from a hash of the key,
+    so checks with the same interval are spread evenly across that interval
+    instead of all firing in the same second. Due slots are therefore a
+    pure function of (key, interval), which lets several worker processes
+    hold their own scheduler and still agree on what is due.
+
+    `due()` works on aligned windows of `tick` seconds: each call returns
+    the keys whose slot falls inside the window ending at the tick nearest
+    to `now`. Given `since`, the end of the last window any process
+    handled, it returns everything due after it instead, so a tick that
+    runs late still dispatches the windows it skipped, each key once.
+    Without it, slots from earlier windows are skipped rather than
+    replayed, so a restart never produces a burst of catch-up checks.
+    """
+
+    def __init__(self, tick: float = 10.0):
+        self.tick = tick
+        self._heap = []
+        self._intervals = {}
+        self._versions = {}
+        self._version = 0
+
+    def __len__(self):
+        return len(self._intervals)
+
+    def __contains__(self, key):
+        return key in self._intervals
+
+    @staticmethod
+    def phase(key: Hashable, interval: float) -> float:
+        """Return the stable offset of `key` within its interval."""
+        digest = zlib.crc32(repr(key).encode('utf-8'))
+        return (digest % int(interval * 1000)) / 1000.0
+
+    def next_due(self, key: Hashable, interval: float, after: float) -> float:
+        """Return the first slot of `key` strictly after `after`."""
+        phase = self.phase(key, interval)
+        slots = math.floor((after - phase) / interval) + 1
+        return phase + slots * interval
+
+    def add(self, key: Hashable, interval: float, now: float):
+        """Schedule `key` every `interval` seconds, replacing any previous interval."""
+        if interval <= 0:
+            raise ValueError(f"Interval must be positive, got {interval}")
+        if self._intervals.get(key) == interval:
+            return
+
+        self._version += 1
+        self._intervals[key] = interval
+        self._versions[key] = self._version
+        window_start, _window_end = self.window(now)
+        heapq.heappush(self._heap, (self.next_due(key, interval, window_start), self._version, key))
+
+    def remove(self, key: Hashable):
+        """Stop scheduling `key`; its heap entry is discarded lazily."""
+        self._intervals.pop(key, None)
+        self._versions.pop(key, None)
+
+    def sync(self, intervals: Dict[Hashable, float], now: float):
+        """Make the scheduled set match `intervals` exactly."""
+        for key in [key for key in self._intervals if key not in intervals]:
+            self.remove(key)
+        for key, interval in intervals.items():
+            self.add(key, interval, now)
+
+        # Compact once stale entries dominate the heap
+        if len(self._heap) > 2 * len(self._intervals) + 1024:
+            self._heap = [
+                entry for entry in self._heap
+                if self._versions.get(entry[2]) == entry[1]
+            ]
+            heapq.heapify(self._heap)
+
+    def window(self, now: float) -> tuple:
+        """Return the (start, end] window handled by the tick nearest to `now`."""
+        window_end = round(now / self.tick) * self.tick
+        return window_end - self.tick, window_end
+
+    def due(self, now: float, since: Optional[float] = None) -> List[Hashable]:
+        """
+        Pop the keys due in the current window and reschedule them.
+
+        Args:
+            now: Current time
+            since: End of the last window handled; keys due after it are
+                returned as well, and nothing is returned once the current
+                window has been handled
+        """
+        window_start, window_end = self.window(now)
+        if since is not None:
+            if since >= window_end:
+                return []
+            window_start = min(window_start, since)
+        due = []
+
+        while self._heap and self._heap[0][0] <= window_end:
+            due_at, version, key = heapq.heappop(self._heap)
+            if self._versions.get(key) != version:
+                continue  # Removed or rescheduled since this entry was pushed
+
+            if due_at > window_start:
+                due.append(key)
+                after = window_end
+            else:
+                # Missed window: move to the slot in or after the current one
+                after = window_start
+
+            interval = self._intervals[key]
+            heapq.heappush(self._heap, (self.next_due(key, interval, after), version, key))
+
+        return due
+
+
+class WindowMark:
+    """End of the last scheduler window handled, kept in this process"""
+
+    def __init__(self):
+        self._end = None
+        self._lock = threading.Lock()
+
+    def advance(self, window_end: float) -> Optional[float]:
+        """Record `window_end` as handled unless a later window was; return the previous end."""
+        with self._lock:
+            previous = self._end
+            if previous is None or previous < window_end:
+                self._end = window_end
+            return previous
+
+
+class RedisWindowMark:
+    """End of the last scheduler window handled by any process, kept in Redis"""
+
+    # Only ever moves the mark forward, and returns the previous one
+    ADVANCE = """
+local previous = redis.call('GET', KEYS[1])
+if (not previous) or tonumber(previous) < tonumber(ARGV[1]) then
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+return previous
+"""
+
+    def __init__(self, url: str, key: str = 'network_monitor:scheduler:window_end'):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_connect_timeout=2)
+        self.key = key
+        self.local = WindowMark()
+        self._advance = self.client.register_script(self.ADVANCE)
+
+    def advance(self, window_end: float) -> Optional[float]:
+        """Record `window_end` as handled unless a later window was; return the previous end."""
+        try:
+            previous = self._advance(keys=[self.key], args=[repr(window_end)])
+        except Exception as e:
+            logger.warning(f"Scheduler Redis unavailable ({e}), tracking windows in-process only")
+            return self.local.advance(window_end)
+        self.local.advance(window_end)
+        return float(previous) if previous is not None else None
+
+
+_mark = None
+_mark_lock = threading.Lock()
+
+
+def get_window_mark(url: Optional[str] = None):
+    """Return the process-wide window mark, shared through Redis when `url` is reachable."""
+    global _mark
+    with _mark_lock:
+        if _mark is None:
+            if url:
+                try:
+                    _mark = RedisWindowMark(url)
+                    _mark.client.ping()
+                except Exception as e:
+                    logger.warning(f"Scheduler Redis unavailable ({e}), tracking windows in-process only")
+                    _mark = None
+            if _mark is None:
+                _mark = WindowMark()
+        return _mark
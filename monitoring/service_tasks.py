@@ -3,11 +3,9 @@ Comprehensive Service Monitoring Tasks
 """
 import socket
 import time
-import requests
 import ftplib
-import ssl
 import dns.resolver
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from celery import shared_task
 from django.utils import timezone
 from django.conf import settings
@@ -18,9 +16,24 @@ from .port_models import (
     PortMonitor, PortCheckResult, ServiceMonitor, 
     ServiceCheckResult, ServiceType, get_service_type_for_port
 )
+from .write_buffer import django_buffer
+from .rollups import record_port_results
+from .tcp import check_ports
+from .http_check import get_http_checker
+from .retention import run_retention
+from .discovery import parse_ports, scan_services
 
 logger = logging.getLogger(__name__)
 
+# Service check keys that map onto PortCheckResult columns; the rest are
+# informational and only returned to the caller
+PORT_RESULT_FIELDS = {'http_status_code', 'http_response_size', 'ssl_cert_expiry'}
+
+# Ports tried by service discovery unless a port list is given
+SERVICE_DISCOVERY_PORTS = [21, 22, 23, 25, 53, 80, 110, 143, 443, 993, 995, 1433, 3306, 5432, 8080, 8443]
+
+PORT_MONITOR_STATUS_FIELDS = ['is_reachable', 'last_check', 'last_success', 'consecutive_failures', 'updated_at']
+
 
 @shared_task
 def monitor_all_ports():
@@ -28,7 +41,8 @@ def monitor_all_ports():
     logger.info("Starting comprehensive port monitoring")
     
     # Get all enabled port monitors
-    port_monitors = PortMonitor.objects.filter(is_enabled=True)
+    port_monitors = list(PortMonitor.objects.filter(is_enabled=True).select_related('device'))
+    batch_size = getattr(settings, 'NETWORK_MONITOR', {}).get('PORT_CHECK_BATCH_SIZE', 2000)
     
     results = {
         'total_checked': 0,
@@ -37,86 +51,143 @@ def monitor_all_ports():
         'errors': []
     }
     
-    for port_monitor in port_monitors:
+    for start in range(0, len(port_monitors), batch_size):
         try:
-            result = check_port_connectivity(port_monitor)
-            results['total_checked'] += 1
-            
-            if result['is_reachable']:
-                results['successful'] += 1
-            else:
-                results['failed'] += 1
+            batch_results = check_port_monitors(port_monitors[start:start + batch_size])
+            results['total_checked'] += len(batch_results)
+            results['successful'] += sum(1 for result in batch_results.values() if result['is_reachable'])
+            results['failed'] += sum(1 for result in batch_results.values() if not result['is_reachable'])
                 
         except Exception as e:
-            logger.error(f"Error checking port {port_monitor}: {e}")
+            logger.error(f"Error checking port batch at offset {start}: {e}")
             results['errors'].append(str(e))
     
     logger.info(f"Port monitoring completed: {results}")
     return results
 
 
-def check_port_connectivity(port_monitor):
-    """Check connectivity to a specific port"""
-    start_time = time.time()
+@shared_task
+def monitor_port_batch(port_monitor_ids):
+    """Check a batch of port monitors dispatched by the interval scheduler"""
+    port_monitors = PortMonitor.objects.filter(
+        id__in=port_monitor_ids, is_enabled=True
+    ).select_related('device')
     
     try:
-        # Basic TCP connection test
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(port_monitor.timeout)
-        
-        result = sock.connect_ex((port_monitor.device.ip_address, port_monitor.port))
-        sock.close()
-        
-        response_time = (time.time() - start_time) * 1000  # Convert to milliseconds
-        is_reachable = result == 0
-        
-        # Service-specific checks
-        service_data = {}
-        if is_reachable:
-            service_data = perform_service_specific_check(port_monitor, response_time)
-        
-        # Create check result
-        check_result = PortCheckResult.objects.create(
-            port_monitor=port_monitor,
-            is_reachable=is_reachable,
-            response_time=response_time if is_reachable else None,
-            error_message="" if is_reachable else f"Connection failed (code: {result})",
-            **service_data
-        )
-        
-        # Update port monitor status
-        port_monitor.is_reachable = is_reachable
-        port_monitor.last_check = timezone.now()
-        
-        if is_reachable:
-            port_monitor.last_success = timezone.now()
-            port_monitor.consecutive_failures = 0
-        else:
-            port_monitor.consecutive_failures += 1
-        
-        port_monitor.save()
-        
-        # Check if alert should be triggered
-        if (not is_reachable and 
+        batch_results = check_port_monitors(port_monitors)
+    except Exception as e:
+        logger.error(f"Error checking port batch {port_monitor_ids}: {e}")
+        return {'error': str(e)}
+    
+    return {
+        'total_checked': len(batch_results),
+        'successful': sum(1 for result in batch_results.values() if result['is_reachable']),
+        'failed': sum(1 for result in batch_results.values() if not result['is_reachable'])
+    }
+
+
+def apply_port_status(port_monitor, is_reachable, now):
+    """Update port monitor status from a check; returns True if an alert is due"""
+    port_monitor.is_reachable = is_reachable
+    port_monitor.last_check = now
+    port_monitor.updated_at = now
+    
+    if is_reachable:
+        port_monitor.last_success = now
+        port_monitor.consecutive_failures = 0
+    else:
+        port_monitor.consecutive_failures += 1
+    
+    return (not is_reachable and 
             port_monitor.alert_on_failure and 
-            port_monitor.consecutive_failures >= port_monitor.alert_threshold):
-            trigger_port_alert(port_monitor)
+            port_monitor.consecutive_failures >= port_monitor.alert_threshold)
+
+
+def check_port_monitors(port_monitors):
+    """Check many port monitors concurrently and persist their results
+    
+    TCP connectivity for all monitors is checked together by the asyncio
+    engine, service-specific checks for reachable ports run in a bounded
+    thread pool, and monitor status is saved with one bulk_update.
+    
+    Returns a dict of check results keyed by port monitor id.
+    """
+    port_monitors = list(port_monitors)
+    if not port_monitors:
+        return {}
+    
+    config = getattr(settings, 'NETWORK_MONITOR', {})
+    connectivity = check_ports(
+        [(pm.device.ip_address, pm.port, pm.timeout) for pm in port_monitors],
+        max_concurrency=config.get('PORT_CHECK_MAX_CONCURRENCY', 1000),
+        per_host_limit=config.get('PORT_CHECK_PER_HOST_LIMIT', 20)
+    )
+    
+    def connection(port_monitor):
+        return connectivity[(port_monitor.device.ip_address, port_monitor.port)]
+    
+    # Service-specific checks use blocking client libraries
+    reachable = [pm for pm in port_monitors if connection(pm)['is_reachable']]
+    service_data = {}
+    if reachable:
+        workers = min(config.get('SERVICE_CHECK_WORKERS', 32), len(reachable))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            checks = pool.map(
+                lambda pm: perform_service_specific_check(pm, connection(pm)['response_time']),
+                reachable
+            )
+            service_data = {pm.id: data for pm, data in zip(reachable, checks)}
+    
+    now = timezone.now()
+    rows = []
+    alerts = []
+    results = {}
+    
+    for port_monitor in port_monitors:
+        check = connection(port_monitor)
+        data = service_data.get(port_monitor.id, {})
         
-        return {
-            'is_reachable': is_reachable,
-            'response_time': response_time,
-            'service_data': service_data
+        rows.append(PortCheckResult(
+            port_monitor=port_monitor,
+            is_reachable=check['is_reachable'],
+            response_time=check['response_time'],
+            error_message=check['error_message'] or '',
+            **{key: value for key, value in data.items() if key in PORT_RESULT_FIELDS}
+        ))
+        
+        if apply_port_status(port_monitor, check['is_reachable'], now):
+            alerts.append(port_monitor)
+        
+        results[port_monitor.id] = {
+            'is_reachable': check['is_reachable'],
+            'response_time': check['response_time'],
+            'service_data': data,
+            'error': check['error_message']
         }
+    
+    # Queue check results for the next bulk write
+    django_buffer(PortCheckResult, after_write=record_port_results).add_many(rows)
+    PortMonitor.objects.bulk_update(port_monitors, PORT_MONITOR_STATUS_FIELDS)
+    
+    trigger_port_alerts(alerts)
+    
+    return results
+
+
+def check_port_connectivity(port_monitor):
+    """Check connectivity to a specific port"""
+    try:
+        return check_port_monitors([port_monitor])[port_monitor.id]
         
     except Exception as e:
         logger.error(f"Error checking port {port_monitor}: {e}")
         
-        # Create failed check result
-        PortCheckResult.objects.create(
+        # Queue failed check result
+        django_buffer(PortCheckResult, after_write=record_port_results).add(PortCheckResult(
             port_monitor=port_monitor,
             is_reachable=False,
             error_message=str(e)
-        )
+        ))
         
         # Update port monitor
         port_monitor.is_reachable = False
@@ -155,30 +226,27 @@ def perform_service_specific_check(port_monitor, base_response_time):
 
 def check_http_service(port_monitor):
     """Check HTTP/HTTPS service"""
-    protocol = 'https' if port_monitor.port in [443, 8443] else 'http'
+    is_https = port_monitor.service_type == ServiceType.HTTPS or port_monitor.port in [443, 8443]
+    protocol = 'https' if is_https else 'http'
     url = f"{protocol}://{port_monitor.device.ip_address}:{port_monitor.port}/"
     
-    try:
-        response = requests.get(url, timeout=port_monitor.timeout, verify=False)
-        
-        service_data = {
-            'http_status_code': response.status_code,
-            'http_response_size': len(response.content)
-        }
-        
-        # Check SSL certificate for HTTPS
-        if protocol == 'https':
-            try:
-                cert_info = ssl.get_server_certificate((port_monitor.device.ip_address, port_monitor.port))
-                # Parse certificate expiry (simplified)
-                service_data['ssl_cert_info'] = 'Valid'
-            except:
-                service_data['ssl_cert_info'] = 'Invalid or expired'
-        
-        return service_data
-        
-    except requests.RequestException as e:
-        return {'http_error': str(e)}
+    config = getattr(settings, 'NETWORK_MONITOR', {})
+    checker = get_http_checker(
+        pool_maxsize=config.get('HTTP_POOL_PER_HOST', 4),
+        pool_connections=config.get('HTTP_POOL_HOSTS', 1000)
+    )
+    
+    # Certificate expiry comes from the same TLS handshake as the request
+    service_data = checker.check(url, timeout=port_monitor.timeout)
+    
+    if is_https and 'http_error' not in service_data:
+        days_remaining = service_data.get('ssl_cert_days_remaining')
+        if days_remaining is None:
+            service_data['ssl_cert_info'] = 'Unavailable'
+        else:
+            service_data['ssl_cert_info'] = 'Valid' if days_remaining >= 0 else 'Expired'
+    
+    return service_data
 
 
 def check_ftp_service(port_monitor):
@@ -258,66 +326,137 @@ def check_database_service(port_monitor):
         return {'db_error': str(e)}
 
 
-def trigger_port_alert(port_monitor):
-    """Trigger alert for port failure"""
+def trigger_port_alerts(port_monitors):
+    """Trigger alerts for port failures with one bulk insert"""
+    if not port_monitors:
+        return
+    
     try:
+        from django.db import transaction
         from alerts.models import Alert, AlertType, AlertSeverity
-        
-        Alert.objects.create(
-            device=port_monitor.device,
-            title=f"Port {port_monitor.port} Unreachable",
-            message=f"Port {port_monitor.port} ({port_monitor.get_service_type_display()}) on {port_monitor.device.name} has been unreachable for {port_monitor.consecutive_failures} consecutive checks.",
-            alert_type=AlertType.CONNECTIVITY,
-            severity=AlertSeverity.HIGH if port_monitor.consecutive_failures >= 5 else AlertSeverity.MEDIUM,
-            is_active=True
-        )
-        
-        logger.info(f"Alert triggered for {port_monitor}")
+        from alerts.dedup import create_alerts
+        
+        alerts = [
+            Alert(
+                device=port_monitor.device,
+                title=f"Port {port_monitor.port} Unreachable",
+                message=f"Port {port_monitor.port} ({port_monitor.get_service_type_display()}) on {port_monitor.device.name} has been unreachable for {port_monitor.consecutive_failures} consecutive checks.",
+                alert_type=AlertType.PORT_DOWN,
+                severity=AlertSeverity.HIGH if port_monitor.consecutive_failures >= 5 else AlertSeverity.MEDIUM,
+                is_active=True
+            )
+            for port_monitor in port_monitors
+        ]
+        
+        # Each port of a device cools down on its own
+        with transaction.atomic():
+            create_alerts(alerts, keys=[
+                (port_monitor.device_id, AlertType.PORT_DOWN, port_monitor.port) for port_monitor in port_monitors
+            ])
+        logger.info(f"Alerts triggered for {len(alerts)} ports")
         
     except Exception as e:
-        logger.error(f"Error creating alert for {port_monitor}: {e}")
+        logger.error(f"Error creating alerts for {len(port_monitors)} ports: {e}")
+
+
+def discover_device_services(device_ids, ports=None, progress=None):
+    """
+    Scan devices for open candidate ports and monitor the ones found.
+
+    All devices are scanned concurrently, with every port of a device in
+    parallel. PortMonitor rows for newly found ports are bulk-created as
+    each batch of devices finishes.
+
+    Args:
+        device_ids: Devices to scan
+        ports: Ports to try, or a port list such as "22,8000-8100";
+            defaults to SERVICE_DISCOVERY_PORTS
+        progress: Called with the running totals and the latest results
+            after each batch
+
+    Returns:
+        Dictionary with devices_scanned, services_created and
+        discovered_services mapping device ids to "port (service)" strings
+    """
+    monitor_settings = getattr(settings, 'NETWORK_MONITOR', {})
+    if ports is None:
+        ports = SERVICE_DISCOVERY_PORTS
+    elif isinstance(ports, str):
+        ports = parse_ports(ports, monitor_settings.get('SERVICE_DISCOVERY_MAX_PORTS', 1024))
+    ports = sorted(set(int(port) for port in ports))
+
+    # Targets are read here because the scan runs on another thread without a DB connection
+    targets = [
+        (device_id, ip_address, ports)
+        for device_id, ip_address in Device.objects.filter(id__in=list(device_ids)).values_list('id', 'ip_address')
+    ]
+    batches = scan_services(
+        targets,
+        timeout=monitor_settings.get('SERVICE_DISCOVERY_TIMEOUT', 3.0),
+        max_concurrency=monitor_settings.get('PORT_CHECK_MAX_CONCURRENCY', 1000),
+        per_host_limit=monitor_settings.get('SERVICE_DISCOVERY_PER_HOST_LIMIT', 64),
+        max_hosts=monitor_settings.get('SERVICE_DISCOVERY_MAX_HOSTS', 256),
+    )
+
+    totals = {'devices_scanned': 0, 'services_created': 0, 'discovered_services': {}}
+    for results, scanned in batches:
+        totals['devices_scanned'] = scanned
+        found = [result for result in results if result['open_ports']]
+        if found:
+            existing = set(PortMonitor.objects.filter(
+                device_id__in=[result['key'] for result in found]
+            ).values_list('device_id', 'port'))
+
+            monitors = [
+                PortMonitor(device_id=result['key'], port=port, service_type=get_service_type_for_port(port),
+                            is_enabled=True, check_interval=300, timeout=10)
+                for result in found for port in result['open_ports']
+                if (result['key'], port) not in existing
+            ]
+            PortMonitor.objects.bulk_create(monitors, ignore_conflicts=True)
+
+            for monitor in monitors:
+                totals['discovered_services'].setdefault(monitor.device_id, []).append(
+                    f"{monitor.port} ({monitor.service_type})"
+                )
+            totals['services_created'] += len(monitors)
+
+        if progress:
+            progress(totals, results)
+
+    return totals
+
+
+@shared_task(bind=True)
+def discover_services(self, device_ids, ports=None):
+    """Discover services on many devices at once, reporting results as task state"""
+    def progress(totals, results):
+        if self.request.id and not self.request.is_eager:
+            self.update_state(state='PROGRESS', meta={
+                'devices_total': len(device_ids),
+                'devices_scanned': totals['devices_scanned'],
+                'services_created': totals['services_created'],
+                'results': [{'device_id': result['key'], 'open_ports': result['open_ports']} for result in results],
+            })
+
+    try:
+        totals = discover_device_services(device_ids, ports, progress)
+        logger.info(f"Service discovery completed for {totals['devices_scanned']} devices: "
+                    f"{totals['services_created']} new services")
+        return totals
+    except Exception as e:
+        logger.error(f"Error in service discovery for {len(device_ids)} devices: {e}")
+        return {'error': str(e)}
 
 
 @shared_task
-def auto_discover_services(device_id):
+def auto_discover_services(device_id, ports=None):
     """Auto-discover services on a device by scanning common ports"""
     try:
         device = Device.objects.get(id=device_id)
-        
-        # Common ports to scan
-        common_ports = [21, 22, 23, 25, 53, 80, 110, 143, 443, 993, 995, 1433, 3306, 5432, 8080, 8443]
-        
-        discovered_services = []
-        
-        for port in common_ports:
-            try:
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(5)  # Quick scan
-                
-                result = sock.connect_ex((device.ip_address, port))
-                sock.close()
-                
-                if result == 0:  # Port is open
-                    service_type = get_service_type_for_port(port)
-                    
-                    # Create or update port monitor
-                    port_monitor, created = PortMonitor.objects.get_or_create(
-                        device=device,
-                        port=port,
-                        defaults={
-                            'service_type': service_type,
-                            'is_enabled': True,
-                            'check_interval': 300,
-                            'timeout': 10
-                        }
-                    )
-                    
-                    if created:
-                        discovered_services.append(f"{port} ({service_type})")
-                        
-            except Exception as e:
-                logger.debug(f"Error scanning port {port} on {device.name}: {e}")
-        
+        totals = discover_device_services([device.id], ports)
+        discovered_services = totals['discovered_services'].get(device.id, [])
+
         logger.info(f"Service discovery completed for {device.name}: {discovered_services}")
         return {
             'device': device.name,
@@ -334,15 +473,13 @@ def auto_discover_services(device_id):
 
 @shared_task
 def cleanup_old_port_results():
-    """Clean up old port check results to manage database size"""
+    """Clean up old port and service check results to manage database size"""
     try:
-        # Keep only last 30 days of results
-        cutoff_date = timezone.now() - timedelta(days=30)
-        
-        deleted_count = PortCheckResult.objects.filter(timestamp__lt=cutoff_date).delete()[0]
+        tables = run_retention(names={'port_check_results', 'service_check_results'})
+        deleted_count = tables['port_check_results']['deleted']
         
         logger.info(f"Cleaned up {deleted_count} old port check results")
-        return {'deleted_count': deleted_count}
+        return {'deleted_count': deleted_count, 'tables': tables}
         
     except Exception as e:
         logger.error(f"Error cleaning up old port results: {e}")
@@ -7,26 +7,91 @@ import subprocess
 import platform
 import re
 import ipaddress
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from celery import shared_task
 from django.utils import timezone
 from django.conf import settings
+from django.db import transaction
 
 from devices.models import Device, DeviceStatus
-from .models import PingResult, SpeedTestResult, SystemMetrics
+from .models import PingResult, SpeedTestResult, SystemMetrics, TracerouteResult
+from .icmp import ping_hosts as icmp_ping_hosts, IcmpUnavailable
+from .scheduler import IntervalScheduler, get_window_mark
+from .write_buffer import django_buffer, all_metrics, publish_metrics
+from .rollups import record_ping_results, prune_rollups, rebuild_rollups
+from .retention import run_retention
+from .partitions import ensure_partitions
+from .archive import prune_archive
+from .discovery import DISCOVERY_PORTS, discovery_hosts, sweep as discovery_sweep, resolve_hostnames
+from .traceroute import trace_hosts, format_trace
+from .topology import record_paths
+from .device_state import record_ping_states, record_speed_state, refresh_device_states
+from .events import publish_events, publish_on_commit, status_event
+from .flapping import get_flap_detector
+from .port_models import PortMonitor
+from .discovery_models import DiscoveryScan, DiscoveredHost, DiscoveryStatus
+from .service_tasks import monitor_port_batch
 from alerts.models import Alert, AlertType
+from alerts.rules import ping_rule_inputs
+from alerts.tasks import evaluate_alert_rules, evaluate_speed_rules
+from alerts.dedup import create_alerts
 
 logger = logging.getLogger(__name__)
 
+# Hosts listed in the discovery task result; the rest are in DiscoveredHost
+DISCOVERY_RESULT_LIMIT = 1000
+
 
 class PingMonitor:
     """Ping monitoring utility"""
     
-    def __init__(self):
+    def __init__(self, use_icmp_engine=None):
         self.system = platform.system().lower()
+        monitor_settings = getattr(settings, 'NETWORK_MONITOR', {})
+        if use_icmp_engine is None:
+            use_icmp_engine = monitor_settings.get('USE_ICMP_ENGINE', True)
+        self.use_icmp_engine = use_icmp_engine
+        self.icmp_max_rate = monitor_settings.get('ICMP_MAX_RATE', 2000)
+        self.max_concurrent_pings = monitor_settings.get('MAX_CONCURRENT_PINGS', 50)
     
     def ping_host(self, host: str, timeout: int = 5, count: int = 4) -> dict:
         """Ping a host and return results"""
+        return self.ping_hosts([host], timeout=timeout, count=count)[host]
+    
+    def ping_hosts(self, hosts, timeout: int = 5, count: int = 4, timeouts=None) -> dict:
+        """Ping many hosts at once, keyed by host.
+        
+        Uses the asyncio ICMP engine so the whole batch shares one socket,
+        and falls back to one `ping` subprocess per host when ICMP sockets
+        are not permitted, running up to MAX_CONCURRENT_PINGS of them at once.
+        """
+        hosts = list(hosts)
+        timeouts = timeouts or {}
+        
+        if self.use_icmp_engine:
+            try:
+                return icmp_ping_hosts(
+                    hosts,
+                    timeout=timeout,
+                    count=count,
+                    timeouts=timeouts,
+                    max_rate=self.icmp_max_rate
+                )
+            except IcmpUnavailable as e:
+                logger.warning(f"ICMP engine unavailable, falling back to ping subprocess: {e}")
+                self.use_icmp_engine = False
+        
+        if not hosts:
+            return {}
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_concurrent_pings, len(hosts)))) as executor:
+            results = executor.map(
+                lambda host: self._system_ping(host, timeouts.get(host, timeout), count), hosts
+            )
+            return dict(zip(hosts, results))
+    
+    def _system_ping(self, host: str, timeout: int = 5, count: int = 4) -> dict:
+        """Ping a host with the system `ping` command"""
         result = {
             'host': host,
             'is_reachable': False,
@@ -34,6 +99,9 @@ class PingMonitor:
             'packet_loss': 100.0,
             'packets_sent': count,
             'packets_received': 0,
+            'min_time': None,
+            'max_time': None,
+            'avg_time': None,
             'error_message': None,
             'timestamp': time.time()
         }
@@ -108,9 +176,13 @@ class PingMonitor:
                     result['is_reachable'] = received > 0
                 
                 # Extract response time
-                time_match = re.search(r'min/avg/max/mdev = [\d.]+/([\d.]+)/[\d.]+/[\d.]+', output)
+                time_match = re.search(r'min/avg/max/(?:mdev|stddev) = ([\d.]+)/([\d.]+)/([\d.]+)/[\d.]+', output)
                 if time_match:
-                    result['response_time'] = float(time_match.group(1))
+                    min_time, avg_time, max_time = map(float, time_match.groups())
+                    result['min_time'] = min_time
+                    result['max_time'] = max_time
+                    result['avg_time'] = avg_time
+                    result['response_time'] = avg_time
         
         except Exception as e:
             logger.error(f"Error parsing ping output: {e}")
@@ -182,6 +254,81 @@ class SpeedTestMonitor:
         return result
 
 
+def apply_ping_status(device, ping_result, now):
+    """Set device status (and last_seen) from a ping result"""
+    if ping_result['is_reachable']:
+        if (ping_result['response_time'] and 
+            ping_result['response_time'] > device.alert_threshold_latency):
+            device.status = DeviceStatus.WARNING
+        else:
+            device.status = DeviceStatus.ONLINE
+        device.last_seen = now
+    else:
+        device.status = DeviceStatus.OFFLINE
+
+
+def flap_detector():
+    """Return the process-wide device flap detector"""
+    config = getattr(settings, 'NETWORK_MONITOR', {})
+    return get_flap_detector(
+        url=config.get('DEVICE_FLAP_URL'),
+        history=config.get('DEVICE_FLAP_HISTORY', 21),
+        low=config.get('DEVICE_FLAP_LOW_THRESHOLD', 25.0),
+        high=config.get('DEVICE_FLAP_HIGH_THRESHOLD', 50.0),
+        maxsize=config.get('DEVICE_FLAP_CACHE_SIZE', 100000)
+    )
+
+
+def apply_flap_detection(devices):
+    """Hold flapping devices in FLAPPING status
+    
+    Expects each device's status to be the one its ping result just gave
+    it. While a device flaps its status stays FLAPPING, so its state
+    changes raise no status writes, events or alerts until it settles.
+    """
+    if not devices or not getattr(settings, 'NETWORK_MONITOR', {}).get('DEVICE_FLAP_DETECTION_ENABLED', True):
+        return
+    
+    flaps = flap_detector().record_many((device.id, device.status) for device in devices)
+    for device in devices:
+        flap = flaps[device.id]
+        if flap.flapping:
+            if not flap.was_flapping:
+                logger.info(f"{device.name} started flapping ({flap.percent:.0f}% state changes)")
+            device.status = DeviceStatus.FLAPPING
+        elif flap.was_flapping:
+            logger.info(f"{device.name} stopped flapping ({flap.percent:.0f}% state changes)")
+
+
+def build_ping_result(device, ping_result):
+    """Build an unsaved PingResult row from a ping result dict"""
+    return PingResult(
+        device=device,
+        is_reachable=ping_result['is_reachable'],
+        response_time=ping_result['response_time'],
+        packet_loss=ping_result['packet_loss'],
+        packets_sent=ping_result['packets_sent'],
+        packets_received=ping_result['packets_received'],
+        min_time=ping_result.get('min_time'),
+        max_time=ping_result.get('max_time'),
+        avg_time=ping_result.get('avg_time'),
+        error_message=ping_result.get('error_message') or ''
+    )
+
+
+def record_ping_writes(rows):
+    """Fold freshly saved PingResult rows into the rollups and device states
+    
+    Runs inside the rows' write transaction. The alert rules see the rows
+    only once they are committed, on the rule worker's queue, so a failing
+    alert cannot roll back or requeue the results.
+    """
+    record_ping_results(rows)
+    record_ping_states(rows)
+    results = ping_rule_inputs(rows)
+    transaction.on_commit(lambda: evaluate_alert_rules.delay(results), robust=True)
+
+
 @shared_task(bind=True)
 def monitor_single_device(self, device_id):
     """Monitor a single device"""
@@ -199,32 +346,21 @@ def monitor_single_device(self, device_id):
             count=4
         )
         
-        # Store ping result
-        db_result = PingResult.objects.create(
-            device=device,
-            is_reachable=ping_result['is_reachable'],
-            response_time=ping_result['response_time'],
-            packet_loss=ping_result['packet_loss'],
-            packets_sent=ping_result['packets_sent'],
-            packets_received=ping_result['packets_received'],
-            error_message=ping_result.get('error_message', '')
+        # Queue ping result for the next bulk write
+        django_buffer(PingResult, after_write=record_ping_writes).add(
+            build_ping_result(device, ping_result)
         )
         
         # Update device status
         previous_status = device.status
-        
-        if ping_result['is_reachable']:
-            if (ping_result['response_time'] and 
-                ping_result['response_time'] > device.alert_threshold_latency):
-                device.status = DeviceStatus.WARNING
-            else:
-                device.status = DeviceStatus.ONLINE
-            device.last_seen = timezone.now()
-        else:
-            device.status = DeviceStatus.OFFLINE
-        
+        now = timezone.now()
+        apply_ping_status(device, ping_result, now)
+        apply_flap_detection([device])
         device.save()
         
+        if previous_status != device.status:
+            publish_events([status_event(device, previous_status, now)])
+        
         # Generate alerts if status changed
         if previous_status != device.status and device.alert_enabled:
             generate_status_alert.delay(device.id, previous_status, device.status)
@@ -247,35 +383,189 @@ def monitor_single_device(self, device_id):
         self.retry(countdown=60, max_retries=3)
 
 
+@shared_task(bind=True)
+def monitor_device_batch(self, device_ids, count=4):
+    """Monitor a chunk of devices with one concurrent probe run
+    
+    All devices in the chunk are pinged together through the ICMP engine,
+    then their results are written with one bulk_create and one bulk_update.
+    """
+    try:
+        devices = list(
+            Device.objects.filter(id__in=device_ids, is_active=True, ping_enabled=True)
+        )
+        if not devices:
+            return {'monitored': 0, 'status_changes': 0}
+        
+        ping_monitor = PingMonitor()
+        ping_results = ping_monitor.ping_hosts(
+            [device.ip_address for device in devices],
+            count=count,
+            timeouts={device.ip_address: device.ping_timeout for device in devices}
+        )
+        
+        now = timezone.now()
+        rows = []
+        changed = []
+        events = []
+        previous_statuses = {}
+        
+        for device in devices:
+            ping_result = ping_results[device.ip_address]
+            rows.append(build_ping_result(device, ping_result))
+            
+            previous_statuses[device.id] = device.status
+            apply_ping_status(device, ping_result, now)
+            device.updated_at = now
+        
+        apply_flap_detection(devices)
+        
+        for device in devices:
+            previous_status = previous_statuses[device.id]
+            if previous_status != device.status:
+                events.append(status_event(device, previous_status, now))
+                if device.alert_enabled:
+                    changed.append((device.id, previous_status, device.status))
+        
+        with transaction.atomic():
+            PingResult.objects.bulk_create(rows)
+            record_ping_writes(rows)
+            Device.objects.bulk_update(devices, ['status', 'last_seen', 'updated_at'])
+            publish_on_commit(events)
+        
+        if changed:
+            generate_status_alerts.delay(changed)
+        
+        logger.info(f"Monitored batch of {len(devices)} devices, {len(changed)} status changes")
+        
+        return {
+            'monitored': len(devices),
+            'reachable': sum(1 for row in rows if row.is_reachable),
+            'status_changes': len(changed)
+        }
+        
+    except Exception as e:
+        logger.error(f"Error monitoring device batch: {e}")
+        self.retry(countdown=60, max_retries=3)
+
+
+def chunked(items, size):
+    """Split a list into consecutive chunks of at most `size` items"""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
 @shared_task
 def monitor_all_devices():
-    """Monitor all active devices"""
-    devices = Device.objects.filter(is_active=True, ping_enabled=True)
+    """Monitor all active devices in batches"""
+    device_ids = list(
+        Device.objects.filter(is_active=True, ping_enabled=True)
+        .order_by('id')
+        .values_list('id', flat=True)
+    )
     
-    if not devices.exists():
+    if not device_ids:
         logger.info("No devices to monitor")
         return {'message': 'No devices to monitor'}
     
+    batch_size = getattr(settings, 'NETWORK_MONITOR', {}).get('MONITOR_BATCH_SIZE', 500)
     results = []
     
-    for device in devices:
+    for batch in chunked(device_ids, batch_size):
         try:
-            result = monitor_single_device.delay(device.id)
+            result = monitor_device_batch.delay(batch)
             results.append({
-                'device_id': device.id,
+                'device_count': len(batch),
                 'task_id': result.id
             })
         except Exception as e:
-            logger.error(f"Error queuing monitoring for device {device.id}: {e}")
+            logger.error(f"Error queuing monitoring batch starting at device {batch[0]}: {e}")
     
-    logger.info(f"Queued monitoring for {len(results)} devices")
+    queued = sum(r['device_count'] for r in results)
+    logger.info(f"Queued monitoring for {queued} devices in {len(results)} batches")
     return {
-        'queued_devices': len(results),
-        'total_devices': devices.count(),
+        'queued_devices': queued,
+        'total_devices': len(device_ids),
+        'batches': len(results),
         'results': results
     }
 
 
+# Per-process scheduler state; due slots are deterministic, so every worker
+# process that runs the dispatch tick agrees on what is due
+_scheduler = None
+_scheduler_synced_at = 0.0
+
+
+def sync_scheduler(scheduler, now):
+    """Load ping, speed test and port check intervals into the scheduler"""
+    intervals = {}
+    
+    devices = Device.objects.filter(is_active=True).values_list(
+        'id', 'ping_enabled', 'ping_interval', 'speed_test_enabled', 'speed_test_interval'
+    )
+    for device_id, ping_enabled, ping_interval, speed_enabled, speed_interval in devices:
+        if ping_enabled:
+            intervals[('ping', device_id)] = ping_interval
+        if speed_enabled:
+            intervals[('speed', device_id)] = speed_interval
+    
+    port_monitors = PortMonitor.objects.filter(
+        is_enabled=True, device__is_active=True
+    ).values_list('id', 'check_interval')
+    for port_monitor_id, check_interval in port_monitors:
+        intervals[('port', port_monitor_id)] = check_interval
+    
+    scheduler.sync(intervals, now)
+
+
+@shared_task
+def dispatch_due_checks():
+    """Dispatch the ping, speed test and port checks that are due this tick"""
+    global _scheduler, _scheduler_synced_at
+    
+    monitor_settings = getattr(settings, 'NETWORK_MONITOR', {})
+    tick = monitor_settings.get('SCHEDULER_TICK_SECONDS', 10)
+    resync = monitor_settings.get('SCHEDULER_RESYNC_SECONDS', 60)
+    batch_size = monitor_settings.get('MONITOR_BATCH_SIZE', 500)
+    
+    now = time.time()
+    if _scheduler is None or _scheduler.tick != tick:
+        _scheduler = IntervalScheduler(tick=tick)
+        _scheduler_synced_at = 0.0
+    
+    if now - _scheduler_synced_at >= resync:
+        sync_scheduler(_scheduler, now)
+        _scheduler_synced_at = now
+    
+    # A tick that runs late also covers the windows skipped since the last one handled
+    _window_start, window_end = _scheduler.window(now)
+    since = get_window_mark(monitor_settings.get('SCHEDULER_STATE_URL')).advance(window_end)
+    
+    due = {'ping': [], 'speed': [], 'port': []}
+    for kind, object_id in _scheduler.due(now, since=since):
+        due[kind].append(object_id)
+    
+    for batch in chunked(due['ping'], batch_size):
+        monitor_device_batch.delay(batch)
+    for device_id in due['speed']:
+        run_speed_test_for_device.delay(device_id)
+    for batch in chunked(due['port'], batch_size):
+        monitor_port_batch.delay(batch)
+    
+    if any(due.values()):
+        logger.info(
+            f"Dispatched {len(due['ping'])} pings, {len(due['speed'])} speed tests, "
+            f"{len(due['port'])} port checks"
+        )
+    
+    return {
+        'pings': len(due['ping']),
+        'speed_tests': len(due['speed']),
+        'port_checks': len(due['port']),
+        'scheduled': len(_scheduler)
+    }
+
+
 @shared_task
 def run_speed_test_for_device(device_id):
     """Run speed test for a specific device"""
@@ -294,7 +584,7 @@ def run_speed_test_for_device(device_id):
         speed_result = speed_monitor.run_speed_test()
         
         # Store speed test result
-        SpeedTestResult.objects.create(
+        result = SpeedTestResult.objects.create(
             device=device,
             download_speed=speed_result['download_speed'],
             upload_speed=speed_result['upload_speed'],
@@ -305,6 +595,9 @@ def run_speed_test_for_device(device_id):
             is_successful=speed_result['is_successful'],
             error_message=speed_result.get('error_message', '')
         )
+        record_speed_state(result)
+        if result.is_successful:
+            evaluate_speed_rules.delay(device.id, result.timestamp.isoformat(), result.download_speed)
         
         logger.info(f"Speed test completed for {device.name}")
         
@@ -322,60 +615,95 @@ def run_speed_test_for_device(device_id):
         return {'error': str(e)}
 
 
+def build_status_alert(device, previous_status, current_status):
+    """Build the unsaved alert for a device status change, or None when none is needed"""
+    if current_status == DeviceStatus.FLAPPING:
+        alert_type = AlertType.FLAPPING
+        severity = 'medium'
+        title = f"Device {device.name} is flapping"
+        message = (f"Device {device.name} ({device.ip_address}) keeps changing state. "
+                   f"Its status alerts are held until it settles.")
+    elif current_status == DeviceStatus.OFFLINE:
+        alert_type = AlertType.DEVICE_DOWN
+        severity = 'high'
+        title = f"Device {device.name} is DOWN"
+        message = f"Device {device.name} ({device.ip_address}) is no longer reachable."
+    elif current_status == DeviceStatus.ONLINE and previous_status == DeviceStatus.OFFLINE:
+        alert_type = AlertType.DEVICE_UP
+        severity = 'medium'
+        title = f"Device {device.name} is UP"
+        message = f"Device {device.name} ({device.ip_address}) is now reachable again."
+    elif current_status == DeviceStatus.ONLINE and previous_status == DeviceStatus.FLAPPING:
+        alert_type = AlertType.DEVICE_UP
+        severity = 'low'
+        title = f"Device {device.name} is stable"
+        message = f"Device {device.name} ({device.ip_address}) has stopped flapping and is reachable."
+    elif current_status == DeviceStatus.WARNING:
+        alert_type = AlertType.HIGH_LATENCY
+        severity = 'medium'
+        title = f"Device {device.name} has performance issues"
+        message = f"Device {device.name} ({device.ip_address}) is experiencing high latency."
+    else:
+        return None
+    
+    return Alert(
+        device=device,
+        alert_type=alert_type,
+        severity=severity,
+        title=title,
+        message=message
+    )
+
+
+@shared_task
+def generate_status_alerts(changes):
+    """Generate alerts for a batch of device status changes with one bulk insert"""
+    try:
+        devices = Device.objects.in_bulk({device_id for device_id, _, _ in changes})
+        alerts = [
+            build_status_alert(devices[device_id], previous_status, current_status)
+            for device_id, previous_status, current_status in changes
+            if device_id in devices
+        ]
+        alerts = [alert for alert in alerts if alert is not None]
+        
+        with transaction.atomic():
+            created = create_alerts(alerts)
+        
+        logger.info(f"Generated {len(created)} status alerts for {len(changes)} status changes")
+        
+        return {
+            'created': len(created),
+            'skipped': len(changes) - len(created)
+        }
+        
+    except Exception as e:
+        logger.error(f"Error generating status alerts: {e}")
+        return {'error': str(e)}
+
+
 @shared_task
 def generate_status_alert(device_id, previous_status, current_status):
     """Generate alert for device status change"""
     try:
         device = Device.objects.get(id=device_id)
         
-        # Check for recent similar alerts (cooldown)
-        cooldown_minutes = getattr(settings, 'NETWORK_MONITOR', {}).get('ALERT_COOLDOWN_MINUTES', 15)
-        cooldown_time = timezone.now() - timedelta(minutes=cooldown_minutes)
-        
-        recent_alert = Alert.objects.filter(
-            device=device,
-            created_at__gt=cooldown_time,
-            is_active=True
-        ).first()
+        alert = build_status_alert(device, previous_status, current_status)
+        if alert is None:
+            return {'skipped': True, 'reason': 'No alert needed'}
         
-        if recent_alert:
+        # Skip the alert while its (device, alert type) is cooling down
+        created = create_alerts([alert])
+        if not created:
             logger.info(f"Skipping alert for {device.name} - recent alert exists")
             return {'skipped': True, 'reason': 'Recent alert exists'}
         
-        # Determine alert type and details
-        if current_status == DeviceStatus.OFFLINE:
-            alert_type = AlertType.DEVICE_DOWN
-            severity = 'high'
-            title = f"Device {device.name} is DOWN"
-            message = f"Device {device.name} ({device.ip_address}) is no longer reachable."
-        elif current_status == DeviceStatus.ONLINE and previous_status == DeviceStatus.OFFLINE:
-            alert_type = AlertType.DEVICE_UP
-            severity = 'medium'
-            title = f"Device {device.name} is UP"
-            message = f"Device {device.name} ({device.ip_address}) is now reachable again."
-        elif current_status == DeviceStatus.WARNING:
-            alert_type = AlertType.HIGH_LATENCY
-            severity = 'medium'
-            title = f"Device {device.name} has performance issues"
-            message = f"Device {device.name} ({device.ip_address}) is experiencing high latency."
-        else:
-            return {'skipped': True, 'reason': 'No alert needed'}
-        
-        # Create alert
-        alert = Alert.objects.create(
-            device=device,
-            alert_type=alert_type,
-            severity=severity,
-            title=title,
-            message=message
-        )
-        
-        logger.info(f"Generated alert: {title}")
+        logger.info(f"Generated alert: {alert.title}")
         
         return {
             'alert_id': alert.id,
-            'title': title,
-            'severity': severity
+            'title': alert.title,
+            'severity': alert.severity
         }
         
     except Device.DoesNotExist:
@@ -388,38 +716,26 @@ def generate_status_alert(device_id, previous_status, current_status):
 
 @shared_task
 def cleanup_old_data():
-    """Clean up old monitoring data"""
+    """Clean up old monitoring data in bounded batches"""
     try:
-        max_days = getattr(settings, 'NETWORK_MONITOR', {}).get('MAX_PING_HISTORY_DAYS', 30)
-        cutoff_date = timezone.now() - timedelta(days=max_days)
-        
-        # Delete old ping results
-        old_pings = PingResult.objects.filter(timestamp__lt=cutoff_date)
-        ping_count = old_pings.count()
-        old_pings.delete()
-        
-        # Delete old speed test results (keep longer - 90 days)
-        speed_cutoff = timezone.now() - timedelta(days=90)
-        old_speeds = SpeedTestResult.objects.filter(timestamp__lt=speed_cutoff)
-        speed_count = old_speeds.count()
-        old_speeds.delete()
-        
-        # Delete resolved alerts older than 30 days
-        alert_cutoff = timezone.now() - timedelta(days=30)
-        old_alerts = Alert.objects.filter(
-            resolved_at__lt=alert_cutoff,
-            is_active=False
-        )
-        alert_count = old_alerts.count()
-        old_alerts.delete()
+        tables = run_retention()
         
-        logger.info(f"Cleaned up {ping_count} ping results, {speed_count} speed tests, {alert_count} alerts")
+        # Delete rollups past their per-resolution retention
+        rollup_count = prune_rollups()
+        archive_days = prune_archive() if settings.NETWORK_MONITOR.get('ARCHIVE_ENABLED') else 0
+        
+        logger.info("Cleaned up " + ", ".join(
+            f"{stats['deleted']} {name}" for name, stats in tables.items()
+        ) + f", {rollup_count} rollups")
         
         return {
-            'ping_results_deleted': ping_count,
-            'speed_results_deleted': speed_count,
-            'alerts_deleted': alert_count,
-            'cutoff_date': cutoff_date.isoformat()
+            'ping_results_deleted': tables['ping_results']['deleted'],
+            'speed_results_deleted': tables['speed_results']['deleted'],
+            'alerts_deleted': tables['alerts']['deleted'],
+            'rollups_deleted': rollup_count,
+            'archive_days_pruned': archive_days,
+            'cutoff_date': tables['ping_results']['cutoff'],
+            'tables': tables
         }
         
     except Exception as e:
@@ -427,6 +743,43 @@ def cleanup_old_data():
         return {'error': str(e)}
 
 
+@shared_task
+def maintain_ping_partitions():
+    """Create the ping result partitions of the coming days"""
+    try:
+        return ensure_partitions()
+    except Exception as e:
+        logger.error(f"Error maintaining ping partitions: {e}")
+        return {'error': str(e)}
+
+
+@shared_task
+def write_buffer_metrics():
+    """Publish and report queue depth and flush latency of this worker's write-behind buffers"""
+    publish_metrics(force=True)
+    return {'buffers': all_metrics()}
+
+
+@shared_task
+def rebuild_ping_rollups(days=7):
+    """Recompute ping and port check rollups from raw results for the last N closed days"""
+    try:
+        return rebuild_rollups(timezone.now() - timedelta(days=days))
+    except Exception as e:
+        logger.error(f"Error rebuilding rollups: {e}")
+        return {'error': str(e)}
+
+
+@shared_task
+def refresh_device_state_snapshots(device_ids=None):
+    """Rebuild the latest-state snapshot of devices from raw results and rollups"""
+    try:
+        return {'refreshed': refresh_device_states(device_ids)}
+    except Exception as e:
+        logger.error(f"Error refreshing device states: {e}")
+        return {'error': str(e)}
+
+
 @shared_task
 def update_system_metrics():
     """Update system metrics"""
@@ -452,81 +805,75 @@ def update_system_metrics():
         return {'error': str(e)}
 
 
+def trace_devices(devices):
+    """
+    Trace the routes to many devices at once and store the results.
+
+    Args:
+        devices: Devices to trace
+
+    Returns:
+        Dictionary mapping device ids to trace result dictionaries, with
+        path_changed set when the route differs from the previous trace
+    """
+    monitor_settings = getattr(settings, 'NETWORK_MONITOR', {})
+    devices = list(devices)
+    traces = trace_hosts(
+        [device.ip_address for device in devices],
+        max_hops=monitor_settings.get('TRACEROUTE_MAX_HOPS', 15),
+        probes=monitor_settings.get('TRACEROUTE_PROBES', 3),
+        timeout=monitor_settings.get('TRACEROUTE_TIMEOUT', 2.0),
+        max_rate=monitor_settings.get('ICMP_MAX_RATE', 2000),
+        max_traces=monitor_settings.get('TRACEROUTE_MAX_CONCURRENT', 256),
+    )
+
+    now = timezone.now()
+    results = {device.id: dict(traces[device.ip_address]) for device in devices}
+    with transaction.atomic():
+        paths = record_paths(results, now)
+        for device in devices:
+            results[device.id]['path_changed'] = device.id in paths and paths[device.id]['changed']
+
+        TracerouteResult.objects.bulk_create([
+            TracerouteResult(
+                device=device,
+                hops=results[device.id]['hops'],
+                total_hops=results[device.id]['total_hops'],
+                destination_reached=results[device.id]['destination_reached'],
+                total_time=results[device.id]['total_time'],
+                path_hash=paths[device.id]['path_hash'] if device.id in paths else '',
+                path_changed=results[device.id]['path_changed'],
+                error_message=results[device.id]['error_message'] or '',
+                is_successful=not results[device.id]['error_message'],
+            )
+            for device in devices
+        ])
+        for device in devices:
+            device.traceroute_hops = results[device.id]['hops']
+            device.last_traceroute = now
+        Device.objects.bulk_update(devices, ['traceroute_hops', 'last_traceroute'], batch_size=500)
+
+    return results
+
+
 @shared_task
 def run_traceroute_for_device(device_id):
     """Run traceroute for a specific device"""
     try:
         device = Device.objects.get(id=device_id, is_active=True)
+        trace = trace_devices([device])[device.id]
 
-        # Perform traceroute
-        import subprocess
-        import platform
-        import re
-
-        system = platform.system().lower()
-        if system == 'windows':
-            cmd = ['tracert', '-h', '15', device.ip_address]
-        else:
-            cmd = ['traceroute', '-m', '15', device.ip_address]
-
-        try:
-            process = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-            output = process.stdout
-
-            # Parse traceroute output
-            hops = []
-            if system == 'windows':
-                # Parse Windows tracert output
-                lines = output.split('\n')
-                for line in lines:
-                    hop_match = re.search(r'^\s*(\d+)\s+(.+)', line)
-                    if hop_match:
-                        hop_num = int(hop_match.group(1))
-                        hop_data = hop_match.group(2).strip()
-                        hops.append({
-                            'hop': hop_num,
-                            'data': hop_data
-                        })
-            else:
-                # Parse Unix traceroute output
-                lines = output.split('\n')
-                for line in lines:
-                    hop_match = re.search(r'^\s*(\d+)\s+(.+)', line)
-                    if hop_match:
-                        hop_num = int(hop_match.group(1))
-                        hop_data = hop_match.group(2).strip()
-                        hops.append({
-                            'hop': hop_num,
-                            'data': hop_data
-                        })
-
-            # Store traceroute result
-            from .models import TracerouteResult
-            TracerouteResult.objects.create(
-                device=device,
-                hops=hops,
-                total_hops=len(hops),
-                destination_reached=process.returncode == 0,
-                is_successful=True
-            )
-
-            # Update device traceroute info
-            device.traceroute_hops = hops
-            device.last_traceroute = timezone.now()
-            device.save()
+        logger.info(f"Traceroute completed for {device.name}")
 
-            logger.info(f"Traceroute completed for {device.name}")
-
-            return {
-                'device_id': device.id,
-                'device_name': device.name,
-                'hops': hops,
-                'total_hops': len(hops),
-                'output': output
-            }
-
-        except subprocess.TimeoutExpired:
-            return {'error': 'Traceroute timed out'}
+        return {
+            'device_id': device.id,
+            'device_name': device.name,
+            'hops': trace['hops'],
+            'total_hops': trace['total_hops'],
+            'destination_reached': trace['destination_reached'],
+            'path_changed': trace['path_changed'],
+            'output': format_trace(trace)
+        }
 
     except Device.DoesNotExist:
         logger.error(f"Device {device_id} not found")
@@ -537,57 +884,101 @@ def run_traceroute_for_device(device_id):
 
 
 @shared_task
-def discover_network_devices(subnet='192.168.1.0/24'):
-    """Discover devices on a network subnet"""
+def run_traceroutes(device_ids=None):
+    """Run traceroute for many devices concurrently (all active devices by default)"""
     try:
-        import ipaddress
-        import subprocess
-        import concurrent.futures
+        devices = Device.objects.filter(is_active=True)
+        if device_ids is not None:
+            devices = devices.filter(id__in=device_ids)
 
-        network = ipaddress.ip_network(subnet, strict=False)
-        discovered_devices = []
+        traces = trace_devices(devices)
+        reached = sum(1 for trace in traces.values() if trace['destination_reached'])
 
-        def ping_host(ip):
-            """Ping a single host"""
-            try:
-                system = platform.system().lower()
-                if system == 'windows':
-                    cmd = ['ping', '-n', '1', '-w', '1000', str(ip)]
-                else:
-                    cmd = ['ping', '-c', '1', '-W', '1', str(ip)]
+        changed = sorted(device_id for device_id, trace in traces.items() if trace['path_changed'])
 
-                process = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
+        logger.info(f"Traceroute completed for {len(traces)} devices, {reached} reached, "
+                    f"{len(changed)} route changes")
+        return {'devices_traced': len(traces), 'destinations_reached': reached, 'route_changes': changed}
 
-                if process.returncode == 0:
-                    return {
-                        'ip': str(ip),
-                        'reachable': True,
-                        'hostname': None  # Could add hostname resolution here
-                    }
-            except Exception:
-                pass
+    except Exception as e:
+        logger.error(f"Error running traceroutes: {e}")
+        return {'error': str(e)}
 
-            return None
 
-        # Ping all IPs in the subnet (limit to reasonable size)
-        ips_to_check = list(network.hosts())[:254]  # Limit to /24 equivalent
+@shared_task
+def discover_network_devices(subnet='192.168.1.0/24', scan_id=None, resolve_dns=None):
+    """Discover devices on a network subnet of up to a /16"""
+    monitor_settings = getattr(settings, 'NETWORK_MONITOR', {})
+    if resolve_dns is None:
+        resolve_dns = monitor_settings.get('DISCOVERY_RESOLVE_DNS', True)
+
+    if scan_id is None:
+        scan = DiscoveryScan.objects.create(subnet=subnet)
+    else:
+        try:
+            scan = DiscoveryScan.objects.get(pk=scan_id)
+        except DiscoveryScan.DoesNotExist:
+            logger.error(f"Discovery scan {scan_id} not found")
+            return {'error': f'Discovery scan {scan_id} not found'}
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=50) as executor:
-            futures = [executor.submit(ping_host, ip) for ip in ips_to_check]
+    try:
+        hosts_total, addresses = discovery_hosts(subnet, monitor_settings.get('DISCOVERY_MAX_HOSTS', 65536))
+        DiscoveryScan.objects.filter(pk=scan.pk).update(
+            status=DiscoveryStatus.RUNNING, hosts_total=hosts_total, started_at=timezone.now()
+        )
 
-            for future in concurrent.futures.as_completed(futures):
-                result = future.result()
-                if result:
-                    discovered_devices.append(result)
+        found = 0
+        batches = discovery_sweep(
+            addresses,
+            timeout=monitor_settings.get('DISCOVERY_TIMEOUT', 1.0),
+            ports=monitor_settings.get('DISCOVERY_PORTS', DISCOVERY_PORTS),
+            max_rate=monitor_settings.get('DISCOVERY_MAX_RATE', 2000),
+            max_in_flight=monitor_settings.get('DISCOVERY_MAX_IN_FLIGHT', 2048),
+            use_icmp=monitor_settings.get('USE_ICMP_ENGINE', True),
+        )
+        # Hits are written as they arrive, so the scan can be followed while it runs
+        for hits, scanned in batches:
+            if hits:
+                DiscoveredHost.objects.bulk_create([
+                    DiscoveredHost(scan_id=scan.pk, ip_address=hit['ip'], method=hit['method'],
+                                   port=hit['port'], response_time=hit['response_time'])
+                    for hit in hits
+                ], ignore_conflicts=True)
+                found += len(hits)
+            DiscoveryScan.objects.filter(pk=scan.pk).update(hosts_scanned=scanned, hosts_found=found)
+
+        if resolve_dns:
+            hosts = list(DiscoveredHost.objects.filter(scan_id=scan.pk).only('id', 'ip_address'))
+            names = resolve_hostnames(
+                [host.ip_address for host in hosts], monitor_settings.get('DISCOVERY_DNS_WORKERS', 64)
+            )
+            named = [host for host in hosts if host.ip_address in names]
+            for host in named:
+                host.hostname = names[host.ip_address][:255]
+            DiscoveredHost.objects.bulk_update(named, ['hostname'], batch_size=1000)
 
-        logger.info(f"Network discovery completed for {subnet}: {len(discovered_devices)} devices found")
+        DiscoveryScan.objects.filter(pk=scan.pk).update(
+            status=DiscoveryStatus.COMPLETED, hosts_scanned=hosts_total, finished_at=timezone.now()
+        )
+        logger.info(f"Network discovery completed for {subnet}: {found} devices found")
 
+        devices = DiscoveredHost.objects.filter(scan_id=scan.pk).order_by('ip_address')
         return {
             'subnet': subnet,
-            'devices_found': len(discovered_devices),
-            'devices': discovered_devices
+            'scan_id': scan.pk,
+            'hosts_scanned': hosts_total,
+            'devices_found': found,
+            # Large sweeps are read from the scan's hosts instead of the task result
+            'devices': [
+                {'ip': host.ip_address, 'reachable': True, 'hostname': host.hostname or None,
+                 'method': host.method, 'port': host.port}
+                for host in devices[:DISCOVERY_RESULT_LIMIT]
+            ]
         }
 
     except Exception as e:
         logger.error(f"Error in network discovery for {subnet}: {e}")
+        DiscoveryScan.objects.filter(pk=scan.pk).update(
+            status=DiscoveryStatus.FAILED, error_message=str(e), finished_at=timezone.now()
+        )
         return {'error': str(e)}
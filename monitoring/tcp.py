@@ -0,0 +1,118 @@
+"""
+Asyncio TCP connect engine for checking many (host, port) pairs at once
+"""
+import asyncio
+import errno
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Tuple
+
+
+def empty_result(host: str, port: int) -> Dict:
+    """Return a port check result dict for a connection that did not succeed."""
+    return {
+        'host': host,
+        'port': port,
+        'is_reachable': False,
+        'response_time': None,
+        'error_message': None,
+        'timestamp': time.time()
+    }
+
+
+def describe_error(error: BaseException) -> str:
+    """Turn a connection exception into a short error message."""
+    if isinstance(error, asyncio.TimeoutError):
+        return "Connection timed out"
+    if isinstance(error, ConnectionRefusedError):
+        return f"Connection refused (code: {errno.ECONNREFUSED})"
+    if isinstance(error, OSError) and error.errno:
+        return f"Connection failed (code: {error.errno}): {error.strerror}"
+    return str(error) or error.__class__.__name__
+
+
+class AsyncTcpChecker:
+    """
+    Open TCP connections to many (host, port) pairs concurrently.
+
+    A global semaphore caps the number of sockets in flight, and a
+    per-host semaphore keeps a device with many monitored ports from being
+    hit with all of them at once. Filtered ports only cost their own
+    timeout instead of stalling every check queued behind them.
+    """
+
+    def __init__(self, timeout: float = 10.0, max_concurrency: int = 1000,
+                 per_host_limit: int = 20):
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.per_host_limit = per_host_limit
+        self._semaphore = None
+        self._host_semaphores = None
+
+    def _host_semaphore(self, host: str) -> asyncio.Semaphore:
+        if self._host_semaphores is None:
+            self._host_semaphores = defaultdict(lambda: asyncio.Semaphore(self.per_host_limit))
+        return self._host_semaphores[host]
+
+    async def check(self, host: str, port: int, timeout: Optional[float] = None) -> Dict:
+        """
+        Check whether a TCP connection to host:port can be established.
+
+        Args:
+            host: IP address or hostname
+            port: TCP port
+            timeout: Connect timeout in seconds (defaults to the checker's)
+
+        Returns:
+            Dictionary with port check results
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        result = empty_result(host, port)
+
+        async with self._host_semaphore(host), self._semaphore:
+            started = time.perf_counter()
+            try:
+                _reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(host, port), timeout or self.timeout
+                )
+            except (asyncio.TimeoutError, OSError) as e:
+                result['error_message'] = describe_error(e)
+                return result
+
+            result['response_time'] = round((time.perf_counter() - started) * 1000, 3)
+            result['is_reachable'] = True
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+        return result
+
+    async def check_many(self, targets: Iterable[Tuple]) -> Dict[Tuple[str, int], Dict]:
+        """
+        Check many targets concurrently.
+
+        Args:
+            targets: (host, port) or (host, port, timeout) tuples
+
+        Returns:
+            Dictionary mapping each (host, port) to its check result
+        """
+        targets = {(target[0], int(target[1])): (target[2] if len(target) > 2 else None)
+                   for target in targets}
+        results = await asyncio.gather(
+            *(self.check(host, port, timeout) for (host, port), timeout in targets.items())
+        )
+        return dict(zip(targets.keys(), results))
+
+
+def check_ports(targets: Iterable[Tuple], timeout: float = 10.0,
+                **kwargs) -> Dict[Tuple[str, int], Dict]:
+    """Synchronously check many (host, port[, timeout]) targets with the asyncio engine."""
+    async def run():
+        checker = AsyncTcpChecker(timeout=timeout, **kwargs)
+        return await checker.check_many(targets)
+
+    return asyncio.run(run())
@@ -0,0 +1,247 @@
+"""
+Incremental network topology from traceroute hops
+
+Each trace is reduced to its path, the hop addresses in order, and the
+path's SHA-1. Hops that are silent in a trace that otherwise matches the
+stored path keep their stored address, so a rate-limiting router does
+not look like a route change. Comparing that hash with the one stored on the device's
+DevicePath tells in O(1) whether the route changed, and only changed
+routes rewrite their DevicePathHop rows. Answering hops become
+TopologyNode rows and consecutive answering hops TopologyEdge rows whose
+latency statistics are merged in place, so the graph grows with every
+run without being rebuilt. DevicePathHop is indexed by node, so the
+devices behind any upstream hop are one query away.
+"""
+import hashlib
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+EDGE_STAT_FIELDS = ['count', 'latency_sum', 'latency_min', 'latency_max', 'last_seen']
+
+
+def path_addresses(hops: List[Dict]) -> List[Optional[str]]:
+    """Return the hop addresses of a trace in TTL order, None for silent hops."""
+    return [hop['address'] for hop in sorted(hops, key=lambda hop: hop['hop'])]
+
+
+def path_hash(addresses: List[Optional[str]]) -> str:
+    """Hash a path; silent hops count, so a hop that stops answering changes the hash."""
+    return hashlib.sha1('>'.join(address or '*' for address in addresses).encode()).hexdigest()
+
+
+def carry_silent_hops(addresses: List[Optional[str]], previous: Optional[List[Optional[str]]]) -> List[Optional[str]]:
+    """
+    Fill the silent hops of a path from the previous path of the same route.
+
+    Routers that rate-limit ICMP answer some traces and not others. When
+    every hop that answered matches the previous path, a silent hop is
+    taken to be the one that answered there before, so a flaky hop does
+    not count as a route change on every other trace.
+    """
+    if not previous or len(previous) != len(addresses):
+        return addresses
+    if any(address is not None and address != before for address, before in zip(addresses, previous)):
+        return addresses
+    return [before if address is None else address for address, before in zip(addresses, previous)]
+
+
+def path_links(hops: List[Dict]) -> List[Tuple[str, str, Optional[float]]]:
+    """
+    Return the links between consecutive answering hops.
+
+    Silent hops are skipped over, so a link may span several TTLs.
+
+    Returns:
+        List of (source, target, latency) tuples, where latency is the RTT
+        difference between the two hops in ms (floored at 0), or None when
+        either hop has no RTT
+    """
+    links = []
+    previous = None
+    for hop in sorted(hops, key=lambda hop: hop['hop']):
+        if hop['address'] is None:
+            continue
+        if previous is not None and previous['address'] != hop['address']:
+            latency = None
+            if previous['avg_rtt'] is not None and hop['avg_rtt'] is not None:
+                latency = round(max(0.0, hop['avg_rtt'] - previous['avg_rtt']), 3)
+            links.append((previous['address'], hop['address'], latency))
+        previous = hop
+    return links
+
+
+def _merge_link_stats(links: Iterable[Tuple[str, str, Optional[float]]]) -> Dict[Tuple[str, str], Dict]:
+    stats = {}
+    for source, target, latency in links:
+        edge = stats.setdefault((source, target), {'count': 0, 'latency_sum': 0.0,
+                                                   'latency_min': None, 'latency_max': None})
+        edge['count'] += 1
+        if latency is not None:
+            edge['latency_sum'] += latency
+            edge['latency_min'] = latency if edge['latency_min'] is None else min(edge['latency_min'], latency)
+            edge['latency_max'] = latency if edge['latency_max'] is None else max(edge['latency_max'], latency)
+    return stats
+
+
+def _upsert_nodes(addresses, now) -> Dict[str, int]:
+    from .topology_models import TopologyNode
+
+    TopologyNode.objects.bulk_create(
+        [TopologyNode(address=address, last_seen=now) for address in addresses], ignore_conflicts=True
+    )
+    nodes = TopologyNode.objects.filter(address__in=addresses)
+    nodes.update(last_seen=now)
+    return dict(nodes.values_list('address', 'id'))
+
+
+def _merge_edges(link_stats: Dict[Tuple[str, str], Dict], node_ids: Dict[str, int], now):
+    from .topology_models import TopologyEdge
+
+    keys = sorted((node_ids[source], node_ids[target]) for source, target in link_stats)
+    if not keys:
+        return
+
+    TopologyEdge.objects.bulk_create(
+        [TopologyEdge(source_id=source, target_id=target, last_seen=now) for source, target in keys],
+        ignore_conflicts=True
+    )
+    existing = TopologyEdge.objects.select_for_update().filter(
+        source_id__in={key[0] for key in keys}, target_id__in={key[1] for key in keys}
+    ).order_by('pk')
+    edges = {(edge.source_id, edge.target_id): edge for edge in existing}
+
+    merged = []
+    for (source, target), stats in link_stats.items():
+        edge = edges[(node_ids[source], node_ids[target])]
+        edge.count += stats['count']
+        edge.latency_sum += stats['latency_sum']
+        for field, pick in (('latency_min', min), ('latency_max', max)):
+            values = [value for value in (getattr(edge, field), stats[field]) if value is not None]
+            setattr(edge, field, pick(values) if values else None)
+        edge.last_seen = now
+        merged.append(TopologyEdge(source_id=edge.source_id, target_id=edge.target_id,
+                                   **{field: getattr(edge, field) for field in EDGE_STAT_FIELDS}))
+
+    TopologyEdge.objects.bulk_create(
+        merged, update_conflicts=True, unique_fields=['source', 'target'], update_fields=EDGE_STAT_FIELDS
+    )
+
+
+def record_paths(traces: Dict[int, Dict], now=None) -> Dict[int, Dict]:
+    """
+    Fold the traces of a run into the topology graph.
+
+    Args:
+        traces: Trace result dictionaries (with hops) keyed by device id
+        now: Time of the run (defaults to now)
+
+    Returns:
+        Dictionary keyed by device id with path_hash, changed (True when
+        the route differs from the stored one; False on a first trace) and
+        previous_hops
+    """
+    from .topology_models import DevicePath, DevicePathHop
+
+    now = now or timezone.now()
+    paths = {device_id: path_addresses(trace['hops']) for device_id, trace in traces.items()
+             if trace['hops']}
+    if not paths:
+        return {}
+
+    outcome = {}
+
+    with transaction.atomic():
+        stored = {path.device_id: path for path in DevicePath.objects.filter(device_id__in=list(paths))}
+        for device_id, previous in stored.items():
+            paths[device_id] = carry_silent_hops(paths[device_id], previous.hops)
+        hashes = {device_id: path_hash(addresses) for device_id, addresses in paths.items()}
+        changed = {device_id for device_id in paths
+                   if device_id not in stored or stored[device_id].path_hash != hashes[device_id]}
+
+        addresses = sorted({address for addresses in paths.values() for address in addresses if address})
+        node_ids = _upsert_nodes(addresses, now)
+        _merge_edges(
+            _merge_link_stats(link for trace in traces.values() for link in path_links(trace['hops'])),
+            node_ids, now
+        )
+
+        # Only changed routes touch their hop rows; unchanged ones just record the check
+        if changed:
+            DevicePathHop.objects.filter(device_id__in=changed).delete()
+            DevicePathHop.objects.bulk_create([
+                DevicePathHop(device_id=device_id, node_id=node_ids[address], hop=hop['hop'])
+                for device_id in changed
+                for hop, address in zip(sorted(traces[device_id]['hops'], key=lambda hop: hop['hop']),
+                                        paths[device_id])
+                if address
+            ])
+
+        rows = []
+        for device_id in paths:
+            previous = stored.get(device_id)
+            is_changed = device_id in changed
+            rows.append(DevicePath(
+                device_id=device_id,
+                path_hash=hashes[device_id],
+                hops=paths[device_id],
+                change_count=(previous.change_count + is_changed) if previous else 0,
+                changed_at=now if is_changed else previous.changed_at,
+                checked_at=now,
+            ))
+            outcome[device_id] = {
+                'path_hash': hashes[device_id],
+                'changed': is_changed and previous is not None,
+                'previous_hops': previous.hops if previous else None,
+            }
+        DevicePath.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['device'],
+            update_fields=['path_hash', 'hops', 'change_count', 'changed_at', 'checked_at']
+        )
+
+    route_changes = sorted(device_id for device_id in changed if device_id in stored)
+    if route_changes:
+        logger.info(f"Route changed for {len(route_changes)} devices: {route_changes[:20]}")
+    return outcome
+
+
+def devices_behind(address: str) -> List[int]:
+    """Return the ids of devices whose current route passes through `address`."""
+    from .topology_models import DevicePathHop
+
+    return list(DevicePathHop.objects.filter(node__address=address)
+                .values_list('device_id', flat=True).distinct().order_by('device_id'))
+
+
+def shared_upstreams(device_ids: Iterable[int], min_devices: int = 2) -> List[Dict]:
+    """
+    Find the hops shared by the routes of several devices.
+
+    Used to tie many down devices to one upstream failure: the hop shared
+    by most of them, nearest to them, is the likely cause.
+
+    Args:
+        device_ids: Devices to correlate, such as the ones currently down
+        min_devices: Least number of the devices a hop must be shared by
+
+    Returns:
+        List of dicts with address, devices (the count among device_ids)
+        and max_hop, ordered by devices descending, then by max_hop
+        descending so the hop closest to the devices comes first
+    """
+    from .topology_models import DevicePathHop
+
+    rows = (DevicePathHop.objects.filter(device_id__in=list(device_ids))
+            .values('node__address')
+            .annotate(devices=Count('device', distinct=True), max_hop=Max('hop'))
+            .filter(devices__gte=min_devices)
+            .order_by('-devices', '-max_hop'))
+    return [{'address': row['node__address'], 'devices': row['devices'], 'max_hop': row['max_hop']}
+            for row in rows]
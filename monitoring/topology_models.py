@@ -0,0 +1,99 @@
+"""
+Network topology models built from traceroute hops
+"""
+from django.db import models
+from devices.models import Device
+
+
+class TopologyNode(models.Model):
+    """Model for a router or host seen as a traceroute hop"""
+
+    address = models.GenericIPAddressField(protocol='IPv4', unique=True)
+
+    # Metadata
+    first_seen = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = 'Topology Node'
+        verbose_name_plural = 'Topology Nodes'
+
+    def __str__(self):
+        return self.address
+
+
+class TopologyEdge(models.Model):
+    """Model for a link between consecutive answering hops, with latency statistics"""
+
+    source = models.ForeignKey(TopologyNode, on_delete=models.CASCADE, related_name='outgoing_edges')
+    target = models.ForeignKey(TopologyNode, on_delete=models.CASCADE, related_name='incoming_edges')
+
+    # Latency added by the link: the RTT difference between its two hops
+    count = models.PositiveIntegerField(default=0, help_text="Number of traces that crossed the link")
+    latency_sum = models.FloatField(default=0.0, help_text="Sum of link latencies in milliseconds")
+    latency_min = models.FloatField(null=True, blank=True, help_text="Minimum link latency in milliseconds")
+    latency_max = models.FloatField(null=True, blank=True, help_text="Maximum link latency in milliseconds")
+
+    # Metadata
+    first_seen = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = 'Topology Edge'
+        verbose_name_plural = 'Topology Edges'
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'target'], name='unique_topology_edge'),
+        ]
+
+    def __str__(self):
+        return f"{self.source.address} -> {self.target.address}"
+
+    @property
+    def avg_latency(self):
+        """Return the mean link latency"""
+        if self.count == 0:
+            return None
+        return round(self.latency_sum / self.count, 3)
+
+
+class DevicePath(models.Model):
+    """Model for the current route to a device and its hash"""
+
+    device = models.OneToOneField(Device, on_delete=models.CASCADE, primary_key=True, related_name='path')
+
+    path_hash = models.CharField(max_length=40, db_index=True, help_text="SHA-1 of the hop addresses")
+    hops = models.JSONField(default=list, help_text="Hop addresses in order, None for silent hops")
+    change_count = models.PositiveIntegerField(default=0, help_text="Number of route changes seen")
+
+    # Metadata
+    changed_at = models.DateTimeField(help_text="When the route last changed")
+    checked_at = models.DateTimeField(help_text="When the route was last traced")
+
+    class Meta:
+        verbose_name = 'Device Path'
+        verbose_name_plural = 'Device Paths'
+
+    def __str__(self):
+        return f"Path to {self.device.name}"
+
+
+class DevicePathHop(models.Model):
+    """Model linking a device to each node on its current route, for shared-upstream lookups"""
+
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='path_hops')
+    node = models.ForeignKey(TopologyNode, on_delete=models.CASCADE, related_name='device_hops')
+    hop = models.PositiveSmallIntegerField(help_text="TTL at which the node answered")
+
+    class Meta:
+        ordering = ['device', 'hop']
+        verbose_name = 'Device Path Hop'
+        verbose_name_plural = 'Device Path Hops'
+        constraints = [
+            models.UniqueConstraint(fields=['device', 'hop'], name='unique_device_path_hop'),
+        ]
+        indexes = [
+            models.Index(fields=['node', 'device']),
+        ]
+
+    def __str__(self):
+        return f"{self.device.name} hop {self.hop}: {self.node.address}"
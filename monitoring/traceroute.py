@@ -0,0 +1,380 @@
+"""
+Asyncio traceroute engine probing every TTL of many targets at once
+
+Echo requests for all TTLs of a target are sent in parallel over one raw
+ICMP socket instead of one TTL at a time, so a trace costs a single
+timeout rather than one per hop, and many targets share the socket.
+Routers answer with Time Exceeded messages that quote the probe's ICMP
+header, which is how replies are matched to (target, TTL). As in Paris
+traceroute, the identifier and checksum stay the same for every probe so
+per-flow load balancers keep all of them on one path.
+
+Receiving Time Exceeded messages needs a raw socket (root or
+CAP_NET_RAW). Without one, trace_hosts falls back to the system
+traceroute, run for many targets in parallel and parsed into the same
+structured hops.
+"""
+import asyncio
+import ipaddress
+import logging
+import os
+import platform
+import re
+import socket
+import struct
+import subprocess
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+from .icmp import ICMP_ECHO_REPLY, ICMP_ECHO_REQUEST, PAYLOAD, IcmpUnavailable, build_echo_request
+
+logger = logging.getLogger(__name__)
+
+ICMP_DEST_UNREACHABLE = 3
+ICMP_TIME_EXCEEDED = 11
+
+IP_PATTERN = re.compile(r'\b\d{1,3}(?:\.\d{1,3}){3}\b')
+RTT_PATTERN = re.compile(r'<?(\d+(?:\.\d+)?)\s*ms')
+
+
+def paris_payload(seq: int) -> bytes:
+    """
+    Payload that keeps the echo request checksum the same for every seq.
+
+    The first payload word is the ones' complement of seq, so seq and that
+    word always add up to 0xFFFF in the checksum sum.
+    """
+    return struct.pack('!H', 0xFFFF - seq) + PAYLOAD[2:]
+
+
+def parse_probe_response(data: bytes) -> Optional[tuple]:
+    """
+    Parse an ICMP message received on a raw socket in answer to a probe.
+
+    Returns:
+        (icmp_type, ident, seq) of the probe being answered, or None if
+        `data` does not answer an echo request
+    """
+    if len(data) < 20 or data[0] >> 4 != 4:
+        return None
+    data = data[(data[0] & 0x0F) * 4:]
+    if len(data) < 8:
+        return None
+
+    icmp_type = data[0]
+    if icmp_type == ICMP_ECHO_REPLY:
+        _type, _code, _csum, ident, seq = struct.unpack('!BBHHH', data[:8])
+        return icmp_type, ident, seq
+
+    if icmp_type in (ICMP_TIME_EXCEEDED, ICMP_DEST_UNREACHABLE):
+        # The message quotes the probe's IP header and first 8 bytes of its ICMP header
+        quoted = data[8:]
+        if len(quoted) < 20 or quoted[9] != socket.IPPROTO_ICMP:
+            return None
+        quoted = quoted[(quoted[0] & 0x0F) * 4:]
+        if len(quoted) < 8 or quoted[0] != ICMP_ECHO_REQUEST:
+            return None
+        _type, _code, _csum, ident, seq = struct.unpack('!BBHHH', quoted[:8])
+        return icmp_type, ident, seq
+
+    return None
+
+
+def build_hops(responses: Dict[int, List[Optional[tuple]]], destination: str) -> List[Dict]:
+    """
+    Turn probe responses into hops.
+
+    Args:
+        responses: For each TTL, one (address, rtt_ms, icmp_type) tuple or
+            None per probe
+        destination: Target address; hops stop at the first TTL it answered
+
+    Returns:
+        List of hop dictionaries with hop, address, rtts, avg_rtt, sent and loss,
+        without trailing hops that never answered
+    """
+    hops = []
+    for ttl in sorted(responses):
+        answers = [answer for answer in responses[ttl] if answer is not None]
+        rtts = [round(rtt, 3) for _address, rtt, _type in answers]
+        address = Counter(address for address, _rtt, _type in answers).most_common(1)[0][0] if answers else None
+        hops.append({
+            'hop': ttl,
+            'address': address,
+            'rtts': rtts,
+            'avg_rtt': round(sum(rtts) / len(rtts), 3) if rtts else None,
+            'sent': len(responses[ttl]),
+            'loss': round((len(responses[ttl]) - len(answers)) / len(responses[ttl]) * 100, 2),
+        })
+        if address == destination:
+            break
+
+    while hops and hops[-1]['address'] is None:
+        hops.pop()
+    return hops
+
+
+def trace_result(host: str, hops: List[Dict], destination: Optional[str] = None,
+                 error_message: Optional[str] = None) -> Dict:
+    """Return a trace result dict in the shape stored as a TracerouteResult."""
+    reached = bool(hops) and destination is not None and hops[-1]['address'] == destination
+    return {
+        'host': host,
+        'hops': hops,
+        'total_hops': len(hops),
+        'destination_reached': reached,
+        'total_time': hops[-1]['avg_rtt'] if reached else None,
+        'error_message': error_message,
+    }
+
+
+def format_trace(result: Dict) -> str:
+    """Render a trace result as traceroute-style text."""
+    lines = []
+    for hop in result['hops']:
+        fields = [hop['address']] if hop['address'] else []
+        fields += [f"{rtt:.3f} ms" for rtt in hop['rtts']] + ['*'] * (hop['sent'] - len(hop['rtts']))
+        lines.append(f"{hop['hop']:>2}  " + '  '.join(fields))
+    if result.get('error_message'):
+        lines.append(result['error_message'])
+    return '\n'.join(lines)
+
+
+class AsyncTracer:
+    """
+    Trace the routes to many hosts over one raw ICMP socket.
+
+    Every probe of every TTL is sent without waiting for earlier hops,
+    paced to at most `max_rate` packets per second; at most `max_traces`
+    targets are traced at once.
+    """
+
+    def __init__(self, max_hops: int = 15, probes: int = 3, timeout: float = 2.0,
+                 max_rate: int = 2000, max_traces: int = 256):
+        self.max_hops = max_hops
+        self.probes = probes
+        self.timeout = timeout
+        self.max_rate = max_rate
+        self.max_traces = max_traces
+        # Distinct from the ping engine's identifier so neither consumes the other's replies
+        self.ident = (os.getpid() ^ 0x8000) & 0xFFFF
+        self.sock = None
+        self._loop = None
+        self._seq = 0
+        self._pending = {}
+        self._next_send = 0.0
+        self._semaphore = None
+
+    async def __aenter__(self):
+        self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    def open(self):
+        """Open the raw ICMP socket and register it with the running event loop."""
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+        except (PermissionError, OSError) as e:
+            raise IcmpUnavailable(f"Cannot open raw ICMP socket: {e}")
+
+        sock.setblocking(False)
+        self.sock = sock
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(sock.fileno(), self._on_readable)
+        self._semaphore = asyncio.Semaphore(self.max_traces)
+
+    def close(self):
+        """Unregister and close the socket, failing any outstanding probes."""
+        if self.sock is None:
+            return
+        self._loop.remove_reader(self.sock.fileno())
+        self.sock.close()
+        self.sock = None
+        for _address, future, _sent_at in self._pending.values():
+            if not future.done():
+                future.cancel()
+        self._pending.clear()
+
+    def _on_readable(self):
+        """Drain the socket and resolve the futures of answered probes."""
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                logger.debug(f"Traceroute receive error: {e}")
+                return
+
+            received_at = self._loop.time()
+            parsed = parse_probe_response(data)
+            if parsed is None:
+                continue
+
+            icmp_type, ident, seq = parsed
+            pending = self._pending.get(seq)
+            if ident != self.ident or pending is None:
+                continue
+            target, future, sent_at = pending
+            # An echo reply must come from the target itself
+            if icmp_type == ICMP_ECHO_REPLY and addr[0] != target:
+                continue
+            if not future.done():
+                future.set_result((addr[0], (received_at - sent_at) * 1000, icmp_type))
+
+    def _next_seq(self) -> int:
+        for _ in range(0x10000):
+            self._seq = (self._seq + 1) & 0xFFFF
+            if self._seq not in self._pending:
+                return self._seq
+        raise RuntimeError("No free ICMP sequence numbers")
+
+    async def _throttle(self):
+        now = self._loop.time()
+        if self._next_send < now:
+            self._next_send = now
+        delay = self._next_send - now
+        self._next_send += 1.0 / self.max_rate
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _probe(self, address: str, ttl: int) -> Optional[tuple]:
+        """Send one echo request with `ttl` and wait for whatever answers it."""
+        await self._throttle()
+
+        seq = self._next_seq()
+        future = self._loop.create_future()
+        packet = build_echo_request(self.ident, seq, paris_payload(seq))
+        self._pending[seq] = (address, future, self._loop.time())
+
+        try:
+            # No await between setting the TTL and sending, so probes cannot interleave
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, ttl)
+            while True:
+                try:
+                    self.sock.sendto(packet, (address, 0))
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(0.001)
+                    self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, ttl)
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._pending.pop(seq, None)
+
+    async def trace(self, host: str) -> Dict:
+        """
+        Trace the route to one host.
+
+        Returns:
+            Dictionary with host, hops, total_hops, destination_reached,
+            total_time and error_message
+        """
+        async with self._semaphore:
+            try:
+                try:
+                    address = str(ipaddress.IPv4Address(host))
+                except ValueError:
+                    infos = await self._loop.getaddrinfo(host, None, family=socket.AF_INET)
+                    address = infos[0][4][0]
+            except (OSError, IndexError) as e:
+                return trace_result(host, [], error_message=f"Cannot resolve {host}: {e}")
+
+            ttls = [ttl for ttl in range(1, self.max_hops + 1) for _ in range(self.probes)]
+            try:
+                answers = await asyncio.gather(*(self._probe(address, ttl) for ttl in ttls))
+            except OSError as e:
+                return trace_result(host, [], address, error_message=str(e))
+
+        responses = {ttl: [] for ttl in range(1, self.max_hops + 1)}
+        for ttl, answer in zip(ttls, answers):
+            responses[ttl].append(answer)
+        return trace_result(host, build_hops(responses, address), address)
+
+    async def trace_many(self, hosts: Iterable[str]) -> Dict[str, Dict]:
+        """Trace many hosts concurrently, keyed by host."""
+        hosts = list(dict.fromkeys(hosts))
+        results = await asyncio.gather(*(self.trace(host) for host in hosts))
+        return dict(zip(hosts, results))
+
+
+def parse_traceroute_output(output: str, probes: int = 3) -> List[Dict]:
+    """
+    Parse `traceroute -n` or `tracert -d` output into hops.
+
+    Lines that do not start with a hop number, such as the header, are ignored.
+    """
+    hops = []
+    for line in output.splitlines():
+        match = re.match(r'^\s*(\d+)\s+(.+)', line)
+        if not match:
+            continue
+        text = match.group(2)
+        addresses = IP_PATTERN.findall(text)
+        rtts = [float(rtt) for rtt in RTT_PATTERN.findall(text)]
+        sent = max(probes, len(rtts))
+        hops.append({
+            'hop': int(match.group(1)),
+            'address': Counter(addresses).most_common(1)[0][0] if addresses else None,
+            'rtts': rtts,
+            'avg_rtt': round(sum(rtts) / len(rtts), 3) if rtts else None,
+            'sent': sent,
+            'loss': round((sent - len(rtts)) / sent * 100, 2),
+        })
+    return hops
+
+
+def system_traceroute(host: str, max_hops: int = 15, probes: int = 3, timeout: float = 2.0) -> Dict:
+    """Trace one host with the system traceroute command."""
+    if platform.system().lower() == 'windows':
+        cmd = ['tracert', '-d', '-h', str(max_hops), '-w', str(int(timeout * 1000)), host]
+    else:
+        cmd = ['traceroute', '-n', '-m', str(max_hops), '-q', str(probes), '-w', str(timeout), host]
+
+    try:
+        process = subprocess.run(cmd, capture_output=True, text=True,
+                                 timeout=max_hops * probes * timeout + 10)
+    except subprocess.TimeoutExpired:
+        return trace_result(host, [], error_message="Traceroute timed out")
+    except OSError as e:
+        return trace_result(host, [], error_message=f"Cannot run traceroute: {e}")
+
+    try:
+        destination = socket.gethostbyname(host)
+    except OSError:
+        destination = None
+    hops = parse_traceroute_output(process.stdout, probes)
+    while hops and hops[-1]['address'] is None:
+        hops.pop()
+    return trace_result(host, hops, destination)
+
+
+def trace_hosts(hosts: Iterable[str], max_hops: int = 15, probes: int = 3, timeout: float = 2.0,
+                max_rate: int = 2000, max_traces: int = 256) -> Dict[str, Dict]:
+    """
+    Synchronously trace many hosts, keyed by host.
+
+    Uses the asyncio engine, and the system traceroute on a thread pool
+    when no raw ICMP socket can be opened.
+    """
+    hosts = list(dict.fromkeys(hosts))
+    if not hosts:
+        return {}
+
+    async def run():
+        async with AsyncTracer(max_hops=max_hops, probes=probes, timeout=timeout,
+                               max_rate=max_rate, max_traces=max_traces) as tracer:
+            return await tracer.trace_many(hosts)
+
+    try:
+        return asyncio.run(run())
+    except IcmpUnavailable as e:
+        logger.warning(f"Traceroute engine unavailable, falling back to traceroute subprocess: {e}")
+
+    with ThreadPoolExecutor(max_workers=min(32, len(hosts))) as executor:
+        results = executor.map(lambda host: system_traceroute(host, max_hops, probes, timeout), hosts)
+        return dict(zip(hosts, results))
@@ -16,6 +16,7 @@ urlpatterns = [
     
     # API endpoints
     path('api/dashboard/', views.api_dashboard_data, name='api_dashboard_data'),
+    path('api/events/', views.event_stream, name='event_stream'),
     path('api/device/<int:device_id>/', views.api_device_status, name='api_device_status'),
     path('api/test/<int:device_id>/', views.test_device, name='test_device'),
 ]
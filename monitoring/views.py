@@ -2,17 +2,22 @@
 Views for network monitoring dashboard and live monitoring
 """
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.conf import settings
 from django.contrib import messages
 from django.utils import timezone
 from django.db.models import Count, Avg, Q
 from datetime import timedelta, datetime
 import json
+import logging
+import time
 
 from devices.models import Device, DeviceStatus
-from .models import PingResult, SpeedTestResult, SystemMetrics, MonitoringSession
+from .models import PingResult, SpeedTestResult, SystemMetrics, MonitoringSession, DeviceState, DiscoveryScan, TracerouteResult
 from alerts.models import Alert
 
+logger = logging.getLogger(__name__)
+
 
 def dashboard(request):
     """Main dashboard view"""
@@ -34,6 +39,7 @@ def dashboard(request):
             offline=Count('id', filter=Q(status=DeviceStatus.OFFLINE)),
             warning=Count('id', filter=Q(status=DeviceStatus.WARNING)),
             unknown=Count('id', filter=Q(status=DeviceStatus.UNKNOWN)),
+            flapping=Count('id', filter=Q(status=DeviceStatus.FLAPPING)),
         )
 
         # Calculate percentages
@@ -44,6 +50,7 @@ def dashboard(request):
             'offline': status_counts['offline'],
             'warning': status_counts['warning'],
             'unknown': status_counts['unknown'],
+            'flapping': status_counts['flapping'],
             'online_percentage': round((status_counts['online'] / total) * 100, 1),
             'offline_percentage': round((status_counts['offline'] / total) * 100, 1),
             'warning_percentage': round((status_counts['warning'] / total) * 100, 1),
@@ -99,23 +106,28 @@ def dashboard(request):
     return render(request, 'monitoring/dashboard.html', context)
 
 
+def device_state_data(device):
+    """Return the latest-state snapshot of a device fetched with select_related('state')"""
+    try:
+        state = device.state
+    except DeviceState.DoesNotExist:
+        state = None
+    
+    return {
+        'device': device,
+        'latest_ping': state.latest_ping if state else None,
+        'latest_speed': state.latest_speed if state else None,
+        'uptime_24h': state.uptime_24h if state else None,
+        'avg_response_time': state.avg_response_time_24h if state else None,
+    }
+
+
 def live_monitor(request):
     """Live monitoring view with real-time updates"""
-    devices = Device.objects.filter(is_active=True).order_by('name')
-    
-    # Get latest ping result for each device
-    device_data = []
-    for device in devices:
-        latest_ping = device.ping_results.first()
-        latest_speed = device.speed_results.first()
-        
-        device_data.append({
-            'device': device,
-            'latest_ping': latest_ping,
-            'latest_speed': latest_speed,
-            'uptime_24h': device.get_uptime_percentage(1),
-            'avg_response_time': device.get_average_response_time(1),
-        })
+    devices = Device.objects.filter(is_active=True).select_related('state').order_by('name')
+    
+    # Latest results and 24h statistics come from the device state snapshot
+    device_data = [device_state_data(device) for device in devices]
     
     context = {
         'device_data': device_data,
@@ -196,29 +208,30 @@ def api_dashboard_data(request):
     """API endpoint for dashboard data (AJAX updates)"""
     # Get device status summary
     devices = Device.objects.filter(is_active=True)
-    status_summary = {
-        'total': devices.count(),
-        'online': devices.filter(status=DeviceStatus.ONLINE).count(),
-        'offline': devices.filter(status=DeviceStatus.OFFLINE).count(),
-        'warning': devices.filter(status=DeviceStatus.WARNING).count(),
-        'unknown': devices.filter(status=DeviceStatus.UNKNOWN).count(),
-    }
+    status_summary = devices.aggregate(
+        total=Count('id'),
+        online=Count('id', filter=Q(status=DeviceStatus.ONLINE)),
+        offline=Count('id', filter=Q(status=DeviceStatus.OFFLINE)),
+        warning=Count('id', filter=Q(status=DeviceStatus.WARNING)),
+        unknown=Count('id', filter=Q(status=DeviceStatus.UNKNOWN)),
+        flapping=Count('id', filter=Q(status=DeviceStatus.FLAPPING)),
+    )
     
     # Get active alerts count
     active_alerts = Alert.objects.filter(is_active=True).count()
     
     # Get latest ping results
     latest_pings = []
-    for device in devices[:10]:
-        latest_ping = device.ping_results.first()
+    for device in devices.select_related('state')[:10]:
+        latest_ping = device_state_data(device)['latest_ping']
         if latest_ping:
             latest_pings.append({
                 'device_name': device.name,
                 'ip_address': device.ip_address,
                 'status': device.status,
-                'response_time': latest_ping.response_time,
-                'timestamp': latest_ping.timestamp.isoformat(),
-                'is_reachable': latest_ping.is_reachable
+                'response_time': latest_ping['response_time'],
+                'timestamp': latest_ping['timestamp'].isoformat(),
+                'is_reachable': latest_ping['is_reachable']
             })
     
     return JsonResponse({
@@ -229,13 +242,55 @@ def api_dashboard_data(request):
     })
 
 
+def event_stream(request):
+    """
+    Server-Sent Events stream of dashboard deltas (status changes, latency buckets, alerts)
+
+    Each connection holds a server worker for up to EVENT_STREAM_MAX_SECONDS,
+    so serve this with gevent workers or an ASGI server, not sync workers.
+    """
+    from .events import get_event_bus, format_sse
+    
+    bus = get_event_bus()
+    config = getattr(settings, 'NETWORK_MONITOR', {})
+    max_seconds = config.get('EVENT_STREAM_MAX_SECONDS', 300)
+    last_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id') or bus.last_id()
+    
+    def stream(last_id):
+        # Connections are recycled after max_seconds; EventSource reconnects
+        # with Last-Event-ID so no events are missed in between
+        deadline = time.monotonic() + max_seconds
+        yield 'retry: 3000\n\n'
+        while time.monotonic() < deadline:
+            try:
+                events, lost = bus.read(last_id, timeout=min(15, max(deadline - time.monotonic(), 0.1)))
+            except Exception as e:
+                logger.warning(f"Event stream read failed: {e}")
+                return
+            
+            if lost:
+                yield format_sse(last_id, 'resync', {})
+            if not events:
+                yield ': keepalive\n\n'
+                continue
+            for event_id, event_type, data in events:
+                yield format_sse(event_id, event_type, data)
+                last_id = event_id
+    
+    response = StreamingHttpResponse(stream(last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 def api_device_status(request, device_id):
     """API endpoint for individual device status"""
-    device = get_object_or_404(Device, id=device_id)
+    device = get_object_or_404(Device.objects.select_related('state'), id=device_id)
     
-    # Get latest results
-    latest_ping = device.ping_results.first()
-    latest_speed = device.speed_results.first()
+    # Get latest results from the device state snapshot
+    snapshot = device_state_data(device)
+    latest_ping = snapshot['latest_ping']
+    latest_speed = snapshot['latest_speed']
     
     data = {
         'device': {
@@ -246,17 +301,17 @@ def api_device_status(request, device_id):
             'last_seen': device.last_seen.isoformat() if device.last_seen else None,
         },
         'latest_ping': {
-            'is_reachable': latest_ping.is_reachable if latest_ping else None,
-            'response_time': latest_ping.response_time if latest_ping else None,
-            'timestamp': latest_ping.timestamp.isoformat() if latest_ping else None,
+            'is_reachable': latest_ping['is_reachable'],
+            'response_time': latest_ping['response_time'],
+            'timestamp': latest_ping['timestamp'].isoformat(),
         } if latest_ping else None,
         'latest_speed': {
-            'download_speed': latest_speed.download_speed if latest_speed else None,
-            'upload_speed': latest_speed.upload_speed if latest_speed else None,
-            'timestamp': latest_speed.timestamp.isoformat() if latest_speed else None,
+            'download_speed': latest_speed['download_speed'],
+            'upload_speed': latest_speed['upload_speed'],
+            'timestamp': latest_speed['timestamp'].isoformat(),
         } if latest_speed else None,
-        'uptime_24h': device.get_uptime_percentage(1),
-        'avg_response_time': device.get_average_response_time(1),
+        'uptime_24h': snapshot['uptime_24h'],
+        'avg_response_time': snapshot['avg_response_time'],
     }
     
     return JsonResponse(data)
@@ -310,43 +365,51 @@ def run_speed_test(request, device_id):
 
 
 def run_traceroute(request, device_id):
-    """Run traceroute for a device"""
+    """Start a traceroute for a device (POST) or fetch its latest result (GET)"""
+    device = get_object_or_404(Device, id=device_id)
+
+    if request.method == 'GET':
+        from .traceroute import format_trace
+
+        from django.utils.dateparse import parse_datetime
+
+        latest = TracerouteResult.objects.filter(device=device).order_by('-timestamp').first()
+        since = parse_datetime(request.GET.get('since', ''))
+        if latest is None or (since and latest.timestamp <= since):
+            return JsonResponse({'success': True, 'pending': True})
+
+        return JsonResponse({
+            'success': True,
+            'pending': False,
+            'result': {
+                'device': device.name,
+                'ip_address': device.ip_address,
+                'hops': latest.hops,
+                'total_hops': latest.total_hops,
+                'destination_reached': latest.destination_reached,
+                'total_time': latest.total_time,
+                'error_message': latest.error_message,
+                'output': format_trace({'hops': latest.hops, 'error_message': latest.error_message}),
+                'timestamp': latest.timestamp.isoformat(),
+            }
+        })
+
     if request.method != 'POST':
         return JsonResponse({'error': 'POST method required'}, status=405)
 
-    device = get_object_or_404(Device, id=device_id)
-
     try:
+        requested_at = timezone.now().isoformat()
+
+        # The trace runs in the worker; the page polls GET for the stored result
         from .tasks import run_traceroute_for_device
         result = run_traceroute_for_device.delay(device_id)
 
-        # For immediate response, we'll run a quick traceroute
-        import subprocess
-        import platform
-
-        system = platform.system().lower()
-        if system == 'windows':
-            cmd = ['tracert', '-h', '10', device.ip_address]
-        else:
-            cmd = ['traceroute', '-m', '10', device.ip_address]
-
-        try:
-            process = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-            output = process.stdout
-
-            return JsonResponse({
-                'success': True,
-                'result': {
-                    'output': output,
-                    'device': device.name,
-                    'ip_address': device.ip_address
-                }
-            })
-        except subprocess.TimeoutExpired:
-            return JsonResponse({
-                'success': False,
-                'error': 'Traceroute timed out'
-            })
+        return JsonResponse({
+            'success': True,
+            'pending': True,
+            'task_id': result.id,
+            'requested_at': requested_at
+        })
 
     except Exception as e:
         return JsonResponse({
@@ -389,13 +452,23 @@ def discover_network(request):
     try:
         subnet = request.POST.get('subnet', '192.168.1.0/24')
 
+        from .discovery import discovery_hosts
+        max_hosts = getattr(settings, 'NETWORK_MONITOR', {}).get('DISCOVERY_MAX_HOSTS', 65536)
+        try:
+            discovery_hosts(subnet, max_hosts)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
         from .tasks import discover_network_devices
-        result = discover_network_devices.delay(subnet)
+        scan = DiscoveryScan.objects.create(subnet=subnet)
+        result = discover_network_devices.delay(subnet, scan_id=scan.pk)
+        DiscoveryScan.objects.filter(pk=scan.pk).update(task_id=result.id or '')
 
         return JsonResponse({
             'success': True,
             'message': f'Network discovery started for {subnet}',
-            'task_id': result.id
+            'task_id': result.id,
+            'scan_id': scan.pk
         })
     except Exception as e:
         return JsonResponse({
@@ -404,6 +477,95 @@ def discover_network(request):
         }, status=500)
 
 
+def discovery_scan_status(request, scan_id):
+    """API endpoint for the progress and hosts of a discovery scan"""
+    scan = get_object_or_404(DiscoveryScan, pk=scan_id)
+    try:
+        offset = max(0, int(request.GET.get('offset', 0)))
+        limit = min(max(1, int(request.GET.get('limit', 500))), 5000)
+    except ValueError:
+        return JsonResponse({'error': 'offset and limit must be integers'}, status=400)
+
+    hosts = scan.hosts.order_by('ip_address').values(
+        'ip_address', 'hostname', 'method', 'port', 'response_time'
+    )[offset:offset + limit]
+
+    return JsonResponse({
+        'scan_id': scan.pk,
+        'subnet': scan.subnet,
+        'status': scan.status,
+        'hosts_total': scan.hosts_total,
+        'hosts_scanned': scan.hosts_scanned,
+        'hosts_found': scan.hosts_found,
+        'progress_percentage': scan.progress_percentage,
+        'error_message': scan.error_message,
+        'started_at': scan.started_at.isoformat() if scan.started_at else None,
+        'finished_at': scan.finished_at.isoformat() if scan.finished_at else None,
+        'hosts': list(hosts),
+    })
+
+
+def topology_graph(request):
+    """API endpoint for the topology graph of hops seen in recent traceroutes"""
+    from .topology_models import TopologyNode, TopologyEdge
+
+    try:
+        days = int(request.GET.get('days', 7))
+    except ValueError:
+        return JsonResponse({'error': 'days must be an integer'}, status=400)
+    since = timezone.now() - timedelta(days=days)
+
+    nodes = TopologyNode.objects.filter(last_seen__gte=since).annotate(
+        devices=Count('device_hops__device', distinct=True)
+    ).values('id', 'address', 'devices', 'last_seen')
+    edges = TopologyEdge.objects.filter(last_seen__gte=since).values(
+        'source_id', 'target_id', 'count', 'latency_sum', 'latency_min', 'latency_max', 'last_seen'
+    )
+
+    return JsonResponse({
+        'nodes': [{**node, 'last_seen': node['last_seen'].isoformat()} for node in nodes],
+        'edges': [{
+            'source': edge['source_id'],
+            'target': edge['target_id'],
+            'count': edge['count'],
+            'avg_latency': round(edge['latency_sum'] / edge['count'], 3) if edge['count'] else None,
+            'min_latency': edge['latency_min'],
+            'max_latency': edge['latency_max'],
+            'last_seen': edge['last_seen'].isoformat(),
+        } for edge in edges],
+    })
+
+
+def topology_hop_devices(request, address):
+    """API endpoint for the devices whose current route passes through a hop"""
+    from .topology import devices_behind
+
+    devices = Device.objects.filter(id__in=devices_behind(address)).values('id', 'name', 'ip_address', 'status')
+    return JsonResponse({
+        'address': address,
+        'devices': list(devices),
+    })
+
+
+def topology_shared_upstreams(request):
+    """API endpoint for the upstream hops shared by a set of devices (the offline ones by default)"""
+    from .topology import shared_upstreams
+
+    device_ids = request.GET.get('device_ids')
+    if device_ids:
+        try:
+            device_ids = [int(device_id) for device_id in device_ids.split(',') if device_id.strip()]
+        except ValueError:
+            return JsonResponse({'error': 'device_ids must be a comma-separated list of integers'}, status=400)
+    else:
+        device_ids = list(Device.objects.filter(is_active=True, status=DeviceStatus.OFFLINE).values_list('id', flat=True))
+
+    return JsonResponse({
+        'devices': len(device_ids),
+        'upstreams': shared_upstreams(device_ids)[:50],
+    })
+
+
 def monitoring_sessions(request):
     """View for managing monitoring sessions"""
     sessions = MonitoringSession.objects.all().order_by('-created_at')
@@ -415,6 +577,17 @@ def monitoring_sessions(request):
     return render(request, 'monitoring/sessions.html', context)
 
 
+def api_write_buffer_metrics(request):
+    """API endpoint for the write-behind buffer queue depth and flush latency of every worker"""
+    from .write_buffer import published_metrics
+
+    config = getattr(settings, 'NETWORK_MONITOR', {})
+    return JsonResponse({
+        'workers': published_metrics(config.get('WRITE_BUFFER_METRICS_URL')),
+        'timestamp': timezone.now().isoformat()
+    })
+
+
 def system_health(request):
     """System health and status page"""
     # Get system metrics
@@ -0,0 +1,393 @@
+"""
+Write-behind buffer that batches monitoring result rows into bulk inserts
+"""
+import atexit
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    Collect rows in memory and hand them to `flush_func` in bulk.
+
+    A background thread flushes whenever `max_batch` rows are pending or
+    `flush_interval` seconds have passed since the last flush. Producers
+    that get more than `max_pending` rows ahead of the flusher block for
+    up to `block_timeout` seconds and then flush inline themselves, so a
+    slow database pushes back on the probes instead of growing memory.
+
+    The flusher thread is started lazily in the process that first adds a
+    row, which keeps the buffer safe to create before a Celery prefork.
+    Pending rows are flushed on interpreter exit and by `close()`.
+    """
+
+    def __init__(self, flush_func: Callable[[List], None], name: str = 'results',
+                 max_batch: int = 500, flush_interval: float = 2.0,
+                 max_pending: int = 10000, block_timeout: float = 5.0):
+        self.flush_func = flush_func
+        self.name = name
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.block_timeout = block_timeout
+
+        self._rows = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._pid = None
+        self._atexit_registered = False
+
+        self._stats = {
+            'rows_added': 0,
+            'rows_flushed': 0,
+            'rows_dropped': 0,
+            'flushes': 0,
+            'flush_errors': 0,
+            'blocked_adds': 0,
+            'last_flush_ms': None,
+            'max_flush_ms': None,
+            'total_flush_ms': 0.0,
+            'last_flush_at': None,
+        }
+
+    def add(self, row):
+        """Queue one row for writing."""
+        self.add_many([row])
+
+    def add_many(self, rows: Iterable):
+        """Queue several rows for writing."""
+        rows = list(rows)
+        if not rows:
+            return
+        self._ensure_started()
+
+        with self._lock:
+            if len(self._rows) >= self.max_pending:
+                self._stats['blocked_adds'] += 1
+                self._wakeup.set()
+                self._not_full.wait_for(
+                    lambda: len(self._rows) < self.max_pending,
+                    timeout=self.block_timeout
+                )
+            self._rows.extend(rows)
+            self._stats['rows_added'] += len(rows)
+            pending = len(self._rows)
+
+        if pending >= self.max_pending:
+            # Flusher could not keep up within block_timeout; write inline
+            self.flush()
+        elif pending >= self.max_batch:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """Write everything pending now; returns the number of rows written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._rows.popleft() for _ in range(min(self.max_batch, len(self._rows)))]
+                    self._not_full.notify_all()
+                if not batch:
+                    return written
+
+                started = time.monotonic()
+                try:
+                    self.flush_func(batch)
+                except Exception as e:
+                    self._stats['flush_errors'] += 1
+                    logger.error(f"Error flushing {len(batch)} rows from {self.name} buffer: {e}")
+                    self._requeue(batch)
+                    return written
+
+                elapsed_ms = (time.monotonic() - started) * 1000
+                written += len(batch)
+                self._record_flush(len(batch), elapsed_ms)
+
+    def close(self):
+        """Stop the flusher thread and write any pending rows."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join(timeout=self.flush_interval + self.block_timeout)
+        self.flush()
+
+    def metrics(self) -> Dict:
+        """Return queue depth and flush latency statistics."""
+        with self._lock:
+            depth = len(self._rows)
+            stats = dict(self._stats)
+        total_flush_ms = stats.pop('total_flush_ms')
+        flushes = stats['flushes']
+        stats.update({
+            'name': self.name,
+            'queue_depth': depth,
+            'max_pending': self.max_pending,
+            'avg_flush_ms': round(total_flush_ms / flushes, 2) if flushes else None,
+        })
+        return stats
+
+    def _requeue(self, batch: List):
+        """Put a failed batch back at the head, dropping the oldest overflow."""
+        with self._lock:
+            self._rows.extendleft(reversed(batch))
+            overflow = len(self._rows) - self.max_pending
+            for _ in range(max(overflow, 0)):
+                self._rows.popleft()
+            if overflow > 0:
+                self._stats['rows_dropped'] += overflow
+                logger.warning(f"Dropped {overflow} rows from {self.name} buffer after flush failure")
+
+    def _record_flush(self, count: int, elapsed_ms: float):
+        with self._lock:
+            self._stats['rows_flushed'] += count
+            self._stats['flushes'] += 1
+            self._stats['total_flush_ms'] += elapsed_ms
+            self._stats['last_flush_ms'] = round(elapsed_ms, 2)
+            self._stats['max_flush_ms'] = round(max(self._stats['max_flush_ms'] or 0, elapsed_ms), 2)
+            self._stats['last_flush_at'] = time.time()
+
+    def _reset_after_fork(self):
+        """Drop state inherited from the parent process; the parent flushes its own rows."""
+        self._rows = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def _ensure_started(self):
+        """Start the flusher thread in this process if it is not running."""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        if self._pid is not None and self._pid != os.getpid():
+            self._reset_after_fork()
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stopping = False
+            self._thread = threading.Thread(
+                target=self._run, name=f'write-behind-{self.name}', daemon=True
+            )
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.close)
+                self._atexit_registered = True
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Unexpected error in {self.name} flusher: {e}")
+            publish_metrics()
+
+
+def django_bulk_writer(model, batch_size: int = 500,
+                       after_write: Optional[Callable[[List], None]] = None) -> Callable[[List], None]:
+    """
+    Return a flush function that bulk inserts model instances with the Django ORM.
+
+    `after_write` is called with the saved rows inside the same transaction,
+    e.g. to fold them into rollups.
+    """
+    def write(rows):
+        from django.db import close_old_connections, transaction
+
+        close_old_connections()
+        with transaction.atomic():
+            model.objects.bulk_create(rows, batch_size=batch_size)
+            if after_write is not None:
+                after_write(rows)
+
+    return write
+
+
+class MetricsPublisher:
+    """
+    Share the buffer metrics of every worker process through Redis.
+
+    The buffers live in the Celery workers, so the web process cannot see
+    them directly. Each worker writes its metrics under its own key, which
+    expires after three publishing intervals so that stopped workers drop
+    out by themselves.
+    """
+
+    def __init__(self, url: str, interval: float = 10.0, prefix: str = 'network_monitor:write_buffers'):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_connect_timeout=2)
+        self.interval = interval
+        self.prefix = prefix
+        self._last_published = None
+        self._lock = threading.Lock()
+
+    def publish(self, metrics: List[Dict], force: bool = False) -> bool:
+        """Store this process's metrics unless they were stored less than `interval` seconds ago."""
+        now = time.monotonic()
+        with self._lock:
+            if not force and self._last_published is not None and now - self._last_published < self.interval:
+                return False
+            self._last_published = now
+
+        worker = worker_name()
+        payload = {'worker': worker, 'timestamp': time.time(), 'buffers': metrics}
+        self.client.set(f"{self.prefix}:{worker}", json.dumps(payload), ex=max(1, int(self.interval * 3)))
+        return True
+
+    def collect(self) -> List[Dict]:
+        """Return the metrics every live worker published, ordered by worker."""
+        names = sorted(self.client.scan_iter(match=f"{self.prefix}:*", count=100))
+        if not names:
+            return []
+        workers = []
+        for value in self.client.mget(names):
+            if value:
+                payload = json.loads(value)
+                payload['source'] = 'redis'
+                workers.append(payload)
+        return workers
+
+
+def worker_name() -> str:
+    """Return the host and process id that identify this process's metrics."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+_buffers = {}
+_writers = {}
+_buffers_lock = threading.Lock()
+
+_publishers = {}
+_metrics_url = None
+_metrics_interval = 10.0
+
+
+def buffer_options(config: Dict) -> Dict:
+    """Map WRITE_BUFFER_* configuration keys to WriteBehindBuffer options."""
+    return {
+        'max_batch': config.get('WRITE_BUFFER_MAX_BATCH', 500),
+        'flush_interval': config.get('WRITE_BUFFER_FLUSH_INTERVAL', 2.0),
+        'max_pending': config.get('WRITE_BUFFER_MAX_PENDING', 10000),
+    }
+
+
+def get_buffer(name: str, flush_func_factory: Callable[[], Callable[[List], None]],
+               writer=None, **options) -> WriteBehindBuffer:
+    """
+    Return the process-wide buffer called `name`, creating it on first use.
+
+    `writer` identifies what the flush function writes, e.g. a model and
+    its after_write hook. Only the first caller's flush function is used,
+    so a later caller passing a different writer raises ValueError rather
+    than having its rows written the first caller's way.
+    """
+    with _buffers_lock:
+        buffer = _buffers.get(name)
+        if buffer is None:
+            buffer = WriteBehindBuffer(flush_func_factory(), name=name, **options)
+            _buffers[name] = buffer
+            _writers[name] = writer
+        elif _writers[name] != writer:
+            raise ValueError(
+                f"Write buffer {name} already writes with {_writers[name]!r}, not {writer!r}"
+            )
+        return buffer
+
+
+def django_buffer(model, after_write: Optional[Callable[[List], None]] = None) -> WriteBehindBuffer:
+    """Return the process-wide write-behind buffer for a Django model."""
+    from django.conf import settings
+
+    config = getattr(settings, 'NETWORK_MONITOR', {})
+    configure_metrics(config.get('WRITE_BUFFER_METRICS_URL'), config.get('WRITE_BUFFER_METRICS_INTERVAL', 10.0))
+    options = buffer_options(config)
+    return get_buffer(
+        model._meta.label,
+        lambda: django_bulk_writer(model, batch_size=options['max_batch'], after_write=after_write),
+        writer=(model, after_write),
+        **options
+    )
+
+
+def flush_all():
+    """Flush every registered buffer."""
+    for buffer in list(_buffers.values()):
+        buffer.flush()
+
+
+def close_all():
+    """Stop and flush every registered buffer."""
+    for buffer in list(_buffers.values()):
+        buffer.close()
+
+
+def all_metrics() -> List[Dict]:
+    """Return metrics for every registered buffer."""
+    return [buffer.metrics() for buffer in _buffers.values()]
+
+
+
+def get_metrics_publisher(url: Optional[str], interval: float = 10.0) -> Optional[MetricsPublisher]:
+    """Return the process-wide metrics publisher for `url`, or None without one."""
+    if not url:
+        return None
+    with _buffers_lock:
+        publisher = _publishers.get(url)
+        if publisher is None:
+            try:
+                publisher = MetricsPublisher(url, interval=interval)
+            except Exception as e:
+                logger.warning(f"Write buffer metrics Redis unavailable ({e}), metrics stay in-process")
+                return None
+            _publishers[url] = publisher
+        return publisher
+
+
+def configure_metrics(url: Optional[str], interval: float = 10.0):
+    """Have this process's flusher threads publish buffer metrics to `url`."""
+    global _metrics_url, _metrics_interval
+    _metrics_url = url
+    _metrics_interval = interval
+
+
+def publish_metrics(force: bool = False) -> bool:
+    """Publish this process's buffer metrics if configured and due; returns whether they were sent."""
+    publisher = get_metrics_publisher(_metrics_url, _metrics_interval)
+    if publisher is None:
+        return False
+    try:
+        return publisher.publish(all_metrics(), force=force)
+    except Exception as e:
+        logger.warning(f"Could not publish write buffer metrics ({e})")
+        return False
+
+
+def published_metrics(url: Optional[str]) -> List[Dict]:
+    """
+    Return the buffer metrics of every worker that published to `url`.
+
+    Falls back to this process's own buffers, marked with source 'local',
+    when there is no URL or Redis cannot be read.
+    """
+    publisher = get_metrics_publisher(url)
+    if publisher is not None:
+        try:
+            return publisher.collect()
+        except Exception as e:
+            logger.warning(f"Could not read write buffer metrics ({e}), reporting this process only")
+    return [{'worker': worker_name(), 'timestamp': time.time(), 'buffers': all_metrics(), 'source': 'local'}]
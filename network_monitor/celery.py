@@ -3,10 +3,13 @@ Celery configuration for network_monitor project.
 """
 import os
 from celery import Celery
+from celery.signals import worker_process_shutdown, worker_shutdown
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'network_monitor.settings')
 
+from django.conf import settings
+
 app = Celery('network_monitor')
 
 # Using a string here means the worker doesn't have to serialize
@@ -18,18 +21,24 @@ app.autodiscover_tasks()
 
 # Celery Beat Schedule
 app.conf.beat_schedule = {
-    'monitor-all-devices': {
-        'task': 'monitoring.tasks.monitor_all_devices',
-        'schedule': 300.0,  # Every 5 minutes
+    'dispatch-due-checks': {
+        'task': 'monitoring.tasks.dispatch_due_checks',
+        # Devices and ports run on their own intervals; this is only the tick
+        'schedule': float(settings.NETWORK_MONITOR['SCHEDULER_TICK_SECONDS']),
     },
-    'send-alert-emails': {
+    'send-alert-notifications': {
         'task': 'alerts.tasks.send_pending_alerts',
-        'schedule': 120.0,  # Every 2 minutes
+        # The digest window: alerts raised in between go out together
+        'schedule': float(settings.NETWORK_MONITOR['ALERT_DIGEST_WINDOW_SECONDS']),
     },
     'cleanup-old-data': {
         'task': 'monitoring.tasks.cleanup_old_data',
         'schedule': 86400.0,  # Daily
     },
+    'maintain-ping-partitions': {
+        'task': 'monitoring.tasks.maintain_ping_partitions',
+        'schedule': 3600.0,  # Hourly; a no-op unless PING_PARTITIONING is set
+    },
     'generate-daily-report': {
         'task': 'reports.tasks.generate_daily_report',
         'schedule': 86400.0,  # Daily
@@ -38,6 +47,15 @@ app.conf.beat_schedule = {
 
 app.conf.timezone = 'UTC'
 
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def flush_write_buffers(**kwargs):
+    """Write out buffered monitoring results before the worker exits"""
+    from monitoring.write_buffer import close_all
+    close_all()
+
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
@@ -161,17 +161,109 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+# Alert rule windows live in one process; run a single worker on this queue
+ALERT_RULE_QUEUE = config('ALERT_RULE_QUEUE', default='alert_rules')
+CELERY_TASK_ROUTES = {
+    'alerts.tasks.evaluate_alert_rules': {'queue': ALERT_RULE_QUEUE},
+    'alerts.tasks.evaluate_speed_rules': {'queue': ALERT_RULE_QUEUE},
+}
 
 # Network Monitor Settings
 NETWORK_MONITOR = {
     'DEFAULT_PING_TIMEOUT': config('DEFAULT_PING_TIMEOUT', default=5, cast=int),
     'DEFAULT_PING_INTERVAL': config('DEFAULT_PING_INTERVAL', default=60, cast=int),
     'MAX_CONCURRENT_PINGS': config('MAX_CONCURRENT_PINGS', default=50, cast=int),
+    'USE_ICMP_ENGINE': config('USE_ICMP_ENGINE', default=True, cast=bool),
+    'ICMP_MAX_RATE': config('ICMP_MAX_RATE', default=2000, cast=int),
+    'TRACEROUTE_MAX_HOPS': config('TRACEROUTE_MAX_HOPS', default=15, cast=int),
+    'TRACEROUTE_PROBES': config('TRACEROUTE_PROBES', default=3, cast=int),
+    'TRACEROUTE_TIMEOUT': config('TRACEROUTE_TIMEOUT', default=2.0, cast=float),
+    'TRACEROUTE_MAX_CONCURRENT': config('TRACEROUTE_MAX_CONCURRENT', default=256, cast=int),
+    # Subnet discovery: ICMP sweep with a TCP connect fallback, up to a /16
+    'DISCOVERY_MAX_RATE': config('DISCOVERY_MAX_RATE', default=2000, cast=int),
+    'DISCOVERY_MAX_IN_FLIGHT': config('DISCOVERY_MAX_IN_FLIGHT', default=2048, cast=int),
+    'DISCOVERY_TIMEOUT': config('DISCOVERY_TIMEOUT', default=1.0, cast=float),
+    'DISCOVERY_PORTS': config('DISCOVERY_PORTS', default='22,23,80,443,445,3389', cast=lambda v: [int(p) for p in v.split(',') if p.strip()]),
+    'DISCOVERY_MAX_HOSTS': config('DISCOVERY_MAX_HOSTS', default=65536, cast=int),
+    'DISCOVERY_RESOLVE_DNS': config('DISCOVERY_RESOLVE_DNS', default=True, cast=bool),
+    'DISCOVERY_DNS_WORKERS': config('DISCOVERY_DNS_WORKERS', default=64, cast=int),
+    'MONITOR_BATCH_SIZE': config('MONITOR_BATCH_SIZE', default=500, cast=int),
+    'PORT_CHECK_BATCH_SIZE': config('PORT_CHECK_BATCH_SIZE', default=2000, cast=int),
+    'PORT_CHECK_MAX_CONCURRENCY': config('PORT_CHECK_MAX_CONCURRENCY', default=1000, cast=int),
+    'PORT_CHECK_PER_HOST_LIMIT': config('PORT_CHECK_PER_HOST_LIMIT', default=20, cast=int),
+    'SERVICE_DISCOVERY_TIMEOUT': config('SERVICE_DISCOVERY_TIMEOUT', default=3.0, cast=float),
+    'SERVICE_DISCOVERY_MAX_HOSTS': config('SERVICE_DISCOVERY_MAX_HOSTS', default=256, cast=int),
+    'SERVICE_DISCOVERY_PER_HOST_LIMIT': config('SERVICE_DISCOVERY_PER_HOST_LIMIT', default=64, cast=int),
+    'SERVICE_DISCOVERY_MAX_PORTS': config('SERVICE_DISCOVERY_MAX_PORTS', default=1024, cast=int),
+    'SERVICE_CHECK_WORKERS': config('SERVICE_CHECK_WORKERS', default=32, cast=int),
+    'HTTP_POOL_PER_HOST': config('HTTP_POOL_PER_HOST', default=4, cast=int),
+    'HTTP_POOL_HOSTS': config('HTTP_POOL_HOSTS', default=1000, cast=int),
+    'SCHEDULER_TICK_SECONDS': config('SCHEDULER_TICK_SECONDS', default=10, cast=int),
+    'SCHEDULER_RESYNC_SECONDS': config('SCHEDULER_RESYNC_SECONDS', default=60, cast=int),
+    # End of the last dispatched window, shared so a late tick catches up without repeats
+    'SCHEDULER_STATE_URL': config('SCHEDULER_STATE_URL', default=CELERY_BROKER_URL),
+    'WRITE_BUFFER_MAX_BATCH': config('WRITE_BUFFER_MAX_BATCH', default=500, cast=int),
+    'WRITE_BUFFER_FLUSH_INTERVAL': config('WRITE_BUFFER_FLUSH_INTERVAL', default=2.0, cast=float),
+    'WRITE_BUFFER_MAX_PENDING': config('WRITE_BUFFER_MAX_PENDING', default=10000, cast=int),
+    'WRITE_BUFFER_METRICS_URL': config('WRITE_BUFFER_METRICS_URL', default=CELERY_BROKER_URL),
+    'WRITE_BUFFER_METRICS_INTERVAL': config('WRITE_BUFFER_METRICS_INTERVAL', default=10.0, cast=float),
     'SPEED_TEST_INTERVAL': config('SPEED_TEST_INTERVAL', default=3600, cast=int),
     'ALERT_COOLDOWN_MINUTES': config('ALERT_COOLDOWN_MINUTES', default=15, cast=int),
+    # Streaming alert rules: ping results kept per device and rule recompile interval
+    'ALERT_RULE_WINDOW_SIZE': config('ALERT_RULE_WINDOW_SIZE', default=10, cast=int),
+    'ALERT_RULE_RELOAD_SECONDS': config('ALERT_RULE_RELOAD_SECONDS', default=60, cast=int),
+    # (device, alert type) cooldown cache; Redis shares it across workers
+    'ALERT_COOLDOWN_URL': config('ALERT_COOLDOWN_URL', default=CELERY_BROKER_URL),
+    'ALERT_COOLDOWN_CACHE_SIZE': config('ALERT_COOLDOWN_CACHE_SIZE', default=100000, cast=int),
     'ALERT_EMAIL_RECIPIENTS': config('ALERT_EMAIL_RECIPIENTS', default='', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()]),
+    # Root-cause correlation of failures that share an upstream hop, subnet, group, location or ISP
+    'ALERT_CORRELATION_ENABLED': config('ALERT_CORRELATION_ENABLED', default=True, cast=bool),
+    'ALERT_CORRELATION_WINDOW_SECONDS': config('ALERT_CORRELATION_WINDOW_SECONDS', default=120, cast=int),
+    'ALERT_CORRELATION_MIN_DEVICES': config('ALERT_CORRELATION_MIN_DEVICES', default=5, cast=int),
+    'ALERT_CORRELATION_MIN_RATIO': config('ALERT_CORRELATION_MIN_RATIO', default=0.5, cast=float),
+    'ALERT_CORRELATION_SUBNET_PREFIX': config('ALERT_CORRELATION_SUBNET_PREFIX', default=24, cast=int),
+    'ALERT_CORRELATION_INDEX_SECONDS': config('ALERT_CORRELATION_INDEX_SECONDS', default=300, cast=int),
+    # Flap detection: checks kept per device and the flap percentages that start and stop flapping
+    'DEVICE_FLAP_DETECTION_ENABLED': config('DEVICE_FLAP_DETECTION_ENABLED', default=True, cast=bool),
+    'DEVICE_FLAP_HISTORY': config('DEVICE_FLAP_HISTORY', default=21, cast=int),
+    'DEVICE_FLAP_LOW_THRESHOLD': config('DEVICE_FLAP_LOW_THRESHOLD', default=25.0, cast=float),
+    'DEVICE_FLAP_HIGH_THRESHOLD': config('DEVICE_FLAP_HIGH_THRESHOLD', default=50.0, cast=float),
+    'DEVICE_FLAP_URL': config('DEVICE_FLAP_URL', default=CELERY_BROKER_URL),
+    'DEVICE_FLAP_CACHE_SIZE': config('DEVICE_FLAP_CACHE_SIZE', default=100000, cast=int),
+    # Alert notifications: pending alerts are sent as digests once per window
+    'ALERT_DIGEST_WINDOW_SECONDS': config('ALERT_DIGEST_WINDOW_SECONDS', default=60, cast=int),
+    'ALERT_NOTIFY_MAX_AGE_MINUTES': config('ALERT_NOTIFY_MAX_AGE_MINUTES', default=60, cast=int),
+    'ALERT_NOTIFY_MAX_RETRIES': config('ALERT_NOTIFY_MAX_RETRIES', default=3, cast=int),
+    'ALERT_NOTIFY_BATCH_SIZE': config('ALERT_NOTIFY_BATCH_SIZE', default=5000, cast=int),
+    'ALERT_WEBHOOK_WORKERS': config('ALERT_WEBHOOK_WORKERS', default=16, cast=int),
+    'ALERT_WEBHOOK_TIMEOUT': config('ALERT_WEBHOOK_TIMEOUT', default=10.0, cast=float),
+    'ALERT_WEBHOOK_RETRIES': config('ALERT_WEBHOOK_RETRIES', default=3, cast=int),
     'MAX_PING_HISTORY_DAYS': config('MAX_PING_HISTORY_DAYS', default=30, cast=int),
+    'SPEED_TEST_HISTORY_DAYS': config('SPEED_TEST_HISTORY_DAYS', default=90, cast=int),
+    'ALERT_HISTORY_DAYS': config('ALERT_HISTORY_DAYS', default=30, cast=int),
+    'PORT_CHECK_HISTORY_DAYS': config('PORT_CHECK_HISTORY_DAYS', default=30, cast=int),
+    'SERVICE_CHECK_HISTORY_DAYS': config('SERVICE_CHECK_HISTORY_DAYS', default=30, cast=int),
+    'TRACEROUTE_HISTORY_DAYS': config('TRACEROUTE_HISTORY_DAYS', default=30, cast=int),
+    'RETENTION_BATCH_SIZE': config('RETENTION_BATCH_SIZE', default=5000, cast=int),
+    'RETENTION_BATCH_PAUSE': config('RETENTION_BATCH_PAUSE', default=0.05, cast=float),
+    'RETENTION_ROLLUP_BEFORE_DELETE': config('RETENTION_ROLLUP_BEFORE_DELETE', default=True, cast=bool),
+    # Daily PostgreSQL partitions for ping results; retention drops whole days
+    'PING_PARTITIONING': config('PING_PARTITIONING', default=False, cast=bool),
+    'PING_PARTITION_PRECREATE_DAYS': config('PING_PARTITION_PRECREATE_DAYS', default=3, cast=int),
+    # Parquet archive of ping/port check results past their history window
+    'ARCHIVE_ENABLED': config('ARCHIVE_ENABLED', default=False, cast=bool),
+    'ARCHIVE_ROOT': config('ARCHIVE_ROOT', default=str(BASE_DIR / 'archive')),
+    'ARCHIVE_RETENTION_DAYS': config('ARCHIVE_RETENTION_DAYS', default=730, cast=int),
+    'ARCHIVE_COMPRESSION': config('ARCHIVE_COMPRESSION', default='zstd'),
+    'DEVICE_STATE_STATS_INTERVAL': config('DEVICE_STATE_STATS_INTERVAL', default=300, cast=int),
+    'ROLLUP_MINUTE_RETENTION_HOURS': config('ROLLUP_MINUTE_RETENTION_HOURS', default=48, cast=int),
+    'ROLLUP_HOUR_RETENTION_DAYS': config('ROLLUP_HOUR_RETENTION_DAYS', default=90, cast=int),
+    'ROLLUP_DAY_RETENTION_DAYS': config('ROLLUP_DAY_RETENTION_DAYS', default=730, cast=int),
     'DASHBOARD_REFRESH_INTERVAL': config('DASHBOARD_REFRESH_INTERVAL', default=30, cast=int),
+    'EVENT_STREAM_URL': config('EVENT_STREAM_URL', default=CELERY_BROKER_URL),
+    'EVENT_STREAM_MAXLEN': config('EVENT_STREAM_MAXLEN', default=10000, cast=int),
+    'EVENT_STREAM_MAX_SECONDS': config('EVENT_STREAM_MAX_SECONDS', default=300, cast=int),
+    'EVENT_STREAM_RETRY_SECONDS': config('EVENT_STREAM_RETRY_SECONDS', default=30, cast=int),
 }
 
 # Logging
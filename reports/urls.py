@@ -10,4 +10,5 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('device-status/', views.device_status_report, name='device_status'),
     path('uptime/', views.uptime_report, name='uptime'),
+    path('latency-history/<int:device_id>/', views.latency_history, name='latency_history'),
 ]
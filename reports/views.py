@@ -1,16 +1,22 @@
 """
 Views for reports and analytics
 """
-from django.shortcuts import render
+from django.shortcuts import render, get_object_or_404
 from django.http import JsonResponse
 from django.contrib import messages
+from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 
 from devices.models import Device
 from monitoring.models import PingResult, SpeedTestResult
+from monitoring.rollups import ping_summaries_by_device
+from monitoring.archive import archived_series, ArchiveUnavailable
 from alerts.models import Alert
 
+# Smallest latency history bucket; finer ones would return a point per result
+MIN_HISTORY_BUCKET_SECONDS = 60
+
 
 def index(request):
     """Reports index page"""
@@ -44,16 +50,17 @@ def uptime_report(request):
     start_date = end_date - timedelta(days=days)
     
     devices = Device.objects.filter(is_active=True)
+    summaries = ping_summaries_by_device(start_date, end_date)
     device_data = []
     
     for device in devices:
-        uptime = device.get_uptime_percentage(days)
-        avg_response = device.get_average_response_time(days)
+        summary = summaries.get(device.id, {})
         
         device_data.append({
             'device': device,
-            'uptime_percentage': uptime,
-            'avg_response_time': avg_response,
+            'uptime_percentage': summary.get('uptime_percentage'),
+            'avg_response_time': summary.get('avg_latency'),
+            'avg_packet_loss': summary.get('avg_packet_loss'),
         })
     
     context = {
@@ -63,3 +70,42 @@ def uptime_report(request):
         'end_date': end_date,
     }
     return render(request, 'reports/uptime.html', context)
+
+
+def latency_history(request, device_id):
+    """Long-range latency and uptime series of a device from the cold archive"""
+    monitor_settings = getattr(settings, 'NETWORK_MONITOR', {})
+    if not monitor_settings.get('ARCHIVE_ENABLED', False):
+        return JsonResponse({'error': 'The result archive is disabled'}, status=404)
+    
+    device = get_object_or_404(Device, id=device_id)
+    try:
+        days = int(request.GET.get('days', 180))
+        bucket = max(MIN_HISTORY_BUCKET_SECONDS, int(request.GET.get('bucket', 86400)))
+    except ValueError:
+        return JsonResponse({'error': 'days and bucket must be integers'}, status=400)
+    if days < 1:
+        return JsonResponse({'error': 'days must be at least 1'}, status=400)
+    
+    # Nothing older than the retention period is archived, and a bucket
+    # wider than the window would only ever hold one point
+    days = min(days, monitor_settings.get('ARCHIVE_RETENTION_DAYS', 730))
+    bucket = min(bucket, days * 86400)
+    end_date = timezone.now()
+    try:
+        start_date = end_date - timedelta(days=days)
+    except OverflowError:
+        return JsonResponse({'error': 'days is out of range'}, status=400)
+    
+    try:
+        series = archived_series('ping', device.id, start_date, end_date, bucket_seconds=bucket)
+    except ArchiveUnavailable as e:
+        return JsonResponse({'error': str(e)}, status=503)
+    
+    return JsonResponse({
+        'device_id': device.id,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'bucket_seconds': bucket,
+        'series': [dict(point, bucket=point['bucket'].isoformat()) for point in series],
+    })
@@ -0,0 +1,47 @@
+"""
+Fixtures for tests of the Django project
+"""
+import os
+
+import pytest
+
+
+@pytest.fixture(scope='session')
+def django_project():
+    """Set up the Django project on an in-memory test database, with tasks run inline."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'network_monitor.settings')
+    import django
+    from django.conf import settings
+
+    # Keep test runs out of the log file and off any local Redis
+    settings.LOGGING['handlers']['file'] = {'class': 'logging.NullHandler'}
+    for key in ('ALERT_COOLDOWN_URL', 'DEVICE_FLAP_URL', 'EVENT_STREAM_URL', 'SCHEDULER_STATE_URL',
+                'WRITE_BUFFER_METRICS_URL'):
+        settings.NETWORK_MONITOR[key] = ''
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+    from network_monitor.celery import app as celery_app
+
+    celery_app.conf.task_always_eager = True
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    yield
+    connection.creation.destroy_test_db(old_name, verbosity=0)
+    teardown_test_environment()
+
+
+@pytest.fixture
+def db(django_project):
+    """Give a test the Django database and fresh process-wide caches, emptied afterwards."""
+    from django.core.management import call_command
+    from monitoring import cooldown, flapping
+    from network_monitor.celery import app as celery_app
+
+    # The Flask tests make their own Celery app current
+    celery_app.set_current()
+    cooldown._caches.clear()
+    flapping._detector = None
+    yield
+    call_command('flush', interactive=False, verbosity=0)
@@ -0,0 +1,45 @@
+"""
+Tests for deduplicated alert creation
+"""
+import pytest
+
+def make_alert(device):
+    from alerts.models import Alert, AlertType
+    return Alert(device=device, alert_type=AlertType.DEVICE_DOWN, severity='high', title='down', message='')
+
+def test_failed_insert_releases_cooldown(db):
+    """Test that alerts whose insert rolls back are not suppressed afterwards."""
+    from django.db import IntegrityError
+    from alerts.dedup import create_alerts
+    from alerts.models import Alert
+    from devices.models import Device
+
+    device = Device.objects.create(name='r1', ip_address='10.0.0.1')
+    missing = Device(id=device.id + 1000, name='gone', ip_address='10.0.0.2')
+    with pytest.raises(IntegrityError):
+        create_alerts([make_alert(device), make_alert(missing)])
+    assert Alert.objects.count() == 0
+
+    assert len(create_alerts([make_alert(device)])) == 1
+    assert create_alerts([make_alert(device)]) == []
+
+def test_rolled_back_transaction_leaves_only_a_pending_claim(db):
+    """Test that a claim inside a rolled back transaction lapses after the pending period."""
+    from django.db import transaction
+    from alerts.dedup import PENDING_CLAIM_SECONDS, alert_cooldown, create_alerts
+    from alerts.models import Alert, AlertType
+    from devices.models import Device
+
+    device = Device.objects.create(name='r1', ip_address='10.0.0.1')
+    cache = alert_cooldown()
+    now = [0.0]
+    cache.clock = lambda: now[0]
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            assert len(create_alerts([make_alert(device)])) == 1
+            raise RuntimeError('caller failed')
+    assert Alert.objects.count() == 0
+
+    now[0] = PENDING_CLAIM_SECONDS + 1
+    assert len(create_alerts([make_alert(device)])) == 1
+    assert cache.cooling([(device.id, AlertType.DEVICE_DOWN)])
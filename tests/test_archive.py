@@ -0,0 +1,82 @@
+"""
+Tests for the Parquet cold archive
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from monitoring.archive import KINDS, write_owner_day, read_archive, archived_series
+
+DAY = datetime(2026, 1, 31, tzinfo=timezone.utc)
+
+def ping_row(pk, minutes, reachable=True, latency=10.0):
+    return (pk, 7, DAY + timedelta(minutes=minutes), reachable, latency if reachable else None,
+            0.0 if reachable else 100.0, 4, 4 if reachable else 0, None, None, None, '')
+
+def test_write_owner_day_skips_rows_already_archived(tmp_path):
+    """Test that archiving a day again only adds the new rows."""
+    kind = KINDS['ping']
+    assert write_owner_day(kind, DAY, 7, [ping_row(1, 0), ping_row(2, 1)], tmp_path, 'zstd') == 2
+    assert write_owner_day(kind, DAY, 7, [ping_row(2, 1), ping_row(3, 2)], tmp_path, 'zstd') == 1
+
+    table = read_archive('ping', DAY, DAY + timedelta(days=1), [7], root=tmp_path)
+    assert table['id'].to_pylist() == [1, 2, 3]
+
+def test_read_archive_filters_time_range_and_owner(tmp_path):
+    """Test that reads return only the requested owners and time range."""
+    kind = KINDS['ping']
+    write_owner_day(kind, DAY, 7, [ping_row(1, 0), ping_row(2, 90)], tmp_path, 'zstd')
+    write_owner_day(kind, DAY, 8, [ping_row(3, 0)[:1] + (8,) + ping_row(3, 0)[2:]], tmp_path, 'zstd')
+
+    table = read_archive('ping', DAY + timedelta(minutes=30), DAY + timedelta(days=1), root=tmp_path)
+    assert table['id'].to_pylist() == [2]
+    assert read_archive('ping', DAY, DAY + timedelta(days=1), [8], root=tmp_path).num_rows == 1
+    assert read_archive('ping', DAY - timedelta(days=3), DAY, root=tmp_path).num_rows == 0
+
+def test_archived_series_buckets_uptime_and_latency(tmp_path):
+    """Test hourly aggregation of archived pings."""
+    rows = [ping_row(1, 0, latency=10.0), ping_row(2, 10, latency=30.0), ping_row(3, 20, reachable=False),
+            ping_row(4, 70, latency=5.0)]
+    write_owner_day(KINDS['ping'], DAY, 7, rows, tmp_path, 'zstd')
+
+    series = archived_series('ping', 7, DAY, DAY + timedelta(days=1), bucket_seconds=3600, root=tmp_path)
+    assert [point['samples'] for point in series] == [3, 1]
+    assert series[0]['bucket'] == DAY
+    assert series[0]['uptime_percentage'] == 66.67
+    assert series[0]['avg_latency'] == 20.0
+    assert series[1]['max_latency'] == 5.0
+
+def test_latency_history_validates_its_parameters(db, tmp_path, monkeypatch):
+    """Test that the history view is gated on ARCHIVE_ENABLED, rejects bad parameters and clamps days and bucket."""
+    import json
+    from django.conf import settings
+    from django.test import RequestFactory
+    from devices.models import Device
+    from reports.views import latency_history
+
+    device = Device.objects.create(name='r1', ip_address='10.0.0.1')
+    factory = RequestFactory()
+    monkeypatch.setitem(settings.NETWORK_MONITOR, 'ARCHIVE_ENABLED', False)
+    assert latency_history(factory.get('/'), device.id).status_code == 404
+
+    monkeypatch.setitem(settings.NETWORK_MONITOR, 'ARCHIVE_ENABLED', True)
+    assert latency_history(factory.get('/', {'days': 'x'}), device.id).status_code == 400
+    assert latency_history(factory.get('/', {'days': '0'}), device.id).status_code == 400
+
+    write_owner_day(KINDS['ping'], DAY, device.id, [ping_row(1, 0)], tmp_path, 'zstd')
+    monkeypatch.setitem(settings.NETWORK_MONITOR, 'ARCHIVE_ROOT', str(tmp_path))
+    monkeypatch.setitem(settings.NETWORK_MONITOR, 'ARCHIVE_RETENTION_DAYS', 30)
+    response = latency_history(factory.get('/', {'days': str(10 ** 12), 'bucket': '0'}), device.id)
+    assert response.status_code == 200
+    body = json.loads(response.content)
+    assert body['bucket_seconds'] == 60
+    span = datetime.fromisoformat(body['end_date']) - datetime.fromisoformat(body['start_date'])
+    assert span == timedelta(days=30)
+
+    response = latency_history(factory.get('/', {'bucket': str(10 ** 12)}), device.id)
+    assert json.loads(response.content)['bucket_seconds'] == 30 * 86400
+
+    monkeypatch.setitem(settings.NETWORK_MONITOR, 'ARCHIVE_RETENTION_DAYS', 10 ** 12)
+    assert latency_history(factory.get('/', {'days': str(10 ** 12)}), device.id).status_code == 400
@@ -0,0 +1,45 @@
+"""
+Tests for the alert cooldown cache
+"""
+from monitoring.cooldown import CooldownCache
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_claims_expire_after_ttl():
+    """Test that a key is claimed once per ttl, and repeats in one call collapse."""
+    clock = Clock()
+    cache = CooldownCache(ttl=60, clock=clock)
+    assert cache.claim_many([(1, 'device_down'), (2, 'device_down'), (1, 'device_down')]) == [
+        (1, 'device_down'), (2, 'device_down')
+    ]
+    clock.now = 59
+    assert cache.claim_many([(1, 'device_down'), (1, 'device_up')]) == [(1, 'device_up')]
+    clock.now = 60
+    assert cache.claim((1, 'device_down'))
+
+def test_lru_bound_evicts_least_recent_key():
+    """Test that the cache never holds more than maxsize keys."""
+    cache = CooldownCache(ttl=60, maxsize=2, clock=Clock())
+    cache.claim_many(['a', 'b'])
+    assert cache.cooling(['a']) == {'a'}
+    cache.claim('c')
+    assert len(cache) == 2
+    assert cache.cooling(['a', 'b', 'c']) == {'a', 'c'}
+
+def test_provisional_claim_is_extended_or_released():
+    """Test that a short claim becomes a full cooldown, and a released key is claimable again."""
+    clock = Clock()
+    cache = CooldownCache(ttl=600, clock=clock)
+    assert cache.claim_many(['a', 'b'], ttl=60) == ['a', 'b']
+    cache.extend(['a'])
+    cache.release(['b'])
+    assert cache.claim_many(['a', 'b'], ttl=60) == ['b']
+    clock.now = 61
+    assert cache.claim_many(['a', 'b'], ttl=60) == ['b']
+    clock.now = 601
+    assert cache.claim('a')
@@ -0,0 +1,66 @@
+"""
+Tests for root-cause alert correlation
+"""
+from alerts.correlation import CorrelationIndex, describe_key
+
+def build_index():
+    # 20 devices behind router 10.0.0.2, split over two edge routers; 20 behind 10.0.0.3
+    devices = [(i, f'192.168.{i % 4}.{i + 1}', 'Hyderabad' if i < 30 else '', 'ISP-A') for i in range(40)]
+    hops = [(i, '10.0.0.2' if i < 20 else '10.0.0.3', 2) for i in range(40)]
+    hops += [(i, f'10.1.{i // 10}.1', 3) for i in range(20)]
+    return CorrelationIndex.from_rows(devices, [(i, 'Core') for i in range(10)], hops)
+
+def test_keys_are_ordered_most_specific_first():
+    """Test that deeper hops come before subnet, group, location and ISP keys."""
+    index = build_index()
+    assert index.device_keys[3] == (
+        'upstream:10.1.0.1', 'upstream:10.0.0.2', 'subnet:192.168.3.0/24', 'group:Core',
+        'location:Hyderabad', 'isp:ISP-A'
+    )
+    assert index.sizes['upstream:10.0.0.2'] == 20
+    assert describe_key('upstream:10.0.0.2') == 'upstream hop 10.0.0.2'
+
+def test_devices_join_the_key_explaining_most_failures():
+    """Test that an outage of a shared router groups its devices under it."""
+    assigned = build_index().classify(range(20), min_devices=5, min_ratio=0.5)
+    assert set(assigned) == set(range(20))
+    assert set(assigned.values()) == {'upstream:10.0.0.2'}
+
+def test_narrow_outage_and_stray_failures():
+    """Test that a stray failure neither forms a group nor widens one."""
+    index = build_index()
+    assigned = index.classify(list(range(10)) + [25], min_devices=5, min_ratio=0.5)
+    assert assigned == {i: 'upstream:10.1.0.1' for i in range(10)}
+    assert index.classify([0, 1, 2], min_devices=5) == {}
+
+def test_open_keys_collect_late_failures():
+    """Test that a key with an active parent qualifies with a single failure."""
+    assigned = build_index().classify([15], min_devices=5, open_keys={'upstream:10.0.0.2'})
+    assert assigned == {15: 'upstream:10.0.0.2'}
+
+def test_existing_parent_is_joined_instead_of_duplicated(db):
+    """Test that a parent another worker already opened for the key is reused."""
+    from datetime import timedelta
+    from django.utils import timezone
+    from alerts import correlation
+    from alerts.dedup import create_alerts
+    from alerts.models import Alert, AlertType
+    from devices.models import Device
+    from monitoring.topology_models import DevicePathHop, TopologyNode
+
+    devices = Device.objects.bulk_create([Device(name=f'd{i}', ip_address=f'10.5.0.{i + 1}') for i in range(10)])
+    router = TopologyNode.objects.create(address='10.0.0.9', last_seen=timezone.now())
+    DevicePathHop.objects.bulk_create([DevicePathHop(device=device, node=router, hop=2) for device in devices])
+    correlation._index = None
+
+    # Opened by another worker, but too long ago for this worker's open parent lookup
+    parent = Alert.objects.create(device=devices[0], alert_type=AlertType.CORRELATED, title='outage', message='',
+                                  correlation_key='upstream:10.0.0.9')
+    Alert.objects.filter(id=parent.id).update(updated_at=timezone.now() - timedelta(hours=1))
+
+    created = create_alerts([Alert(device=device, alert_type=AlertType.DEVICE_DOWN, title='down', message='')
+                             for device in devices])
+    assert {alert.parent_id for alert in created} == {parent.id}
+    assert Alert.objects.filter(alert_type=AlertType.CORRELATED).count() == 1
+    parent.refresh_from_db()
+    assert parent.child_count == 10
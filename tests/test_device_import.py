@@ -0,0 +1,30 @@
+"""
+Tests for device import row preparation
+"""
+import pandas as pd
+
+from devices.importer import detect_device_types, prepare_import
+
+OPTIONS = {
+    'has_header': True,
+    'ip_column': 0,
+    'name_column': 1,
+    'location_column': None,
+    'isp_column': None,
+    'default_device_type': 'server',
+    'auto_detect_type': True,
+}
+
+def test_detect_device_types():
+    """Test that the first matching keyword group wins and the default fills the rest."""
+    names = pd.Series(['web-db-1', 'core-gw', 'printer'])
+    assert detect_device_types(names, 'server').tolist() == ['database', 'router', 'server']
+
+def test_prepare_import_drops_invalid_and_duplicate_ips():
+    """Test that bad and repeated IPs are reported with their file row numbers."""
+    df = pd.DataFrame([['10.0.0.1', 'nginx-1'], ['10.0.0.256', 'bad'], ['10.0.0.1', 'again'], ['10.0.0.2', None]])
+    records, errors = prepare_import(df, OPTIONS)
+    assert [record['ip_address'] for record in records] == ['10.0.0.1', '10.0.0.2']
+    assert records[0]['device_type'] == 'web_server'
+    assert records[1]['name'] == '10.0.0.2'
+    assert errors == ["Row 3: Invalid IP address '10.0.0.256'", "Row 4: Duplicate IP address '10.0.0.1'"]
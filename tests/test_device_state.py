@@ -0,0 +1,79 @@
+"""
+Tests for the per-device latest-state snapshot
+"""
+
+def save_pings(device, outcomes):
+    """Bulk save one PingResult per (is_reachable, response_time) and fold them in like the buffer does."""
+    from monitoring.models import PingResult
+    from monitoring.tasks import record_ping_writes
+
+    rows = PingResult.objects.bulk_create([
+        PingResult(device=device, is_reachable=reachable, response_time=response_time,
+                   packet_loss=0.0 if reachable else 100.0, packets_sent=4,
+                   packets_received=4 if reachable else 0)
+        for reachable, response_time in outcomes
+    ])
+    record_ping_writes(rows)
+    return rows
+
+def test_saved_ping_batch_updates_snapshot(db):
+    """Test that a saved batch leaves each device's latest ping and 24h statistics in its state."""
+    from devices.models import Device
+    from monitoring.models import DeviceState
+
+    router, server = Device.objects.bulk_create([
+        Device(name='router', ip_address='10.30.0.1'), Device(name='server', ip_address='10.30.0.2'),
+    ])
+    save_pings(router, [(True, 10.0), (True, 30.0), (False, None), (True, 20.0)])
+    save_pings(server, [(False, None)])
+
+    state = DeviceState.objects.get(device=router)
+    assert state.last_ping_reachable is True
+    assert state.last_response_time == 20.0
+    assert state.uptime_24h == 75.0
+    assert state.avg_response_time_24h == 20.0
+    assert state.stats_updated_at is not None
+
+    state = DeviceState.objects.get(device=server)
+    assert state.last_ping_reachable is False
+    assert state.last_packet_loss == 100.0
+    assert state.uptime_24h == 0.0
+
+def test_refresh_rebuilds_missing_states(db):
+    """Test that refresh_device_states backfills states from raw results and rollups."""
+    from devices.models import Device
+    from monitoring.device_state import refresh_device_states
+    from monitoring.models import DeviceState
+
+    device = Device.objects.create(name='switch', ip_address='10.30.0.3')
+    idle = Device.objects.create(name='idle', ip_address='10.30.0.4')
+    save_pings(device, [(True, 5.0), (True, 7.0)])
+    DeviceState.objects.all().delete()
+
+    assert refresh_device_states() == 2
+    state = DeviceState.objects.get(device=device)
+    assert state.last_response_time == 7.0
+    assert state.uptime_24h == 100.0
+    assert state.avg_response_time_24h == 6.0
+    assert DeviceState.objects.get(device=idle).last_ping_at is None
+
+def test_select_related_state_reads_snapshot_in_one_query(db):
+    """Test that the live monitor's select_related('state') path needs no query per device."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from devices.models import Device
+    from monitoring.views import device_state_data
+
+    pinged = Device.objects.create(name='ap', ip_address='10.30.0.5')
+    Device.objects.create(name='new', ip_address='10.30.0.6')
+    save_pings(pinged, [(True, 12.5)])
+
+    with CaptureQueriesContext(connection) as queries:
+        data = {entry['device'].name: entry for entry in
+                (device_state_data(device) for device in Device.objects.select_related('state'))}
+    assert len(queries) == 1
+
+    assert data['ap']['latest_ping']['response_time'] == 12.5
+    assert data['ap']['uptime_24h'] == 100.0
+    assert data['new']['latest_ping'] is None
+    assert data['new']['uptime_24h'] is None
@@ -0,0 +1,88 @@
+"""
+Tests for the subnet discovery engine
+"""
+import socket
+
+import pytest
+
+from monitoring.discovery import discovery_hosts, parse_ports, scan_services, sweep
+
+def test_discovery_hosts_limits_range():
+    """Test that host counts skip network and broadcast and large ranges are refused."""
+    count, addresses = discovery_hosts('10.1.2.0/30')
+    assert count == 2
+    assert list(addresses) == ['10.1.2.1', '10.1.2.2']
+    assert discovery_hosts('10.0.0.0/16')[0] == 65534
+    with pytest.raises(ValueError):
+        discovery_hosts('10.0.0.0/15')
+
+def test_sweep_counts_refused_connection_as_live():
+    """Test that a host refusing the TCP fallback is reported with the refusing port."""
+    closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    closed.bind(('127.0.0.1', 0))
+    closed_port = closed.getsockname()[1]
+    closed.close()
+
+    batches = list(sweep(['127.0.0.1'], ports=[closed_port], use_icmp=False, timeout=2))
+    hits = [hit for batch, _scanned in batches for hit in batch]
+    assert batches[-1][1] == 1
+    assert len(hits) == 1
+    assert hits[0]['method'] == 'tcp'
+    assert hits[0]['port'] == closed_port
+
+def test_parse_ports():
+    """Test that port lists accept single ports and ranges and reject bad input."""
+    assert parse_ports('443, 80,8000-8002') == [80, 443, 8000, 8001, 8002]
+    for spec in ('0', '90-80', 'x-1', '1-2000'):
+        with pytest.raises(ValueError):
+            parse_ports(spec)
+
+def test_scan_services_reports_open_ports():
+    """Test that each host's open ports are reported under its key."""
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(16)
+    open_port = listener.getsockname()[1]
+    try:
+        batches = list(scan_services([(7, '127.0.0.1', [open_port, 1])], timeout=2))
+    finally:
+        listener.close()
+    results = [result for batch, _scanned in batches for result in batch]
+    assert results == [{'key': 7, 'host': '127.0.0.1', 'open_ports': [open_port]}]
+
+def test_sweep_fails_when_descriptors_run_out(monkeypatch):
+    """Test that running out of file descriptors fails the sweep instead of hiding hosts."""
+    import errno
+
+    async def exhausted(*args, **kwargs):
+        raise OSError(errno.EMFILE, 'Too many open files')
+
+    monkeypatch.setattr('asyncio.open_connection', exhausted)
+    with pytest.raises(OSError) as error:
+        list(sweep(['127.0.0.1', '127.0.0.2'], ports=[80], use_icmp=False, timeout=1))
+    assert error.value.errno == errno.EMFILE
+
+def test_sweep_caps_connects_by_descriptor_budget(monkeypatch):
+    """Test that connects in flight never exceed the open files budget."""
+    import asyncio
+    from monitoring import discovery
+
+    in_flight = []
+    peak = []
+
+    async def slow_refusal(*args, **kwargs):
+        in_flight.append(1)
+        peak.append(len(in_flight))
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            in_flight.pop()
+        raise ConnectionRefusedError()
+
+    monkeypatch.setattr(discovery, 'descriptor_budget', lambda: 4)
+    monkeypatch.setattr('asyncio.open_connection', slow_refusal)
+    addresses = [f'10.0.0.{i}' for i in range(1, 41)]
+    hits = [hit for batch, _scanned in sweep(addresses, ports=[22, 80, 443], use_icmp=False,
+                                              max_rate=0, max_in_flight=16) for hit in batch]
+    assert len(hits) == 40
+    assert max(peak) <= 4
@@ -0,0 +1,82 @@
+"""
+Tests for the dashboard event bus and its Server-Sent Events stream
+"""
+import json
+
+from monitoring.events import LocalEventBus, format_sse, latency_bucket
+
+def test_format_sse_frames_one_event():
+    """Test that an event becomes id, event and data lines ended by a blank line."""
+    frame = format_sse('7', 'status', {'device_id': 3, 'status': 'offline'})
+    lines = frame.split('\n')
+    assert frame.endswith('\n\n')
+    assert lines[:2] == ['id: 7', 'event: status']
+    assert json.loads(lines[2][len('data: '):]) == {'device_id': 3, 'status': 'offline'}
+
+def test_latency_buckets():
+    """Test that results fall into the live monitor's latency buckets."""
+    assert latency_bucket(False, 5.0) == 'down'
+    assert latency_bucket(True, None) == 'unknown'
+    assert [latency_bucket(True, ms) for ms in (10, 150, 900, 1500)] == ['good', 'fair', 'slow', 'critical']
+
+def test_local_bus_reports_lost_events():
+    """Test that a reader whose position fell off the ring buffer is told to resync."""
+    bus = LocalEventBus(maxlen=3)
+    bus.publish_many([('status', {'n': n}) for n in range(5)])
+    events, lost = bus.read('1', timeout=0)
+    assert [event_id for event_id, _type, _data in events] == ['3', '4', '5']
+    assert lost
+    assert bus.read('3', timeout=0) == ([('4', 'status', {'n': 3}), ('5', 'status', {'n': 4})], False)
+
+def test_event_stream_sends_events_after_last_id(django_project, monkeypatch):
+    """Test that the stream replays events after Last-Event-ID as SSE frames."""
+    from django.conf import settings
+    from django.test import RequestFactory
+    from monitoring import events, views
+
+    bus = LocalEventBus()
+    bus.publish_many([('status', {'n': 1}), ('alert', {'n': 2})])
+    monkeypatch.setattr(events, '_bus', bus)
+    monkeypatch.setitem(settings.NETWORK_MONITOR, 'EVENT_STREAM_MAX_SECONDS', 0.2)
+
+    request = RequestFactory().get('/api/events/', HTTP_LAST_EVENT_ID='1')
+    response = views.event_stream(request)
+    body = ''.join(part.decode() for part in response.streaming_content)
+
+    assert response['Content-Type'] == 'text/event-stream'
+    assert body.startswith('retry: 3000\n\n')
+    assert format_sse('2', 'alert', {'n': 2}) in body
+    assert 'event: status' not in body
+
+def test_unreachable_redis_falls_back_and_is_retried(django_project, monkeypatch, caplog):
+    """Test that an unreachable Redis is logged as an error and tried again after the retry delay."""
+    from django.conf import settings
+    from monitoring import events
+
+    attempts = []
+
+    class DownBus:
+        def __init__(self, url, maxlen):
+            attempts.append(url)
+            raise ConnectionError('Connection refused')
+
+    clock = [1000.0]
+    monkeypatch.setattr(events, '_bus', None)
+    monkeypatch.setattr(events, '_local_bus', None)
+    monkeypatch.setattr(events, '_retry_at', 0.0)
+    monkeypatch.setattr(events, 'RedisEventBus', DownBus)
+    monkeypatch.setattr(events.time, 'monotonic', lambda: clock[0])
+    monkeypatch.setitem(settings.NETWORK_MONITOR, 'EVENT_STREAM_URL', 'redis://redis.invalid:6379/0')
+    monkeypatch.setitem(settings.NETWORK_MONITOR, 'EVENT_STREAM_RETRY_SECONDS', 30)
+
+    fallback = events.get_event_bus()
+    assert isinstance(fallback, LocalEventBus)
+    assert any(record.levelname == 'ERROR' for record in caplog.records)
+
+    clock[0] += 10
+    assert events.get_event_bus() is fallback
+    assert len(attempts) == 1
+
+    clock[0] += 30
+    assert events.get_event_bus() is fallback
+    assert len(attempts) == 2
@@ -0,0 +1,42 @@
+"""
+Tests for the streaming CSV and Excel export
+"""
+import gzip
+import io
+from datetime import datetime, timezone
+
+from openpyxl import load_workbook
+
+from monitoring.export import csv_stream, write_xlsx
+
+HEADER = ['name', 'timestamp', 'value']
+
+def rows(count):
+    for number in range(count):
+        yield (f'device-{number}', datetime(2026, 1, 31, tzinfo=timezone.utc), number)
+
+def test_csv_stream_yields_chunks_lazily():
+    """Test that CSV is produced in chunks of chunk_rows rows."""
+    chunks = list(csv_stream(HEADER, rows(25), chunk_rows=10))
+    lines = b''.join(chunks).decode().splitlines()
+    assert len(chunks) == 3
+    assert lines[0] == 'name,timestamp,value'
+    assert lines[1] == 'device-0,2026-01-31T00:00:00+00:00,0'
+    assert len(lines) == 26
+
+def test_csv_stream_gzip():
+    """Test that the compressed stream is a valid gzip file."""
+    data = b''.join(csv_stream(HEADER, rows(500), compress=True))
+    assert gzip.decompress(data) == b''.join(csv_stream(HEADER, rows(500)))
+
+def test_write_xlsx_continues_long_sheets():
+    """Test that rows beyond max_sheet_rows continue on numbered sheets."""
+    target = io.BytesIO()
+    total = write_xlsx(target, [('Pings', HEADER, rows(5)), ('Empty', HEADER, iter(()))], max_sheet_rows=2)
+    workbook = load_workbook(io.BytesIO(target.getvalue()))
+
+    assert total == 5
+    assert workbook.sheetnames == ['Pings', 'Pings (2)', 'Pings (3)', 'Empty']
+    assert [cell.value for cell in workbook['Pings (3)'][1]] == HEADER
+    assert workbook['Pings (3)']['A2'].value == 'device-4'
+    assert workbook['Empty'].max_row == 1
@@ -0,0 +1,72 @@
+"""
+Tests for device flap detection
+"""
+import pytest
+
+from monitoring.flapping import FlapDetector, flap_percent
+
+def test_flap_percent_weighs_recent_changes_more():
+    """Test that a change weighs 0.8 when oldest and 1.2 when newest."""
+    assert flap_percent('1' * 20, 20) == pytest.approx(100.0)
+    assert flap_percent('1' + '0' * 19, 20) == pytest.approx(4.0)
+    assert flap_percent('0' * 19 + '1', 20) == pytest.approx(6.0)
+    assert flap_percent('1', 20) == flap_percent('0' * 19 + '1', 20)
+
+def test_alternating_device_starts_and_stops_flapping():
+    """Test the hysteresis between the high and low thresholds."""
+    detector = FlapDetector(history=21, low=25.0, high=50.0)
+    states = ['online', 'offline'] * 6
+    results = [detector.record(1, state) for state in states]
+    started = next(i for i, result in enumerate(results) if result.flapping)
+    assert started > 1 and not results[started].was_flapping
+    assert all(result.flapping for result in results[started:])
+
+    # Settled checks lower the percentage, but flapping holds until it drops below low
+    results = [detector.record(1, 'online') for _ in range(20)]
+    stopped = next(i for i, result in enumerate(results) if not result.flapping)
+    assert results[stopped].was_flapping and results[stopped].percent < 25.0
+    assert results[stopped - 1].percent < 50.0
+
+def test_histories_are_bounded():
+    """Test that the least recently checked devices are evicted past maxsize."""
+    detector = FlapDetector(maxsize=2)
+    detector.record_many([(1, 'online'), (2, 'online'), (3, 'offline')])
+    assert len(detector) == 2
+    assert detector.record(1, 'offline').percent == 0.0
+    with pytest.raises(ValueError):
+        FlapDetector(low=60.0, high=50.0)
+
+def test_redis_histories_collapse_duplicate_devices():
+    """Test that a device checked twice in one batch is read and written once, in check order."""
+    from monitoring.flapping import RedisFlapDetector
+
+    class FakeRedis:
+        def __init__(self):
+            self.values = {}
+            self.reads = []
+            self.writes = []
+
+        def mget(self, names):
+            self.reads.append(list(names))
+            return [self.values.get(name) for name in names]
+
+        def pipeline(self, transaction=False):
+            return self
+
+        def set(self, name, value, ex=None):
+            self.writes.append(name)
+            self.values[name] = value
+
+        def execute(self):
+            pass
+
+    detector = RedisFlapDetector('redis://localhost:6379/0', history=5, low=10.0, high=20.0)
+    detector.client = FakeRedis()
+    local = FlapDetector(history=5, low=10.0, high=20.0)
+    batches = [[(1, 'online'), (2, 'online')], [(1, 'offline'), (2, 'online'), (1, 'online'), (1, 'offline')]]
+
+    for batch in batches:
+        assert detector.record_many(batch) == local.record_many(batch)
+    assert detector.client.reads[-1] == ['network_monitor:flap:1', 'network_monitor:flap:2']
+    assert detector.client.writes[-2:] == ['network_monitor:flap:1', 'network_monitor:flap:2']
+    assert detector.record(1, 'offline') == local.record(1, 'offline')
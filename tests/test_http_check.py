@@ -0,0 +1,28 @@
+"""
+Tests for the pooled HTTP checker certificate parsing
+"""
+import ssl
+from datetime import datetime, timezone
+from monitoring.http_check import certificate_not_after
+
+CERTIFICATE = """-----BEGIN CERTIFICATE-----
+MIIBgzCCASmgAwIBAgIUPGprCSSFn/RJQkyZkHve9QfiB/gwCgYIKoZIzj0EAwIw
+FzEVMBMGA1UEAwwMbW9uaXRvci10ZXN0MB4XDTI2MTAxNjIyNTYxM1oXDTM2MTAx
+MzIyNTYxM1owFzEVMBMGA1UEAwwMbW9uaXRvci10ZXN0MFkwEwYHKoZIzj0CAQYI
+KoZIzj0DAQcDQgAESWd1Ydrw70lPELvX+pJJjiw12LSTCl5XkMsRrTpd24O5MwyS
+UWtyo0bBvU33fsVGvx0RXN8KeWZsbqDCXrg7mKNTMFEwHQYDVR0OBBYEFOpWgZq2
+0lzk+lcpTXhHnTLmpElUMB8GA1UdIwQYMBaAFOpWgZq20lzk+lcpTXhHnTLmpElU
+MA8GA1UdEwEB/wQFMAMBAf8wCgYIKoZIzj0EAwIDSAAwRQIgNpf0/cYUUK4ChHxd
+qNBbEjxdxNoA0s+X4oKhYn1ZqmsCIQDfMYDvl2lnYucvpx0Fim/5KLR2xh1CXGAS
+V9EnFJ7abA==
+-----END CERTIFICATE-----
+"""
+
+def test_certificate_not_after():
+    """Test reading notAfter from a DER certificate."""
+    der = ssl.PEM_cert_to_DER_cert(CERTIFICATE)
+    assert certificate_not_after(der) == datetime(2036, 10, 13, 22, 56, 13, tzinfo=timezone.utc)
+
+def test_certificate_not_after_garbage():
+    """Test that malformed input yields None instead of raising."""
+    assert certificate_not_after(b'\x30\x03\x02') is None
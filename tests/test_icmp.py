@@ -0,0 +1,39 @@
+"""
+Tests for the asyncio ICMP engine packet handling
+"""
+import struct
+from monitoring.icmp import (
+    build_echo_request, parse_echo_reply, checksum, empty_result,
+    ICMP_ECHO_REPLY, ICMP_ECHO_REQUEST
+)
+
+def test_echo_request_checksum():
+    """Test that a built echo request checksums to zero."""
+    packet = build_echo_request(0x1234, 7)
+    assert packet[0] == ICMP_ECHO_REQUEST
+    assert checksum(packet) == 0
+
+def test_parse_echo_reply_without_ip_header():
+    """Test parsing a reply as delivered by a datagram ICMP socket."""
+    reply = struct.pack('!BBHHH', ICMP_ECHO_REPLY, 0, 0, 0x1234, 7) + b'payload'
+    assert parse_echo_reply(reply) == (0x1234, 7)
+
+def test_parse_echo_reply_with_ip_header():
+    """Test parsing a reply as delivered by a raw socket."""
+    ip_header = bytes([0x45]) + bytes(19)
+    reply = struct.pack('!BBHHH', ICMP_ECHO_REPLY, 0, 0, 42, 99)
+    assert parse_echo_reply(ip_header + reply) == (42, 99)
+
+def test_parse_ignores_other_icmp_types():
+    """Test that echo requests and short packets are not treated as replies."""
+    assert parse_echo_reply(build_echo_request(1, 1)) is None
+    assert parse_echo_reply(b'\x00\x00') is None
+
+def test_empty_result_shape():
+    """Test the default result matches the PingMonitor result dict."""
+    result = empty_result('10.0.0.1', 4)
+    assert result['is_reachable'] is False
+    assert result['packet_loss'] == 100.0
+    assert result['packets_sent'] == 4
+    for key in ('response_time', 'min_time', 'max_time', 'avg_time'):
+        assert result[key] is None
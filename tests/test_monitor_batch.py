@@ -0,0 +1,130 @@
+"""
+Tests for batched device monitoring
+"""
+
+def fake_ping_hosts(calls, reachable):
+    """Return a PingMonitor.ping_hosts stand-in that records its hosts."""
+    from monitoring.icmp import empty_result
+
+    def ping_hosts(self, hosts, timeout=5, count=4, timeouts=None):
+        hosts = list(hosts)
+        calls.append(hosts)
+        results = {}
+        for host in hosts:
+            result = empty_result(host, count)
+            if host in reachable:
+                result.update(is_reachable=True, response_time=2.5, packet_loss=0.0, packets_received=count)
+            results[host] = result
+        return results
+
+    return ping_hosts
+
+def make_devices(count, **fields):
+    from devices.models import Device
+
+    start = Device.objects.count()
+    return Device.objects.bulk_create([
+        Device(name=f'device-{start + i}', ip_address=f'10.20.{(start + i) // 250}.{(start + i) % 250 + 1}', **fields)
+        for i in range(count)
+    ])
+
+def test_chunked_boundaries(django_project):
+    """Test that chunks keep order and only the last one is short."""
+    from monitoring.tasks import chunked
+
+    assert chunked([], 3) == []
+    assert chunked([1, 2, 3, 4, 5, 6], 3) == [[1, 2, 3], [4, 5, 6]]
+    assert chunked([1, 2, 3, 4, 5, 6, 7], 3) == [[1, 2, 3], [4, 5, 6], [7]]
+    assert chunked([1, 2], 5) == [[1, 2]]
+
+def test_monitor_all_devices_queues_active_pinged_devices_in_chunks(db, monkeypatch):
+    """Test that only active, ping-enabled devices are queued, batch by batch."""
+    from django.conf import settings
+    from monitoring import tasks
+
+    active = make_devices(5)
+    make_devices(2, is_active=False)
+    make_devices(2, ping_enabled=False)
+
+    queued = []
+
+    class Result:
+        id = 'task'
+
+    monkeypatch.setattr(tasks.monitor_device_batch, 'delay', lambda batch: queued.append(batch) or Result())
+    monkeypatch.setitem(settings.NETWORK_MONITOR, 'MONITOR_BATCH_SIZE', 2)
+
+    summary = tasks.monitor_all_devices()
+    ids = [device.id for device in active]
+    assert queued == [ids[0:2], ids[2:4], ids[4:5]]
+    assert summary['queued_devices'] == 5
+    assert summary['batches'] == 3
+
+def test_monitor_device_batch_pings_once_and_skips_excluded(db, monkeypatch):
+    """Test that a batch pings its monitored devices together and writes their results."""
+    from devices.models import Device, DeviceStatus
+    from monitoring.models import PingResult
+    from monitoring.tasks import PingMonitor, monitor_device_batch
+
+    active = make_devices(4)
+    inactive = make_devices(1, is_active=False)
+    unpinged = make_devices(1, ping_enabled=False)
+    calls = []
+    monkeypatch.setattr(PingMonitor, 'ping_hosts',
+                        fake_ping_hosts(calls, {device.ip_address for device in active[:3]}))
+
+    result = monitor_device_batch([device.id for device in active + inactive + unpinged])
+
+    assert calls == [[device.ip_address for device in active]]
+    assert result['monitored'] == 4
+    assert result['reachable'] == 3
+    assert PingResult.objects.count() == 4
+    assert set(PingResult.objects.values_list('device_id', flat=True)) == {device.id for device in active}
+    statuses = dict(Device.objects.values_list('id', 'status'))
+    assert [statuses[device.id] for device in active] == [DeviceStatus.ONLINE] * 3 + [DeviceStatus.OFFLINE]
+    assert statuses[inactive[0].id] == statuses[unpinged[0].id] == DeviceStatus.UNKNOWN
+
+def test_monitor_device_batch_without_monitored_devices(db, monkeypatch):
+    """Test that a batch of only excluded devices pings nothing."""
+    from monitoring.tasks import PingMonitor, monitor_device_batch
+
+    excluded = make_devices(1, is_active=False) + make_devices(1, ping_enabled=False)
+    calls = []
+    monkeypatch.setattr(PingMonitor, 'ping_hosts', fake_ping_hosts(calls, set()))
+
+    assert monitor_device_batch([device.id for device in excluded]) == {'monitored': 0, 'status_changes': 0}
+    assert calls == []
+
+def test_subprocess_fallback_pings_hosts_concurrently(django_project, monkeypatch):
+    """Test that without ICMP sockets the fallback pings overlap, up to MAX_CONCURRENT_PINGS."""
+    import threading
+    import time
+    from django.conf import settings
+    from monitoring import tasks
+    from monitoring.icmp import IcmpUnavailable, empty_result
+
+    def no_icmp(*args, **kwargs):
+        raise IcmpUnavailable('Operation not permitted')
+
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def slow_ping(self, host, timeout=5, count=4):
+        with lock:
+            running.append(host)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(host)
+        return empty_result(host, count)
+
+    monkeypatch.setattr(tasks, 'icmp_ping_hosts', no_icmp)
+    monkeypatch.setattr(tasks.PingMonitor, '_system_ping', slow_ping)
+    monkeypatch.setitem(settings.NETWORK_MONITOR, 'MAX_CONCURRENT_PINGS', 4)
+
+    hosts = [f'10.40.0.{i}' for i in range(1, 13)]
+    results = tasks.PingMonitor(use_icmp_engine=True).ping_hosts(hosts, timeout=1, count=1)
+
+    assert list(results) == hosts
+    assert 1 < max(peak) <= 4
@@ -0,0 +1,27 @@
+"""
+Tests for alert digests
+"""
+from datetime import datetime
+
+from monitoring.notify import digest_body, digest_subject, recipient_digests
+
+def alert(id, severity, device='router1'):
+    return {'id': id, 'severity': severity, 'title': f'Alert {id}', 'device_name': device,
+            'ip_address': '10.0.0.1', 'created_at': datetime(2026, 1, 1, 12, 0, id)}
+
+def test_recipient_digests_merge_routes_by_severity():
+    """Test that each recipient gets one digest, filtered by route severity and most severe first."""
+    alerts = [alert(1, 'medium'), alert(2, 'critical'), alert(3, 'high')]
+    digests = recipient_digests(alerts, [(['ops@example.com'], 'low'), (['ops@example.com', 'cto@example.com'], 'critical')])
+    assert [item['id'] for item in digests['ops@example.com']] == [2, 3, 1]
+    assert [item['id'] for item in digests['cto@example.com']] == [2]
+    assert recipient_digests([alert(1, 'low')], [(['cto@example.com'], 'high')]) == {}
+
+def test_digest_subject_and_body():
+    """Test that a digest is titled by its worst alert and lists a bounded number of lines."""
+    alerts = [alert(1, 'critical', 'r1'), alert(2, 'high', 'r2'), alert(3, 'high', 'r2')]
+    assert digest_subject(alerts[:1]) == '[CRITICAL] Alert 1'
+    assert digest_subject(alerts) == '[CRITICAL] 3 network alerts on 2 devices'
+    body = digest_body(alerts, max_lines=2)
+    assert '1 critical, 2 high' in body
+    assert '... and 1 more' in body
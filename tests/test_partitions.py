@@ -0,0 +1,122 @@
+"""
+Tests for daily ping result partitions, against a recording stand-in for the PostgreSQL connection
+"""
+from collections import deque
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+TABLE = 'monitoring_pingresult'
+
+def utc(day, hour=0):
+    return datetime(2024, 3, day, hour, tzinfo=timezone.utc)
+
+class RecordingCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.connection.statements.append((' '.join(sql.split()), params))
+
+    def fetchone(self):
+        return self.connection.rows.popleft()
+
+    def fetchall(self):
+        return self.connection.rows.popleft()
+
+class RecordingConnection:
+    vendor = 'postgresql'
+    ops = SimpleNamespace(quote_name=lambda name: f'"{name}"')
+
+    def __init__(self, *rows):
+        self.statements = []
+        self.rows = deque(rows)
+
+    def cursor(self):
+        return RecordingCursor(self)
+
+    def sql(self):
+        return [sql for sql, _params in self.statements]
+
+@pytest.fixture
+def partitions(django_project, monkeypatch):
+    from monitoring import partitions
+
+    monkeypatch.setattr(partitions, 'transaction', SimpleNamespace(atomic=nullcontext))
+    return partitions
+
+def test_partition_name_and_range(partitions, monkeypatch):
+    """Test that a day's partition is named after it and covers exactly that UTC day."""
+    connection = RecordingConnection()
+    monkeypatch.setattr(partitions, 'connection', connection)
+
+    assert partitions._day(datetime(2024, 3, 5, 23, 30, tzinfo=timezone(timedelta(hours=-5)))) == utc(6)
+    assert partitions.create_partition(utc(5)) == f'{TABLE}_p20240305'
+
+    create, move, attach = connection.statements
+    assert create[0] == f'CREATE TABLE "{TABLE}_p20240305" (LIKE "{TABLE}" INCLUDING DEFAULTS)'
+    assert f'DELETE FROM "{TABLE}_default"' in move[0]
+    assert move[1] == [utc(5), utc(6)]
+    assert attach[0] == (f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{TABLE}_p20240305" '
+                         f"FOR VALUES FROM ('2024-03-05T00:00:00+00:00') TO ('2024-03-06T00:00:00+00:00')")
+
+def test_legacy_table_conversion(partitions, monkeypatch):
+    """Test that the old table is validated before the lock and attached up to the day after tomorrow."""
+    connection = RecordingConnection((42,))
+    monkeypatch.setattr(partitions, 'connection', connection)
+
+    boundary = partitions.convert_to_partitioned(now=utc(10, 15))
+    assert boundary == utc(12)
+
+    sql = connection.sql()
+    lock = sql.index(f'LOCK TABLE "{TABLE}" IN ACCESS EXCLUSIVE MODE')
+    assert sql[0].startswith('CREATE UNIQUE INDEX CONCURRENTLY')
+    assert sql[1].endswith(""""timestamp" < '2024-03-12T00:00:00+00:00') NOT VALID""")
+    assert sql[2].startswith(f'ALTER TABLE "{TABLE}" VALIDATE CONSTRAINT')
+    assert lock == 3
+    assert sql[lock + 1] == f'ALTER TABLE "{TABLE}" RENAME TO "{TABLE}_legacy"'
+    assert f'ALTER TABLE "{TABLE}" ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY (START WITH 42)' in sql
+    assert f'ALTER TABLE "{TABLE}" ADD PRIMARY KEY (id, "timestamp")' in sql
+    assert (f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{TABLE}_legacy" '
+            f"FOR VALUES FROM (MINVALUE) TO ('2024-03-12T00:00:00+00:00')") in sql
+    assert sql[-1] == f'CREATE TABLE "{TABLE}_default" PARTITION OF "{TABLE}" DEFAULT'
+
+def test_list_partitions_parses_upper_bounds(partitions, monkeypatch):
+    """Test that partitions are ordered by upper bound with the default partition last."""
+    connection = RecordingConnection([
+        (f'{TABLE}_default', 'DEFAULT'),
+        (f'{TABLE}_p20240312', "FOR VALUES FROM ('2024-03-12 00:00:00+00') TO ('2024-03-13 00:00:00+00')"),
+        (f'{TABLE}_legacy', "FOR VALUES FROM (MINVALUE) TO ('2024-03-12 00:00:00+00')"),
+    ])
+    monkeypatch.setattr(partitions, 'connection', connection)
+
+    assert partitions.list_partitions() == [
+        (f'{TABLE}_legacy', utc(12)), (f'{TABLE}_p20240312', utc(13)), (f'{TABLE}_default', None),
+    ]
+
+def test_drop_expired_partitions_keeps_partitions_reaching_past_cutoff(partitions, monkeypatch):
+    """Test that only partitions whose upper bound is at or before the cutoff are dropped."""
+    connection = RecordingConnection((1000,), (250,))
+    monkeypatch.setattr(partitions, 'connection', connection)
+    monkeypatch.setattr(partitions, 'list_partitions', lambda: [
+        (f'{TABLE}_legacy', utc(4)),
+        (f'{TABLE}_p20240304', utc(5)),
+        (f'{TABLE}_p20240305', utc(6)),
+        (f'{TABLE}_default', None),
+    ])
+
+    stats = partitions.drop_expired_partitions(utc(5))
+    assert stats['partitions_dropped'] == [f'{TABLE}_legacy', f'{TABLE}_p20240304']
+    assert stats['deleted'] == 1250
+    assert f'DROP TABLE "{TABLE}_p20240305"' not in connection.sql()
+    assert connection.sql()[-2:] == [
+        f'ALTER TABLE "{TABLE}" DETACH PARTITION "{TABLE}_p20240304"', f'DROP TABLE "{TABLE}_p20240304"',
+    ]
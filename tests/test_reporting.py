@@ -0,0 +1,40 @@
+"""
+Tests for the vectorised report statistics
+"""
+import math
+
+import pandas as pd
+
+from app.utils.reporting import summarize_pings, frame_records
+
+def ping_frame(rows):
+    return pd.DataFrame(rows, columns=['device_id', 'is_reachable', 'response_time', 'packet_loss'])
+
+def test_summarize_pings_per_device():
+    """Test uptime, latency mean, percentiles and loss per device."""
+    frame = ping_frame([
+        (1, True, 10.0, 0.0), (1, True, 30.0, 0.0), (1, False, None, 100.0), (1, True, 20.0, 0.0),
+        (2, False, None, 100.0),
+    ])
+    stats = summarize_pings(frame, percentiles=(50, 100))
+
+    assert stats.loc[1, 'total_pings'] == 4
+    assert stats.loc[1, 'successful_pings'] == 3
+    assert stats.loc[1, 'uptime_percentage'] == 75.0
+    assert stats.loc[1, 'avg_response_time'] == 20.0
+    assert stats.loc[1, 'p50'] == 20.0
+    assert stats.loc[1, 'p100'] == 30.0
+    assert stats.loc[1, 'avg_packet_loss'] == 25.0
+    assert stats.loc[2, 'uptime_percentage'] == 0.0
+    assert math.isnan(stats.loc[2, 'avg_response_time'])
+
+def test_summarize_pings_empty_window():
+    """Test that an empty window gives an empty frame with every column."""
+    stats = summarize_pings(ping_frame([]))
+    assert stats.empty
+    assert {'uptime_percentage', 'p50', 'p95', 'p99'} <= set(stats.columns)
+
+def test_frame_records_turns_nan_into_none():
+    """Test that missing statistics come out as None."""
+    records = frame_records(pd.DataFrame({'device_id': [1], 'p50': [float('nan')]}))
+    assert records == [{'device_id': 1, 'p50': None}]
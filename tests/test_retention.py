@@ -0,0 +1,31 @@
+"""
+Tests for the chunked retention loop
+"""
+from monitoring.retention import delete_in_batches
+
+def test_delete_in_batches_bounds_every_batch():
+    """Test that rows are deleted in batches no larger than batch_size."""
+    rows = set(range(23))
+    batch_sizes = []
+
+    def next_batch(size):
+        return sorted(rows)[:size]
+
+    def delete_batch(ids):
+        batch_sizes.append(len(ids))
+        rows.difference_update(ids)
+        return len(ids)
+
+    stats = delete_in_batches(next_batch, delete_batch, batch_size=5, pause=0)
+
+    assert not rows
+    assert batch_sizes == [5, 5, 5, 5, 3]
+    assert stats['deleted'] == 23
+    assert stats['batches'] == 5
+    assert stats['rows_per_sec'] > 0
+
+def test_delete_in_batches_with_nothing_expired():
+    """Test that an empty table finishes without deleting."""
+    stats = delete_in_batches(lambda size: [], lambda ids: 0, batch_size=5, pause=0)
+    assert stats['deleted'] == 0
+    assert stats['batches'] == 0
@@ -0,0 +1,133 @@
+"""
+Tests for rollup bucket selection and histogram percentiles
+"""
+from datetime import datetime, timezone
+
+# Rollup resolutions as stored
+MINUTE, HOUR, DAY = '1m', '1h', '1d'
+
+def at(day, hour=0, minute=0, second=0):
+    return datetime(2024, 3, day, hour, minute, second, tzinfo=timezone.utc)
+
+def assert_contiguous(ranges, start, end):
+    spans = sorted((range_start, range_end) for _resolution, range_start, range_end in ranges)
+    assert spans[0][0] == start
+    assert spans[-1][1] == end
+    assert all(previous[1] == following[0] for previous, following in zip(spans, spans[1:]))
+
+def test_unaligned_window_uses_coarsest_buckets(django_project):
+    """Test that an unaligned window is split into edge minutes, edge hours and whole days."""
+    from monitoring.rollups import covering_ranges
+
+    ranges = covering_ranges(at(1, 10, 17, 30), at(4, 5, 42, 10))
+    assert sorted(ranges) == sorted([
+        (DAY, at(2), at(4)),
+        (HOUR, at(1, 11), at(2)),
+        (HOUR, at(4), at(4, 5)),
+        (MINUTE, at(1, 10, 18), at(1, 11)),
+        (MINUTE, at(4, 5), at(4, 5, 43)),
+    ])
+    assert_contiguous(ranges, at(1, 10, 18), at(4, 5, 43))
+
+def test_short_and_empty_windows(django_project):
+    """Test that a window inside one hour reads minutes and an empty one reads nothing."""
+    from monitoring.rollups import covering_ranges
+
+    assert covering_ranges(at(1, 10, 5), at(1, 10, 20, 1)) == [(MINUTE, at(1, 10, 5), at(1, 10, 21))]
+    assert covering_ranges(at(1, 10, 5, 10), at(1, 10, 5, 40)) == []
+
+def test_pruned_edge_minutes_fall_back_to_hours(django_project):
+    """Test that edge minutes older than the minute retention are read from their hour."""
+    from monitoring.rollups import covering_ranges
+
+    ranges = covering_ranges(at(1, 10, 17, 30), at(4, 5, 42, 10), minutes_since=at(3))
+    assert (MINUTE, at(1, 10, 18), at(1, 11)) not in ranges
+    assert (HOUR, at(1, 10), at(2)) in ranges
+    assert (MINUTE, at(4, 5), at(4, 5, 43)) in ranges
+    assert_contiguous(ranges, at(1, 10), at(4, 5, 43))
+
+    old = covering_ranges(at(1, 10, 17), at(1, 10, 40), minutes_since=at(3))
+    assert old == [(HOUR, at(1, 10), at(1, 11))]
+
+def test_percentile_of_empty_histogram(django_project):
+    """Test that an empty histogram has no percentile."""
+    from monitoring.rollups import histogram_percentile
+
+    assert histogram_percentile({}, 95) is None
+    assert histogram_percentile({'12': 0}, 95) is None
+
+def test_percentile_of_single_sample_is_clamped_to_it(django_project):
+    """Test that one sample's p95 is the sample itself once clamped by min and max."""
+    from monitoring.rollups import histogram_bin, histogram_percentile
+
+    histogram = {histogram_bin(23.4): 1}
+    estimate = histogram_percentile(histogram, 95)
+    assert 23.4 <= estimate <= 23.4 * 1.1 + 0.001
+    assert histogram_percentile(histogram, 95, lower=23.4, upper=23.4) == 23.4
+
+def test_merged_percentile_within_one_bin(django_project):
+    """Test that p95 of merged histograms is within one bin of the exact value."""
+    from monitoring.rollups import histogram_bin, histogram_percentile, merge_histograms
+
+    samples = [float(ms) for ms in range(1, 201)]
+    first, second = {}, {}
+    for index, sample in enumerate(samples):
+        target = first if index % 2 else second
+        key = str(histogram_bin(sample))
+        target[key] = target.get(key, 0) + 1
+    estimate = histogram_percentile(merge_histograms(first, second), 95, 1.0, 200.0)
+    assert 190.0 <= estimate <= 190.0 * 1.1
+
+def add_pings(device, *timestamps):
+    from monitoring.models import PingResult
+
+    results = []
+    for timestamp in timestamps:
+        result = PingResult.objects.create(device=device, is_reachable=True, response_time=5.0)
+        PingResult.objects.filter(pk=result.pk).update(timestamp=timestamp)
+        result.timestamp = timestamp
+        results.append(result)
+    return results
+
+def daily_count(device, day):
+    from monitoring.rollups import floor_bucket
+    from monitoring.rollup_models import PingRollup
+
+    rollup = PingRollup.objects.filter(device=device, resolution=DAY, bucket=floor_bucket(day, DAY)).first()
+    return rollup.count if rollup else None
+
+def test_rebuild_leaves_the_live_day_alone(db):
+    """Test that a rebuild recomputes closed days and never touches today's rollups."""
+    from datetime import timedelta
+    from django.utils import timezone
+    from devices.models import Device
+    from monitoring.rollups import rebuild_rollups, record_ping_results
+
+    device = Device.objects.create(name='r1', ip_address='10.0.0.1')
+    now = timezone.now()
+    past = now - timedelta(days=3)
+    add_pings(device, past, past + timedelta(minutes=1))
+    # One live result is rolled up, the other is still on its way
+    record_ping_results(add_pings(device, now))
+    add_pings(device, now)
+
+    assert rebuild_rollups(now - timedelta(days=5))['pingresult'] == 2
+    assert daily_count(device, past) == 2
+    assert daily_count(device, now) == 1
+
+def test_rebuild_skips_days_past_raw_retention(db, monkeypatch):
+    """Test that days whose raw results may be partly deleted keep their rollups."""
+    from datetime import timedelta
+    from django.conf import settings
+    from django.utils import timezone
+    from devices.models import Device
+    from monitoring.rollups import rebuild_rollups, record_ping_results
+
+    monkeypatch.setitem(settings.NETWORK_MONITOR, 'MAX_PING_HISTORY_DAYS', 5)
+    device = Device.objects.create(name='r1', ip_address='10.0.0.1')
+    old = timezone.now() - timedelta(days=10)
+    record_ping_results(add_pings(device, old, old, old))
+    add_pings(device, old - timedelta(minutes=1))
+
+    assert rebuild_rollups()['pingresult'] == 0
+    assert daily_count(device, old) == 3
@@ -0,0 +1,62 @@
+"""
+Tests for the streaming alert rule engine
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from alerts.rules import CompiledRule, DeviceWindow, RuleEngine, FIRE, RESOLVE, device_filter_lookups
+
+T0 = datetime(2026, 1, 1)
+
+def at(seconds):
+    return T0 + timedelta(seconds=seconds)
+
+def test_device_window_evicts_oldest_result():
+    """Test that the running means only cover the last `size` results."""
+    window = DeviceWindow(size=3)
+    for latency in (100.0, 10.0, 20.0, 30.0):
+        window.add(True, latency, 0.0)
+    window.add(False, None, 100.0)
+    assert window.mean_latency == 25.0
+    assert window.mean_loss == pytest.approx(100.0 / 3)
+    assert window.failures == 1
+
+def test_rule_fires_once_after_duration_and_resolves():
+    """Test that a breach fires only once it has held for threshold_duration."""
+    engine = RuleEngine(window_size=1)
+    engine.load([CompiledRule(1, 'Down', 'ping_failure', 1, 120, 'high', device_ids={7})])
+    assert engine.observe(7, at(0), False) == []
+    assert engine.observe(7, at(60), False) == []
+    events = engine.observe(7, at(120), False)
+    assert [event.kind for event in events] == [FIRE] and events[0].since == at(0)
+    assert engine.observe(7, at(180), False) == []
+    assert [event.kind for event in engine.observe(7, at(240), True, 5.0)] == [RESOLVE]
+
+def test_rules_only_see_their_devices():
+    """Test that results of devices outside a rule's filter are not evaluated."""
+    engine = RuleEngine()
+    engine.load([CompiledRule(1, 'Slow', 'high_latency', 100, 0, 'medium', device_ids={1})])
+    assert engine.observe(2, at(0), True, 500.0) == []
+    assert 2 not in engine.windows
+    assert [event.kind for event in engine.observe(1, at(0), True, 500.0)] == [FIRE]
+
+def test_device_filter_lookups():
+    """Test that filter keys map to Device lookups and unknown keys are rejected."""
+    assert device_filter_lookups({}) == {}
+    assert device_filter_lookups({'device_type': 'router', 'groups': ['core'], 'ids': ['3']}) == {
+        'device_type__in': ['router'], 'groups__name__in': ['core'], 'id__in': [3]
+    }
+    with pytest.raises(ValueError):
+        device_filter_lookups({'vendor': 'acme'})
+
+def test_rearm_refires_an_unapplied_breach():
+    """Test that a fire or resolve whose alert could not be written happens again."""
+    engine = RuleEngine(window_size=1)
+    engine.load([CompiledRule(1, 'Slow', 'high_latency', 100, 0, 'medium', device_ids={1})])
+    fired = engine.observe(1, at(0), True, 500.0)
+    engine.rearm(fired)
+    assert [event.kind for event in engine.observe(1, at(10), True, 500.0)] == [FIRE]
+    resolved = engine.observe(1, at(20), True, 5.0)
+    engine.rearm(resolved)
+    assert [event.kind for event in engine.observe(1, at(30), True, 5.0)] == [RESOLVE]
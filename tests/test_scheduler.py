@@ -0,0 +1,72 @@
+"""
+Tests for the interval scheduler
+"""
+from collections import Counter
+from monitoring.scheduler import IntervalScheduler, WindowMark
+
+START = 1_000_000.0
+
+def test_each_key_due_once_per_interval():
+    """Test that every key fires exactly once per interval, spread across ticks."""
+    scheduler = IntervalScheduler(tick=10)
+    scheduler.sync({('ping', i): 300 for i in range(3000)}, START)
+
+    fired = Counter()
+    per_tick = []
+    for tick in range(30):
+        due = scheduler.due(START + tick * 10)
+        per_tick.append(len(due))
+        fired.update(due)
+
+    assert len(fired) == 3000
+    assert set(fired.values()) == {1}
+    assert max(per_tick) < 3000 / 30 * 2
+
+def test_stale_scheduler_agrees_and_skips_missed_slots():
+    """Test that a scheduler which missed ticks does not replay them."""
+    current = IntervalScheduler(tick=10)
+    stale = IntervalScheduler(tick=10)
+    intervals = {('ping', i): 60 for i in range(500)}
+    current.sync(intervals, START)
+    stale.sync(intervals, START)
+
+    for tick in range(1, 50):
+        current_due = current.due(START + tick * 10)
+
+    assert sorted(stale.due(START + 49 * 10)) == sorted(current_due)
+
+def test_interval_change_and_removal():
+    """Test rescheduling and removing keys."""
+    scheduler = IntervalScheduler(tick=10)
+    scheduler.sync({'a': 60, 'b': 60}, START)
+    scheduler.sync({'a': 30}, START)
+
+    fired = Counter()
+    for tick in range(1, 7):
+        fired.update(scheduler.due(START + tick * 10))
+
+    assert fired['a'] == 2
+    assert 'b' not in fired
+    assert len(scheduler) == 1
+
+def test_late_tick_dispatches_the_skipped_window():
+    """Test that a tick running more than tick/2 late still dispatches every key once."""
+    scheduler = IntervalScheduler(tick=10)
+    scheduler.sync({('ping', i): 60 for i in range(600)}, START)
+    mark = WindowMark()
+
+    fired = Counter()
+    for now in [START + 10, START + 20, START + 36, START + 40, START + 50, START + 60]:
+        _start, window_end = scheduler.window(now)
+        fired.update(scheduler.due(now, since=mark.advance(window_end)))
+
+    assert len(fired) == 600
+    assert set(fired.values()) == {1}
+
+def test_handled_window_is_not_dispatched_twice():
+    """Test that a second tick in an already handled window returns nothing."""
+    scheduler = IntervalScheduler(tick=10)
+    scheduler.sync({('ping', i): 10 for i in range(50)}, START)
+    mark = WindowMark()
+    assert len(scheduler.due(START + 10, since=mark.advance(START + 10))) == 50
+    assert scheduler.due(START + 11, since=mark.advance(START + 10)) == []
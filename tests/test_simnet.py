@@ -0,0 +1,29 @@
+"""
+Tests for the simulated network used by the probe benchmarks
+"""
+import dns.message
+from benchmarks.simnet import SimulatedNetwork, dns_reply, DNS_ANSWER
+
+def test_profiles_are_deterministic():
+    """Test that the same seed gives the same hosts and profiles in every process."""
+    first = SimulatedNetwork(500, latency=10, jitter=5, blackhole=0.1, seed=7)
+    second = SimulatedNetwork(500, latency=10, jitter=5, blackhole=0.1, seed=7)
+
+    assert first.hosts[0] == '127.16.0.1'
+    assert first.hosts == second.hosts
+    for host in first.hosts:
+        assert first.profile(host).latency == second.profile(host).latency
+        assert first.profile(host).blackholed == second.profile(host).blackholed
+        assert 5 <= first.profile(host).latency <= 15
+    assert 0 < sum(first.profile(host).blackholed for host in first.hosts) < 500
+    assert first.profile('10.0.0.1') is None
+
+def test_dns_reply_answers_a_queries():
+    """Test that the DNS stand-in builds a reply dnspython accepts."""
+    query = dns.message.make_query('google.com', 'A')
+    response = dns.message.from_wire(dns_reply(query.to_wire()))
+
+    assert response.id == query.id
+    assert query.is_response(response)
+    assert [item.to_text() for item in response.answer[0]] == [DNS_ANSWER]
+    assert dns_reply(b'\x00' * 5) is None
@@ -0,0 +1,27 @@
+"""
+Tests for the asyncio TCP port-check engine
+"""
+import socket
+from monitoring.tcp import check_ports
+
+def test_open_and_closed_ports():
+    """Test that a listening port is reachable and a closed one is refused."""
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(16)
+    open_port = listener.getsockname()[1]
+
+    closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    closed.bind(('127.0.0.1', 0))
+    closed_port = closed.getsockname()[1]
+    closed.close()
+
+    try:
+        results = check_ports([('127.0.0.1', open_port), ('127.0.0.1', closed_port, 2)], timeout=2)
+    finally:
+        listener.close()
+
+    assert results[('127.0.0.1', open_port)]['is_reachable'] is True
+    assert results[('127.0.0.1', open_port)]['response_time'] is not None
+    assert results[('127.0.0.1', closed_port)]['is_reachable'] is False
+    assert 'refused' in results[('127.0.0.1', closed_port)]['error_message']
@@ -0,0 +1,43 @@
+"""
+Tests for path hashing and link extraction from traceroute hops
+"""
+from monitoring.topology import path_addresses, path_hash, path_links
+
+def hop(number, address, rtt=None):
+    return {'hop': number, 'address': address, 'rtts': [rtt] if rtt else [], 'avg_rtt': rtt}
+
+def test_path_hash_tracks_route_and_silent_hops():
+    """Test that the hash changes with any hop, including one that stops answering."""
+    route = [hop(1, '10.0.0.1', 1.0), hop(2, '10.0.1.1', 2.0), hop(3, '8.8.8.8', 9.0)]
+    same_route_other_rtts = [hop(2, '10.0.1.1', 7.0), hop(1, '10.0.0.1', 3.0), hop(3, '8.8.8.8', 12.0)]
+    silent = [hop(1, '10.0.0.1', 1.0), hop(2, None), hop(3, '8.8.8.8', 9.0)]
+    assert path_addresses(same_route_other_rtts) == ['10.0.0.1', '10.0.1.1', '8.8.8.8']
+    assert path_hash(path_addresses(route)) == path_hash(path_addresses(same_route_other_rtts))
+    assert path_hash(path_addresses(route)) != path_hash(path_addresses(silent))
+
+def test_path_links_span_silent_hops():
+    """Test that links join answering hops with their RTT difference, floored at zero."""
+    hops = [hop(1, '10.0.0.1', 2.0), hop(2, None), hop(3, '10.0.1.1', 1.5), hop(4, '10.0.1.1', 1.6), hop(5, '8.8.8.8')]
+    assert path_links(hops) == [('10.0.0.1', '10.0.1.1', 0.0), ('10.0.1.1', '8.8.8.8', None)]
+
+def test_flaky_silent_hop_keeps_the_route(db):
+    """Test that a hop answering only some traces does not count as a route change."""
+    from devices.models import Device
+    from monitoring.topology import record_paths
+    from monitoring.topology_models import DevicePath, DevicePathHop
+
+    device = Device.objects.create(name='edge', ip_address='10.9.0.1')
+    answered = {'hops': [hop(1, '10.0.0.1', 1.0), hop(2, '10.0.1.1', 2.0), hop(3, '10.9.0.1', 5.0)]}
+    silent = {'hops': [hop(1, '10.0.0.1', 1.0), hop(2, None), hop(3, '10.9.0.1', 5.0)]}
+    rerouted = {'hops': [hop(1, '10.0.0.1', 1.0), hop(2, None), hop(3, '10.9.9.9', 5.0)]}
+
+    first = record_paths({device.id: answered})[device.id]
+    for trace in (silent, answered, silent):
+        outcome = record_paths({device.id: trace})[device.id]
+        assert not outcome['changed']
+        assert outcome['path_hash'] == first['path_hash']
+    assert DevicePath.objects.get(device=device).change_count == 0
+    assert DevicePathHop.objects.filter(device=device).count() == 3
+
+    assert record_paths({device.id: rerouted})[device.id]['changed']
+    assert DevicePath.objects.get(device=device).hops == ['10.0.0.1', None, '10.9.9.9']
@@ -0,0 +1,56 @@
+"""
+Tests for the parallel traceroute engine
+"""
+import struct
+
+from monitoring.icmp import build_echo_request
+from monitoring.traceroute import (
+    build_hops, format_trace, paris_payload, parse_probe_response, parse_traceroute_output, trace_result
+)
+
+def ipv4_header(protocol=1):
+    return bytes([0x45, 0, 0, 0, 0, 0, 0, 0, 64, protocol, 0, 0]) + bytes([10, 0, 0, 1, 10, 0, 0, 2])
+
+def test_paris_payload_keeps_checksum_constant():
+    """Test that every sequence number gives the same echo request checksum."""
+    checksums = {build_echo_request(0x1234, seq, paris_payload(seq))[2:4] for seq in (1, 2, 500, 65535)}
+    assert len(checksums) == 1
+
+def test_parse_time_exceeded_quotes_probe():
+    """Test that a Time Exceeded message is matched to the quoted probe."""
+    probe = build_echo_request(0x1234, 42, paris_payload(42))
+    message = ipv4_header() + struct.pack('!BBHI', 11, 0, 0, 0) + ipv4_header() + probe[:8]
+    assert parse_probe_response(message) == (11, 0x1234, 42)
+    assert parse_probe_response(ipv4_header() + struct.pack('!BBHHH', 0, 0, 0, 0x1234, 7)) == (0, 0x1234, 7)
+    udp_quote = ipv4_header() + struct.pack('!BBHI', 11, 0, 0, 0) + ipv4_header(protocol=17) + probe[:8]
+    assert parse_probe_response(udp_quote) is None
+
+def test_build_hops_stops_at_destination():
+    """Test that hops end at the destination and silent hops are kept only in between."""
+    responses = {
+        1: [('10.0.0.1', 1.0, 11), ('10.0.0.1', 3.0, 11)],
+        2: [None, None],
+        3: [('8.8.8.8', 9.0, 0), None],
+        4: [('8.8.8.8', 9.5, 0), ('8.8.8.8', 9.6, 0)],
+    }
+    hops = build_hops(responses, '8.8.8.8')
+    assert [hop['address'] for hop in hops] == ['10.0.0.1', None, '8.8.8.8']
+    assert hops[0]['avg_rtt'] == 2.0
+    assert hops[2]['loss'] == 50.0
+    result = trace_result('8.8.8.8', hops, '8.8.8.8')
+    assert result['destination_reached'] is True
+    assert format_trace(result).splitlines()[1:] == [' 2  *  *', ' 3  8.8.8.8  9.000 ms  *']
+
+def test_parse_traceroute_output():
+    """Test that traceroute text is parsed into structured hops."""
+    output = (
+        "traceroute to 8.8.8.8 (8.8.8.8), 15 hops max, 60 byte packets\n"
+        " 1  192.168.1.1  0.512 ms  0.401 ms  0.399 ms\n"
+        " 2  * * *\n"
+        " 3  8.8.8.8  10.1 ms *  9.9 ms\n"
+    )
+    hops = parse_traceroute_output(output)
+    assert [hop['hop'] for hop in hops] == [1, 2, 3]
+    assert hops[0]['rtts'] == [0.512, 0.401, 0.399]
+    assert hops[1]['address'] is None and hops[1]['loss'] == 100.0
+    assert hops[2]['address'] == '8.8.8.8' and hops[2]['avg_rtt'] == 10.0
@@ -0,0 +1,60 @@
+"""
+Tests for the write-behind result buffer
+"""
+import atexit
+
+from monitoring.write_buffer import WriteBehindBuffer
+
+def test_rows_flushed_in_batches():
+    """Test that pending rows are written in max_batch sized chunks."""
+    batches = []
+    buffer = WriteBehindBuffer(batches.append, max_batch=10, flush_interval=60)
+    buffer.add_many(range(25))
+    buffer.close()
+
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert buffer.metrics()['rows_flushed'] == 25
+    assert buffer.metrics()['queue_depth'] == 0
+
+def test_failed_flush_requeues_and_caps_pending():
+    """Test that a failing writer keeps rows queued without growing past max_pending."""
+    def fail(rows):
+        raise RuntimeError('database unavailable')
+
+    buffer = WriteBehindBuffer(fail, max_batch=5, flush_interval=60, max_pending=8, block_timeout=0)
+    try:
+        buffer.add_many(range(6))
+        buffer.flush()
+        assert buffer.metrics()['queue_depth'] == 6
+
+        buffer.add_many(range(6, 12))
+        metrics = buffer.metrics()
+        assert metrics['queue_depth'] <= 8
+        assert metrics['rows_dropped'] >= 4
+        assert metrics['flush_errors'] >= 2
+    finally:
+        # Stop the flusher now; at interpreter exit the failing writer would
+        # log to streams pytest has already closed
+        buffer.close()
+        atexit.unregister(buffer.close)
+
+def test_get_buffer_rejects_a_different_writer():
+    """Test that a second caller cannot silently share a buffer that writes differently."""
+    import pytest
+    from monitoring.write_buffer import get_buffer
+
+    first = get_buffer('tests.writer_check', lambda: list.append, writer=('model', 'hook'))
+    assert get_buffer('tests.writer_check', lambda: list.append, writer=('model', 'hook')) is first
+    with pytest.raises(ValueError):
+        get_buffer('tests.writer_check', lambda: list.append, writer=('model', 'other_hook'))
+
+def test_published_metrics_fall_back_to_this_process():
+    """Test that metrics without a Redis URL report this process's buffers."""
+    from monitoring.write_buffer import get_buffer, published_metrics, worker_name
+
+    get_buffer('tests.local_metrics', lambda: list.append)
+    workers = published_metrics('')
+    assert len(workers) == 1
+    assert workers[0]['source'] == 'local'
+    assert workers[0]['worker'] == worker_name()
+    assert 'tests.local_metrics' in [buffer['name'] for buffer in workers[0]['buffers']]